@@ -0,0 +1,199 @@
+"""
+Tables d'alias (méthode de Vose) pour des tirages pondérés en O(1)
+
+Une AliasTable regroupe plusieurs distributions discrètes dans des tableaux plats, délimitées par
+indptr comme dans graph_csr: pour le CSR du graphe, un groupe = les arêtes sortantes d'un nœud et
+le poids d'une arête = csr.weights (écoutes ou co-écoutes). Chaque élément e d'un groupe de taille n
+garde une probabilité prob[e] et un alias[e]: tirer une colonne k uniforme, puis garder k avec la
+probabilité prob[k] ou prendre alias[k] sinon. Construction en O(n_éléments), tirages vectorisés
+sur un lot de groupes (draw), utilisés pour les ripple sets pondérés (data_loader) et les marches
+aléatoires (walk_corpus).
+
+Usage (depuis src/):
+    python alias_sampling.py --benchmark
+"""
+import argparse
+import collections
+import json
+import time
+import numpy as np
+
+from graph_snapshot import load_snapshot
+from profiling import span
+from rng_utils import make_rng
+
+# indptr (n_groups + 1,), prob float32 et alias int64 (n_éléments,) alignés sur les éléments,
+# totals: poids total de chaque groupe (taille du groupe si tous ses poids sont nuls)
+AliasTable = collections.namedtuple('AliasTable', ['indptr', 'prob', 'alias', 'totals'])
+
+
+def build_alias(indptr, weights):
+    """
+    Tables d'alias de tous les groupes en une passe vectorisée
+
+    Équivalent à Vose avec des files: les colonnes "petites" (n * p < 1) sont complétées dans l'ordre
+    par la "grande" colonne courante, qui devient petite à son tour quand son excédent est épuisé et
+    est alors complétée par la grande suivante. Les déficits des petites colonnes et les excédents des
+    grandes, mis bout à bout par groupe, se remplissent donc dans l'ordre: l'alias d'une petite colonne
+    est la grande dont l'intervalle d'excédent contient le début de son déficit (searchsorted).
+
+    Args:
+        indptr: Bornes des groupes (comme CSRGraph.indptr)
+        weights: Poids positifs ou nuls des éléments (un groupe de poids tous nuls devient uniforme)
+
+    Returns:
+        AliasTable
+    """
+    indptr = np.asarray(indptr, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if (weights < 0).any():
+        raise ValueError('Poids négatifs: tirage pondéré impossible')
+    n_groups = len(indptr) - 1
+    sizes = np.diff(indptr)
+    groups = np.repeat(np.arange(n_groups), sizes)
+    totals = np.bincount(groups, weights=weights, minlength=n_groups)
+    empty = totals[groups] == 0
+    if empty.any():
+        weights = np.where(empty, 1.0, weights)
+        totals = np.bincount(groups, weights=weights, minlength=n_groups)
+    scaled = weights * (sizes / np.maximum(totals, np.finfo(np.float64).tiny))[groups]
+
+    prob = np.ones(len(weights), dtype=np.float64)
+    alias = np.arange(len(weights), dtype=np.int64)
+    is_large = scaled >= 1.0
+    # Groupe sans grande colonne: tous les n * p valent 1 à l'arrondi près (ex: un seul élément)
+    has_large = np.bincount(groups[is_large], minlength=n_groups) > 0
+    small = np.flatnonzero(~is_large & has_large[groups])
+    large = np.flatnonzero(is_large)
+    if len(small):
+        prob[small] = scaled[small]
+        # Déficits et excédents cumulés (les groupes se suivent, les sommes coïncident à chaque fin de groupe)
+        deficit_end = np.cumsum(1.0 - scaled[small])
+        deficit_start = deficit_end - (1.0 - scaled[small])
+        excess_end = np.cumsum(scaled[large] - 1.0)
+        # Grandes colonnes de chaque groupe: [first_large, last_large] (les erreurs d'arrondi aux
+        # frontières de groupes sont rattrapées en bornant les positions au groupe)
+        large_groups = groups[large]
+        first_large = np.searchsorted(large_groups, np.arange(n_groups))
+        last_large = np.searchsorted(large_groups, np.arange(n_groups), side='right') - 1
+
+        small_groups = groups[small]
+        donor = np.searchsorted(excess_end, deficit_start, side='right')
+        donor = np.clip(donor, first_large[small_groups], last_large[small_groups])
+        alias[small] = large[donor]
+
+        # Grande colonne dont l'excédent s'épuise au milieu du déficit d'une petite colonne: elle
+        # cède ce dépassement à la grande suivante du groupe (sauf la dernière, à l'arrondi près)
+        crossing = np.minimum(np.searchsorted(deficit_end, excess_end, side='right'), len(small) - 1)
+        overshoot = deficit_end[crossing] - excess_end
+        crosses = ((small_groups[crossing] == large_groups) & (deficit_start[crossing] < excess_end)
+                   & (np.arange(len(large)) < last_large[large_groups]))
+        overshoot = np.where(crosses, np.clip(overshoot, 0.0, 1.0), 0.0)
+        prob[large] = 1.0 - overshoot
+        alias[large[crosses]] = large[np.flatnonzero(crosses) + 1]
+    return AliasTable(indptr=indptr, prob=prob.astype(np.float32), alias=alias, totals=totals)
+
+
+def csr_alias_table(csr, weights=None):
+    """
+    Tables d'alias des arêtes sortantes de chaque nœud
+
+    Args:
+        csr: CSRGraph
+        weights: Poids alignés sur les arêtes (défaut: csr.weights)
+
+    Returns:
+        AliasTable dont les éléments sont les arêtes du CSR
+    """
+    with span('alias_sampling.build', edges=len(csr.indices)):
+        return build_alias(csr.indptr, csr.weights if weights is None else weights)
+
+
+def draw(table, groups, rng=None, size=None):
+    """
+    Tirages pondérés, un (ou size) par groupe demandé
+
+    Args:
+        table: AliasTable
+        groups: Index de groupes (scalaire ou array, ex: nœuds du CSR)
+        rng: numpy.random.Generator (voir rng_utils.make_rng)
+        size: Nombre de tirages par groupe (défaut: un seul, sans dimension ajoutée)
+
+    Returns:
+        Array int64 d'index d'éléments (arêtes pour csr_alias_table), -1 pour les groupes vides,
+        de forme groups.shape (+ (size,))
+    """
+    rng = make_rng(rng)
+    groups = np.asarray(groups, dtype=np.int64)
+    if size is not None:
+        groups = np.broadcast_to(groups[..., None], groups.shape + (size,))
+    flat = groups.ravel()
+    starts = table.indptr[flat]
+    sizes = table.indptr[flat + 1] - starts
+    # Une seule uniforme par tirage: partie entière = colonne, partie fractionnaire = test d'alias
+    u = rng.random(len(flat)) * sizes
+    columns = np.minimum(u.astype(np.int64), np.maximum(sizes - 1, 0))
+    elements = starts + columns
+    valid = sizes > 0
+    if not valid.any():
+        return np.full(groups.shape, -1, dtype=np.int64)
+    elements[~valid] = 0
+    use_alias = (u - columns) >= table.prob[elements]
+    elements = np.where(use_alias, table.alias[elements], elements)
+    elements[~valid] = -1
+    return elements.reshape(groups.shape)
+
+
+def benchmark(csr, n_draws=1_000_000, n_nodes=2000, seed=0):
+    """
+    Construction des tables, débit des tirages par lot, comparaison avec Generator.choice(p=...)
+    par nœud et écart entre fréquences tirées et poids sur le nœud de plus fort degré
+
+    Returns:
+        dict
+    """
+    rng = make_rng(seed)
+    start = time.perf_counter()
+    table = csr_alias_table(csr)
+    build_seconds = time.perf_counter() - start
+
+    heads = np.flatnonzero(np.diff(csr.indptr))
+    nodes = rng.choice(heads, n_draws)
+    start = time.perf_counter()
+    draw(table, nodes, rng)
+    alias_seconds = time.perf_counter() - start
+
+    sample = nodes[:n_nodes]
+    start = time.perf_counter()
+    for node in sample:
+        weights = csr.weights[csr.indptr[node]:csr.indptr[node + 1]].astype(np.float64)
+        rng.choice(len(weights), p=weights / weights.sum())
+    choice_seconds = time.perf_counter() - start
+
+    hub = int(np.argmax(np.diff(csr.indptr)))
+    edges = draw(table, hub, rng, size=n_draws)
+    hub_weights = csr.weights[csr.indptr[hub]:csr.indptr[hub + 1]].astype(np.float64)
+    frequencies = np.bincount(edges - csr.indptr[hub], minlength=len(hub_weights)) / n_draws
+    return {'edges': int(len(csr.indices)), 'build_seconds': round(build_seconds, 4),
+            'alias_draws_per_s': round(n_draws / alias_seconds),
+            'choice_draws_per_s': round(len(sample) / choice_seconds),
+            'hub_degree': int(len(hub_weights)),
+            'hub_max_frequency_error': float(np.abs(frequencies - hub_weights / hub_weights.sum()).max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tables d'alias pour tirages pondérés sur le KG")
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--benchmark', action='store_true', help='Mesurer construction et tirages')
+    parser.add_argument('--n_draws', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    csr = load_snapshot(args.dataset_path, args.dataset).csr
+    if args.benchmark:
+        print(json.dumps(benchmark(csr, args.n_draws, seed=args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
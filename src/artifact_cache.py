@@ -0,0 +1,156 @@
+"""
+Cache d'artefacts adressé par contenu pour les étapes du prétraitement
+
+Chaque étape déclare ses entrées: empreintes SHA-256 des fichiers bruts, paramètres et clés des
+étapes amont. La clé de l'artefact est l'empreinte de ces entrées: une étape dont la clé est déjà
+dans le cache est relue au lieu d'être recalculée, et une entrée modifiée invalide l'étape et
+toutes celles qui en dépendent (leurs clés changent en cascade).
+
+Disposition: {cache_dir}/{étape}/{clé}.npz (arrays numpy, écriture atomique), plus
+{cache_dir}/outputs.json qui associe chaque fichier de sortie à la clé qui l'a produit.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+
+# À incrémenter quand le contenu d'un artefact change pour des entrées identiques
+ARTIFACT_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Empreinte SHA-256 du contenu d'un fichier ('absent' s'il n'existe pas)"""
+    if not os.path.exists(path):
+        return 'absent'
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_key(stage, **inputs):
+    """
+    Clé d'un artefact: empreinte du nom de l'étape et de ses entrées
+
+    Args:
+        stage: Nom de l'étape
+        **inputs: Valeurs sérialisables en JSON (empreintes, paramètres, clés amont)
+
+    Returns:
+        str: Empreinte SHA-256 hexadécimale
+    """
+    payload = json.dumps({'stage': stage, 'version': ARTIFACT_VERSION, 'inputs': inputs},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def json_array(obj):
+    """Objet JSON stocké comme array uint8 (pas de pickle dans les .npz)"""
+    return np.frombuffer(json.dumps(obj, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+
+
+def json_value(array):
+    return json.loads(np.asarray(array).tobytes().decode('utf-8'))
+
+
+class ArtifactCache:
+    """
+    Artefacts des étapes, rangés par clé
+
+    Args:
+        cache_dir: Dossier du cache
+        enabled: False = toujours recalculer et ne rien écrire (ex: --no_cache)
+    """
+
+    def __init__(self, cache_dir, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.status = {}
+
+    def path(self, stage, key):
+        return os.path.join(self.cache_dir, stage, f'{key}.npz')
+
+    def load(self, stage, key):
+        """Arrays de l'artefact, ou None s'il est absent (ou illisible)"""
+        path = self.path(stage, key)
+        if not self.enabled or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+
+    def save(self, stage, key, arrays):
+        if not self.enabled:
+            return
+        path = self.path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def stage(self, stage, key, compute):
+        """
+        Relire l'artefact de l'étape, ou le calculer puis l'enregistrer
+
+        Args:
+            stage: Nom de l'étape
+            key: Clé de l'artefact (voir artifact_key)
+            compute: Fonction sans argument retournant un dictionnaire {nom: array}
+
+        Returns:
+            dict: {nom: array}
+        """
+        arrays = self.load(stage, key)
+        if arrays is not None:
+            self.status[stage] = 'cache'
+        else:
+            arrays = compute()
+            self.save(stage, key, arrays)
+            self.status[stage] = 'calculé'
+        print(f'  [étape {stage}] {self.status[stage]} ({key[:12]})')
+        return arrays
+
+    def _outputs_file(self):
+        return os.path.join(self.cache_dir, 'outputs.json')
+
+    def _read_outputs(self):
+        try:
+            with open(self._outputs_file(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def materialize(self, path, key, write):
+        """
+        Écrire un fichier de sortie, sauf s'il a déjà été écrit depuis la même clé et n'a pas changé
+
+        Args:
+            path: Fichier de sortie
+            key: Clé des données écrites
+            write: Fonction write(path)
+
+        Returns:
+            bool: True si le fichier a été (ré)écrit
+        """
+        name = os.path.abspath(path)
+        outputs = self._read_outputs() if self.enabled else {}
+        record = outputs.get(name)
+        if record is not None and record['key'] == key and os.path.exists(path):
+            stat = os.stat(path)
+            if [stat.st_size, stat.st_mtime_ns] == [record['size'], record['mtime_ns']]:
+                print(f'  [sortie {os.path.basename(path)}] inchangée ({key[:12]})')
+                return False
+        write(path)
+        if self.enabled:
+            stat = os.stat(path)
+            outputs[name] = {'key': key, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f'{self._outputs_file()}.tmp{os.getpid()}'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(outputs, f, indent=2)
+            os.replace(tmp_path, self._outputs_file())
+        return True
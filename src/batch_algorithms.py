@@ -0,0 +1,131 @@
+"""
+Versions vectorisées de BFS, Dijkstra et Prim pour plusieurs utilisateurs à la fois
+Chaque colonne d'un bloc (n_nodes, batch) est un utilisateur; les arêtes entrantes de chaque nœud
+sont parcourues par réductions segmentées (reduceat) sur le CSR transposé
+"""
+import numpy as np
+from graph_algorithms import ARTIST_RELATIONS
+from graph_csr import build_csr, csr_heads, transpose_csr
+
+
+def incoming_graph(csr, relations=ARTIST_RELATIONS):
+    """
+    Arêtes entrantes des relations suivies (CSR transposé) et leur nœud cible
+
+    Returns:
+        tuple: (CSRGraph transposé, array des cibles de chaque arête)
+    """
+    heads = csr_heads(csr)
+    keep = np.isin(csr.relations, relations)
+    kg_np = np.column_stack([heads[keep], csr.relations[keep], csr.indices[keep], csr.weights[keep]])
+    incoming = transpose_csr(build_csr(kg_np, n_nodes=csr.n_nodes))
+    return incoming, csr_heads(incoming)
+
+
+def _segment_reduce(ufunc, values, targets, n_nodes, fill):
+    """Réduire les lignes de values (groupées par cible croissante) par cible"""
+    out = np.full((n_nodes, values.shape[1]), fill, dtype=values.dtype)
+    if len(targets) == 0:
+        return out
+    starts = np.flatnonzero(np.r_[True, targets[1:] != targets[:-1]])
+    out[targets[starts]] = ufunc.reduceat(values, starts, axis=0)
+    return out
+
+
+def _seed_mask(n_nodes, seed_lists):
+    mask = np.zeros((n_nodes, len(seed_lists)), dtype=bool)
+    for column, seeds in enumerate(seed_lists):
+        mask[np.asarray(seeds, dtype=np.int64), column] = True
+    return mask
+
+
+def bfs_hops_batch(incoming, targets, seed_lists, max_hops=2):
+    """
+    Niveau BFS de chaque nœud pour chaque utilisateur (mêmes ensembles que bfs_recommend)
+
+    Args:
+        incoming, targets: Voir incoming_graph
+        seed_lists: Artistes de départ de chaque utilisateur (niveau 0)
+        max_hops: Nombre maximum de hops
+
+    Returns:
+        Array int16 (n_nodes, batch): hop, -1 si non atteint
+    """
+    n_nodes = incoming.n_nodes
+    frontier = _seed_mask(n_nodes, seed_lists)
+    visited = frontier.copy()
+    hops = np.where(frontier, 0, -1).astype(np.int16)
+
+    for hop in range(1, max_hops + 1):
+        # Seules les arêtes dont la source est dans une frontière comptent
+        active = frontier.any(axis=1)[incoming.indices]
+        reached = _segment_reduce(np.logical_or, np.take(frontier, incoming.indices[active], axis=0),
+                                  targets[active], n_nodes, False)
+        frontier = reached & ~visited
+        if not frontier.any():
+            break
+        visited |= frontier
+        hops[frontier] = hop
+    return hops
+
+
+def dijkstra_batch(incoming, targets, seed_lists, max_iter=1000):
+    """
+    Distances des plus courts chemins depuis les artistes écoutés (distance = 1 / poids)
+
+    Relaxation de Bellman-Ford restreinte aux arêtes sortant des nœuds dont la distance
+    a changé à l'itération précédente: mêmes distances que dijkstra_recommend.
+
+    Returns:
+        tuple: (array float64 (n_nodes, batch), inf si non atteint; nombre d'itérations)
+    """
+    n_nodes = incoming.n_nodes
+    lengths = np.full(len(incoming.weights), np.inf)
+    positive = incoming.weights > 0
+    lengths[positive] = 1.0 / incoming.weights[positive]
+    seeds = _seed_mask(n_nodes, seed_lists)
+    distances = np.where(seeds, 0.0, np.inf)
+    changed = seeds.any(axis=1)
+
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        active = changed[incoming.indices] & positive
+        if not active.any():
+            break
+        candidates = np.take(distances, incoming.indices[active], axis=0) + lengths[active][:, None]
+        best = _segment_reduce(np.minimum, candidates, targets[active], n_nodes, np.inf)
+        improved = best < distances
+        distances[improved] = best[improved]
+        changed = improved.any(axis=1)
+    return distances, iteration
+
+
+def widest_path_batch(incoming, targets, seed_lists, max_iter=1000):
+    """
+    Capacité du chemin le plus large depuis les artistes écoutés (score "Prim")
+
+    La capacité d'un chemin est son plus petit poids; la meilleure capacité vers un nœud est
+    celle du chemin qui le relie aux artistes écoutés dans l'arbre couvrant de poids maximum,
+    c'est-à-dire l'arbre que grandit prim_recommend.
+
+    Returns:
+        tuple: (array float64 (n_nodes, batch), 0 si non atteint, inf pour les départs;
+                nombre d'itérations)
+    """
+    n_nodes = incoming.n_nodes
+    weights = incoming.weights.astype(np.float64)
+    seeds = _seed_mask(n_nodes, seed_lists)
+    capacities = np.where(seeds, np.inf, 0.0)
+    changed = seeds.any(axis=1)
+
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        active = changed[incoming.indices] & (weights > 0)
+        if not active.any():
+            break
+        candidates = np.minimum(np.take(capacities, incoming.indices[active], axis=0), weights[active][:, None])
+        best = _segment_reduce(np.maximum, candidates, targets[active], n_nodes, 0.0)
+        improved = best > capacities
+        capacities[improved] = best[improved]
+        changed = improved.any(axis=1)
+    return capacities, iteration
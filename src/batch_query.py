@@ -0,0 +1,180 @@
+"""
+Requêtes par lot en flux JSONL: un seul processus chargé pour toute une liste d'utilisateurs ou d'artistes
+
+Entrée: un id par ligne, depuis un fichier ou stdin ('-'); lignes vides et commençant par # ignorées
+Sortie: une ligne JSON par id, dans l'ordre de l'entrée
+    {"user_id": 3, "recommendations": [{"artist": 12, "score": 0.01, "name": "..."}, ...]}
+    {"artist_id": 14, "similar": [...]}
+    avec "error" à la place des résultats pour un id inconnu ou une ligne invalide
+Les ids sont lus par blocs de --batch_size, et chaque bloc passe en un seul appel à
+RecommendationEngine.recommend_batch / similar_artists_batch (PPR vectorisé sur le bloc).
+La mémoire reste bornée par un bloc, quelle que soit la taille de l'entrée.
+
+Usage (depuis src/):
+    python main.py --batch users.txt --algorithm ppr --top_k 10 --batch_output recs.jsonl
+    seq 0 999 | python main.py --batch - --query similar --similar_method table > similar.jsonl
+"""
+import contextlib
+import itertools
+import json
+import sys
+import time
+
+from engine import RecommendationEngine
+from profiling import span
+
+BATCH_QUERIES = ['recommend', 'similar']
+# Intervalle minimal entre deux lignes de progression (secondes)
+PROGRESS_INTERVAL = 2.0
+
+
+def parse_ids(lines):
+    """
+    Ids de l'entrée, une ligne à la fois
+
+    Yields:
+        tuple: (texte de la ligne, id entier ou None si la ligne n'est pas un entier)
+    """
+    for line in lines:
+        text = line.strip()
+        if not text or text.startswith('#'):
+            continue
+        try:
+            yield text, int(text)
+        except ValueError:
+            yield text, None
+
+
+def iter_chunks(items, size):
+    """Blocs successifs d'au plus size éléments, sans matérialiser l'itérable"""
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Progress:
+    """
+    Compteur de requêtes et débit, écrit sur stderr au plus toutes les PROGRESS_INTERVAL secondes
+
+    Args:
+        stream: Flux de sortie (défaut: sys.stderr; None = silencieux)
+    """
+
+    def __init__(self, stream=sys.stderr, interval=PROGRESS_INTERVAL):
+        self.stream = stream
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.queries = 0
+        self.errors = 0
+
+    def update(self, queries, errors):
+        self.queries += queries
+        self.errors += errors
+        now = time.perf_counter()
+        if self.stream is not None and now - self.last >= self.interval:
+            self.last = now
+            print(f'  {self.queries} requêtes ({self.errors} erreurs), {self.rate():.0f} requêtes/s',
+                  file=self.stream, flush=True)
+
+    def rate(self):
+        return self.queries / max(time.perf_counter() - self.start, 1e-9)
+
+    def summary(self):
+        return {'queries': self.queries, 'errors': self.errors,
+                'seconds': round(time.perf_counter() - self.start, 3), 'queries_per_s': round(self.rate(), 1)}
+
+
+def _run_chunk(engine, ids, query, k, algorithm, method, max_hops):
+    if query == 'recommend':
+        return engine.recommend_batch(ids, algorithm, k, max_hops)
+    return engine.similar_artists_batch(ids, k, method)
+
+
+def stream_batch(engine, lines, output, query='recommend', algorithm='ppr', k=10, batch_size=64,
+                 method='ppr', max_hops=2, progress=None):
+    """
+    Traiter toutes les lignes d'entrée par blocs et écrire une ligne JSON par id
+
+    Args:
+        engine: RecommendationEngine chargé
+        lines: Itérable de lignes (fichier ouvert, sys.stdin, liste)
+        output: Flux texte de sortie (vidé après chaque bloc)
+        query: 'recommend' (ids d'utilisateurs) ou 'similar' (ids d'artistes)
+        algorithm: Algorithme de recommend_batch (query='recommend')
+        k: Nombre de résultats par id
+        batch_size: Nombre d'ids par appel au moteur
+        method: Méthode de similar_artists_batch (query='similar')
+        max_hops: Pour BFS
+        progress: Progress (défaut: nouveau compteur sur stderr)
+
+    Returns:
+        dict: Nombre de requêtes, d'erreurs, durée et débit
+    """
+    if query not in BATCH_QUERIES:
+        raise ValueError(f'Requête inconnue: {query} (choix: {BATCH_QUERIES})')
+    if progress is None:
+        progress = Progress()
+    id_key, result_key = ('user_id', 'recommendations') if query == 'recommend' else ('artist_id', 'similar')
+    unknown = 'utilisateur inconnu' if query == 'recommend' else 'artiste hors du graphe'
+
+    for chunk in iter_chunks(parse_ids(lines), batch_size):
+        ids = [value for _, value in chunk if value is not None]
+        with span(f'batch_query.{query}', queries=len(ids)):
+            results = iter(_run_chunk(engine, ids, query, k, algorithm, method, max_hops) if ids else [])
+        errors = 0
+        records = []
+        for text, value in chunk:
+            if value is None:
+                record = {id_key: None, 'input': text, 'error': 'id invalide'}
+            else:
+                result = next(results)
+                record = {id_key: value, result_key: result}
+                if result is None:
+                    record = {id_key: value, 'error': unknown}
+            errors += 'error' in record
+            records.append(json.dumps(record, ensure_ascii=False))
+        output.write('\n'.join(records) + '\n')
+        output.flush()
+        progress.update(len(chunk), errors)
+    return progress.summary()
+
+
+def run_batch(dataset_path, dataset_name, input_path, output_path=None, use_small=False, alpha=0.15,
+              ppr_tol=1e-6, **kwargs):
+    """
+    Charger le moteur une fois puis traiter tout le fichier d'entrée (appelé par main.py --batch)
+
+    Les messages de chargement et la progression vont sur stderr: stdout ne reçoit que le JSONL.
+
+    Args:
+        dataset_path: Chemin vers final_data
+        dataset_name: Nom du dataset
+        input_path: Fichier d'ids ('-' = stdin)
+        output_path: Fichier JSONL de sortie (défaut: stdout)
+        alpha, ppr_tol: Paramètres PPR du moteur
+        **kwargs: Transmis à stream_batch (query, algorithm, k, batch_size, method, max_hops)
+
+    Returns:
+        dict: Résumé de stream_batch
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        print('Chargement du moteur de recommandation...')
+        engine = RecommendationEngine.from_dataset(dataset_path, dataset_name, use_small=use_small,
+                                                   alpha=alpha, ppr_tol=ppr_tol)
+    # Index manquant: arrêter avant de lire l'entrée plutôt qu'au premier bloc
+    query = kwargs.get('query', 'recommend')
+    name = kwargs.get('algorithm', 'ppr') if query == 'recommend' else kwargs.get('method', 'ppr')
+    missing = engine.missing_index(name)
+    if missing is not None:
+        raise SystemExit(missing)
+    with contextlib.ExitStack() as stack:
+        lines = sys.stdin if input_path == '-' else stack.enter_context(open(input_path, 'r', encoding='utf-8'))
+        output = sys.stdout if output_path is None else stack.enter_context(open(output_path, 'w', encoding='utf-8'))
+        summary = stream_batch(engine, lines, output, **kwargs)
+    print(f"Terminé: {summary['queries']} requêtes ({summary['errors']} erreurs) en {summary['seconds']} s, "
+          f"{summary['queries_per_s']} requêtes/s", file=sys.stderr)
+    return summary
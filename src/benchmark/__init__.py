@@ -0,0 +1,4 @@
+"""
+Suite de benchmarks sur données synthétiques au format Last.fm
+Lancer depuis src/: python -m benchmark.run_benchmarks --scales 1k
+"""
@@ -0,0 +1,146 @@
+"""
+Comparer les co-écoutes approchées (MinHash/LSH) au calcul exact: précision, rappel, temps
+
+Usage (depuis src/):
+    python -m benchmark.co_listen_report                       # écoutes de final_data/music
+    python -m benchmark.co_listen_report --scale 100k --max_artists 5000
+    python -m benchmark.co_listen_report --configs 128x32 128x64 256x128 --output ../benchmark_results/lsh.json
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from co_listen import LISTENED_TO, co_listen_counts, minhash_co_listen_counts
+from graph_loader import load_kg_array
+from benchmark.synthetic import SCALES, generate_interactions
+
+
+def load_listens(dataset_path, dataset_name='music'):
+    """Écoutes (user_entity, artist) du KG prétraité (relation listened_to)"""
+    kg_np = load_kg_array(dataset_path, dataset_name)
+    listens = kg_np[kg_np[:, 1] == LISTENED_TO]
+    return listens[:, 0].astype(np.int64), listens[:, 2].astype(np.int64)
+
+
+def compare(exact, approx, degree, n_artists, min_jaccard=0.5):
+    """
+    Précision et rappel des paires approchées par rapport aux paires exactes
+
+    Returns:
+        dict: precision, recall, recall pondéré par le nombre de co-écoutes,
+              rappel des paires de Jaccard >= min_jaccard, erreur relative des poids
+    """
+    exact_keys = exact[0] * n_artists + exact[1]
+    approx_keys = approx[0] * n_artists + approx[1]
+    found = np.isin(exact_keys, approx_keys)
+    jaccard = exact[2] / (degree[exact[0]] + degree[exact[1]] - exact[2])
+    similar = jaccard >= min_jaccard
+
+    # Poids des paires retrouvées (exact_keys et approx_keys sont triées)
+    matched = np.searchsorted(approx_keys, exact_keys[found])
+    weight_error = np.abs(approx[2][matched] - exact[2][found]) / exact[2][found]
+    return {
+        'n_exact': int(len(exact_keys)),
+        'n_approx': int(len(approx_keys)),
+        'precision': float(np.isin(approx_keys, exact_keys).mean()) if len(approx_keys) else float('nan'),
+        'recall': float(found.mean()) if len(found) else float('nan'),
+        'weighted_recall': float(exact[2][found].sum() / exact[2].sum()) if len(found) else float('nan'),
+        f'recall_jaccard_{min_jaccard:g}': float(found[similar].mean()) if similar.any() else float('nan'),
+        'n_jaccard': int(similar.sum()),
+        'weight_error': float(weight_error.mean()) if len(weight_error) else float('nan'),
+    }
+
+
+def run_report(users, artists, n_artists, configs, min_co_listens=2, verify=True, min_jaccard=0.5, seed=0,
+               max_bucket=None):
+    """
+    Mesurer le calcul exact puis chaque configuration (n_hashes, bands)
+
+    Returns:
+        dict: {'exact': {...}, 'approx': [{...}, ...]}
+    """
+    degree = np.bincount(artists, minlength=n_artists)
+    start = time.perf_counter()
+    exact = co_listen_counts(users, artists, n_artists, min_co_listens)
+    exact_seconds = time.perf_counter() - start
+    report = {'exact': {'pairs': int(len(exact[0])), 'seconds': round(exact_seconds, 4),
+                        'pair_work': int((np.bincount(users) ** 2).sum() // 2)},
+              'approx': []}
+
+    for n_hashes, bands in configs:
+        start = time.perf_counter()
+        approx = minhash_co_listen_counts(users, artists, n_artists, min_co_listens, n_hashes=n_hashes,
+                                          bands=bands, verify=verify, rng=seed, max_bucket=max_bucket)
+        seconds = time.perf_counter() - start
+        row = {'n_hashes': n_hashes, 'bands': bands,
+               'threshold': round((1.0 / bands) ** (bands / n_hashes), 3),
+               'seconds': round(seconds, 4), 'speedup': round(exact_seconds / seconds, 2)}
+        row.update(compare(exact, approx, degree, n_artists, min_jaccard))
+        report['approx'].append(row)
+    return report
+
+
+def print_report(report, min_jaccard):
+    exact = report['exact']
+    print(f"\nExact: {exact['pairs']} paires en {exact['seconds']:.3f}s "
+          f"({exact['pair_work']} paires énumérées)")
+    print(f"{'hashes':>6} {'bandes':>6} {'seuil J':>7} {'paires':>8} {'précision':>9} {'rappel':>7} "
+          f"{'rappel pondéré':>14} {'rappel J>=' + format(min_jaccard, 'g'):>12} {'temps':>8} {'accél.':>7}")
+    for row in report['approx']:
+        print(f"{row['n_hashes']:>6} {row['bands']:>6} {row['threshold']:>7} {row['n_approx']:>8} "
+              f"{row['precision']:>9.3f} {row['recall']:>7.3f} {row['weighted_recall']:>14.3f} "
+              f"{row[f'recall_jaccard_{min_jaccard:g}']:>12.3f} {row['seconds']:>7.3f}s {row['speedup']:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rapport MinHash/LSH vs co-écoutes exactes')
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--scale', type=str, default=None, choices=sorted(SCALES),
+                        help='Utiliser des écoutes synthétiques au lieu du dataset')
+    parser.add_argument('--max_artists', type=int, default=1000,
+                        help='Longueur maximale d\'un historique synthétique (utilisateurs "lourds")')
+    parser.add_argument('--activity_exponent', type=float, default=2.0,
+                        help='Exposant de Pareto de l\'activité synthétique (plus petit = plus d\'utilisateurs lourds)')
+    parser.add_argument('--configs', nargs='+', default=['64x32', '128x32', '128x64'],
+                        help='Configurations n_hashes x bandes')
+    parser.add_argument('--min_co_listens', type=int, default=2)
+    parser.add_argument('--min_jaccard', type=float, default=0.5,
+                        help='Rappel rapporté séparément pour les paires au moins aussi similaires')
+    parser.add_argument('--estimate', action='store_true',
+                        help='Estimer les co-écoutes depuis les signatures au lieu de les vérifier')
+    parser.add_argument('--max_bucket', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None)
+    args = parser.parse_args()
+
+    if args.scale:
+        n_users, n_artists = SCALES[args.scale]
+        interactions = generate_interactions(n_users, n_artists, seed=args.seed, max_artists=args.max_artists,
+                                             activity_exponent=args.activity_exponent)
+        users, artists = interactions[:, 0] - 1, interactions[:, 1] - 1
+        source = f'synthétique {args.scale}'
+    else:
+        users, artists = load_listens(args.dataset_path, args.dataset)
+        n_artists = int(artists.max()) + 1
+        source = f'{args.dataset_path}/{args.dataset}'
+    users = users.astype(np.int64)
+    artists = artists.astype(np.int64)
+    print(f'Écoutes: {len(users)} ({source}), {n_artists} artistes, min_co_listens={args.min_co_listens}')
+
+    configs = [tuple(int(x) for x in config.lower().split('x')) for config in args.configs]
+    report = run_report(users, artists, n_artists, configs, args.min_co_listens, verify=not args.estimate,
+                        min_jaccard=args.min_jaccard, seed=args.seed, max_bucket=args.max_bucket)
+    report['source'] = source
+    print_report(report, args.min_jaccard)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
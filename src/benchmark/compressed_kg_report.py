@@ -0,0 +1,174 @@
+"""
+Mémoire et coût de décodage du KG compressé (graph_compressed) par rapport au CSR
+
+Usage (depuis src/):
+    python -m benchmark.compressed_kg_report                      # snapshot de final_data/music
+    python -m benchmark.compressed_kg_report --scale 10k --min_co_listens 3
+    python -m benchmark.compressed_kg_report --output ../benchmark_results/compressed.json
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from co_listen import LISTENED_TO, LISTENED_BY, co_listen_counts, artist_triples
+from graph_algorithms import bfs_recommend
+from graph_compressed import (CompressedAdjacency, compress_csr, decode_rows, decompress_csr, memory_bytes,
+                              neighbors)
+from graph_csr import CSRAdjacency, build_csr, neighbors as csr_neighbors
+from graph_snapshot import load_snapshot
+from benchmark.synthetic import SCALES, generate_interactions
+
+
+def synthetic_csr(scale, min_co_listens=2, seed=0, max_artists=1000):
+    """KG au format de preprocess_music (relations 0 à 3) depuis des écoutes synthétiques"""
+    n_users, n_artists = SCALES[scale]
+    interactions = generate_interactions(n_users, n_artists, seed=seed, max_artists=max_artists)
+    users = interactions[:, 0] - 1 + n_artists
+    artists = interactions[:, 1] - 1
+    weights = interactions[:, 2]
+    artist1, artist2, counts = co_listen_counts(users, artists, n_artists, min_co_listens)
+    kg_np = np.concatenate([
+        np.column_stack([users, np.full(len(users), LISTENED_TO), artists, weights]),
+        np.column_stack([artists, np.full(len(users), LISTENED_BY), users, weights]),
+        artist_triples(artist1, artist2, counts),
+    ]).astype(np.int32)
+    return build_csr(kg_np, n_nodes=n_artists + n_users)
+
+
+def _best_of(function, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _csr_rows(csr, nodes):
+    """Même sortie que graph_compressed.decode_rows, lue dans le CSR"""
+    starts, stops = csr.indptr[nodes], csr.indptr[nodes + 1]
+    sizes = stops - starts
+    edges = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+    return np.repeat(nodes, sizes), csr.indices[edges], csr.relations[edges], csr.weights[edges]
+
+
+def run_report(csr, n_rows=2000, batch_size=64, n_bfs=50, repeat=5, seed=0):
+    """
+    Tailles, décodage complet, décodage de lignes isolées et de lots, BFS via l'interface dictionnaire
+
+    Returns:
+        dict
+    """
+    rng = np.random.default_rng(seed)
+    n_edges = len(csr.indices)
+    start = time.perf_counter()
+    ccsr = compress_csr(csr)
+    compress_seconds = time.perf_counter() - start
+
+    report = {
+        'edges': n_edges,
+        'nodes': int(csr.n_nodes),
+        'bytes_per_edge': {
+            'triples_int32': 16.0,
+            'csr': round(memory_bytes(csr) / n_edges, 3),
+            'compressed': round(memory_bytes(ccsr) / n_edges, 3),
+            'compressed_tails': round(ccsr.tail_bytes.nbytes / n_edges, 3),
+            'compressed_relations': round(ccsr.relation_tags.nbytes / n_edges, 3),
+            'compressed_weights': round((ccsr.weight_codes.nbytes + ccsr.exact_positions.nbytes
+                                         + ccsr.exact_weights.nbytes) / n_edges, 3),
+            'compressed_pointers': round((ccsr.indptr.nbytes + ccsr.byte_ptr.nbytes + ccsr.first_tail.nbytes
+                                          + ccsr.delta_width.nbytes) / n_edges, 3),
+        },
+        'exact_weight_side_table': int(len(ccsr.exact_positions)),
+        'compress_seconds': round(compress_seconds, 4),
+    }
+
+    # Décodage complet contre simple copie des tableaux CSR (borne de bande passante)
+    copy_seconds = _best_of(lambda: [field.copy() for field in csr if isinstance(field, np.ndarray)], repeat)
+    decode_seconds = _best_of(lambda: decompress_csr(ccsr), repeat)
+    report['full_decode'] = {'csr_copy_ms': round(copy_seconds * 1000, 3),
+                             'decode_ms': round(decode_seconds * 1000, 3),
+                             'decoded_edges_per_s': round(n_edges / decode_seconds)}
+
+    heads = np.flatnonzero(np.diff(csr.indptr))
+    nodes = rng.choice(heads, n_rows).tolist()
+    csr_single = _best_of(lambda: [csr_neighbors(csr, node) for node in nodes], repeat)
+    compressed_single = _best_of(lambda: [neighbors(ccsr, node) for node in nodes], repeat)
+    report['single_row_us'] = {'csr': round(csr_single / n_rows * 1e6, 3),
+                               'compressed': round(compressed_single / n_rows * 1e6, 3)}
+
+    batches = [rng.choice(heads, batch_size) for _ in range(max(1, n_rows // batch_size))]
+    csr_batch = _best_of(lambda: [_csr_rows(csr, batch) for batch in batches], repeat)
+    compressed_batch = _best_of(lambda: [decode_rows(ccsr, batch) for batch in batches], repeat)
+    n_batch_edges = sum(int((csr.indptr[b + 1] - csr.indptr[b]).sum()) for b in batches)
+    report['batch_rows'] = {'batch_size': batch_size,
+                            'csr_ns_per_edge': round(csr_batch / n_batch_edges * 1e9, 2),
+                            'compressed_ns_per_edge': round(compressed_batch / n_batch_edges * 1e9, 2)}
+
+    # BFS depuis les voisins artistes de quelques utilisateurs (interface {head: [...]})
+    users = heads[np.diff(csr.indptr)[heads] > 0]
+    users = rng.choice(users, min(n_bfs, len(users)), replace=False)
+    seeds = [csr.indices[csr.indptr[user]:csr.indptr[user + 1]][:20].tolist() for user in users]
+    adjacency, compressed_adjacency = CSRAdjacency(csr), CompressedAdjacency(ccsr)
+    csr_bfs = _best_of(lambda: [bfs_recommend(adjacency, s, max_hops=1) for s in seeds], 1)
+    compressed_bfs = _best_of(lambda: [bfs_recommend(compressed_adjacency, s, max_hops=1) for s in seeds], 1)
+    report['bfs_ms_per_user'] = {'csr': round(csr_bfs / len(seeds) * 1000, 3),
+                                 'compressed': round(compressed_bfs / len(seeds) * 1000, 3)}
+    return report
+
+
+def print_report(report):
+    sizes = report['bytes_per_edge']
+    print(f"\n{report['edges']} arêtes, {report['nodes']} nœuds (compression: {report['compress_seconds']:.3f}s)")
+    print(f"Octets par arête: triplets {sizes['triples_int32']:.1f}, CSR {sizes['csr']:.2f}, "
+          f"compressé {sizes['compressed']:.2f} (voisins {sizes['compressed_tails']:.2f}, "
+          f"relations {sizes['compressed_relations']:.2f}, poids {sizes['compressed_weights']:.2f}, "
+          f"pointeurs {sizes['compressed_pointers']:.2f})")
+    print(f"Poids dans la table annexe: {report['exact_weight_side_table']}")
+    full = report['full_decode']
+    print(f"Décodage complet: {full['decode_ms']:.1f} ms (copie du CSR: {full['csr_copy_ms']:.1f} ms), "
+          f"{full['decoded_edges_per_s'] / 1e6:.1f} M arêtes/s")
+    single = report['single_row_us']
+    print(f"Ligne isolée: CSR {single['csr']:.2f} µs, compressé {single['compressed']:.2f} µs")
+    batch = report['batch_rows']
+    print(f"Lots de {batch['batch_size']} lignes: CSR {batch['csr_ns_per_edge']:.1f} ns/arête, "
+          f"compressé {batch['compressed_ns_per_edge']:.1f} ns/arête")
+    bfs = report['bfs_ms_per_user']
+    print(f"BFS 1 hop (interface dictionnaire): CSR {bfs['csr']:.2f} ms, compressé {bfs['compressed']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rapport mémoire / décodage du KG compressé')
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--scale', type=str, default=None, choices=sorted(SCALES),
+                        help='Utiliser un KG construit depuis des écoutes synthétiques')
+    parser.add_argument('--min_co_listens', type=int, default=2, help='Seuil de co-écoutes (avec --scale)')
+    parser.add_argument('--max_artists', type=int, default=1000, help='Historique maximal (avec --scale)')
+    parser.add_argument('--n_rows', type=int, default=2000, help='Lignes décodées pour les mesures par ligne')
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=5, help='Meilleur temps sur N répétitions')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None)
+    args = parser.parse_args()
+
+    if args.scale:
+        csr = synthetic_csr(args.scale, args.min_co_listens, args.seed, args.max_artists)
+        source = f'synthétique {args.scale}'
+    else:
+        csr = load_snapshot(args.dataset_path, args.dataset).csr
+        source = f'{args.dataset_path}/{args.dataset}'
+    report = run_report(csr, args.n_rows, args.batch_size, repeat=args.repeat, seed=args.seed)
+    report['source'] = source
+    print_report(report)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""
+Lancer le pipeline complet sur des données synthétiques et mesurer chaque étape
+
+Usage (depuis src/):
+    python -m benchmark.run_benchmarks --scales 1k 10k --output ../benchmark_results/run.json
+    python -m benchmark.run_benchmarks --scales 1k --compare ../benchmark_results/run.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+import data_loader
+import graph_loader
+import profiling
+from graph_algorithms import ALGORITHMS, run_algorithm
+from graph_csr import build_csr, CSRAdjacency
+from graph_kernels import available_backends
+from preprocess import preprocess_music
+from rng_utils import stage_rng, STAGE_NEGATIVE_SAMPLING, STAGE_SPLIT, STAGE_RIPPLE_SET
+from benchmark.synthetic import SCALES, generate_dataset
+
+STAGES = ['preprocess', 'load_kg', 'dataset_split', 'ripple_set', 'ripple_set_weighted', 'algorithms',
+          'algorithms_csr']
+# Étapes qui parcourent le dictionnaire construct_kg utilisateur par utilisateur: mesurées sur un
+# échantillon (à 10k, Dijkstra sur le dictionnaire prend ~4 s par utilisateur), comparer les débits
+DICT_STAGES = ['ripple_set', 'algorithms']
+
+
+def git_revision():
+    """Retourner (commit, dirty) du dépôt courant, ou (None, None) hors git"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+        status = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                         stderr=subprocess.DEVNULL, text=True)
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run_stages(raw_data_path, dataset_path, stages, seed=0, n_algorithm_users=100, n_baseline_users=10, n_hop=2,
+               n_memory=32, trace_memory=False, verbose=False):
+    """
+    Exécuter le pipeline sur un dataset déjà généré, chaque étape dans un span
+
+    Les étapes de DICT_STAGES ne traitent que les n_baseline_users premiers utilisateurs
+    (None = tous); algorithms_csr traite n_algorithm_users utilisateurs et ripple_set_weighted tous.
+
+    Returns:
+        dict: Trace de profiling.get_trace()
+    """
+    output_path = os.path.join(dataset_path, 'music')
+    for cached in ('kg_final.npy', 'ratings_final.npy'):
+        if os.path.exists(os.path.join(output_path, cached)):
+            os.remove(os.path.join(output_path, cached))
+
+    profiling.enable_profiling(command='benchmark', trace_memory=trace_memory)
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+
+        # preprocess_music produit les fichiers nécessaires aux autres étapes
+        # (sans cache d'artefacts: toutes les étapes sont mesurées)
+        with profiling.span('preprocess'):
+            preprocess_music(raw_data_path, output_path, rng=stage_rng(seed, STAGE_NEGATIVE_SAMPLING),
+                             use_cache=False)
+
+        rating_np = graph_loader.load_ratings(dataset_path, 'music')
+
+        if 'load_kg' in stages or 'algorithms' in stages:
+            n_entity, n_relation, kg, _ = graph_loader.load_kg(dataset_path, 'music')
+
+        if 'dataset_split' in stages or 'ripple_set' in stages or 'ripple_set_weighted' in stages:
+            with profiling.span('dataset_split', ratings=len(rating_np)) as counts:
+                _, _, _, user_history_dict = data_loader.dataset_split(rating_np, stage_rng(seed, STAGE_SPLIT))
+                counts['users'] = len(user_history_dict)
+
+        if 'ripple_set' in stages:
+            kg_np = graph_loader.load_kg_array(dataset_path, 'music')
+            ripple_args = argparse.Namespace(n_hop=n_hop, n_memory=n_memory)
+            baseline_history = {user: user_history_dict[user]
+                                for user in sorted(user_history_dict)[:n_baseline_users]}
+            # Construction du dictionnaire mesurée à part: le débit de ripple_set reste par utilisateur
+            with profiling.span('ripple_set.construct_kg', triples=len(kg_np)):
+                ripple_kg = data_loader.construct_kg(kg_np[:, :3])
+            with profiling.span('ripple_set', users=len(baseline_history)):
+                data_loader.get_ripple_set(ripple_args, ripple_kg, baseline_history,
+                                           rng=stage_rng(seed, STAGE_RIPPLE_SET))
+
+        if 'ripple_set_weighted' in stages:
+            kg_np = graph_loader.load_kg_array(dataset_path, 'music')
+            ripple_args = argparse.Namespace(n_hop=n_hop, n_memory=n_memory)
+            with profiling.span('ripple_set_weighted', users=len(user_history_dict)):
+                data_loader.get_weighted_ripple_set(ripple_args, build_csr(kg_np), user_history_dict,
+                                                    rng=stage_rng(seed, STAGE_RIPPLE_SET))
+
+        if 'algorithms' in stages:
+            user_history = graph_loader.get_user_history(rating_np)
+            users = sorted(user_history)[:n_baseline_users]
+            for name in ALGORITHMS:
+                with profiling.span(f'algorithm.{name}', users=len(users)) as counts:
+                    visited = 0
+                    for user in users:
+                        visited += run_algorithm(name, kg, user_history[user], top_k=10)['n_visited']
+                    counts['visited'] = visited
+
+        if 'algorithms_csr' in stages:
+            # Mêmes requêtes sur le CSR, une fois par backend de noyaux disponible
+            user_history = graph_loader.get_user_history(rating_np)
+            users = sorted(user_history)[:n_algorithm_users]
+            adjacency = CSRAdjacency(build_csr(graph_loader.load_kg_array(dataset_path, 'music')))
+            for backend in available_backends():
+                for name in ALGORITHMS:
+                    # Hors mesure: compilation Numba et tableaux par arête mis en cache par la vue
+                    run_algorithm(name, adjacency, user_history[users[0]], top_k=10, backend=backend)
+                    with profiling.span(f'algorithm_{backend}.{name}', users=len(users)) as counts:
+                        visited = 0
+                        for user in users:
+                            visited += run_algorithm(name, adjacency, user_history[user], top_k=10,
+                                                     backend=backend)['n_visited']
+                        counts['visited'] = visited
+
+    trace = profiling.get_trace()
+    profiling.disable_profiling()
+    return trace
+
+
+def run_scale(scale, workdir, stages, seed=0, memory_pass=True, verbose=False, **kwargs):
+    """
+    Générer un dataset à l'échelle demandée et mesurer chaque étape
+
+    Les temps viennent d'une passe sans tracemalloc (qui ralentit fortement le code Python);
+    les pics mémoire par étape viennent d'une seconde passe identique avec tracemalloc.
+
+    Args:
+        scale: Nom d'échelle (voir SCALES)
+        workdir: Dossier de travail (rawdata/ et final_data/ y sont créés)
+        stages: Étapes à mesurer (sous-ensemble de STAGES)
+        seed: Graine (données synthétiques et échantillonnage)
+        memory_pass: Lancer la passe tracemalloc
+        verbose: Afficher la sortie des étapes
+        **kwargs: Paramètres transmis à run_stages (n_algorithm_users, n_baseline_users, n_hop, n_memory)
+
+    Returns:
+        dict: {'config': {...}, 'stages': {nom: mesures}}
+    """
+    raw_data_path = os.path.join(workdir, 'rawdata', 'music')
+    dataset_path = os.path.join(workdir, 'final_data')
+
+    print(f'[{scale}] Génération des données synthétiques...')
+    start = time.perf_counter()
+    config = generate_dataset(raw_data_path, scale=scale, seed=seed)
+    config['generate_s'] = round(time.perf_counter() - start, 3)
+    print(f'[{scale}] {config["n_users"]} users, {config["n_artists"]} artistes, '
+          f'{config["n_interactions"]} interactions ({config["generate_s"]}s)')
+
+    print(f'[{scale}] Passe de mesure des temps...')
+    trace = run_stages(raw_data_path, dataset_path, stages, seed=seed, verbose=verbose, **kwargs)
+    results = {}
+    for record in trace['spans']:
+        results[record['name']] = {key: record.get(key) for key in
+                                   ('wall_s', 'cpu_s', 'items', 'items_per_s', 'peak_rss_kb')}
+        results[record['name']]['tracemalloc_peak_bytes'] = None
+    config['peak_rss_kb'] = trace['peak_rss_kb']
+    config['n_baseline_users'] = kwargs.get('n_baseline_users')
+
+    if memory_pass:
+        print(f'[{scale}] Passe de mesure mémoire (tracemalloc)...')
+        trace = run_stages(raw_data_path, dataset_path, stages, seed=seed, trace_memory=True,
+                           verbose=verbose, **kwargs)
+        for record in trace['spans']:
+            if record['name'] in results:
+                results[record['name']]['tracemalloc_peak_bytes'] = record['tracemalloc_peak_bytes']
+
+    return {'config': config, 'stages': results}
+
+
+def _users_per_s(stage):
+    return (stage.get('items_per_s') or {}).get('users')
+
+
+def print_results(report, baseline=None):
+    """
+    Afficher un tableau par échelle, avec le ratio vs baseline si fourni
+
+    Le speedup compare les débits (utilisateurs/s) quand l'étape en a un: les deux runs peuvent
+    avoir mesuré un nombre d'utilisateurs différent. Sinon il compare les temps.
+    """
+    for scale, scale_result in report['scales'].items():
+        print(f'\n=== Échelle {scale} ===')
+        n_baseline_users = scale_result['config'].get('n_baseline_users')
+        if n_baseline_users is not None:
+            print(f'({", ".join(DICT_STAGES)}: {n_baseline_users} premiers utilisateurs seulement)')
+        header = f'{"étape":<40} {"mur (s)":>10} {"cpu (s)":>10} {"users/s":>10} {"pic mem (Mo)":>13}'
+        if baseline:
+            header += f' {"speedup":>9}'
+        print(header)
+        base_stages = (baseline or {}).get('scales', {}).get(scale, {}).get('stages', {})
+        for name, stage in scale_result['stages'].items():
+            peak = stage['tracemalloc_peak_bytes']
+            peak_str = f'{peak / 2**20:.1f}' if peak is not None else '-'
+            rate = _users_per_s(stage)
+            rate_str = f'{rate:.1f}' if rate is not None else '-'
+            line = f'{name:<40} {stage["wall_s"]:>10.3f} {stage["cpu_s"]:>10.3f} {rate_str:>10} {peak_str:>13}'
+            if baseline:
+                base = base_stages.get(name)
+                if base and rate and _users_per_s(base):
+                    line += f' {rate / _users_per_s(base):>8.2f}x'
+                elif base and stage['wall_s'] > 0:
+                    line += f' {base["wall_s"] / stage["wall_s"]:>8.2f}x'
+                else:
+                    line += f' {"-":>9}'
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks sur données synthétiques Last.fm')
+    parser.add_argument('--scales', nargs='+', default=['1k'], choices=list(SCALES),
+                       help='Échelles à mesurer')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES,
+                       help='Étapes à mesurer (preprocess est toujours exécuté)')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Graine des données synthétiques et de l\'échantillonnage')
+    parser.add_argument('--n_algorithm_users', type=int, default=100,
+                       help='Nombre d\'utilisateurs pour chaque algorithme sur le CSR')
+    parser.add_argument('--n_baseline_users', type=int, default=10,
+                       help='Nombre d\'utilisateurs des étapes sur le dictionnaire (ripple_set, algorithms)')
+    parser.add_argument('--skip_memory', action='store_true',
+                       help='Ne pas lancer la passe tracemalloc (pics mémoire par étape)')
+    parser.add_argument('--workdir', type=str, default=None,
+                       help='Dossier de travail (défaut: dossier temporaire supprimé à la fin)')
+    parser.add_argument('--output', type=str, default=None,
+                       help='Fichier JSON de résultats')
+    parser.add_argument('--compare', type=str, default=None,
+                       help='Fichier JSON d\'un run précédent pour afficher les speedups')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Afficher la sortie des étapes du pipeline')
+    args = parser.parse_args()
+
+    commit, dirty = git_revision()
+    report = {
+        'git_commit': commit,
+        'git_dirty': dirty,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'scales': {},
+    }
+
+    for scale in args.scales:
+        workdir = args.workdir and os.path.join(args.workdir, scale)
+        cleanup = workdir is None
+        workdir = workdir or tempfile.mkdtemp(prefix=f'bench_{scale}_')
+        try:
+            report['scales'][scale] = run_scale(scale, workdir, args.stages, seed=args.seed,
+                                                memory_pass=not args.skip_memory,
+                                                n_algorithm_users=args.n_algorithm_users,
+                                                n_baseline_users=args.n_baseline_users,
+                                                verbose=args.verbose)
+        finally:
+            if cleanup:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(report, baseline)
+
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nRésultats sauvegardés dans: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
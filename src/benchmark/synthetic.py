@@ -0,0 +1,136 @@
+"""
+Générateur de données synthétiques au format Last.fm (artists.dat, user_artists.dat)
+Activité des utilisateurs et popularité des artistes suivent des lois de puissance
+"""
+import os
+import numpy as np
+
+# Échelles prédéfinies: nom -> (n_users, n_artists)
+# Le dataset réel a 1892 users pour 17632 artistes, mais on borne le catalogue aux grandes échelles
+SCALES = {
+    '1k': (1000, 5000),
+    '10k': (10000, 30000),
+    '100k': (100000, 150000),
+    '1m': (1000000, 500000),
+}
+
+
+def sample_user_activity(rng, n_users, min_artists=10, max_artists=1000, exponent=2.0):
+    """
+    Nombre d'artistes écoutés par utilisateur (Pareto discrète bornée)
+
+    Args:
+        rng: numpy.random.Generator
+        n_users: Nombre d'utilisateurs
+        min_artists: Activité minimale (échelle de la loi de Pareto)
+        max_artists: Activité maximale (les "gros" utilisateurs sont tronqués ici)
+        exponent: Exposant de la loi de Pareto (plus petit = queue plus lourde)
+
+    Returns:
+        Array int64 de shape (n_users,)
+    """
+    u = rng.random(n_users)
+    activity = np.floor(min_artists * (1.0 - u) ** (-1.0 / exponent)).astype(np.int64)
+    return np.clip(activity, min_artists, max_artists)
+
+
+def artist_popularity(rng, n_artists, zipf_exponent=1.0):
+    """
+    Distribution de popularité des artistes (Zipf), rangs mélangés aléatoirement
+
+    Returns:
+        Array float64 de probabilités de shape (n_artists,)
+    """
+    ranks = np.arange(1, n_artists + 1, dtype=np.float64)
+    weights = ranks ** (-zipf_exponent)
+    weights = weights[rng.permutation(n_artists)]
+    return weights / weights.sum()
+
+
+def generate_interactions(n_users, n_artists, seed=0, min_artists=10, max_artists=1000,
+                          activity_exponent=2.0, zipf_exponent=1.0):
+    """
+    Générer les interactions utilisateur-artiste (sans doublons)
+
+    Args:
+        n_users: Nombre d'utilisateurs
+        n_artists: Taille du catalogue
+        seed: Graine du générateur
+        min_artists, max_artists, activity_exponent: Paramètres de l'activité utilisateur
+        zipf_exponent: Exposant de la popularité des artistes
+
+    Returns:
+        Array int64 de shape (n_interactions, 3) avec [userID, artistID, weight] (IDs commençant à 1)
+    """
+    rng = np.random.default_rng(seed)
+    max_artists = min(max_artists, n_artists)
+    min_artists = min(min_artists, max_artists)
+
+    activity = sample_user_activity(rng, n_users, min_artists, max_artists, activity_exponent)
+    popularity = artist_popularity(rng, n_artists, zipf_exponent)
+    cdf = np.cumsum(popularity)
+    cdf[-1] = 1.0
+
+    users = np.repeat(np.arange(n_users, dtype=np.int64), activity)
+    artists = np.searchsorted(cdf, rng.random(len(users)), side='right').astype(np.int64)
+
+    # Dédoublonner les paires (user, artist) tirées avec remise
+    keys = np.unique(users * n_artists + artists)
+    users = keys // n_artists
+    artists = keys % n_artists
+
+    # Nombre d'écoutes: log-normale (médiane ~ 250 comme Last.fm)
+    weights = np.maximum(1, rng.lognormal(mean=5.5, sigma=1.5, size=len(keys))).astype(np.int64)
+
+    return np.column_stack([users + 1, artists + 1, weights])
+
+
+def write_lastfm_files(raw_data_path, interactions, n_artists):
+    """
+    Écrire artists.dat et user_artists.dat dans raw_data_path
+
+    Args:
+        raw_data_path: Dossier de sortie (équivalent de rawdata/music)
+        interactions: Array (n, 3) avec [userID, artistID, weight]
+        n_artists: Taille du catalogue (IDs 1..n_artists)
+    """
+    os.makedirs(raw_data_path, exist_ok=True)
+
+    with open(os.path.join(raw_data_path, 'artists.dat'), 'w', encoding='utf-8') as f:
+        f.write('id\tname\turl\tpictureURL\n')
+        for artist_id in range(1, n_artists + 1):
+            f.write(f'{artist_id}\tSynthetic Artist {artist_id}\t'
+                    f'http://www.last.fm/music/Synthetic+Artist+{artist_id}\t\n')
+
+    with open(os.path.join(raw_data_path, 'user_artists.dat'), 'w', encoding='utf-8') as f:
+        f.write('userID\tartistID\tweight\n')
+        np.savetxt(f, interactions, fmt='%d', delimiter='\t')
+
+
+def generate_dataset(raw_data_path, scale='1k', n_users=None, n_artists=None, seed=0, **kwargs):
+    """
+    Générer un dataset synthétique complet à une échelle donnée
+
+    Args:
+        raw_data_path: Dossier de sortie (équivalent de rawdata/music)
+        scale: Nom d'échelle dans SCALES (ignoré si n_users et n_artists sont donnés)
+        n_users, n_artists: Tailles explicites
+        seed: Graine du générateur
+        **kwargs: Paramètres transmis à generate_interactions
+
+    Returns:
+        dict: {'n_users', 'n_artists', 'n_interactions', 'seed'}
+    """
+    default_users, default_artists = SCALES[scale]
+    n_users = n_users or default_users
+    n_artists = n_artists or default_artists
+
+    interactions = generate_interactions(n_users, n_artists, seed=seed, **kwargs)
+    write_lastfm_files(raw_data_path, interactions, n_artists)
+
+    return {
+        'n_users': n_users,
+        'n_artists': n_artists,
+        'n_interactions': int(len(interactions)),
+        'seed': seed,
+    }
@@ -0,0 +1,451 @@
+"""
+Relations artiste-artiste par co-écoute, calculées sur des arrays (sans boucle Python)
+Même définition que preprocess.py: poids = nombre d'utilisateurs ayant écouté les deux artistes
+
+Trois modes:
+- exact (co_listen_counts): toutes les paires de chaque historique, coût ~ somme des carrés
+  des longueurs d'historique
+- externe (external_co_listen_counts): mêmes comptes, agrégés dans des buffers de taille fixe
+  déversés sur disque puis fusionnés, la mémoire étant bornée par un budget
+- approché (minhash_co_listen_counts): signatures MinHash des auditeurs de chaque artiste,
+  paires candidates par LSH en bandes, puis comptage exact (ou estimation) sur ces seules paires
+"""
+import collections
+import os
+import tempfile
+import numpy as np
+from rng_utils import make_rng
+
+# Relations du KG music (voir preprocess.py)
+LISTENED_TO = 0
+LISTENED_BY = 1
+SIMILAR_TO = 2
+SIMILAR_FROM = 3
+
+# Mode externe: octets par paire d'un buffer en cours de remplissage (positions, clés, tri),
+# par entrée d'un bloc en cours de fusion (clé uint64, compte uint32, concaténation et tri),
+# et nombre maximum de runs fusionnés en une passe
+ENUMERATE_BYTES_PER_PAIR = 64
+MERGE_BYTES_PER_ENTRY = 48
+MAX_MERGE_FAN_IN = 64
+# Budget minimal: en dessous, les runs et les tours de fusion se multiplient sans gain de mémoire
+MIN_MEMORY_BUDGET = 1 << 20
+
+# Hachage universel h(x) = (a * x + b) mod p; p < 2^31 pour que a * x tienne sur 64 bits
+HASH_PRIME = (1 << 31) - 1
+
+
+def _dedupe_listens(user_idx, artist_idx, by_artist=False):
+    """Trier les écoutes (par utilisateur, ou par artiste) et retirer les doublons"""
+    user_idx = np.asarray(user_idx, dtype=np.int64)
+    artist_idx = np.asarray(artist_idx, dtype=np.int64)
+    if by_artist:
+        order = np.lexsort((user_idx, artist_idx))
+    else:
+        order = np.lexsort((artist_idx, user_idx))
+    users, artists = user_idx[order], artist_idx[order]
+    keep = np.ones(len(users), dtype=bool)
+    keep[1:] = (users[1:] != users[:-1]) | (artists[1:] != artists[:-1])
+    return users[keep], artists[keep]
+
+
+def _group_bounds(keys):
+    """Début et fin de chaque groupe de clés égales consécutives"""
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+    return starts, np.r_[starts[1:], len(keys)].astype(np.int64)
+
+
+def _pairs_within_groups(starts, ends):
+    """Positions (i, j), i < j, de toutes les paires à l'intérieur de chaque groupe [start, end)"""
+    sizes = ends - starts
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    positions = np.repeat(starts, sizes) + offsets
+    n_after = np.repeat(ends, sizes) - positions - 1
+    first = np.repeat(positions, n_after)
+    block_start = np.repeat(np.cumsum(n_after) - n_after, n_after)
+    second = first + 1 + (np.arange(len(first)) - block_start)
+    return first, second
+
+
+def co_listen_counts(user_idx, artist_idx, n_artists, min_co_listens=1, max_pairs=1 << 24):
+    """
+    Compter les co-écoutes de chaque paire d'artistes
+
+    Args:
+        user_idx: Array des utilisateurs (une entrée par écoute)
+        artist_idx: Array des artistes écoutés (alignés sur user_idx)
+        n_artists: Nombre d'artistes (pour encoder les paires)
+        min_co_listens: Seuil minimum de co-écoutes
+        max_pairs: Nombre maximum de paires énumérées à la fois (les utilisateurs sont traités
+                   par blocs dont les comptes partiels sont fusionnés)
+
+    Returns:
+        tuple: (artist1, artist2, count) avec artist1 < artist2, triés par (artist1, artist2)
+    """
+    users, artists = _dedupe_listens(user_idx, artist_idx)
+    starts, ends = _group_bounds(users)
+    sizes = ends - starts
+    work = np.cumsum(sizes * (sizes - 1) // 2)
+
+    partial_keys, partial_counts = [], []
+    group = 0
+    while group < len(starts):
+        # Blocs d'utilisateurs consécutifs totalisant au plus max_pairs paires (au moins un utilisateur)
+        done = work[group - 1] if group else 0
+        last = max(group + 1, int(np.searchsorted(work, done + max_pairs, side='right')))
+        # Toutes les paires (i, j), i < j, à l'intérieur du groupe de chaque utilisateur
+        first, second = _pairs_within_groups(starts[group:last], ends[group:last])
+        # Les artistes sont triés dans chaque groupe: artists[first] < artists[second]
+        keys, counts = np.unique(artists[first] * n_artists + artists[second], return_counts=True)
+        partial_keys.append(keys)
+        partial_counts.append(counts)
+        group = last
+
+    if len(partial_keys) == 1:
+        keys, counts = partial_keys[0], partial_counts[0]
+    elif partial_keys:
+        # Fusionner les comptes partiels: trier les clés puis sommer par clé
+        keys = np.concatenate(partial_keys)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        key_starts, _ = _group_bounds(keys)
+        counts = np.add.reduceat(np.concatenate(partial_counts)[order], key_starts)
+        keys = keys[key_starts]
+    else:
+        keys = counts = np.empty(0, dtype=np.int64)
+    keep = counts >= min_co_listens
+    keys, counts = keys[keep], counts[keep]
+    return keys // n_artists, keys % n_artists, counts
+
+
+def _pack_pairs(artist1, artist2):
+    """Paire (artist1, artist2) -> clé uint64 (artist1 sur les 32 bits de poids fort): l'ordre des clés
+    est l'ordre (artist1, artist2)"""
+    return (artist1.astype(np.uint64) << np.uint64(32)) | artist2.astype(np.uint64)
+
+
+def _reduce_sorted(keys, counts=None):
+    """Clés triées -> (clés uniques, somme des comptes de chaque clé; 1 par occurrence si counts est None)"""
+    starts, ends = _group_bounds(keys)
+    if counts is None:
+        return keys[starts], (ends - starts).astype(np.uint32)
+    if not len(keys):
+        return keys, counts.astype(np.uint32)
+    return keys[starts], np.add.reduceat(counts, starts).astype(np.uint32)
+
+
+# Run déversé sur disque: clés uint64 dans path + '.keys', comptes uint32 dans path + '.counts'
+_SpillRun = collections.namedtuple('_SpillRun', ['path', 'size'])
+
+
+def _write_run(path, parts):
+    """Écrire les blocs (clés, comptes) triés d'un run, au fil de leur production"""
+    size = 0
+    with open(path + '.keys', 'wb') as keys_file, open(path + '.counts', 'wb') as counts_file:
+        for keys, counts in parts:
+            keys.astype(np.uint64, copy=False).tofile(keys_file)
+            counts.astype(np.uint32, copy=False).tofile(counts_file)
+            size += len(keys)
+    return _SpillRun(path, size)
+
+
+def _read_run(run, start=0, count=-1):
+    """Entrées [start, start + count) d'un run (lecture directe, sans mmap: la mémoire reste celle du bloc)"""
+    keys = np.fromfile(run.path + '.keys', dtype=np.uint64, count=count, offset=8 * start)
+    counts = np.fromfile(run.path + '.counts', dtype=np.uint32, count=count, offset=4 * start)
+    return keys, counts
+
+
+def _merge_runs(runs, block, min_count=1):
+    """
+    Fusion k-voies de runs triés, par blocs
+
+    Chaque run garde en tampon au plus block entrées lues. À chaque tour, toutes les clés <= borne
+    (la plus petite des dernières clés en tampon) sont dans les tampons: elles sont triées, sommées
+    et produites. Le run qui fixe la borne vide son tampon, relu au tour suivant: chaque tour progresse.
+
+    Yields:
+        tuple: (clés, comptes) triés, clés croissantes d'un tour à l'autre, comptes >= min_count
+    """
+    cursors = [0] * len(runs)
+    buffers = [None] * len(runs)
+    while True:
+        for i, run in enumerate(runs):
+            if (buffers[i] is None or not len(buffers[i][0])) and cursors[i] < run.size:
+                buffers[i] = _read_run(run, cursors[i], block)
+                cursors[i] += len(buffers[i][0])
+        active = [i for i, buffer in enumerate(buffers) if buffer is not None and len(buffer[0])]
+        if not active:
+            return
+        bound = min(buffers[i][0][-1] for i in active)
+        taken_keys, taken_counts = [], []
+        for i in active:
+            keys, counts = buffers[i]
+            stop = int(np.searchsorted(keys, bound, side='right'))
+            taken_keys.append(keys[:stop])
+            taken_counts.append(counts[:stop])
+            buffers[i] = (keys[stop:], counts[stop:])
+        keys = np.concatenate(taken_keys)
+        order = np.argsort(keys, kind='stable')
+        keys, counts = _reduce_sorted(keys[order], np.concatenate(taken_counts)[order])
+        keep = counts >= min_count
+        yield keys[keep], counts[keep]
+
+
+def external_co_listen_counts(user_idx, artist_idx, n_artists, min_co_listens=1, memory_budget=256 << 20,
+                              spill_dir=None, stats=None):
+    """
+    Compter les co-écoutes de chaque paire d'artistes avec une mémoire bornée (agrégation externe)
+
+    Les paires de chaque historique sont encodées en clés uint64 et accumulées dans un buffer de taille
+    fixe (les historiques trop longs sont découpés entre plusieurs buffers). Chaque buffer plein est
+    trié et réduit en un run (clés uniques, comptes) écrit sur disque; les runs sont ensuite fusionnés
+    par blocs (_merge_runs), en plusieurs passes au-delà de MAX_MERGE_FAN_IN runs, le seuil
+    min_co_listens étant appliqué à la dernière passe. Résultat identique à co_listen_counts.
+
+    Args:
+        user_idx: Array des utilisateurs (une entrée par écoute)
+        artist_idx: Array des artistes écoutés (alignés sur user_idx)
+        n_artists: Nombre d'artistes (au plus 2^32)
+        min_co_listens: Seuil minimum de co-écoutes
+        memory_budget: Mémoire de travail visée en octets (buffer d'énumération, blocs de fusion),
+                       hors écoutes et paires retenues; au moins MIN_MEMORY_BUDGET
+        spill_dir: Dossier des runs temporaires (défaut: dossier temporaire du système), vidé à la fin
+        stats: dict optionnel complété par enumerated_pairs, runs, merge_passes et pairs
+
+    Returns:
+        tuple: (artist1, artist2, count) avec artist1 < artist2, triés par (artist1, artist2)
+    """
+    if n_artists > 1 << 32:
+        raise ValueError(f'Trop d\'artistes pour des clés sur 64 bits: {n_artists}')
+    stats = {} if stats is None else stats
+    memory_budget = max(memory_budget, MIN_MEMORY_BUDGET)
+    capacity = memory_budget // ENUMERATE_BYTES_PER_PAIR
+    users, artists = _dedupe_listens(user_idx, artist_idx)
+    if not len(users):
+        stats.update(enumerated_pairs=0, runs=0, merge_passes=0, pairs=0)
+        return tuple(np.empty(0, dtype=np.int64) for _ in range(3))
+    starts, ends = _group_bounds(users)
+    # Paires produites par chaque écoute (avec les écoutes suivantes du même historique)
+    n_after = np.repeat(ends, ends - starts) - np.arange(len(users)) - 1
+    work = np.cumsum(n_after)
+    stats['enumerated_pairs'] = int(work[-1]) if len(work) else 0
+
+    with tempfile.TemporaryDirectory(prefix='co_listen_', dir=spill_dir) as tmp_dir:
+        runs = []
+        position = 0
+        while position < len(users):
+            # Écoutes consécutives totalisant au plus capacity paires (au moins une écoute)
+            done = work[position - 1] if position else 0
+            last = max(position + 1, int(np.searchsorted(work, done + capacity, side='right')))
+            sizes = n_after[position:last]
+            first = np.repeat(np.arange(position, last), sizes)
+            offsets = np.arange(len(first)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            second = artists[first + 1 + offsets]
+            del offsets
+            keys = _pack_pairs(artists[first], second)
+            del first, second
+            keys.sort()
+            runs.append(_write_run(os.path.join(tmp_dir, f'run_{len(runs):05d}'), [_reduce_sorted(keys)]))
+            del keys
+            position = last
+        stats['runs'] = len(runs)
+
+        # Passes intermédiaires (sans seuil) tant qu'il y a trop de runs pour un tampon par run
+        passes = 0
+        while len(runs) > MAX_MERGE_FAN_IN:
+            block = memory_budget // (MERGE_BYTES_PER_ENTRY * MAX_MERGE_FAN_IN)
+            runs = [_write_run(os.path.join(tmp_dir, f'pass{passes}_{group:05d}'),
+                               _merge_runs(runs[group:group + MAX_MERGE_FAN_IN], block))
+                    for group in range(0, len(runs), MAX_MERGE_FAN_IN)]
+            passes += 1
+
+        # Dernière passe avec le seuil: seules les paires retenues sont relues en mémoire
+        block = max(memory_budget // (MERGE_BYTES_PER_ENTRY * max(len(runs), 1)), 1)
+        result = _write_run(os.path.join(tmp_dir, 'result'),
+                            _merge_runs(runs, block, min_count=max(min_co_listens, 1)))
+        stats['merge_passes'] = passes + 1
+        keys, counts = _read_run(result)
+    stats['pairs'] = len(keys)
+    artist1 = (keys >> np.uint64(32)).astype(np.int64)
+    keys &= np.uint64(0xFFFFFFFF)
+    return artist1, keys.astype(np.int64), counts.astype(np.int64)
+
+
+def minhash_signatures(user_idx, artist_idx, n_artists, n_hashes=128, rng=None, max_block=1 << 24):
+    """
+    Signatures MinHash de l'ensemble des auditeurs de chaque artiste
+
+    signature[i, a] = min sur les auditeurs u de a de h_i(u); deux artistes ont la même valeur
+    sur une ligne avec une probabilité égale à la similarité de Jaccard de leurs auditeurs.
+
+    Args:
+        user_idx, artist_idx: Écoutes (doublons autorisés)
+        n_artists: Nombre d'artistes
+        n_hashes: Nombre de fonctions de hachage
+        rng: Generator (ou graine) des paramètres de hachage
+        max_block: Nombre maximum de valeurs hachées à la fois (n_hashes x n_écoutes découpé)
+
+    Returns:
+        Array uint32 (n_hashes, n_artists); HASH_PRIME pour un artiste sans auditeur
+    """
+    rng = make_rng(rng)
+    a = rng.integers(1, HASH_PRIME, size=n_hashes, dtype=np.int64)
+    b = rng.integers(0, HASH_PRIME, size=n_hashes, dtype=np.int64)
+    users, artists = _dedupe_listens(user_idx, artist_idx, by_artist=True)
+    starts, _ = _group_bounds(artists)
+
+    signatures = np.full((n_hashes, n_artists), HASH_PRIME, dtype=np.uint32)
+    if len(users) == 0:
+        return signatures
+    rows_per_block = max(1, max_block // len(users))
+    for row in range(0, n_hashes, rows_per_block):
+        rows = slice(row, min(row + rows_per_block, n_hashes))
+        hashed = (a[rows, None] * users[None, :] + b[rows, None]) % HASH_PRIME
+        signatures[rows, artists[starts]] = np.minimum.reduceat(hashed, starts, axis=1)
+    return signatures
+
+
+def lsh_candidate_pairs(signatures, bands, artists=None, max_bucket=None):
+    """
+    Paires candidates par LSH en bandes: deux artistes sont candidats s'ils ont la même
+    sous-signature sur au moins une bande de n_hashes / bands lignes
+
+    Args:
+        signatures: Array (n_hashes, n_artists) (voir minhash_signatures)
+        bands: Nombre de bandes (doit diviser n_hashes)
+        artists: Artistes à considérer (défaut: tous)
+        max_bucket: Ignorer les seaux de plus de max_bucket artistes (None = aucune limite)
+
+    Returns:
+        tuple: (artist1, artist2) uniques avec artist1 < artist2
+    """
+    n_hashes, n_artists = signatures.shape
+    if n_hashes % bands:
+        raise ValueError(f'bands={bands} doit diviser n_hashes={n_hashes}')
+    rows = n_hashes // bands
+    artists = np.arange(n_artists) if artists is None else np.asarray(artists, dtype=np.int64)
+
+    signatures = signatures[:, artists].astype(np.uint64)
+    pair_keys = []
+    for band in range(bands):
+        # Clé 64 bits de la bande (polynôme en arithmétique modulo 2^64); une collision
+        # ne fait qu'ajouter un candidat, éliminé par la vérification
+        keys = np.zeros(len(artists), dtype=np.uint64)
+        for line in signatures[band * rows:(band + 1) * rows]:
+            keys = keys * np.uint64(1000003) + line
+        order = np.argsort(keys, kind='stable')
+        starts, ends = _group_bounds(keys[order])
+        size = ends - starts
+        keep = size >= 2
+        if max_bucket is not None:
+            keep &= size <= max_bucket
+        first, second = _pairs_within_groups(starts[keep], ends[keep])
+        artist_a, artist_b = artists[order[first]], artists[order[second]]
+        pair_keys.append(np.minimum(artist_a, artist_b) * n_artists + np.maximum(artist_a, artist_b))
+
+    pair_keys = np.sort(np.concatenate(pair_keys)) if pair_keys else np.empty(0, dtype=np.int64)
+    pair_keys = pair_keys[_group_bounds(pair_keys)[0]]  # clés uniques (tri explicite, plus rapide que np.unique)
+    return pair_keys // n_artists, pair_keys % n_artists
+
+
+def intersection_counts(artist1, artist2, user_idx, artist_idx, max_block=1 << 22):
+    """
+    Nombre exact d'auditeurs communs de chaque paire candidate
+
+    Les auditeurs de l'artiste le moins écouté de la paire sont cherchés (recherche dans les
+    clés triées artist * n_users + user) parmi ceux de l'autre: coût ~ somme des plus petits degrés.
+
+    Returns:
+        Array int64 aligné sur artist1/artist2
+    """
+    users, artists = _dedupe_listens(user_idx, artist_idx, by_artist=True)
+    n_users = int(users.max(initial=-1)) + 1
+    listen_keys = artists * n_users + users
+    n_artists = int(max(artists.max(initial=-1), np.max(artist1, initial=-1), np.max(artist2, initial=-1))) + 1
+    indptr = np.zeros(n_artists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(artists, minlength=n_artists), out=indptr[1:])
+    degree = np.diff(indptr)
+
+    artist1 = np.asarray(artist1, dtype=np.int64)
+    artist2 = np.asarray(artist2, dtype=np.int64)
+    swap = degree[artist1] > degree[artist2]
+    small = np.where(swap, artist2, artist1)
+    other = np.where(swap, artist1, artist2)
+
+    counts = np.zeros(len(small), dtype=np.int64)
+    work = np.cumsum(degree[small])
+    start = 0
+    while start < len(small):
+        # Blocs de paires dont l'expansion tient dans max_block
+        end = max(start + 1, int(np.searchsorted(work, (work[start - 1] if start else 0) + max_block)))
+        sizes = degree[small[start:end]]
+        pair = np.repeat(np.arange(start, end), sizes)
+        offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        listeners = users[np.repeat(indptr[small[start:end]], sizes) + offsets]
+        queries = other[pair] * n_users + listeners
+        positions = np.minimum(np.searchsorted(listen_keys, queries), len(listen_keys) - 1)
+        found = listen_keys[positions] == queries
+        counts[start:end] = np.bincount(pair[found] - start, minlength=end - start)
+        start = end
+    return counts
+
+
+def minhash_co_listen_counts(user_idx, artist_idx, n_artists, min_co_listens=1, n_hashes=128, bands=32,
+                             verify=True, rng=None, max_bucket=None):
+    """
+    Co-écoutes approchées: candidats MinHash/LSH puis comptage sur les seuls candidats
+
+    Les artistes ayant moins de min_co_listens auditeurs ne peuvent atteindre le seuil et sont
+    écartés avant le LSH. Une paire de similarité de Jaccard s est candidate avec la probabilité
+    1 - (1 - s^r)^b (r = n_hashes / bands lignes par bande): les paires à forte co-écoute mais
+    faible Jaccard (deux artistes très populaires) peuvent être manquées.
+
+    Args:
+        user_idx, artist_idx: Écoutes
+        n_artists: Nombre d'artistes
+        min_co_listens: Seuil minimum de co-écoutes
+        n_hashes, bands: Taille des signatures et nombre de bandes LSH
+        verify: True = nombre exact d'auditeurs communs des candidats;
+                False = estimation J / (1 + J) * (|A| + |B|) depuis les signatures
+        rng: Generator (ou graine) des fonctions de hachage
+        max_bucket: Voir lsh_candidate_pairs
+
+    Returns:
+        tuple: (artist1, artist2, count) comme co_listen_counts
+    """
+    user_idx = np.asarray(user_idx, dtype=np.int64)
+    artist_idx = np.asarray(artist_idx, dtype=np.int64)
+    users, artists = _dedupe_listens(user_idx, artist_idx, by_artist=True)
+    degree = np.bincount(artists, minlength=n_artists)
+    eligible = np.flatnonzero(degree >= max(min_co_listens, 1))
+
+    signatures = minhash_signatures(users, artists, n_artists, n_hashes=n_hashes, rng=rng)
+    artist1, artist2 = lsh_candidate_pairs(signatures, bands, artists=eligible, max_bucket=max_bucket)
+
+    if verify:
+        counts = intersection_counts(artist1, artist2, users, artists)
+    else:
+        jaccard = (signatures[:, artist1] == signatures[:, artist2]).mean(axis=0)
+        counts = np.rint(jaccard / (1.0 + jaccard) * (degree[artist1] + degree[artist2])).astype(np.int64)
+
+    keep = counts >= max(min_co_listens, 1)
+    return artist1[keep], artist2[keep], counts[keep]
+
+
+def artist_triples(artist1, artist2, counts):
+    """
+    Triplets KG similar_to (artist1 -> artist2) puis similar_from (artist2 -> artist1)
+
+    Returns:
+        Array int32 (2 * n_paires, 4) [head, relation, tail, weight]
+    """
+    n_pairs = len(artist1)
+    triples = np.empty((2 * n_pairs, 4), dtype=np.int32)
+    triples[:n_pairs, 0], triples[:n_pairs, 2] = artist1, artist2
+    triples[n_pairs:, 0], triples[n_pairs:, 2] = artist2, artist1
+    triples[:n_pairs, 1] = SIMILAR_TO
+    triples[n_pairs:, 1] = SIMILAR_FROM
+    triples[:n_pairs, 3] = counts
+    triples[n_pairs:, 3] = counts
+    return triples
@@ -1,16 +1,28 @@
 import collections
 import os
 import numpy as np
+from alias_sampling import csr_alias_table, draw
+from graph_csr import build_csr
+from rng_utils import make_rng, spawn_rng, stage_rng, STAGE_SPLIT, STAGE_RIPPLE_SET
 
 
 def load_data(args):
-    train_data, eval_data, test_data, user_history_dict = load_rating(args)
+    # optional args.seed fixes every random stream (split and ripple set)
+    seed = getattr(args, 'seed', None)
+    if seed is None:
+        seed = np.random.SeedSequence()
+    train_data, eval_data, test_data, user_history_dict = load_rating(args, rng=stage_rng(seed, STAGE_SPLIT))
     n_entity, n_relation, kg = load_kg(args)
-    ripple_set = get_ripple_set(args, kg, user_history_dict)
+    if getattr(args, 'weighted_ripple', False):
+        # memories drawn proportionally to the listen / co-listen weights of the KG edges
+        csr = build_csr(load_kg_np(args))
+        ripple_set = get_weighted_ripple_set(args, csr, user_history_dict, rng=stage_rng(seed, STAGE_RIPPLE_SET))
+    else:
+        ripple_set = get_ripple_set(args, kg, user_history_dict, rng=stage_rng(seed, STAGE_RIPPLE_SET))
     return train_data, eval_data, test_data, n_entity, n_relation, ripple_set
 
 
-def load_rating(args):
+def load_rating(args, rng=None):
     print('reading rating file ...')
 
     # reading rating file
@@ -23,21 +35,24 @@ def load_rating(args):
 
     # n_user = len(set(rating_np[:, 0]))
     # n_item = len(set(rating_np[:, 1]))
-    return dataset_split(rating_np)
+    return dataset_split(rating_np, rng)
 
 
-def dataset_split(rating_np):
+def dataset_split(rating_np, rng=None):
     print('splitting dataset ...')
+    rng = make_rng(rng)
 
     # train:eval:test = 6:2:2
     eval_ratio = 0.2
     test_ratio = 0.2
     n_ratings = rating_np.shape[0]
 
-    eval_indices = np.random.choice(n_ratings, size=int(n_ratings * eval_ratio), replace=False)
-    left = set(range(n_ratings)) - set(eval_indices)
-    test_indices = np.random.choice(list(left), size=int(n_ratings * test_ratio), replace=False)
-    train_indices = list(left - set(test_indices))
+    n_eval = int(n_ratings * eval_ratio)
+    n_test = int(n_ratings * test_ratio)
+    permutation = rng.permutation(n_ratings)
+    eval_indices = permutation[:n_eval]
+    test_indices = permutation[n_eval:n_eval + n_test]
+    train_indices = np.sort(permutation[n_eval + n_test:])
     # print(len(train_indices), len(eval_indices), len(test_indices))
 
     # traverse training data, only keeping the users with positive ratings
@@ -63,7 +78,7 @@ def dataset_split(rating_np):
     return train_data, eval_data, test_data, user_history_dict
 
 
-def load_kg(args):
+def load_kg_np(args):
     print('reading KG file ...')
 
     # reading kg file
@@ -73,6 +88,11 @@ def load_kg(args):
     else:
         kg_np = np.loadtxt(kg_file + '.txt', dtype=np.int32)
         np.save(kg_file + '.npy', kg_np)
+    return kg_np
+
+
+def load_kg(args):
+    kg_np = load_kg_np(args)
 
     n_entity = len(set(kg_np[:, 0]) | set(kg_np[:, 2]))
     n_relation = len(set(kg_np[:, 1]))
@@ -90,13 +110,16 @@ def construct_kg(kg_np):
     return kg
 
 
-def get_ripple_set(args, kg, user_history_dict):
+def get_ripple_set(args, kg, user_history_dict, rng=None):
     print('constructing ripple set ...')
+    # one stream per user derived from rng: identical results whatever the processing order
+    rng = make_rng(rng)
 
     # user -> [(hop_0_heads, hop_0_relations, hop_0_tails), (hop_1_heads, hop_1_relations, hop_1_tails), ...]
     ripple_set = collections.defaultdict(list)
 
     for user in user_history_dict:
+        user_rng = spawn_rng(rng, user)
         for h in range(args.n_hop):
             memories_h = []
             memories_r = []
@@ -121,10 +144,46 @@ def get_ripple_set(args, kg, user_history_dict):
             else:
                 # sample a fixed-size 1-hop memory for each user
                 replace = len(memories_h) < args.n_memory
-                indices = np.random.choice(len(memories_h), size=args.n_memory, replace=replace)
+                indices = user_rng.choice(len(memories_h), size=args.n_memory, replace=replace)
                 memories_h = [memories_h[i] for i in indices]
                 memories_r = [memories_r[i] for i in indices]
                 memories_t = [memories_t[i] for i in indices]
                 ripple_set[user].append((memories_h, memories_r, memories_t))
 
     return ripple_set
+
+
+def get_weighted_ripple_set(args, csr, user_history_dict, rng=None, alias_table=None):
+    print('constructing weighted ripple set ...')
+    # same layout as get_ripple_set, but each memory is drawn (with replacement) proportionally to the
+    # weight of its edge: the head by the total weight of its outgoing edges, then the edge in O(1)
+    # with the head's alias table
+    rng = make_rng(rng)
+    if alias_table is None:
+        alias_table = csr_alias_table(csr)
+    # total outgoing weight of every entity, 0 for entities absent from the KG
+    head_weights = np.append(alias_table.totals, 0.0)
+
+    ripple_set = collections.defaultdict(list)
+
+    for user in user_history_dict:
+        user_rng = spawn_rng(rng, user)
+        for h in range(args.n_hop):
+            if h == 0:
+                tails_of_last_hop = np.asarray(user_history_dict[user], dtype=np.int64)
+            else:
+                tails_of_last_hop = np.asarray(ripple_set[user][-1][2], dtype=np.int64)
+
+            in_kg = (tails_of_last_hop >= 0) & (tails_of_last_hop < csr.n_nodes)
+            cumulative = np.cumsum(head_weights[np.where(in_kg, tails_of_last_hop, csr.n_nodes)])
+
+            # same fallback as get_ripple_set when no tail of the last hop has outgoing edges
+            if len(cumulative) == 0 or cumulative[-1] == 0:
+                ripple_set[user].append(ripple_set[user][-1])
+            else:
+                picks = np.searchsorted(cumulative, user_rng.random(args.n_memory) * cumulative[-1], side='right')
+                heads = tails_of_last_hop[np.minimum(picks, len(cumulative) - 1)]
+                edges = draw(alias_table, heads, user_rng)
+                ripple_set[user].append((heads.tolist(), csr.relations[edges].tolist(), csr.indices[edges].tolist()))
+
+    return ripple_set
@@ -0,0 +1,479 @@
+"""
+Oracle de distances artiste-artiste par landmarks (distance = somme des 1 / poids, comme dijkstra_recommend)
+
+Précalcul: quelques artistes "landmarks" (plus forts degrés, ou choisis de proche en proche les plus
+éloignés), un plus court chemin depuis chacun (batch_algorithms.dijkstra_batch), et la matrice
+(n_artistes, n_landmarks) des distances stockée quantifiée (uint16 ou float16) sur disque.
+
+Requête: le graphe des relations similar_to / similar_from étant symétrique, pour tout landmark L
+    |d(L, a) - d(L, b)| <= d(a, b) <= d(L, a) + d(L, b)
+Les bornes sont calculées en O(n_landmarks) (erreur de quantification incluse, elles restent sûres).
+La recherche exacte (A* guidé par les bornes inférieures des landmarks) n'est lancée que si
+l'écart entre les bornes dépasse la tolérance demandée.
+
+Usage (depuis src/):
+    python distance_oracle.py --build --n_landmarks 16
+    python distance_oracle.py --source 14 --target 509
+    python distance_oracle.py --benchmark 1000
+"""
+import argparse
+import collections
+import heapq
+import json
+import os
+import time
+import numpy as np
+
+from batch_algorithms import incoming_graph, dijkstra_batch
+from graph_algorithms import ARTIST_RELATIONS
+from graph_csr import csr_heads
+from graph_snapshot import load_snapshot, source_signature
+from profiling import span
+from rng_utils import make_rng
+
+ORACLE_VERSION = 1
+STRATEGIES = ['degree', 'farthest']
+DTYPES = ['uint16', 'float16']
+
+# Code uint16 réservé aux artistes non atteints depuis un landmark
+UNREACHABLE = np.iinfo(np.uint16).max
+# Erreur relative d'un arrondi float16 (demi-ulp = 2^-11, majoré)
+FLOAT16_REL_ERROR = 2.0 ** -10
+
+# Résultat de DistanceOracle.distance
+DistanceResult = collections.namedtuple('DistanceResult', ['distance', 'lower', 'upper', 'exact'])
+
+
+def artist_graph(csr, n_artists, relations=ARTIST_RELATIONS):
+    """
+    Arêtes artiste-artiste en CSR (indptr, voisins, longueurs 1 / poids)
+
+    Returns:
+        tuple: (indptr (n_artists + 1,), indices int64, lengths float64)
+    """
+    heads = csr_heads(csr)
+    keep = np.isin(csr.relations, relations) & (heads < n_artists) & (csr.indices < n_artists) & (csr.weights > 0)
+    indptr = np.zeros(n_artists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads[keep], minlength=n_artists), out=indptr[1:])
+    return indptr, csr.indices[keep].astype(np.int64), 1.0 / csr.weights[keep].astype(np.float64)
+
+
+def artist_degrees(csr, n_artists, relations=ARTIST_RELATIONS):
+    """Degré de chaque artiste dans les relations artiste-artiste"""
+    heads = csr_heads(csr)
+    keep = np.isin(csr.relations, relations) & (heads < n_artists)
+    return np.bincount(heads[keep], minlength=n_artists)
+
+
+def landmark_distances(incoming, targets, landmarks, n_artists, batch_size=8):
+    """
+    Distances exactes de chaque landmark à chaque artiste, par lots de landmarks
+
+    Returns:
+        Array float64 (n_artists, len(landmarks)), inf si non atteint
+    """
+    distances = np.empty((n_artists, len(landmarks)))
+    for start in range(0, len(landmarks), batch_size):
+        seeds = [[int(landmark)] for landmark in landmarks[start:start + batch_size]]
+        block, _ = dijkstra_batch(incoming, targets, seeds)
+        distances[:, start:start + len(seeds)] = block[:n_artists]
+    return distances
+
+
+def select_landmarks(csr, n_artists, n_landmarks=16, strategy='degree', incoming=None, targets=None):
+    """
+    Choisir les landmarks et calculer leurs distances
+
+    Args:
+        csr: CSRGraph du KG
+        n_artists: Nombre d'artistes
+        n_landmarks: Nombre de landmarks
+        strategy: 'degree' (plus forts degrés) ou 'farthest' (premier = plus fort degré, puis
+                  l'artiste le plus éloigné des landmarks déjà choisis, les composantes non
+                  atteintes en priorité)
+        incoming, targets: Voir batch_algorithms.incoming_graph (calculés si absents)
+
+    Returns:
+        tuple: (landmarks int64, distances float64 (n_artists, n_landmarks))
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'stratégie inconnue: {strategy}')
+    if incoming is None:
+        incoming, targets = incoming_graph(csr)
+    degrees = artist_degrees(csr, n_artists)
+    n_landmarks = max(1, min(n_landmarks, int((degrees > 0).sum())))
+    if strategy == 'degree':
+        landmarks = np.argsort(-degrees, kind='stable')[:n_landmarks]
+        return landmarks, landmark_distances(incoming, targets, landmarks, n_artists)
+
+    landmarks = [int(np.argmax(degrees))]
+    columns = [landmark_distances(incoming, targets, landmarks, n_artists)[:, 0]]
+    closest = columns[0].copy()
+    while len(landmarks) < n_landmarks:
+        # Les artistes isolés (degré 0) ne servent à aucun chemin
+        gap = np.where(degrees > 0, closest, -1.0)
+        gap[landmarks] = -1.0
+        landmark = int(np.argmax(gap))
+        if gap[landmark] < 0:
+            break
+        landmarks.append(landmark)
+        columns.append(landmark_distances(incoming, targets, [landmark], n_artists)[:, 0])
+        closest = np.minimum(closest, columns[-1])
+    return np.array(landmarks, dtype=np.int64), np.column_stack(columns)
+
+
+def encode_distances(distances, dtype='uint16'):
+    """
+    Quantifier la matrice des distances
+
+    uint16: code = round(d / scale), UNREACHABLE si infini (erreur <= scale / 2)
+    float16: conversion directe (erreur relative <= FLOAT16_REL_ERROR)
+
+    Returns:
+        tuple: (array encodé, scale (0 pour float16))
+    """
+    finite = np.isfinite(distances)
+    max_distance = float(distances[finite].max(initial=0.0))
+    if dtype == 'float16':
+        if max_distance >= float(np.finfo(np.float16).max):
+            raise ValueError(f'distance {max_distance} hors de la plage float16, utiliser uint16')
+        return distances.astype(np.float16), 0.0
+    if dtype != 'uint16':
+        raise ValueError(f'dtype inconnu: {dtype}')
+    scale = max_distance / (UNREACHABLE - 1) if max_distance > 0 else 1.0
+    codes = np.full(distances.shape, UNREACHABLE, dtype=np.uint16)
+    codes[finite] = np.round(distances[finite] / scale).astype(np.uint16)
+    return codes, scale
+
+
+def oracle_path(dataset_path, dataset_name='music'):
+    return os.path.join(dataset_path, dataset_name, 'distance_oracle')
+
+
+class DistanceOracle:
+    """
+    Distances quantifiées aux landmarks et requêtes de bornes / distances
+
+    Args:
+        meta: Contenu de oracle.json (dtype, scale, ...)
+        codes: Array (n_artists, n_landmarks) uint16 ou float16 (mmap)
+        landmarks: Artistes landmarks
+        graph: Voir artist_graph (nécessaire seulement pour les recherches exactes)
+    """
+
+    def __init__(self, meta, codes, landmarks, graph=None):
+        self.meta = meta
+        self.codes = codes
+        self.landmarks = landmarks
+        self.graph = graph
+        self.scale = meta['scale']
+        self.n_artists = codes.shape[0]
+
+    def decode(self, artists):
+        """
+        Distances aux landmarks et erreur maximale de quantification de chaque valeur
+
+        Returns:
+            tuple: (distances float64 (len(artists), n_landmarks), erreurs)
+        """
+        codes = np.asarray(self.codes[artists])
+        if self.meta['dtype'] == 'float16':
+            distances = codes.astype(np.float64)
+            return distances, np.where(np.isfinite(distances), distances * FLOAT16_REL_ERROR, 0.0)
+        distances = codes * self.scale
+        distances[codes == UNREACHABLE] = np.inf
+        return distances, np.full(distances.shape, self.scale / 2)
+
+    @staticmethod
+    def _bounds(dist_a, err_a, dist_b, err_b):
+        """Bornes par paires de lignes (mêmes formes), réduites sur l'axe des landmarks"""
+        finite_a, finite_b = np.isfinite(dist_a), np.isfinite(dist_b)
+        both = finite_a & finite_b
+        with np.errstate(invalid='ignore'):
+            gap = np.where(both, np.abs(dist_a - dist_b) - err_a - err_b, 0.0)
+            # Un seul des deux atteint depuis L: composantes différentes
+            gap[finite_a != finite_b] = np.inf
+            total = np.where(both, dist_a + dist_b + err_a + err_b, np.inf)
+        return np.maximum(gap.max(axis=-1), 0.0), total.min(axis=-1)
+
+    def bounds(self, sources, targets):
+        """
+        Bornes inférieure et supérieure de d(source, target) pour des paires
+
+        Args:
+            sources, targets: Arrays d'artistes de même longueur
+
+        Returns:
+            tuple: (lower, upper) arrays float64; lower = inf si les artistes ne sont pas connectés
+        """
+        sources = np.atleast_1d(np.asarray(sources, dtype=np.int64))
+        targets = np.atleast_1d(np.asarray(targets, dtype=np.int64))
+        lower, upper = self._bounds(*self.decode(sources), *self.decode(targets))
+        same = sources == targets
+        lower[same] = 0.0
+        upper[same] = 0.0
+        return lower, upper
+
+    def set_bounds(self, seeds, candidates):
+        """
+        Bornes de la distance de chaque candidat à l'ensemble seeds (min sur les seeds)
+
+        Pour chaque landmark L: d(seeds, c) <= min_s d(s, L) + d(L, c) et
+        d(seeds, c) >= min_s |d(s, L) - d(c, L)| (seed le plus proche par recherche dichotomique),
+        soit O((len(seeds) + len(candidates)) * n_landmarks): utilisable comme caractéristique
+        pour tous les candidats d'un utilisateur.
+
+        Returns:
+            tuple: (lower, upper) arrays float64 alignés sur candidates
+        """
+        seeds = np.asarray(seeds, dtype=np.int64)
+        candidates = np.asarray(candidates, dtype=np.int64)
+        seed_dist, seed_err = self.decode(seeds)
+        dist, err = self.decode(candidates)
+        upper = (dist + err + (seed_dist + seed_err).min(axis=0)).min(axis=1)
+
+        # Distances infinies remplacées par une valeur finie plus grande que toutes les autres:
+        # les écarts ne peuvent que diminuer, la borne inférieure reste valide
+        finite = np.isfinite(seed_dist)
+        sentinel = 2.0 * float(max(seed_dist[finite].max(initial=0.0), dist[np.isfinite(dist)].max(initial=0.0))) + 1.0
+        seed_dist = np.where(finite, seed_dist, sentinel)
+        dist = np.where(np.isfinite(dist), dist, sentinel)
+
+        # Toutes les colonnes en une recherche: colonne L décalée de L * offset
+        n_seeds, n_landmarks = seed_dist.shape
+        offsets = np.arange(n_landmarks) * (4.0 * sentinel)
+        flat = np.sort(seed_dist, axis=0).T.ravel() + np.repeat(offsets, n_seeds)
+        keys = dist + offsets
+        position = np.searchsorted(flat, keys)
+        first = np.arange(n_landmarks) * n_seeds
+        right = flat[np.clip(position, first, first + n_seeds - 1)]
+        left = flat[np.clip(position - 1, first, first + n_seeds - 1)]
+        gap = np.minimum(np.abs(right - keys), np.abs(keys - left)) - err - seed_err.max(axis=0, initial=0.0)
+        lower = np.maximum(gap.max(axis=1, initial=0.0), 0.0)
+
+        is_seed = np.isin(candidates, seeds)
+        lower[is_seed] = 0.0
+        upper[is_seed] = 0.0
+        return lower, upper
+
+    def exact_distance(self, source, target, upper=np.inf):
+        """
+        Distance exacte par A* (heuristique: bornes inférieures des landmarks vers target)
+
+        Les nœuds dont g + h dépasse la borne supérieure connue ne sont pas explorés.
+
+        Returns:
+            tuple: (distance, nombre de nœuds développés)
+        """
+        if self.graph is None:
+            raise ValueError('graphe non chargé: recherche exacte impossible')
+        indptr, indices, lengths = self.graph
+        if source == target:
+            return 0.0, 0
+        target_dist, target_err = self.decode([target])
+        # Heuristique calculée seulement pour les nœuds rencontrés
+        heuristic = np.full(self.n_artists, np.nan)
+
+        def lower_to_target(nodes):
+            missing = nodes[np.isnan(heuristic[nodes])]
+            if len(missing):
+                heuristic[missing] = self._bounds(*self.decode(missing), target_dist, target_err)[0]
+            return heuristic[nodes]
+
+        if not np.isfinite(lower_to_target(np.array([source]))[0]):
+            return np.inf, 0
+        # Marge pour les arrondis des sommes de longueurs
+        limit = upper * (1.0 + 1e-9)
+
+        best = np.full(self.n_artists, np.inf)
+        best[source] = 0.0
+        heap = [(heuristic[source], 0.0, source)]
+        expanded = 0
+        while heap:
+            _, dist, node = heapq.heappop(heap)
+            if node == target:
+                return dist, expanded
+            if dist > best[node]:
+                continue
+            expanded += 1
+            start, stop = indptr[node], indptr[node + 1]
+            tails = indices[start:stop]
+            candidates = dist + lengths[start:stop]
+            better = candidates < best[tails]
+            tails, candidates = tails[better], candidates[better]
+            estimates = candidates + lower_to_target(tails)
+            keep = estimates <= limit
+            tails, candidates, estimates = tails[keep], candidates[keep], estimates[keep]
+            best[tails] = candidates
+            for tail, candidate, estimate in zip(tails.tolist(), candidates.tolist(), estimates.tolist()):
+                heapq.heappush(heap, (estimate, candidate, tail))
+        return (upper if np.isfinite(upper) else np.inf), expanded
+
+    def distance(self, source, target, tolerance=0.1):
+        """
+        Distance entre deux artistes: borne supérieure si elle est à moins de tolerance
+        (relatif) de la borne inférieure, sinon recherche exacte
+
+        Returns:
+            DistanceResult
+        """
+        lower, upper = self.bounds([source], [target])
+        lower, upper = float(lower[0]), float(upper[0])
+        if upper <= lower * (1.0 + tolerance) or not np.isfinite(lower) or self.graph is None:
+            return DistanceResult(distance=upper, lower=lower, upper=upper, exact=lower == upper)
+        distance, _ = self.exact_distance(source, target, upper)
+        return DistanceResult(distance=distance, lower=lower, upper=upper, exact=True)
+
+
+def build_oracle(csr, n_artists, output_dir, n_landmarks=16, strategy='degree', dtype='uint16', info=None):
+    """
+    Précalculer et écrire l'oracle (distances.npy, landmarks.npy, oracle.json écrit en dernier)
+
+    Returns:
+        DistanceOracle (distances en mmap, graphe chargé)
+    """
+    with span('distance_oracle.build', landmarks=n_landmarks) as counts:
+        landmarks, distances = select_landmarks(csr, n_artists, n_landmarks, strategy)
+        codes, scale = encode_distances(distances, dtype)
+        counts['artists'] = n_artists
+        counts['reached'] = int(np.isfinite(distances).any(axis=1).sum())
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, 'distances.npy'), codes)
+    np.save(os.path.join(output_dir, 'landmarks.npy'), landmarks)
+    meta = dict(info or {})
+    meta.update({'version': ORACLE_VERSION, 'dtype': dtype, 'scale': scale, 'strategy': strategy,
+                 'n_artists': int(n_artists), 'n_landmarks': int(len(landmarks))})
+    tmp_path = os.path.join(output_dir, 'oracle.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, 'oracle.json'))
+    print(f'Oracle écrit: {output_dir} ({len(landmarks)} landmarks, {dtype}, '
+          f'{codes.nbytes / 1024:.0f} Ko)')
+    return load_oracle(output_dir, graph=artist_graph(csr, n_artists))
+
+
+def load_oracle(output_dir, graph=None, signature=None):
+    """
+    Ouvrir l'oracle (distances en mmap)
+
+    Args:
+        output_dir: Dossier de l'oracle
+        graph: Voir artist_graph (optionnel, pour les recherches exactes)
+        signature: Si donnée, retourner None quand l'oracle a été construit depuis d'autres fichiers
+
+    Returns:
+        DistanceOracle ou None si absent, d'une autre version ou périmé
+    """
+    meta_path = os.path.join(output_dir, 'oracle.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != ORACLE_VERSION:
+        return None
+    if signature is not None and meta.get('signature') != [int(x) for x in signature]:
+        print('Oracle de distances périmé (fichiers sources modifiés)')
+        return None
+    codes = np.load(os.path.join(output_dir, 'distances.npy'), mmap_mode='r')
+    landmarks = np.load(os.path.join(output_dir, 'landmarks.npy'))
+    return DistanceOracle(meta, codes, landmarks, graph)
+
+
+def benchmark(oracle, csr, n_artists, n_pairs=1000, tolerance=0.1, seed=0):
+    """
+    Tenue des bornes, part des requêtes nécessitant une recherche exacte et latences
+
+    Les paires sont tirées parmi les artistes ayant des relations artiste-artiste; la distance
+    exacte de référence vient de dijkstra_batch depuis chaque source.
+
+    Returns:
+        dict
+    """
+    rng = make_rng(seed)
+    connected = np.flatnonzero(artist_degrees(csr, n_artists) > 0)
+    sources = rng.choice(connected, n_pairs)
+    targets = rng.choice(connected, n_pairs)
+    incoming, in_targets = incoming_graph(csr)
+
+    start = time.perf_counter()
+    reference = np.empty(n_pairs)
+    for first in range(0, n_pairs, 8):
+        seeds = [[int(s)] for s in sources[first:first + 8]]
+        block, _ = dijkstra_batch(incoming, in_targets, seeds)
+        reference[first:first + len(seeds)] = block[targets[first:first + 8], np.arange(len(seeds))]
+    dijkstra_ms = (time.perf_counter() - start) / n_pairs * 1000
+
+    start = time.perf_counter()
+    lower, upper = oracle.bounds(sources, targets)
+    bounds_us = (time.perf_counter() - start) / n_pairs * 1e6
+    finite = np.isfinite(reference)
+    valid = np.all((lower[finite] <= reference[finite] + 1e-9) & (reference[finite] <= upper[finite] + 1e-9))
+
+    latencies, errors, exact_runs = [], [], 0
+    for source, target, expected in zip(sources.tolist(), targets.tolist(), reference.tolist()):
+        start = time.perf_counter()
+        result = oracle.distance(source, target, tolerance)
+        latencies.append(time.perf_counter() - start)
+        exact_runs += result.exact and result.lower != result.upper
+        if np.isfinite(expected) and expected > 0:
+            errors.append(abs(result.distance - expected) / expected)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = upper[finite] / reference[finite]
+    return {
+        'pairs': n_pairs,
+        'connected_pairs': int(finite.sum()),
+        'bounds_valid': bool(valid),
+        'bounds_us_per_pair': round(bounds_us, 3),
+        'median_upper_over_exact': round(float(np.nanmedian(ratio)), 4) if finite.any() else None,
+        'upper_within_tolerance': round(float(np.mean(ratio <= 1.0 + tolerance)), 4) if finite.any() else None,
+        'exact_fallback': round(exact_runs / n_pairs, 4),
+        'distance_p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 4),
+        'distance_p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 4),
+        'max_relative_error': round(float(max(errors, default=0.0)), 4),
+        'dijkstra_ms_per_source': round(dijkstra_ms, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Oracle de distances artiste-artiste par landmarks')
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--build', action='store_true', help="(Re)construire l'oracle")
+    parser.add_argument('--n_landmarks', type=int, default=16)
+    parser.add_argument('--strategy', type=str, default='degree', choices=STRATEGIES)
+    parser.add_argument('--dtype', type=str, default='uint16', choices=DTYPES)
+    parser.add_argument('--source', type=int, default=None, help='Artiste de départ')
+    parser.add_argument('--target', type=int, default=None, help="Artiste d'arrivée")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Écart relatif des bornes accepté sans recherche exacte')
+    parser.add_argument('--benchmark', type=int, default=0, metavar='N', help='Mesurer sur N paires aléatoires')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    snapshot = load_snapshot(args.dataset_path, args.dataset)
+    csr = snapshot.csr
+    n_artists = snapshot.metadata.get('n_artists_actual')
+    if n_artists is None:
+        n_artists = int(csr.indices[np.isin(csr.relations, ARTIST_RELATIONS)].max(initial=-1)) + 1
+    output_dir = oracle_path(args.dataset_path, args.dataset)
+    signature = source_signature(args.dataset_path, args.dataset)
+
+    oracle = None
+    if not args.build:
+        oracle = load_oracle(output_dir, graph=artist_graph(csr, n_artists), signature=signature)
+    if oracle is None:
+        info = {'signature': [int(x) for x in signature]}
+        oracle = build_oracle(csr, n_artists, output_dir, args.n_landmarks, args.strategy, args.dtype, info)
+
+    if args.source is not None and args.target is not None:
+        result = oracle.distance(args.source, args.target, args.tolerance)
+        print(f'\nd({args.source}, {args.target}) = {result.distance:.4f} '
+              f'(bornes [{result.lower:.4f}, {result.upper:.4f}], exacte: {result.exact})')
+    if args.benchmark:
+        print(json.dumps(benchmark(oracle, csr, n_artists, args.benchmark, args.tolerance, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,568 @@
+"""
+Embeddings d'artistes et d'utilisateurs par SVD tronquée randomisée, et index des plus proches voisins
+
+La matrice factorisée est soit la matrice utilisateurs x artistes des écoutes (log1p des poids),
+soit l'adjacence artiste x artiste des relations similar_to / similar_from. Avec A = U S V^T:
+    artistes:     V S^(1/2)
+    utilisateurs: X V S^(-1/2)   (X: écoutes de l'utilisateur, projection "fold-in")
+si bien que le produit scalaire utilisateur . artiste vaut la ligne de X projetée sur V V^T.
+
+L'index est un dossier de fichiers .npy ouverts en mmap au chargement:
+    - recherche exacte: produit matriciel par blocs d'artistes puis top-k (argpartition)
+    - recherche approchée (IVF): k-means sphérique des artistes en listes, vecteurs quantifiés
+      en int8 (une échelle par artiste), seules n_probe listes sont parcourues puis les meilleurs
+      candidats sont re-classés avec les vecteurs float32
+
+Usage (depuis src/):
+    python embeddings.py --build --rank 64
+    python embeddings.py --artist_id 14 --k 50 [--approximate]
+    python embeddings.py --user_id 0 --k 10
+    python embeddings.py --benchmark 1000
+"""
+import argparse
+import collections
+import json
+import os
+import time
+import numpy as np
+
+from co_listen import LISTENED_TO, SIMILAR_TO, SIMILAR_FROM
+from graph_snapshot import load_snapshot, source_signature
+from profiling import span
+from rng_utils import make_rng, stage_rng, STAGE_EMBEDDING
+
+INDEX_VERSION = 1
+SOURCES = ['listens', 'similar']
+
+# Matrice creuse en lignes compressées (même disposition que graph_csr.CSRGraph)
+SparseMatrix = collections.namedtuple('SparseMatrix', ['indptr', 'indices', 'data', 'shape'])
+
+# Résultat de fit_embeddings
+Embeddings = collections.namedtuple('Embeddings', ['artist_vectors', 'user_vectors', 'singular_values'])
+
+
+def _sparse_matrix(rows, cols, data, shape):
+    """Matrice creuse depuis des triplets (lignes, colonnes, valeurs), doublons conservés"""
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+    return SparseMatrix(indptr=indptr, indices=cols[order].astype(np.int64),
+                        data=data[order].astype(np.float64), shape=shape)
+
+
+def _transpose(matrix):
+    rows = np.repeat(np.arange(matrix.shape[0], dtype=np.int64), np.diff(matrix.indptr))
+    return _sparse_matrix(matrix.indices, rows, matrix.data, (matrix.shape[1], matrix.shape[0]))
+
+
+def _weights(weights, weight_transform):
+    weights = weights.astype(np.float64)
+    if weight_transform == 'log1p':
+        return np.log1p(weights)
+    if weight_transform is not None:
+        raise ValueError(f'weight_transform inconnu: {weight_transform}')
+    return weights
+
+
+def listen_matrix(csr, n_artists, weight_transform='log1p'):
+    """
+    Matrice utilisateurs x artistes des écoutes (relation listened_to)
+
+    Args:
+        csr: CSRGraph du KG (utilisateur = entité n_artists + index)
+        n_artists: Nombre d'artistes
+        weight_transform: 'log1p' (défaut) ou None (nombres d'écoutes bruts)
+
+    Returns:
+        SparseMatrix (n_users, n_artists)
+    """
+    heads = np.repeat(np.arange(csr.n_nodes, dtype=np.int64), np.diff(csr.indptr))
+    keep = (csr.relations == LISTENED_TO) & (heads >= n_artists)
+    n_users = max(csr.n_nodes - n_artists, 0)
+    return _sparse_matrix(heads[keep] - n_artists, csr.indices[keep].astype(np.int64),
+                          _weights(csr.weights[keep], weight_transform), (n_users, n_artists))
+
+
+def similarity_matrix(csr, n_artists, weight_transform='log1p'):
+    """
+    Adjacence symétrique artiste x artiste des relations similar_to / similar_from
+
+    Returns:
+        SparseMatrix (n_artists, n_artists)
+    """
+    heads = np.repeat(np.arange(csr.n_nodes, dtype=np.int64), np.diff(csr.indptr))
+    tails = csr.indices.astype(np.int64)
+    keep = np.isin(csr.relations, (SIMILAR_TO, SIMILAR_FROM)) & (heads < n_artists) & (tails < n_artists)
+    return _sparse_matrix(heads[keep], tails[keep], _weights(csr.weights[keep], weight_transform),
+                          (n_artists, n_artists))
+
+
+def sparse_dot(matrix, dense, max_block=1 << 16):
+    """
+    Produit matrice creuse x matrice dense, par blocs d'au plus max_block valeurs non nulles
+
+    Returns:
+        Array (matrix.shape[0], dense.shape[1]) du type de dense
+    """
+    n_rows = matrix.shape[0]
+    out = np.zeros((n_rows, dense.shape[1]), dtype=dense.dtype)
+    row = 0
+    while row < n_rows:
+        end = int(np.searchsorted(matrix.indptr, matrix.indptr[row] + max_block, side='right')) - 1
+        end = min(max(end, row + 1), n_rows)
+        bounds = matrix.indptr[row:end + 1]
+        nonempty = np.flatnonzero(np.diff(bounds))
+        if len(nonempty):
+            start, stop = bounds[0], bounds[-1]
+            products = np.take(dense, matrix.indices[start:stop], axis=0)
+            products *= matrix.data[start:stop, None]
+            out[row + nonempty] = np.add.reduceat(products, bounds[nonempty] - start, axis=0)
+        row = end
+    return out
+
+
+def randomized_svd(matrix, rank, n_oversamples=10, n_power_iter=4, rng=None):
+    """
+    SVD tronquée randomisée (Halko, Martinsson, Tropp) d'une matrice creuse
+
+    Args:
+        matrix: SparseMatrix
+        rank: Nombre de composantes
+        n_oversamples: Colonnes aléatoires supplémentaires
+        n_power_iter: Itérations de puissance (réorthonormalisées par QR)
+        rng: Graine ou Generator
+
+    Returns:
+        tuple: (U (n_rows, rank), S (rank,), Vt (rank, n_cols))
+    """
+    rng = make_rng(rng)
+    transposed = _transpose(matrix)
+    size = min(rank + n_oversamples, min(matrix.shape))
+    omega = rng.standard_normal((matrix.shape[1], size))
+    q, _ = np.linalg.qr(sparse_dot(matrix, omega))
+    for _ in range(n_power_iter):
+        z, _ = np.linalg.qr(sparse_dot(transposed, q))
+        q, _ = np.linalg.qr(sparse_dot(matrix, z))
+    # B = Q^T A, petite matrice dense (size, n_cols)
+    u_small, s, vt = np.linalg.svd(sparse_dot(transposed, q).T, full_matrices=False)
+    return (q @ u_small)[:, :rank], s[:rank], vt[:rank]
+
+
+def fit_embeddings(csr, n_artists, rank=64, source='listens', weight_transform='log1p', n_power_iter=4, rng=None):
+    """
+    Factoriser les écoutes (ou l'adjacence similar_to) en embeddings artistes et utilisateurs
+
+    Args:
+        csr: CSRGraph du KG
+        n_artists: Nombre d'artistes
+        rank: Dimension des embeddings
+        source: 'listens' (utilisateurs x artistes) ou 'similar' (artiste x artiste)
+        weight_transform: 'log1p' ou None
+        n_power_iter: Itérations de puissance de la SVD randomisée
+        rng: Graine ou Generator
+
+    Returns:
+        Embeddings (vecteurs float32)
+    """
+    if source not in SOURCES:
+        raise ValueError(f'source inconnue: {source}')
+    listens = listen_matrix(csr, n_artists, weight_transform)
+    matrix = listens if source == 'listens' else similarity_matrix(csr, n_artists, weight_transform)
+    rank = max(1, min(rank, min(matrix.shape)))
+    _, s, vt = randomized_svd(matrix, rank, n_power_iter=n_power_iter, rng=rng)
+    root = np.sqrt(s)
+    artist_vectors = vt.T * root
+    user_vectors = sparse_dot(listens, vt.T) / np.where(root > 0, root, 1.0)
+    return Embeddings(artist_vectors=artist_vectors.astype(np.float32),
+                      user_vectors=user_vectors.astype(np.float32), singular_values=s)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1)
+    unit = vectors / np.where(norms > 0, norms, 1.0)[:, None]
+    return unit.astype(np.float32), norms.astype(np.float32)
+
+
+def _assign(vectors, centroids, block=1 << 15):
+    """Centroïde le plus proche (produit scalaire) de chaque vecteur, par blocs"""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        assignment[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+    return assignment
+
+
+def spherical_kmeans(unit, n_lists, n_iter=20, rng=None):
+    """
+    k-means sphérique (centroïdes normalisés, similarité cosinus)
+
+    Returns:
+        tuple: (centroïdes float32 (n_lists, rank), liste de chaque vecteur)
+    """
+    rng = make_rng(rng)
+    n_lists = max(1, min(n_lists, len(unit)))
+    centroids = unit[rng.choice(len(unit), n_lists, replace=False)].astype(np.float32)
+    assignment = _assign(unit, centroids)
+    for _ in range(n_iter):
+        order = np.argsort(assignment, kind='stable')
+        lists, starts = np.unique(assignment[order], return_index=True)
+        sums = np.add.reduceat(unit[order], starts, axis=0)
+        # Les listes vides gardent leur centroïde
+        centroids[lists] = _normalize(sums)[0]
+        previous, assignment = assignment, _assign(unit, centroids)
+        if np.array_equal(previous, assignment):
+            break
+    return centroids, assignment
+
+
+def quantize(vectors):
+    """Quantification int8 symétrique, une échelle par ligne (x ~ codes * échelle)"""
+    scales = np.abs(vectors).max(axis=1, initial=0.0) / 127.0
+    codes = np.round(vectors / np.where(scales > 0, scales, 1.0)[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def embedding_index_path(dataset_path, dataset_name='music'):
+    return os.path.join(dataset_path, dataset_name, 'embedding_index')
+
+
+def build_index(embeddings, index_dir, n_lists=None, kmeans_iter=20, rng=None, info=None):
+    """
+    Écrire l'index (fichiers .npy, index.json écrit en dernier)
+
+    Args:
+        embeddings: Embeddings
+        index_dir: Dossier de l'index
+        n_lists: Nombre de listes IVF (défaut: racine du nombre d'artistes)
+        kmeans_iter: Itérations du k-means
+        rng: Graine ou Generator du k-means
+        info: Champs supplémentaires de index.json (source, signature, ...)
+
+    Returns:
+        EmbeddingIndex (chargé en mmap)
+    """
+    unit, norms = _normalize(embeddings.artist_vectors)
+    n_artists = len(unit)
+    if n_lists is None:
+        n_lists = int(round(np.sqrt(n_artists)))
+    with span('embeddings.build_index', artists=n_artists) as counts:
+        centroids, assignment = spherical_kmeans(unit, n_lists, kmeans_iter, rng)
+        list_items = np.argsort(assignment, kind='stable').astype(np.int32)
+        list_indptr = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=len(centroids)), out=list_indptr[1:])
+        codes, scales = quantize(unit[list_items])
+        counts['lists'] = len(centroids)
+
+    os.makedirs(index_dir, exist_ok=True)
+    arrays = {'artist_unit': unit, 'artist_norms': norms, 'user_vectors': embeddings.user_vectors,
+              'centroids': centroids, 'list_indptr': list_indptr, 'list_items': list_items,
+              'list_codes': codes, 'list_scales': scales}
+    for name, array in arrays.items():
+        np.save(os.path.join(index_dir, f'{name}.npy'), array)
+
+    meta = dict(info or {})
+    meta.update({'version': INDEX_VERSION, 'rank': int(unit.shape[1]), 'n_artists': n_artists,
+                 'n_users': int(len(embeddings.user_vectors)), 'n_lists': int(len(centroids)),
+                 'singular_values': [float(s) for s in embeddings.singular_values]})
+    tmp_path = os.path.join(index_dir, 'index.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(index_dir, 'index.json'))
+    print(f'Index écrit: {index_dir} ({n_artists} artistes, rang {unit.shape[1]}, {len(centroids)} listes)')
+    return load_index(index_dir)
+
+
+def load_index(index_dir, mmap=True, signature=None):
+    """
+    Ouvrir l'index (fichiers .npy en mmap par défaut)
+
+    Args:
+        index_dir: Dossier de l'index
+        mmap: Ouvrir les tableaux en mmap_mode='r'
+        signature: Si donnée, retourner None quand l'index a été construit depuis d'autres fichiers sources
+
+    Returns:
+        EmbeddingIndex ou None si absent, d'une autre version ou périmé
+    """
+    meta_path = os.path.join(index_dir, 'index.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != INDEX_VERSION:
+        return None
+    if signature is not None and meta.get('signature') != [int(x) for x in signature]:
+        print("Index d'embeddings périmé (fichiers sources modifiés)")
+        return None
+    mode = 'r' if mmap else None
+    arrays = {name: np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode=mode)
+              for name in ('artist_unit', 'artist_norms', 'user_vectors', 'centroids', 'list_indptr',
+                           'list_items', 'list_codes', 'list_scales')}
+    return EmbeddingIndex(meta, **arrays)
+
+
+def _merge_top_k(items, scores, k):
+    """Top-k par ligne de candidats (batch, n) -> listes [(artiste, score)] triées"""
+    results = []
+    for row_items, row_scores in zip(items, scores):
+        finite = np.isfinite(row_scores)
+        row_items, row_scores = row_items[finite], row_scores[finite]
+        n = min(k, len(row_scores))
+        if n <= 0:
+            results.append([])
+            continue
+        best = np.argpartition(-row_scores, n - 1)[:n]
+        best = best[np.argsort(-row_scores[best], kind='stable')]
+        results.append([(int(row_items[i]), float(row_scores[i])) for i in best])
+    return results
+
+
+class EmbeddingIndex:
+    """
+    Index des embeddings artistes/utilisateurs (voir build_index)
+
+    Les requêtes "artistes similaires" utilisent la similarité cosinus, les requêtes
+    utilisateur le produit scalaire (score de la factorisation).
+    """
+
+    def __init__(self, meta, artist_unit, artist_norms, user_vectors, centroids, list_indptr, list_items,
+                 list_codes, list_scales):
+        self.meta = meta
+        self.artist_unit = artist_unit
+        self.artist_norms = artist_norms
+        self.user_vectors = user_vectors
+        self.centroids = centroids
+        self.list_indptr = list_indptr
+        self.list_items = list_items
+        self.list_codes = list_codes
+        self.list_scales = list_scales
+        self.n_artists = len(artist_unit)
+        self.n_users = len(user_vectors)
+
+    def search_exact(self, queries, k, inner_product=False, exclude=None, block_size=1 << 16):
+        """
+        Top-k exact: produit matriciel par blocs d'artistes
+
+        Args:
+            queries: Array (batch, rank)
+            k: Nombre de résultats
+            inner_product: Produit scalaire (vecteurs artistes non normalisés) au lieu du cosinus
+            exclude: Liste (alignée sur queries) d'artistes à exclure, ou None
+            block_size: Artistes par bloc
+
+        Returns:
+            Liste de listes [(artiste, score)]
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        batch = len(queries)
+        kept_items, kept_scores = [], []
+        for start in range(0, self.n_artists, block_size):
+            stop = min(start + block_size, self.n_artists)
+            scores = queries @ np.asarray(self.artist_unit[start:stop]).T
+            if inner_product:
+                scores *= self.artist_norms[start:stop]
+            if exclude is not None:
+                for row, items in enumerate(exclude):
+                    items = np.asarray(items, dtype=np.int64)
+                    items = items[(items >= start) & (items < stop)]
+                    scores[row, items - start] = -np.inf
+            n = min(k, stop - start)
+            best = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+            kept_items.append(best + start)
+            kept_scores.append(np.take_along_axis(scores, best, axis=1))
+        if not kept_items:
+            return [[] for _ in range(batch)]
+        return _merge_top_k(np.concatenate(kept_items, axis=1), np.concatenate(kept_scores, axis=1), k)
+
+    def search_ivf(self, queries, k, inner_product=False, exclude=None, n_probe=8, rerank=None):
+        """
+        Top-k approché: n_probe listes les plus proches, scores int8 puis re-classement float32
+
+        Args:
+            queries, k, inner_product, exclude: Voir search_exact
+            n_probe: Nombre de listes parcourues par requête
+            rerank: Candidats re-classés avec les vecteurs exacts (défaut: max(4k, 64))
+
+        Returns:
+            Liste de listes [(artiste, score)]
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        n_probe = max(1, min(n_probe, len(self.centroids)))
+        rerank = rerank or max(4 * k, 64)
+        probes = np.argpartition(-(queries @ np.asarray(self.centroids).T), n_probe - 1, axis=1)[:, :n_probe]
+        results = []
+        for row, query in enumerate(queries):
+            starts, stops = self.list_indptr[probes[row]], self.list_indptr[probes[row] + 1]
+            sizes = stops - starts
+            # Positions de toutes les listes sondées (concaténation d'intervalles)
+            positions = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+            items = np.asarray(self.list_items[positions], dtype=np.int64)
+            scores = (self.list_codes[positions] @ query) * self.list_scales[positions]
+            if inner_product:
+                scores *= self.artist_norms[items]
+            if exclude is not None and len(exclude[row]):
+                scores[np.isin(items, np.asarray(exclude[row], dtype=np.int64))] = -np.inf
+            if len(items) > rerank:
+                keep = np.argpartition(-scores, rerank - 1)[:rerank]
+                items, scores = items[keep], scores[keep]
+            finite = np.isfinite(scores)
+            items = items[finite]
+            exact = np.asarray(self.artist_unit[items]) @ query
+            if inner_product:
+                exact *= self.artist_norms[items]
+            results.extend(_merge_top_k([items], [exact], k))
+        return results
+
+    def _search(self, queries, k, inner_product, exclude, approximate, n_probe):
+        if approximate:
+            return self.search_ivf(queries, k, inner_product, exclude, n_probe)
+        return self.search_exact(queries, k, inner_product, exclude)
+
+    def similar_artists_batch(self, artist_ids, k=50, approximate=False, n_probe=8):
+        """
+        Artistes les plus proches (cosinus) de chaque artiste, lui-même exclu
+
+        Returns:
+            Liste alignée sur artist_ids: [(artiste, score)] ou None si l'artiste est hors de l'index
+        """
+        results = [None] * len(artist_ids)
+        valid = [i for i, artist in enumerate(artist_ids) if 0 <= artist < self.n_artists]
+        if not valid:
+            return results
+        artists = [artist_ids[i] for i in valid]
+        queries = np.asarray(self.artist_unit[artists])
+        found = self._search(queries, k, False, [[artist] for artist in artists], approximate, n_probe)
+        for i, result in zip(valid, found):
+            results[i] = result
+        return results
+
+    def recommend_batch(self, user_ids, k=10, exclude=None, approximate=False, n_probe=8):
+        """
+        Artistes de plus grand score (produit scalaire) pour chaque utilisateur
+
+        Args:
+            user_ids: Index des utilisateurs (comme dans ratings_final)
+            k: Nombre de recommandations
+            exclude: Liste alignée sur user_ids d'artistes à exclure (ex: historiques), ou None
+            approximate: Utiliser l'IVF
+
+        Returns:
+            Liste alignée sur user_ids: [(artiste, score)] ou None si l'utilisateur est hors de l'index
+        """
+        results = [None] * len(user_ids)
+        valid = [i for i, user in enumerate(user_ids) if 0 <= user < self.n_users]
+        if not valid:
+            return results
+        queries = np.asarray(self.user_vectors[[user_ids[i] for i in valid]])
+        excluded = [exclude[i] for i in valid] if exclude is not None else None
+        found = self._search(queries, k, True, excluded, approximate, n_probe)
+        for i, result in zip(valid, found):
+            results[i] = result
+        return results
+
+    def score(self, user_id, artist_ids):
+        """Scores de la factorisation d'un utilisateur pour des artistes donnés"""
+        artist_ids = np.asarray(artist_ids, dtype=np.int64)
+        return (np.asarray(self.artist_unit[artist_ids]) @ self.user_vectors[user_id]) * self.artist_norms[artist_ids]
+
+
+def build_from_dataset(dataset_path, dataset_name='music', rank=64, source='listens', weight_transform='log1p',
+                       n_power_iter=4, n_lists=None, seed=0):
+    """
+    Construire l'index depuis le snapshot du graphe (final_data/{dataset}/embedding_index)
+
+    Returns:
+        EmbeddingIndex
+    """
+    snapshot = load_snapshot(dataset_path, dataset_name)
+    n_artists = snapshot.metadata.get('n_artists_actual')
+    if n_artists is None:
+        csr = snapshot.csr
+        n_artists = int(csr.indices[csr.relations == LISTENED_TO].max(initial=-1)) + 1
+    rng = stage_rng(seed, STAGE_EMBEDDING)
+    with span('embeddings.fit', rank=rank) as counts:
+        embeddings = fit_embeddings(snapshot.csr, n_artists, rank, source, weight_transform, n_power_iter, rng)
+        counts['artists'] = len(embeddings.artist_vectors)
+        counts['users'] = len(embeddings.user_vectors)
+    info = {'source': source, 'weight_transform': weight_transform, 'seed': seed,
+            'signature': [int(x) for x in source_signature(dataset_path, dataset_name)]}
+    return build_index(embeddings, embedding_index_path(dataset_path, dataset_name), n_lists, rng=rng, info=info)
+
+
+def benchmark(index, n_queries=1000, k=50, n_probe=8, seed=0):
+    """
+    Latence par requête (une requête par appel) et rappel de l'IVF par rapport à la recherche exacte
+
+    Returns:
+        dict
+    """
+    rng = make_rng(seed)
+    artists = rng.choice(index.n_artists, min(n_queries, index.n_artists), replace=False).tolist()
+    users = rng.choice(index.n_users, min(n_queries, index.n_users), replace=False).tolist()
+    report = {'k': k, 'n_probe': n_probe}
+    results = {}
+    for name, ids, query in (('similar', artists, index.similar_artists_batch),
+                             ('user', users, index.recommend_batch)):
+        for approximate in (False, True):
+            latencies = []
+            found = []
+            for item in ids:
+                start = time.perf_counter()
+                found.append(query([item], k, approximate=approximate, n_probe=n_probe)[0])
+                latencies.append(time.perf_counter() - start)
+            key = f"{name}_{'ivf' if approximate else 'exact'}"
+            results[key] = found
+            report[key] = {'queries': len(ids), 'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 4),
+                           'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 4)}
+        overlaps = [len({a for a, _ in approx} & {a for a, _ in exact}) / max(len(exact), 1)
+                    for exact, approx in zip(results[f'{name}_exact'], results[f'{name}_ivf'])]
+        report[f'{name}_ivf']['recall'] = round(float(np.mean(overlaps)), 4) if overlaps else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embeddings SVD et index des artistes similaires")
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--build', action='store_true', help="(Re)construire l'index")
+    parser.add_argument('--rank', type=int, default=64, help='Dimension des embeddings')
+    parser.add_argument('--source', type=str, default='listens', choices=SOURCES,
+                        help='Matrice factorisée: écoutes utilisateurs x artistes ou adjacence similar_to')
+    parser.add_argument('--weight_transform', type=str, default='log1p', choices=['log1p', 'none'])
+    parser.add_argument('--power_iter', type=int, default=4, help='Itérations de puissance de la SVD')
+    parser.add_argument('--n_lists', type=int, default=None, help='Listes IVF (défaut: racine du nombre d\'artistes)')
+    parser.add_argument('--artist_id', type=int, default=None, help='Artistes similaires à cet artiste')
+    parser.add_argument('--user_id', type=int, default=None, help='Recommandations pour cet utilisateur')
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--approximate', action='store_true', help='Recherche IVF quantifiée')
+    parser.add_argument('--n_probe', type=int, default=8)
+    parser.add_argument('--benchmark', type=int, default=0, metavar='N',
+                        help='Mesurer la latence sur N requêtes artistes et N requêtes utilisateurs')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    index_dir = embedding_index_path(args.dataset_path, args.dataset)
+    index = None if args.build else load_index(index_dir, signature=source_signature(args.dataset_path, args.dataset))
+    if index is None:
+        index = build_from_dataset(args.dataset_path, args.dataset, args.rank, args.source,
+                                   None if args.weight_transform == 'none' else args.weight_transform,
+                                   args.power_iter, args.n_lists, args.seed)
+
+    if args.artist_id is not None:
+        result = index.similar_artists_batch([args.artist_id], args.k, args.approximate, args.n_probe)[0]
+        print(f'\nArtistes similaires à {args.artist_id}:')
+        for artist, score in result or []:
+            print(f'  {artist}: {score:.4f}')
+    if args.user_id is not None:
+        snapshot = load_snapshot(args.dataset_path, args.dataset)
+        history = snapshot.user_history.get(args.user_id, [])
+        result = index.recommend_batch([args.user_id], args.k, [history], args.approximate, args.n_probe)[0]
+        print(f"\nRecommandations pour l'utilisateur {args.user_id}:")
+        for artist, score in result or []:
+            print(f'  {artist}: {score:.4f}')
+    if args.benchmark:
+        report = benchmark(index, args.benchmark, args.k, args.n_probe, args.seed)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Moteur de recommandation résident: charge le graphe une seule fois et répond aux requêtes
+Utilisé par le serveur (server.py) pour éviter de relancer main.py à chaque requête
+"""
+from graph_loader import load_kg, load_kg_array, load_ratings, get_user_history
+from graph_algorithms import ALGORITHMS, run_algorithm
+from graph_csr import build_csr, CSRAdjacency
+from entity_mapping import load_entity_mapping
+from embeddings import embedding_index_path, load_index
+from graph_snapshot import load_snapshot, source_signature
+from neighbor_table import neighbor_table_path, load_neighbor_table
+from ppr import build_transition, personalized_pagerank_batch, top_k, artist_mask
+
+ENGINE_ALGORITHMS = list(ALGORITHMS) + ['ppr', 'embedding']
+SIMILAR_METHODS = ['ppr', 'embedding', 'table']
+
+
+class RecommendationEngine:
+    """
+    Graphe, historiques et structures dérivées gardés en mémoire
+
+    Args:
+        kg: Dictionnaire {head: [(tail, relation, weight), ...]}
+        kg_np: Array (n_triples, 4) des triplets (ignoré si csr est fourni)
+        user_history: {user: [artistes écoutés]}
+        metadata: Métadonnées du dataset (voir graph_loader.load_kg)
+        entity_mapping: EntityMapping pour les noms (optionnel)
+        csr: CSRGraph déjà construit (ex: restauré depuis le snapshot)
+        embedding_index: embeddings.EmbeddingIndex (optionnel, algorithme/méthode 'embedding')
+        neighbor_table: neighbor_table.NeighborTable (optionnel, méthode 'table' de similar_artists_batch)
+    """
+
+    def __init__(self, kg, kg_np, user_history, metadata, entity_mapping=None, alpha=0.15, ppr_tol=1e-6,
+                 csr=None, embedding_index=None, neighbor_table=None):
+        self.kg = kg
+        self.kg_np = kg_np
+        self.user_history = user_history
+        self.metadata = metadata
+        self.entity_mapping = entity_mapping
+        self.alpha = alpha
+        self.ppr_tol = ppr_tol
+        self.embedding_index = embedding_index
+        self.neighbor_table = neighbor_table
+
+        if csr is None:
+            n_nodes = max(metadata.get('n_entity', 0), int(kg_np[:, [0, 2]].max(initial=-1)) + 1)
+            csr = build_csr(kg_np, n_nodes=n_nodes)
+        self.csr = csr
+        self.transition = build_transition(self.csr)
+        self.candidates = artist_mask(csr.n_nodes, metadata.get('n_artists_actual'), self.csr)
+
+    @classmethod
+    def from_dataset(cls, dataset_path, dataset_name='music', use_small=False, use_snapshot=True, **kwargs):
+        """
+        Charger le graphe, les ratings et les correspondances depuis final_data (snapshot par défaut)
+        L'index d'embeddings (embeddings.py --build) et la table des voisins (preprocess.py) sont
+        ouverts en mmap s'ils existent et sont à jour
+        """
+        entity_mapping = load_entity_mapping(dataset_path, dataset_name)
+        if not use_small and 'embedding_index' not in kwargs:
+            kwargs['embedding_index'] = load_index(embedding_index_path(dataset_path, dataset_name),
+                                                   signature=source_signature(dataset_path, dataset_name))
+        if not use_small and 'neighbor_table' not in kwargs:
+            kwargs['neighbor_table'] = load_neighbor_table(neighbor_table_path(dataset_path, dataset_name),
+                                                           signature=source_signature(dataset_path, dataset_name))
+        if use_snapshot:
+            snapshot = load_snapshot(dataset_path, dataset_name, use_small=use_small)
+            return cls(CSRAdjacency(snapshot.csr), None, snapshot.user_history, snapshot.metadata,
+                       entity_mapping, csr=snapshot.csr, **kwargs)
+        _, _, kg, metadata = load_kg(dataset_path, dataset_name, use_small=use_small)
+        kg_np = load_kg_array(dataset_path, dataset_name, use_small=use_small)
+        ratings = load_ratings(dataset_path, dataset_name, use_small=use_small)
+        user_history = dict(get_user_history(ratings))
+        return cls(kg, kg_np, user_history, metadata, entity_mapping, **kwargs)
+
+    def missing_index(self, name):
+        """Message d'erreur si l'algorithme / la méthode demande un index non chargé, sinon None"""
+        if name == 'embedding' and self.embedding_index is None:
+            return "Index d'embeddings absent (python embeddings.py --build)"
+        if name == 'table' and self.neighbor_table is None:
+            return 'Table des voisins absente (relancer preprocess.py avec --neighbor_k > 0)'
+        return None
+
+    def _format(self, recommendations):
+        results = []
+        for node, score in recommendations:
+            item = {'artist': int(node), 'score': float(score)}
+            if self.entity_mapping is not None:
+                item['name'] = self.entity_mapping.entity_label(node)
+            results.append(item)
+        return results
+
+    def recommend_batch(self, user_ids, algorithm='ppr', k=10, max_hops=2):
+        """
+        Recommandations pour plusieurs utilisateurs en un seul appel
+
+        Seuls PPR (un bloc (n_entités, len(user_ids))) et les embeddings sont vectorisés sur le lot.
+        BFS, Dijkstra et Prim sont exécutés utilisateur par utilisateur: leur ordre (découverte, tas,
+        ajout à l'arbre) ne se déduit pas des blocs de batch_algorithms, et dijkstra_batch donne les
+        mêmes distances sans être plus rapide (Bellman-Ford sur tout le bloc).
+
+        Returns:
+            Liste alignée sur user_ids: liste de {'artist', 'score'(, 'name')} ou None si utilisateur inconnu
+        """
+        if algorithm not in ENGINE_ALGORITHMS:
+            raise ValueError(f'Algorithme inconnu: {algorithm}')
+        missing = self.missing_index(algorithm)
+        if missing is not None:
+            raise ValueError(missing)
+        histories = [self.user_history.get(user) for user in user_ids]
+        results = [None] * len(user_ids)
+        known = [i for i, history in enumerate(histories) if history]
+        if not known:
+            return results
+
+        if algorithm == 'ppr':
+            seed_lists = [histories[i] for i in known]
+            scores, _ = personalized_pagerank_batch(self.transition, seed_lists, alpha=self.alpha, tol=self.ppr_tol)
+            for column, i in enumerate(known):
+                results[i] = self._format(top_k(scores[:, column], k, exclude=seed_lists[column],
+                                                candidate_mask=self.candidates))
+        elif algorithm == 'embedding':
+            found = self.embedding_index.recommend_batch([user_ids[i] for i in known], k,
+                                                         exclude=[histories[i] for i in known])
+            for i, recommendations in zip(known, found):
+                results[i] = self._format(recommendations) if recommendations is not None else None
+        else:
+            for i in known:
+                result = run_algorithm(algorithm, self.kg, histories[i], max_hops=max_hops, top_k=k)
+                results[i] = self._format(result['recommendations'])
+        return results
+
+    def recommend(self, user_id, algorithm='ppr', k=10, max_hops=2):
+        """Recommandations pour un seul utilisateur (None si inconnu)"""
+        return self.recommend_batch([user_id], algorithm, k, max_hops)[0]
+
+    def similar_artists_batch(self, artist_ids, k=10, method='ppr'):
+        """
+        Artistes proches de chaque artiste, vectorisé sur le lot
+
+        Args:
+            artist_ids: Artistes de départ
+            k: Nombre de résultats
+            method: 'ppr' (PPR depuis l'artiste seul), 'embedding' (cosinus des embeddings SVD)
+                    ou 'table' (voisins par co-écoute précalculés, au plus neighbor_table.k)
+
+        Returns:
+            Liste alignée sur artist_ids (None si l'artiste est hors du graphe)
+        """
+        missing = self.missing_index(method)
+        if missing is not None:
+            raise ValueError(missing)
+        if method == 'embedding':
+            return [self._format(result) if result is not None else None
+                    for result in self.embedding_index.similar_artists_batch(artist_ids, k)]
+        if method == 'table':
+            return [self._format(result) if result is not None else None
+                    for result in self.neighbor_table.similar_artists_batch(artist_ids, k)]
+        if method != 'ppr':
+            raise ValueError(f'Méthode inconnue: {method}')
+        valid = [i for i, artist in enumerate(artist_ids) if 0 <= artist < self.csr.n_nodes]
+        results = [None] * len(artist_ids)
+        if not valid:
+            return results
+        seed_lists = [[artist_ids[i]] for i in valid]
+        scores, _ = personalized_pagerank_batch(self.transition, seed_lists, alpha=self.alpha, tol=self.ppr_tol)
+        for column, i in enumerate(valid):
+            results[i] = self._format(top_k(scores[:, column], k, exclude=seed_lists[column],
+                                            candidate_mask=self.candidates))
+        return results
+
+    def info(self):
+        """Résumé du graphe chargé"""
+        return {
+            'n_entity': int(self.csr.n_nodes),
+            'n_edges': int(len(self.csr.indices)),
+            'n_users': len(self.user_history),
+            'algorithms': [a for a in ENGINE_ALGORITHMS if a != 'embedding' or self.embedding_index is not None],
+            'type': self.metadata.get('type'),
+        }
@@ -0,0 +1,138 @@
+"""
+Tables de correspondance persistantes entre indices d'entités et IDs Last.fm
+Écrites par preprocess_music dans final_data/{dataset}/mappings/, chargées en mmap
+"""
+import os
+import numpy as np
+
+MAPPING_DIR = 'mappings'
+
+
+def _write_id_table(mapping_dir, prefix, id2index):
+    """
+    Écrire une table {raw_id: index} sous forme de tableaux int32
+
+    - {prefix}_raw_ids.npy: raw_id par index (index -> raw_id en O(1))
+    - {prefix}_sorted_raw_ids.npy / {prefix}_sorted_index.npy: raw_ids triés et leurs index
+      (raw_id -> index en O(log n) par recherche dichotomique)
+    """
+    raw_ids = np.empty(len(id2index), dtype=np.int32)
+    for raw_id, index in id2index.items():
+        raw_ids[index] = raw_id
+    order = np.argsort(raw_ids, kind='stable').astype(np.int32)
+    np.save(os.path.join(mapping_dir, f'{prefix}_raw_ids.npy'), raw_ids)
+    np.save(os.path.join(mapping_dir, f'{prefix}_sorted_raw_ids.npy'), raw_ids[order])
+    np.save(os.path.join(mapping_dir, f'{prefix}_sorted_index.npy'), order)
+
+
+def write_entity_mapping(output_path, artist_id2index, user_id2index, artist_names=None):
+    """
+    Persister les correspondances construites par preprocess_music
+
+    Args:
+        output_path: Dossier de sortie du dataset (ex: final_data/music)
+        artist_id2index: {artist_id Last.fm: index artiste}
+        user_id2index: {user_id Last.fm: index utilisateur}
+        artist_names: {artist_id Last.fm: nom} (optionnel)
+    """
+    mapping_dir = os.path.join(output_path, MAPPING_DIR)
+    os.makedirs(mapping_dir, exist_ok=True)
+
+    _write_id_table(mapping_dir, 'artist', artist_id2index)
+    _write_id_table(mapping_dir, 'user', user_id2index)
+
+    # Table de noms: un seul buffer UTF-8 + offsets (pas de pickle, chargeable en mmap)
+    artist_names = artist_names or {}
+    encoded = [b''] * len(artist_id2index)
+    for raw_id, index in artist_id2index.items():
+        encoded[index] = artist_names.get(raw_id, '').encode('utf-8')
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(name) for name in encoded])
+    np.save(os.path.join(mapping_dir, 'artist_name_offsets.npy'), offsets)
+    np.save(os.path.join(mapping_dir, 'artist_name_data.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+
+class EntityMapping:
+    """
+    Correspondances index <-> IDs Last.fm et noms d'artistes
+
+    Les entités suivent la convention du KG: artistes 0..n_artists-1,
+    utilisateurs n_artists..n_artists+n_users-1.
+    """
+
+    def __init__(self, mapping_dir, mmap_mode='r'):
+        def load(name):
+            return np.load(os.path.join(mapping_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        self.artist_raw_ids = load('artist_raw_ids')
+        self.artist_sorted_raw_ids = load('artist_sorted_raw_ids')
+        self.artist_sorted_index = load('artist_sorted_index')
+        self.user_raw_ids = load('user_raw_ids')
+        self.user_sorted_raw_ids = load('user_sorted_raw_ids')
+        self.user_sorted_index = load('user_sorted_index')
+        self.name_offsets = load('artist_name_offsets')
+        self.name_data = load('artist_name_data')
+
+    @property
+    def n_artists(self):
+        return len(self.artist_raw_ids)
+
+    @property
+    def n_users(self):
+        return len(self.user_raw_ids)
+
+    @staticmethod
+    def _lookup(sorted_raw_ids, sorted_index, raw_ids):
+        raw_ids = np.asarray(raw_ids)
+        pos = np.searchsorted(sorted_raw_ids, raw_ids)
+        pos = np.minimum(pos, len(sorted_raw_ids) - 1)
+        found = sorted_raw_ids[pos] == raw_ids
+        return np.where(found, sorted_index[pos], -1)
+
+    def artist_raw_id(self, artist_index):
+        """Index artiste -> ID Last.fm (scalaire ou array)"""
+        return self.artist_raw_ids[artist_index]
+
+    def artist_index(self, raw_artist_id):
+        """ID Last.fm -> index artiste, -1 si absent (scalaire ou array)"""
+        return self._lookup(self.artist_sorted_raw_ids, self.artist_sorted_index, raw_artist_id)
+
+    def user_raw_id(self, user_index):
+        """Index utilisateur (ratings) -> ID Last.fm"""
+        return self.user_raw_ids[user_index]
+
+    def user_index(self, raw_user_id):
+        """ID Last.fm -> index utilisateur (ratings), -1 si absent"""
+        return self._lookup(self.user_sorted_raw_ids, self.user_sorted_index, raw_user_id)
+
+    def artist_name(self, artist_index):
+        """Nom de l'artiste (chaîne vide si inconnu)"""
+        start, end = self.name_offsets[artist_index], self.name_offsets[artist_index + 1]
+        return bytes(self.name_data[start:end]).decode('utf-8')
+
+    def entity_label(self, entity):
+        """Libellé lisible d'une entité du KG (nom d'artiste ou 'user <id Last.fm>')"""
+        entity = int(entity)
+        if entity < self.n_artists:
+            return self.artist_name(entity) or f'artist {int(self.artist_raw_ids[entity])}'
+        user = entity - self.n_artists
+        if user < self.n_users:
+            return f'user {int(self.user_raw_ids[user])}'
+        return str(entity)
+
+
+def load_entity_mapping(dataset_path, dataset_name='music'):
+    """
+    Charger les correspondances si elles existent
+
+    Args:
+        dataset_path: Chemin vers le dossier final_data
+        dataset_name: Nom du dataset
+
+    Returns:
+        EntityMapping ou None si le preprocessing ne les a pas encore générées
+    """
+    mapping_dir = os.path.join(dataset_path, dataset_name, MAPPING_DIR)
+    if not os.path.exists(os.path.join(mapping_dir, 'artist_raw_ids.npy')):
+        return None
+    return EntityMapping(mapping_dir)
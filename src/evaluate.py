@@ -0,0 +1,382 @@
+"""
+Évaluation hors ligne des recommandations sur les splits eval/test (data_loader.dataset_split)
+AUC, précision/rappel@k, NDCG@k et hit-rate pour BFS, Dijkstra, Prim et PPR
+
+Le graphe d'évaluation ne contient que les écoutes du split train: les arêtes listened_to /
+listened_by des paires eval/test sont retirées et les relations de co-écoute sont recalculées
+avec le seuil min_co_listens demandé (ce qui permet de balayer ce paramètre sans relancer
+preprocess.py).
+
+Usage (depuis src/):
+    python evaluate.py --algorithms bfs dijkstra prim ppr --split test --k 10
+    python evaluate.py --min_co_listens 1 2 3 --max_hops 1 2 3 --output ../eval_results/sweep.json
+"""
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import time
+import numpy as np
+
+from batch_algorithms import incoming_graph, bfs_hops_batch, dijkstra_batch, widest_path_batch
+from co_listen import LISTENED_TO, LISTENED_BY, co_listen_counts, artist_triples
+from data_loader import dataset_split
+from graph_csr import build_csr
+from graph_loader import load_dataset_metadata, load_kg_array, load_ratings
+from ppr import build_transition, personalized_pagerank_batch
+from profiling import span, enable_profiling, write_trace
+from rng_utils import stage_rng, STAGE_SPLIT
+
+ALGORITHMS = ['bfs', 'dijkstra', 'prim', 'ppr']
+METRICS = ['auc', 'precision', 'recall', 'ndcg', 'hit_rate']
+
+# Split et graphe d'évaluation (sans les paires eval/test)
+EvalData = collections.namedtuple('EvalData', ['train', 'eval', 'test', 'user_history', 'listens',
+                                               'n_artists', 'n_nodes'])
+EvalGraph = collections.namedtuple('EvalGraph', ['csr', 'incoming', 'targets', 'transition',
+                                                 'n_artists', 'min_co_listens'])
+
+
+def default_min_co_listens(metadata):
+    """Même seuil par défaut que preprocess.preprocess_music"""
+    if metadata and metadata.get('filtered') and metadata.get('n_users_actual', 50) < 50:
+        return 1
+    return 2
+
+
+def prepare_evaluation(dataset_path, dataset_name='music', seed=0):
+    """
+    Charger ratings et KG, découper les ratings et retirer les paires eval/test du graphe
+
+    Args:
+        dataset_path: Chemin vers final_data
+        dataset_name: Nom du dataset
+        seed: Graine racine (même flux STAGE_SPLIT que data_loader.load_data)
+
+    Returns:
+        EvalData
+    """
+    metadata = load_dataset_metadata(dataset_path, dataset_name) or {}
+    rating_np = load_ratings(dataset_path, dataset_name)
+    kg_np = load_kg_array(dataset_path, dataset_name)
+    n_artists = metadata.get('n_artists_actual', int(rating_np[:, 1].max()) + 1)
+    n_nodes = int(kg_np[:, [0, 2]].max()) + 1
+
+    with span('evaluate.split', ratings=len(rating_np)) as counts:
+        train, eval_data, test, user_history = dataset_split(rating_np, stage_rng(seed, STAGE_SPLIT))
+        counts['users'] = len(user_history)
+
+    # Écoutes (user_entity, artist, weight) hors paires eval/test
+    listens = kg_np[kg_np[:, 1] == LISTENED_TO][:, [0, 2, 3]].astype(np.int64)
+    held_out = np.concatenate([eval_data, test])
+    held_out_keys = (held_out[:, 0].astype(np.int64) + n_artists) * n_nodes + held_out[:, 1]
+    listens = listens[~np.isin(listens[:, 0] * n_nodes + listens[:, 1], held_out_keys)]
+
+    return EvalData(train=train, eval=eval_data, test=test, user_history=user_history, listens=listens,
+                    n_artists=n_artists, n_nodes=n_nodes)
+
+
+def build_eval_graph(data, min_co_listens=2, with_transition=True):
+    """
+    Graphe d'évaluation: écoutes train (relations 0/1) et co-écoutes recalculées (relations 2/3)
+
+    Args:
+        data: EvalData
+        min_co_listens: Seuil de co-écoutes des relations artiste-artiste
+        with_transition: Construire aussi la matrice de transition PPR
+
+    Returns:
+        EvalGraph
+    """
+    with span('evaluate.build_graph', min_co_listens=min_co_listens) as counts:
+        users, artists, weights = data.listens[:, 0], data.listens[:, 1], data.listens[:, 2]
+        artist1, artist2, co_counts = co_listen_counts(users, artists, data.n_artists, min_co_listens)
+        kg_np = np.concatenate([
+            np.column_stack([users, np.full(len(users), LISTENED_TO), artists, weights]),
+            np.column_stack([artists, np.full(len(users), LISTENED_BY), users, weights]),
+            artist_triples(artist1, artist2, co_counts),
+        ]).astype(np.int32)
+        csr = build_csr(kg_np, n_nodes=data.n_nodes)
+        incoming, targets = incoming_graph(csr)
+        transition = build_transition(csr) if with_transition else None
+        counts['artist_pairs'] = len(artist1)
+        counts['edges'] = len(csr.indices)
+
+    return EvalGraph(csr=csr, incoming=incoming, targets=targets, transition=transition,
+                     n_artists=data.n_artists, min_co_listens=min_co_listens)
+
+
+def score_batch(graph, algorithm, seed_lists, max_hops=2, alpha=0.15, ppr_tol=1e-6):
+    """
+    Scores (plus grand = mieux) de chaque nœud pour un lot d'utilisateurs, -inf si non atteint
+
+    bfs: max_hops + 1 - hop; dijkstra: -distance; prim: capacité du chemin le plus large
+    (arbre couvrant maximal); ppr: score PageRank personnalisé
+
+    Returns:
+        Array float64 (n_nodes, len(seed_lists))
+    """
+    if algorithm == 'bfs':
+        hops = bfs_hops_batch(graph.incoming, graph.targets, seed_lists, max_hops=max_hops)
+        return np.where(hops >= 0, max_hops + 1.0 - hops, -np.inf)
+    if algorithm == 'dijkstra':
+        distances, _ = dijkstra_batch(graph.incoming, graph.targets, seed_lists)
+        return -distances
+    if algorithm == 'prim':
+        capacities, _ = widest_path_batch(graph.incoming, graph.targets, seed_lists)
+        return np.where(capacities > 0, capacities, -np.inf)
+    if algorithm == 'ppr':
+        scores, _ = personalized_pagerank_batch(graph.transition, seed_lists, alpha=alpha, tol=ppr_tol)
+        scores = scores.astype(np.float64)
+        return np.where(scores > 0, scores, -np.inf)
+    raise ValueError(f'Algorithme inconnu: {algorithm}')
+
+
+def auc_score(labels, scores):
+    """
+    AUC par les rangs (statistique de Mann-Whitney), ex-aequo comptés pour moitié
+
+    Returns:
+        float ou nan si une seule classe est présente
+    """
+    labels = np.asarray(labels).astype(bool)
+    n_pos = int(labels.sum())
+    n_neg = len(labels) - n_pos
+    if n_pos == 0 or n_neg == 0:
+        return float('nan')
+    _, inverse, counts = np.unique(scores, return_inverse=True, return_counts=True)
+    average_rank = np.cumsum(counts) - (counts - 1) / 2.0
+    rank_sum = average_rank[inverse][labels].sum()
+    return float((rank_sum - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg))
+
+
+def top_k_batch(scores, k, exclude_columns, exclude_items):
+    """
+    Top-k de chaque colonne (argpartition puis tri des k meilleurs)
+
+    Args:
+        scores: Array (n_candidats, batch), modifié en place
+        k: Nombre de recommandations
+        exclude_columns, exclude_items: Paires (colonne, item) à exclure (historique train)
+
+    Returns:
+        tuple: (items (k, batch), scores (k, batch))
+    """
+    scores[exclude_items, exclude_columns] = -np.inf
+    k = min(k, scores.shape[0])
+    best = np.argpartition(-scores, k - 1, axis=0)[:k]
+    best_scores = np.take_along_axis(scores, best, axis=0)
+    order = np.argsort(-best_scores, axis=0, kind='stable')
+    return np.take_along_axis(best, order, axis=0), np.take_along_axis(best_scores, order, axis=0)
+
+
+def ranking_metrics(top_items, top_scores, users, relevant_keys, n_relevant, n_artists):
+    """
+    Précision, rappel, NDCG et hit-rate @k d'un lot
+
+    Les hits sont trouvés par recherche dans les clés triées user * n_artists + item des
+    items pertinents; un item non atteint (score -inf) ne compte jamais comme hit.
+
+    Returns:
+        dict: {métrique: array (batch,)}
+    """
+    k = top_items.shape[0]
+    queries = users[None, :].astype(np.int64) * n_artists + top_items
+    positions = np.minimum(np.searchsorted(relevant_keys, queries), len(relevant_keys) - 1)
+    hits = (relevant_keys[positions] == queries) & np.isfinite(top_scores)
+
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant, k) - 1]
+    n_hits = hits.sum(axis=0)
+    return {
+        'precision': n_hits / k,
+        'recall': n_hits / n_relevant,
+        'ndcg': (hits * discounts[:, None]).sum(axis=0) / ideal,
+        'hit_rate': (n_hits > 0).astype(np.float64),
+    }
+
+
+# Contexte partagé par les workers (hérité au fork ou transmis une fois par l'initializer)
+_CONTEXT = {}
+
+
+def _init_worker(context):
+    _CONTEXT.update(context)
+
+
+def _evaluate_shard(users):
+    """Scores des lignes du split et métriques de rang pour un shard d'utilisateurs"""
+    ctx = _CONTEXT
+    graph, split, params = ctx['graph'], ctx['split'], ctx['params']
+    n_artists = graph.n_artists
+    row_scores = np.empty(0)
+    row_index = np.empty(0, dtype=np.int64)
+    metrics = {name: [] for name in METRICS[1:]}
+
+    for start in range(0, len(users), params['batch_size']):
+        batch = users[start:start + params['batch_size']]
+        seed_lists = [ctx['user_history'][user] for user in batch]
+        scores = score_batch(graph, params['algorithm'], seed_lists, max_hops=params['max_hops'],
+                             alpha=params['alpha'], ppr_tol=params['ppr_tol'])[:n_artists]
+
+        # Lignes (user, item, label) du split pour l'AUC
+        columns = np.searchsorted(batch, split[:, 0])
+        in_batch = np.flatnonzero((columns < len(batch)) & (batch[np.minimum(columns, len(batch) - 1)] == split[:, 0]))
+        row_index = np.concatenate([row_index, in_batch])
+        row_scores = np.concatenate([row_scores, scores[split[in_batch, 1], columns[in_batch]]])
+
+        # Top-k hors historique train, seulement pour les utilisateurs ayant des items pertinents
+        n_relevant = ctx['n_relevant'][batch]
+        evaluated = n_relevant > 0
+        if not evaluated.any():
+            continue
+        history_columns = np.repeat(np.arange(len(batch)), [len(seeds) for seeds in seed_lists])
+        history_items = np.concatenate(seed_lists).astype(np.int64)
+        top_items, top_scores = top_k_batch(scores, params['k'], history_columns, history_items)
+        batch_metrics = ranking_metrics(top_items[:, evaluated], top_scores[:, evaluated], batch[evaluated],
+                                        ctx['relevant_keys'], n_relevant[evaluated], n_artists)
+        for name, values in batch_metrics.items():
+            metrics[name].append(values)
+
+    return row_index, row_scores, {name: np.concatenate(values) if values else np.empty(0)
+                                   for name, values in metrics.items()}
+
+
+def evaluate(data, graph, algorithm, split='test', k=10, max_hops=2, alpha=0.15, ppr_tol=1e-6,
+             batch_size=8, workers=1, max_users=None, seed=0):
+    """
+    Évaluer un algorithme sur tous les utilisateurs du split
+
+    Args:
+        data: EvalData (voir prepare_evaluation)
+        graph: EvalGraph (voir build_eval_graph)
+        algorithm: 'bfs', 'dijkstra', 'prim' ou 'ppr'
+        split: 'eval' ou 'test'
+        k: Taille des listes de recommandations
+        max_hops: Nombre maximum de hops (BFS)
+        alpha, ppr_tol: Paramètres PPR
+        batch_size: Utilisateurs par bloc vectorisé (mémoire ~ n_arêtes * batch_size * 8 octets;
+                    les petits blocs restent en cache)
+        workers: Processus traitant les shards d'utilisateurs en parallèle
+        max_users: Évaluer un échantillon d'utilisateurs (None = tous)
+        seed: Graine de l'échantillon d'utilisateurs
+
+    Returns:
+        dict: {'auc', 'precision', 'recall', 'ndcg', 'hit_rate', 'n_users', 'n_rows', 'seconds'}
+    """
+    split_np = data.test if split == 'test' else data.eval
+    users = np.unique(split_np[:, 0])
+    if max_users is not None and max_users < len(users):
+        users = np.sort(np.random.default_rng(seed).choice(users, size=max_users, replace=False))
+        split_np = split_np[np.isin(split_np[:, 0], users)]
+
+    # Items pertinents: positifs du split, clés user * n_artists + item triées
+    positives = split_np[split_np[:, 2] == 1]
+    relevant_keys = np.unique(positives[:, 0].astype(np.int64) * data.n_artists + positives[:, 1])
+    n_relevant = np.bincount(positives[:, 0], minlength=int(split_np[:, 0].max(initial=0)) + 1)
+
+    context = {
+        'graph': graph,
+        'split': split_np,
+        'user_history': data.user_history,
+        'relevant_keys': relevant_keys,
+        'n_relevant': n_relevant,
+        'params': {'algorithm': algorithm, 'k': k, 'max_hops': max_hops, 'alpha': alpha,
+                   'ppr_tol': ppr_tol, 'batch_size': batch_size},
+    }
+    shards = np.array_split(users, max(1, min(workers * 4, len(users)))) if workers > 1 else [users]
+
+    start = time.perf_counter()
+    with span(f'evaluate.{algorithm}', users=len(users)) as counts:
+        if workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                        initargs=(context,)) as executor:
+                results = list(executor.map(_evaluate_shard, shards))
+        else:
+            _init_worker(context)
+            results = [_evaluate_shard(users)]
+        counts['rows'] = len(split_np)
+    seconds = time.perf_counter() - start
+
+    row_index = np.concatenate([result[0] for result in results])
+    row_scores = np.concatenate([result[1] for result in results])
+    report = {'auc': auc_score(split_np[row_index, 2], row_scores)}
+    for name in METRICS[1:]:
+        values = np.concatenate([result[2][name] for result in results])
+        report[name] = float(values.mean()) if len(values) else float('nan')
+    report.update({'n_users': int(len(users)), 'n_rows': int(len(split_np)), 'seconds': round(seconds, 3)})
+    return report
+
+
+def sweep(data, algorithms, min_co_listens_values, max_hops_values, split='test', k=10, **kwargs):
+    """
+    Évaluer chaque algorithme pour chaque seuil min_co_listens (et chaque max_hops pour BFS)
+
+    Returns:
+        Liste de dicts {'algorithm', 'min_co_listens', 'max_hops', métriques...}
+    """
+    results = []
+    for min_co_listens in min_co_listens_values:
+        graph = build_eval_graph(data, min_co_listens, with_transition='ppr' in algorithms)
+        for algorithm in algorithms:
+            for max_hops in (max_hops_values if algorithm == 'bfs' else [None]):
+                report = evaluate(data, graph, algorithm, split=split, k=k,
+                                  max_hops=max_hops or 2, **kwargs)
+                results.append({'algorithm': algorithm, 'min_co_listens': min_co_listens,
+                                'max_hops': max_hops, **report})
+                print_row(results[-1], k)
+    return results
+
+
+def print_row(row, k):
+    hops = row['max_hops'] if row['max_hops'] is not None else '-'
+    print(f"{row['algorithm']:<9} {row['min_co_listens']:>5} {hops:>5} {row['auc']:>7.4f} "
+          f"{row['precision']:>7.4f} {row['recall']:>7.4f} {row['ndcg']:>7.4f} {row['hit_rate']:>7.4f} "
+          f"{row['seconds']:>8.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Évaluation hors ligne des recommandations')
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--algorithms', nargs='+', default=ALGORITHMS, choices=ALGORITHMS)
+    parser.add_argument('--split', type=str, default='test', choices=['eval', 'test'])
+    parser.add_argument('--k', type=int, default=10, help='Taille des listes (précision/rappel/NDCG@k)')
+    parser.add_argument('--min_co_listens', type=int, nargs='+', default=None,
+                        help='Seuils de co-écoute à balayer (défaut: celui de preprocess.py)')
+    parser.add_argument('--max_hops', type=int, nargs='+', default=[2], help='Valeurs de max_hops (BFS)')
+    parser.add_argument('--alpha', type=float, default=0.15, help='Probabilité de redémarrage PPR')
+    parser.add_argument('--ppr_tol', type=float, default=1e-6, help='Tolérance PPR')
+    parser.add_argument('--batch_size', type=int, default=8, help='Utilisateurs par bloc vectorisé')
+    parser.add_argument('--workers', type=int, default=1, help='Processus pour les shards d\'utilisateurs')
+    parser.add_argument('--max_users', type=int, default=None, help='Échantillon d\'utilisateurs à évaluer')
+    parser.add_argument('--seed', type=int, default=0, help='Graine du split (et de l\'échantillon)')
+    parser.add_argument('--output', type=str, default=None, help='Écrire les résultats en JSON')
+    parser.add_argument('--profile', type=str, default=None, help='Écrire une trace JSON des étapes')
+    args = parser.parse_args()
+
+    if args.profile:
+        enable_profiling(command='evaluate')
+
+    data = prepare_evaluation(args.dataset_path, args.dataset, seed=args.seed)
+    min_co_listens_values = args.min_co_listens or [
+        default_min_co_listens(load_dataset_metadata(args.dataset_path, args.dataset))]
+
+    print(f'\n=== Évaluation ({args.split}, k={args.k}) ===')
+    print(f"{'algo':<9} {'min_co':>5} {'hops':>5} {'AUC':>7} {'P@k':>7} {'R@k':>7} {'NDCG@k':>7} {'HR@k':>7} {'temps':>9}")
+    results = sweep(data, args.algorithms, min_co_listens_values, args.max_hops, split=args.split, k=args.k,
+                    alpha=args.alpha, ppr_tol=args.ppr_tol, batch_size=args.batch_size,
+                    workers=args.workers, max_users=args.max_users, seed=args.seed)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'split': args.split, 'k': args.k, 'seed': args.seed, 'results': results}, f, indent=2)
+        print(f'Résultats écrits dans {args.output}')
+    if args.profile:
+        write_trace(args.profile)
+
+
+if __name__ == '__main__':
+    main()
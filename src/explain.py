@@ -0,0 +1,123 @@
+"""
+Explications des recommandations: chemin depuis un artiste écouté jusqu'à l'artiste recommandé
+
+Avec record_paths=True, bfs_recommend, dijkstra_recommend et prim_recommend ajoutent à leur résultat
+'predecessors': pour chaque nœud atteint, le nœud d'où il a été atteint, la relation et le poids de
+l'arête (tableaux denses indexés par nœud, -1 = pas de prédécesseur). explain_paths remonte ces
+tableaux pour un lot d'artistes, en O(longueur du chemin) par artiste, sans relancer de parcours:
+    écouté Moby → similar_to Dido → similar_from Portishead
+
+Prédécesseur retenu: BFS, l'arête qui a découvert le nœud; Dijkstra, parmi les arêtes d'un plus
+court chemin, celle de plus petit nœud source; Prim, l'arête de l'arbre. Il est le même pour le
+dictionnaire et pour les deux backends de graph_kernels.
+"""
+import collections
+import numpy as np
+
+RELATION_NAMES = {0: 'listened_to', 1: 'listened_by', 2: 'similar_to', 3: 'similar_from'}
+
+# parent, relation, weight: arrays indexés par nœud (parent -1 = pas de prédécesseur)
+# sources: nœuds de départ triés (artistes écoutés)
+Predecessors = collections.namedtuple('Predecessors', ['parent', 'relation', 'weight', 'sources'])
+
+
+def predecessors_from_edges(csr, heads, edges, nodes, sources):
+    """
+    Prédécesseurs depuis les arêtes du CSR qui ont atteint chaque nœud
+
+    Args:
+        csr: CSRGraph parcouru
+        heads: Head de chaque arête (graph_csr.csr_heads)
+        edges: Arête prédécesseur de chaque nœud de nodes
+        nodes: Nœuds atteints (hors sources)
+        sources: Nœuds de départ
+
+    Returns:
+        Predecessors de longueur csr.n_nodes
+    """
+    parent = np.full(csr.n_nodes, -1, dtype=np.int64)
+    relation = np.full(csr.n_nodes, -1, dtype=np.int8)
+    weight = np.zeros(csr.n_nodes, dtype=csr.weights.dtype)
+    parent[nodes] = heads[edges]
+    relation[nodes] = csr.relations[edges]
+    weight[nodes] = csr.weights[edges]
+    return Predecessors(parent, relation, weight, np.unique(np.asarray(list(sources), dtype=np.int64)))
+
+
+def predecessors_from_dict(steps, sources):
+    """
+    Prédécesseurs depuis un dictionnaire {node: (parent, relation, weight)} (graphe dictionnaire)
+
+    Returns:
+        Predecessors de longueur max(nœud) + 1
+    """
+    sources = np.unique(np.asarray(list(sources), dtype=np.int64))
+    size = max([int(sources.max(initial=-1))] + [max(node, parent) for node, (parent, _, _) in steps.items()]) + 1
+    parent = np.full(size, -1, dtype=np.int64)
+    relation = np.full(size, -1, dtype=np.int8)
+    weight = np.zeros(size, dtype=np.float64 if any(isinstance(w, float) for _, _, w in steps.values())
+                      else np.int64)
+    if steps:
+        nodes = np.fromiter(steps, dtype=np.int64, count=len(steps))
+        values = list(steps.values())
+        parent[nodes] = [value[0] for value in values]
+        relation[nodes] = [value[1] for value in values]
+        weight[nodes] = [value[2] for value in values]
+    return Predecessors(parent, relation, weight, sources)
+
+
+def path_to(predecessors, node):
+    """
+    Chemin d'une source jusqu'à node
+
+    Returns:
+        list: [(nœud, relation, poids)], la source en premier avec relation et poids None;
+              None si node n'a pas été atteint
+    """
+    parent = predecessors.parent
+    node = int(node)
+    if not 0 <= node < len(parent):
+        return None
+    steps = []
+    # Un chemin ne passe qu'une fois par chaque nœud: la borne protège d'un tableau incohérent
+    for _ in range(len(parent)):
+        previous = int(parent[node])
+        if previous < 0:
+            break
+        steps.append((node, RELATION_NAMES.get(int(predecessors.relation[node]), int(predecessors.relation[node])),
+                      predecessors.weight[node].item()))
+        node = previous
+    position = np.searchsorted(predecessors.sources, node)
+    if position >= len(predecessors.sources) or predecessors.sources[position] != node:
+        return None
+    steps.append((node, None, None))
+    return steps[::-1]
+
+
+def explain_paths(predecessors, items, entity_mapping=None):
+    """
+    Explications d'un lot d'artistes recommandés
+
+    Args:
+        predecessors: result['predecessors'] d'un algorithme lancé avec record_paths=True
+        items: Artistes à expliquer (ex: [artist for artist, _ in result['recommendations']])
+        entity_mapping: EntityMapping pour les noms d'artistes (artists.dat), sinon les index
+
+    Returns:
+        Liste alignée sur items: None si l'artiste n'a pas été atteint, sinon
+        {'artist', 'source', 'path': [nœuds], 'relations': [...], 'weights': [...], 'labels': [...], 'text'}
+    """
+    explanations = []
+    for item in items:
+        steps = path_to(predecessors, item)
+        if steps is None:
+            explanations.append(None)
+            continue
+        path = [node for node, _, _ in steps]
+        labels = [entity_mapping.entity_label(node) if entity_mapping else str(node) for node in path]
+        relations = [relation for _, relation, _ in steps[1:]]
+        text = ' → '.join([f'écouté {labels[0]}'] + [f'{relation} {label}'
+                                                     for relation, label in zip(relations, labels[1:])])
+        explanations.append({'artist': int(item), 'source': path[0], 'path': path, 'relations': relations,
+                             'weights': [weight for _, _, weight in steps[1:]], 'labels': labels, 'text': text})
+    return explanations
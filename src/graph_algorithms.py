@@ -0,0 +1,273 @@
+"""
+Algorithmes graph classiques pour la recommandation d'artistes
+BFS, Dijkstra et Prim sur le graphe {head: [(tail, relation, weight), ...]}
+Sur un CSRAdjacency, les parcours passent par les noyaux de graph_kernels (NumPy ou Numba),
+avec des résultats identiques à ceux des boucles Python sur le dictionnaire
+Avec record_paths=True, le résultat contient aussi les prédécesseurs de chaque nœud atteint
+(voir explain.py)
+"""
+import collections
+import heapq
+import numpy as np
+
+from explain import predecessors_from_dict, predecessors_from_edges
+from graph_csr import CSRAdjacency, csr_heads
+from graph_kernels import get_backend
+
+# Relations artiste -> artiste (similar_to, similar_from)
+ARTIST_RELATIONS = (2, 3)
+
+
+def _artist_neighbors(kg, node, relations=ARTIST_RELATIONS):
+    """Itérer sur les voisins (tail, relation, weight) d'un nœud pour les relations données"""
+    for tail_info in kg.get(node, ()):
+        if len(tail_info) == 3:
+            tail, relation, weight = tail_info
+        else:
+            tail, relation = tail_info
+            weight = 1
+        if relation in relations:
+            yield tail, relation, weight
+
+
+def _relation_mask(kg, relations):
+    relations = tuple(sorted(relations))
+    return kg.edge_array(('relations', relations), lambda csr: np.isin(csr.relations, relations))
+
+
+def _edge_lengths(kg, relations):
+    # Longueur 1 / poids des arêtes suivies, inf pour les autres (ignorées par shortest_paths)
+    mask = _relation_mask(kg, relations)
+
+    def compute(csr):
+        usable = mask & (csr.weights > 0)
+        return np.where(usable, 1.0 / np.where(usable, csr.weights, 1), np.inf)
+    return kg.edge_array(('lengths', tuple(sorted(relations))), compute)
+
+
+def _kernel_seeds(kg, start_nodes):
+    """Artistes de départ sans doublons (ordre conservé) et leur sous-ensemble présent dans le CSR"""
+    sources = list(dict.fromkeys(start_nodes))
+    seeds = np.array(sources, dtype=np.int64)
+    return sources, seeds[(seeds >= 0) & (seeds < kg.csr.n_nodes)]
+
+
+def bfs_recommend(kg, start_nodes, max_hops=2, relations=ARTIST_RELATIONS, backend=None, record_paths=False):
+    """
+    Parcours en largeur depuis les artistes écoutés
+
+    Args:
+        kg: Dictionnaire {head: [(tail, relation, weight), ...]} ou CSRAdjacency
+        start_nodes: Artistes écoutés par l'utilisateur (niveau 0)
+        max_hops: Nombre maximum de hops
+        relations: Relations suivies pendant le parcours
+        backend: Backend de graph_kernels pour un CSRAdjacency (défaut: 'auto'; ignoré pour un dictionnaire)
+        record_paths: Ajouter 'predecessors' (arête qui a découvert chaque nœud, voir explain.py)
+
+    Returns:
+        dict: {'levels': {hop: [artistes]}, 'recommendations': [(artiste, hop)], 'n_visited': int}
+    """
+    if isinstance(kg, CSRAdjacency):
+        sources, seeds = _kernel_seeds(kg, start_nodes)
+        nodes, hops, edges = get_backend(backend).bfs_hops(kg.csr.indptr, kg.csr.indices,
+                                                           _relation_mask(kg, relations), seeds, max_hops)
+        recommendations = list(zip(nodes.tolist(), hops.tolist()))
+        levels = {}
+        for node, hop in recommendations:
+            levels.setdefault(hop, []).append(node)
+        result = {'levels': levels, 'recommendations': recommendations, 'n_visited': len(sources) + len(nodes)}
+        if record_paths:
+            result['predecessors'] = predecessors_from_edges(kg.csr, kg.edge_array('heads', csr_heads), edges,
+                                                             nodes, sources)
+        return result
+
+    visited = set(start_nodes)
+    frontier = list(dict.fromkeys(start_nodes))
+    levels = {}
+    steps = {}
+
+    for hop in range(1, max_hops + 1):
+        next_frontier = []
+        for node in frontier:
+            for tail, relation, weight in _artist_neighbors(kg, node, relations):
+                if tail not in visited:
+                    visited.add(tail)
+                    next_frontier.append(tail)
+                    steps[tail] = (node, relation, weight)
+        if not next_frontier:
+            break
+        levels[hop] = next_frontier
+        frontier = next_frontier
+
+    recommendations = [(node, hop) for hop, nodes in levels.items() for node in nodes]
+    result = {'levels': levels, 'recommendations': recommendations, 'n_visited': len(visited)}
+    if record_paths:
+        result['predecessors'] = predecessors_from_dict(steps, start_nodes)
+    return result
+
+
+def dijkstra_recommend(kg, start_nodes, relations=ARTIST_RELATIONS, top_k=None, backend=None, record_paths=False):
+    """
+    Plus courts chemins depuis les artistes écoutés (distance = 1 / poids)
+
+    Args:
+        kg: Dictionnaire {head: [(tail, relation, weight), ...]} ou CSRAdjacency
+        start_nodes: Artistes écoutés par l'utilisateur (distance 0)
+        relations: Relations suivies
+        top_k: Nombre maximum de recommandations (None = toutes)
+        backend: Backend de graph_kernels pour un CSRAdjacency (défaut: 'auto'; ignoré pour un dictionnaire)
+        record_paths: Ajouter 'predecessors' (une arête d'un plus court chemin par nœud, voir explain.py)
+
+    Returns:
+        dict: {'distances': {artiste: distance}, 'recommendations': [(artiste, distance)], 'n_visited': int}
+    """
+    if isinstance(kg, CSRAdjacency):
+        sources, seeds = _kernel_seeds(kg, start_nodes)
+        lengths = _edge_lengths(kg, relations)
+        all_distances, pred_edges = get_backend(backend).shortest_paths(kg.csr.indptr, kg.csr.indices, lengths,
+                                                                        seeds)
+        reached = np.flatnonzero(np.isfinite(all_distances))
+        # Même ordre que les sorties du tas: (distance, artiste)
+        reached = reached[np.argsort(all_distances[reached], kind='stable')]
+        distances = dict(zip(reached.tolist(), all_distances[reached].tolist()))
+        outside = set(sources).difference(seeds.tolist())
+        if outside:
+            # Sources absentes du CSR: distance 0, comme dans le dictionnaire
+            distances = dict(sorted({**dict.fromkeys(outside, 0.0), **distances}.items(), key=lambda x: (x[1], x[0])))
+        source_set = set(sources)
+        recommendations = [(node, dist) for node, dist in distances.items() if node not in source_set]
+        if top_k is not None:
+            recommendations = recommendations[:top_k]
+        result = {'distances': distances, 'recommendations': recommendations, 'n_visited': len(distances)}
+        if record_paths:
+            nodes = np.flatnonzero(pred_edges >= 0)
+            result['predecessors'] = predecessors_from_edges(kg.csr, kg.edge_array('heads', csr_heads),
+                                                             pred_edges[nodes], nodes, sources)
+        return result
+
+    distances = {}
+    best = dict.fromkeys(start_nodes, 0.0)
+    heap = [(0.0, node) for node in best]
+    heapq.heapify(heap)
+    sources = set(start_nodes)
+    # Prédécesseur noté à la relaxation: amélioration stricte, ou égalité depuis une plus petite head
+    steps = {}
+
+    while heap:
+        dist, node = heapq.heappop(heap)
+        if node in distances:
+            continue
+        distances[node] = dist
+        for tail, relation, weight in _artist_neighbors(kg, node, relations):
+            if tail in distances or weight <= 0:
+                continue
+            candidate = dist + 1.0 / weight
+            if candidate < best.get(tail, np.inf):
+                best[tail] = candidate
+                heapq.heappush(heap, (candidate, tail))
+                if record_paths:
+                    steps[tail] = (node, relation, weight)
+            elif record_paths and candidate == best[tail] and node < steps[tail][0]:
+                steps[tail] = (node, relation, weight)
+
+    recommendations = sorted(((node, dist) for node, dist in distances.items() if node not in sources),
+                             key=lambda x: x[1])
+    if top_k is not None:
+        recommendations = recommendations[:top_k]
+    result = {'distances': distances, 'recommendations': recommendations, 'n_visited': len(distances)}
+    if record_paths:
+        result['predecessors'] = predecessors_from_dict(steps, start_nodes)
+    return result
+
+
+def prim_recommend(kg, start_nodes, relations=ARTIST_RELATIONS, top_k=None, backend=None, record_paths=False):
+    """
+    Arbre couvrant de poids maximum (Prim) grandi depuis les artistes écoutés
+
+    Les artistes sont recommandés dans l'ordre où Prim les ajoute à l'arbre:
+    la connexion la plus forte vers l'arbre courant d'abord.
+
+    Args:
+        kg: Dictionnaire {head: [(tail, relation, weight), ...]} ou CSRAdjacency
+        start_nodes: Artistes écoutés par l'utilisateur (racines de l'arbre)
+        relations: Relations suivies
+        top_k: Nombre maximum de recommandations (None = toutes)
+        backend: Backend de graph_kernels pour un CSRAdjacency (défaut: 'auto'; ignoré pour un dictionnaire)
+        record_paths: Ajouter 'predecessors' (arêtes de l'arbre, voir explain.py)
+
+    Returns:
+        dict: {'mst_edges': [(parent, artiste, poids)], 'recommendations': [(artiste, poids)], 'n_visited': int}
+    """
+    if isinstance(kg, CSRAdjacency):
+        sources, seeds = _kernel_seeds(kg, start_nodes)
+        csr = kg.csr
+        edges = get_backend(backend).prim_order(csr.indptr, csr.indices, csr.weights, _relation_mask(kg, relations),
+                                                seeds, -1 if top_k is None else top_k)
+        heads = kg.edge_array('heads', csr_heads)
+        mst_edges = list(zip(heads[edges].tolist(), csr.indices[edges].tolist(), csr.weights[edges].tolist()))
+        recommendations = [(node, weight) for _, node, weight in mst_edges]
+        result = {'mst_edges': mst_edges, 'recommendations': recommendations, 'n_visited': len(sources) + len(edges)}
+        if record_paths:
+            result['predecessors'] = predecessors_from_edges(csr, heads, edges, csr.indices[edges], sources)
+        return result
+
+    in_tree = set(start_nodes)
+    heap = []
+    for node in in_tree:
+        for tail, relation, weight in _artist_neighbors(kg, node, relations):
+            if tail not in in_tree:
+                heapq.heappush(heap, (-weight, node, tail, relation))
+
+    mst_edges = []
+    steps = {}
+    while heap:
+        neg_weight, parent, node, relation = heapq.heappop(heap)
+        if node in in_tree:
+            continue
+        in_tree.add(node)
+        mst_edges.append((parent, node, -neg_weight))
+        steps[node] = (parent, relation, -neg_weight)
+        if top_k is not None and len(mst_edges) >= top_k:
+            break
+        for tail, relation, weight in _artist_neighbors(kg, node, relations):
+            if tail not in in_tree:
+                heapq.heappush(heap, (-weight, node, tail, relation))
+
+    recommendations = [(node, weight) for _, node, weight in mst_edges]
+    result = {'mst_edges': mst_edges, 'recommendations': recommendations, 'n_visited': len(in_tree)}
+    if record_paths:
+        result['predecessors'] = predecessors_from_dict(steps, start_nodes)
+    return result
+
+
+ALGORITHMS = collections.OrderedDict([
+    ('bfs', bfs_recommend),
+    ('dijkstra', dijkstra_recommend),
+    ('prim', prim_recommend),
+])
+
+
+def run_algorithm(name, kg, start_nodes, max_hops=2, top_k=None, backend=None, record_paths=False):
+    """
+    Exécuter un algorithme par son nom
+
+    Args:
+        name: 'bfs', 'dijkstra' ou 'prim'
+        kg: Dictionnaire du graphe ou CSRAdjacency
+        start_nodes: Artistes écoutés par l'utilisateur
+        max_hops: Nombre maximum de hops (BFS uniquement)
+        top_k: Nombre maximum de recommandations
+        backend: Backend de graph_kernels ('auto', 'numpy', 'numba') pour un CSRAdjacency
+        record_paths: Ajouter 'predecessors' au résultat (explications, voir explain.explain_paths)
+
+    Returns:
+        dict: Résultat de l'algorithme (voir chaque fonction)
+    """
+    if name not in ALGORITHMS:
+        raise ValueError(f'Algorithme inconnu: {name}')
+    if name == 'bfs':
+        result = bfs_recommend(kg, start_nodes, max_hops=max_hops, backend=backend, record_paths=record_paths)
+        if top_k is not None:
+            result['recommendations'] = result['recommendations'][:top_k]
+        return result
+    return ALGORITHMS[name](kg, start_nodes, top_k=top_k, backend=backend, record_paths=record_paths)
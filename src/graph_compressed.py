@@ -0,0 +1,256 @@
+"""
+Représentation compressée du CSR du graphe de connaissances
+
+Par arête, au lieu de 16 octets (triplet int32 [head, relation, tail, weight]) ou 9 octets (CSR):
+    - voisins triés par ligne, premier voisin à part (int32 par nœud), puis écarts entre voisins
+      successifs en largeur fixe par ligne: 1, 2 ou 4 octets selon le plus grand écart de la ligne
+    - relation: tag de 2 bits (4 relations par octet), ou 4 / 8 bits s'il y a plus de relations
+    - poids: uint16, exact en dessous de 32768, sinon compartiment logarithmique (pas relatif de
+      2^(1/2048), ~0,03 %) avec une table annexe (position de l'arête, poids exact)
+
+Le décodage d'une ligne (ou d'un lot de lignes, ex: une frontière BFS) ne touche que ses octets:
+vue des octets dans la largeur de la ligne puis somme cumulée, sans analyse octet par octet.
+
+Usage (depuis src/):
+    python -m benchmark.compressed_kg_report
+"""
+import collections
+import collections.abc
+import numpy as np
+from graph_csr import CSRGraph
+
+# Poids < EXACT_WEIGHT_LIMIT stockés tels quels dans le code uint16
+EXACT_WEIGHT_LIMIT = 1 << 15
+# Compartiments logarithmiques par doublement au-delà de EXACT_WEIGHT_LIMIT
+LOG_BUCKETS_PER_OCTAVE = 2048
+
+# Largeurs possibles des écarts entre voisins (octets) et types correspondants
+DELTA_DTYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+# indptr: arêtes de chaque nœud (relations, poids); byte_ptr / delta_width: écarts de chaque nœud
+CompressedCSR = collections.namedtuple('CompressedCSR', [
+    'indptr', 'first_tail', 'delta_width', 'byte_ptr', 'tail_bytes', 'relation_bits', 'relation_tags',
+    'weight_codes', 'exact_positions', 'exact_weights', 'n_nodes'])
+
+
+def encode_weights(weights):
+    """
+    Codes uint16 des poids et table annexe des poids non exacts
+
+    Returns:
+        tuple: (codes uint16, positions des poids approchés, poids exacts correspondants)
+    """
+    weights = np.asarray(weights, dtype=np.int64)
+    if (weights < 0).any():
+        raise ValueError('poids négatifs non supportés')
+    codes = weights.astype(np.uint16)
+    large = np.flatnonzero(weights >= EXACT_WEIGHT_LIMIT)
+    if len(large):
+        octaves = np.log2(weights[large]) - np.log2(EXACT_WEIGHT_LIMIT)
+        buckets = np.minimum(np.floor(octaves * LOG_BUCKETS_PER_OCTAVE), EXACT_WEIGHT_LIMIT - 1)
+        codes[large] = (EXACT_WEIGHT_LIMIT + buckets).astype(np.uint16)
+    return codes, large, weights[large].astype(np.int32)
+
+
+def decode_weights(codes):
+    """Poids depuis les codes uint16 (centre du compartiment pour les poids approchés)"""
+    codes = np.asarray(codes)
+    weights = codes.astype(np.int32)
+    large = codes >= EXACT_WEIGHT_LIMIT
+    if large.any():
+        buckets = (codes[large] - EXACT_WEIGHT_LIMIT).astype(np.float64) + 0.5
+        weights[large] = np.round(EXACT_WEIGHT_LIMIT * np.exp2(buckets / LOG_BUCKETS_PER_OCTAVE)).astype(np.int32)
+    return weights
+
+
+def _pack_tags(relations, bits):
+    per_byte = 8 // bits
+    padded = np.zeros(-(-len(relations) // per_byte) * per_byte, dtype=np.uint8)
+    padded[:len(relations)] = relations
+    shifts = (np.arange(per_byte, dtype=np.uint8) * bits)
+    return np.bitwise_or.reduce(padded.reshape(-1, per_byte) << shifts, axis=1).astype(np.uint8)
+
+
+# Table octet -> tags dépaquetés, pour chaque largeur de tag
+TAG_TABLES = {bits: ((np.arange(256, dtype=np.uint8)[:, None] >> (np.arange(8 // bits, dtype=np.uint8) * bits))
+                     & np.uint8((1 << bits) - 1)).astype(np.int8)
+              for bits in (2, 4)}
+
+
+def _unpack_tags(ccsr, edges):
+    bits = ccsr.relation_bits
+    if bits == 8:
+        return ccsr.relation_tags[edges].astype(np.int8)
+    per_byte = 8 // bits
+    return TAG_TABLES[bits][ccsr.relation_tags[edges // per_byte], edges % per_byte]
+
+
+def _unpack_tag_range(ccsr, start, stop):
+    """Relations des arêtes contiguës [start, stop): un bloc d'octets dépaqueté par table"""
+    bits = ccsr.relation_bits
+    if bits == 8:
+        return ccsr.relation_tags[start:stop].astype(np.int8)
+    per_byte = 8 // bits
+    block = TAG_TABLES[bits][ccsr.relation_tags[start // per_byte:-(-stop // per_byte)]].ravel()
+    return block[start % per_byte:start % per_byte + stop - start]
+
+
+def _ranges(starts, stops):
+    """Concaténation des intervalles [starts[i], stops[i])"""
+    sizes = stops - starts
+    return np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+
+
+def compress_csr(csr, exact_weights=True):
+    """
+    Compresser un CSRGraph (voir graph_csr.build_csr: voisins triés par tail dans chaque ligne)
+
+    Args:
+        csr: CSRGraph
+        exact_weights: Garder la table annexe des poids >= EXACT_WEIGHT_LIMIT (sinon poids approchés)
+
+    Returns:
+        CompressedCSR
+    """
+    indptr = csr.indptr.astype(np.int64)
+    tails = csr.indices.astype(np.int64)
+    counts = np.diff(indptr)
+    nonempty = counts > 0
+    first_tail = np.zeros(csr.n_nodes, dtype=np.int32)
+    first_tail[nonempty] = tails[indptr[:-1][nonempty]]
+
+    # Écarts entre voisins successifs d'une même ligne (le premier voisin n'en a pas)
+    heads = np.repeat(np.arange(csr.n_nodes), counts)
+    follows = np.zeros(len(tails), dtype=bool)
+    follows[1:] = heads[1:] == heads[:-1]
+    deltas = np.zeros(len(tails), dtype=np.int64)
+    deltas[1:] = tails[1:] - tails[:-1]
+    if (deltas[follows] < 0).any():
+        raise ValueError('voisins non triés dans une ligne du CSR')
+    max_delta = np.zeros(csr.n_nodes, dtype=np.int64)
+    np.maximum.at(max_delta, heads[follows], deltas[follows])
+    delta_width = np.where(max_delta < (1 << 8), 1, np.where(max_delta < (1 << 16), 2, 4)).astype(np.uint8)
+
+    byte_ptr = np.zeros(csr.n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.maximum(counts - 1, 0) * delta_width, out=byte_ptr[1:])
+    tail_bytes = np.zeros(int(byte_ptr[-1]), dtype=np.uint8)
+    for width, dtype in DELTA_DTYPES.items():
+        rows = np.flatnonzero((delta_width == width) & (counts > 1))
+        edges = _ranges(indptr[rows] + 1, indptr[rows + 1])
+        packed = deltas[edges].astype(dtype).view(np.uint8)
+        tail_bytes[_ranges(byte_ptr[rows], byte_ptr[rows + 1])] = packed
+
+    relations = csr.relations.astype(np.int64)
+    n_relations = int(relations.max(initial=0)) + 1
+    bits = 2 if n_relations <= 4 else 4 if n_relations <= 16 else 8
+    if (relations < 0).any() or n_relations > 256:
+        raise ValueError('relations hors de [0, 255]')
+
+    codes, positions, exact = encode_weights(csr.weights)
+    if not exact_weights:
+        positions, exact = positions[:0], exact[:0]
+    return CompressedCSR(indptr=indptr, first_tail=first_tail, delta_width=delta_width, byte_ptr=byte_ptr,
+                         tail_bytes=tail_bytes, relation_bits=bits,
+                         relation_tags=_pack_tags(relations.astype(np.uint8), bits),
+                         weight_codes=codes, exact_positions=positions.astype(np.int64), exact_weights=exact,
+                         n_nodes=csr.n_nodes)
+
+
+def _edge_weights(ccsr, codes, edges):
+    """Poids décodés; seules les arêtes à code approché sont cherchées dans la table annexe"""
+    if codes.max(initial=0) < EXACT_WEIGHT_LIMIT:
+        return codes.astype(np.int32)
+    weights = decode_weights(codes)
+    if len(ccsr.exact_positions):
+        large = np.flatnonzero(codes >= EXACT_WEIGHT_LIMIT)
+        if len(large):
+            found = np.minimum(np.searchsorted(ccsr.exact_positions, edges[large]), len(ccsr.exact_positions) - 1)
+            hit = ccsr.exact_positions[found] == edges[large]
+            weights[large[hit]] = ccsr.exact_weights[found[hit]]
+    return weights
+
+
+def _row_tails(ccsr, nodes, counts):
+    """Voisins des lignes nodes, concaténés: premier voisin en absolu puis écarts groupés par largeur"""
+    row_first = np.cumsum(counts) - counts
+    values = np.empty(int(counts.sum()), dtype=np.int64)
+    nonempty = counts > 0
+    values[row_first[nonempty]] = ccsr.first_tail[nodes[nonempty]]
+    widths = ccsr.delta_width[nodes]
+    for width, dtype in DELTA_DTYPES.items():
+        rows = np.flatnonzero((widths == width) & (counts > 1))
+        if len(rows):
+            packed = ccsr.tail_bytes[_ranges(ccsr.byte_ptr[nodes[rows]], ccsr.byte_ptr[nodes[rows] + 1])]
+            values[_ranges(row_first[rows] + 1, row_first[rows] + counts[rows])] = packed.view(dtype)
+    # Somme cumulée remise à zéro au début de chaque ligne
+    tails = np.cumsum(values)
+    base = np.zeros(len(nodes), dtype=np.int64)
+    base[nonempty] = tails[row_first[nonempty]] - values[row_first[nonempty]]
+    tails -= np.repeat(base, counts)
+    return tails.astype(np.int32)
+
+
+def decode_rows(ccsr, nodes):
+    """
+    Décoder les arêtes sortantes d'un lot de nœuds (ex: une frontière BFS)
+
+    Returns:
+        tuple: (heads, tails, relations, weights) concaténés dans l'ordre de nodes
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+    starts, stops = ccsr.indptr[nodes], ccsr.indptr[nodes + 1]
+    counts = stops - starts
+    edges = _ranges(starts, stops)
+    return (np.repeat(nodes, counts).astype(np.int32), _row_tails(ccsr, nodes, counts),
+            _unpack_tags(ccsr, edges), _edge_weights(ccsr, ccsr.weight_codes[edges], edges))
+
+
+def neighbors(ccsr, node):
+    """Voisins sortants de node: (tails, relations, weights), comme graph_csr.neighbors"""
+    start, stop = int(ccsr.indptr[node]), int(ccsr.indptr[node + 1])
+    tails = np.empty(stop - start, dtype=np.int32)
+    if stop > start:
+        tails[0] = ccsr.first_tail[node]
+        packed = ccsr.tail_bytes[ccsr.byte_ptr[node]:ccsr.byte_ptr[node + 1]]
+        tails[1:] = packed.view(DELTA_DTYPES[int(ccsr.delta_width[node])])
+        np.cumsum(tails, out=tails)
+    weights = _edge_weights(ccsr, ccsr.weight_codes[start:stop], np.arange(start, stop))
+    return tails, _unpack_tag_range(ccsr, start, stop), weights
+
+
+def decompress_csr(ccsr):
+    """CSRGraph équivalent (identique si les poids exacts ont été gardés)"""
+    n_edges = int(ccsr.indptr[-1])
+    tails = _row_tails(ccsr, np.arange(ccsr.n_nodes), np.diff(ccsr.indptr))
+    weights = _edge_weights(ccsr, ccsr.weight_codes, np.arange(n_edges))
+    return CSRGraph(indptr=ccsr.indptr.copy(), indices=tails,
+                    relations=_unpack_tag_range(ccsr, 0, n_edges), weights=weights,
+                    n_nodes=ccsr.n_nodes)
+
+
+def memory_bytes(graph):
+    """Octets occupés par les tableaux d'un CSRGraph ou d'un CompressedCSR"""
+    return int(sum(field.nbytes for field in graph if isinstance(field, np.ndarray)))
+
+
+class CompressedAdjacency(collections.abc.Mapping):
+    """
+    Vue du CompressedCSR avec l'interface du dictionnaire {head: [(tail, relation, weight), ...]}
+    (même comportement que graph_csr.CSRAdjacency, lignes décodées à la demande)
+    """
+
+    def __init__(self, ccsr):
+        self.ccsr = ccsr
+        self._heads = np.flatnonzero(np.diff(ccsr.indptr))
+
+    def __getitem__(self, node):
+        if not 0 <= node < self.ccsr.n_nodes or self.ccsr.indptr[node] == self.ccsr.indptr[node + 1]:
+            raise KeyError(node)
+        tails, relations, weights = neighbors(self.ccsr, node)
+        return list(zip(tails.tolist(), relations.tolist(), weights.tolist()))
+
+    def __iter__(self):
+        return iter(self._heads.tolist())
+
+    def __len__(self):
+        return len(self._heads)
@@ -0,0 +1,115 @@
+"""
+Représentation CSR (Compressed Sparse Row) du graphe de connaissances
+Construite depuis l'array kg_np [head, relation, tail, weight] sans dépendance à scipy
+"""
+import collections
+import collections.abc
+import numpy as np
+
+# indptr[h]:indptr[h+1] délimite les arêtes sortantes de h dans indices/relations/weights
+CSRGraph = collections.namedtuple('CSRGraph', ['indptr', 'indices', 'relations', 'weights', 'n_nodes'])
+
+
+def build_csr(kg_np, n_nodes=None, relations=None):
+    """
+    Construire le CSR du graphe (arêtes triées par head puis par tail)
+
+    Args:
+        kg_np: Array (n_triples, 3) ou (n_triples, 4) [head, relation, tail(, weight)]
+        n_nodes: Nombre de nœuds (défaut: max(head, tail) + 1)
+        relations: Itérable de relations à garder (défaut: toutes)
+
+    Returns:
+        CSRGraph
+    """
+    kg_np = np.asarray(kg_np)
+    if relations is not None:
+        kg_np = kg_np[np.isin(kg_np[:, 1], list(relations))]
+
+    heads = kg_np[:, 0].astype(np.int64)
+    tails = kg_np[:, 2].astype(np.int64)
+    if kg_np.shape[1] >= 4:
+        weights = kg_np[:, 3].astype(np.int32)
+    else:
+        weights = np.ones(len(kg_np), dtype=np.int32)
+
+    if n_nodes is None:
+        n_nodes = int(max(heads.max(initial=-1), tails.max(initial=-1))) + 1
+
+    order = np.lexsort((tails, heads))
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=n_nodes), out=indptr[1:])
+
+    return CSRGraph(indptr=indptr,
+                    indices=tails[order].astype(np.int32),
+                    relations=kg_np[order, 1].astype(np.int8),
+                    weights=weights[order],
+                    n_nodes=n_nodes)
+
+
+def csr_heads(csr):
+    """Head de chaque arête (expansion de indptr), array int32 de longueur n_edges"""
+    return np.repeat(np.arange(csr.n_nodes, dtype=np.int32), np.diff(csr.indptr))
+
+
+def transpose_csr(csr):
+    """
+    Graphe transposé: les arêtes entrantes de chaque nœud (même relation et même poids)
+
+    Returns:
+        CSRGraph où indices contient les heads d'origine
+    """
+    heads = csr_heads(csr)
+    order = np.lexsort((heads, csr.indices))
+    indptr = np.zeros(csr.n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(csr.indices, minlength=csr.n_nodes), out=indptr[1:])
+    return CSRGraph(indptr=indptr,
+                    indices=heads[order],
+                    relations=csr.relations[order],
+                    weights=csr.weights[order],
+                    n_nodes=csr.n_nodes)
+
+
+def neighbors(csr, node):
+    """Voisins sortants de node: (tails, relations, weights) en vues sans copie"""
+    start, end = csr.indptr[node], csr.indptr[node + 1]
+    return csr.indices[start:end], csr.relations[start:end], csr.weights[start:end]
+
+
+class CSRAdjacency(collections.abc.Mapping):
+    """
+    Vue du CSR avec l'interface du dictionnaire {head: [(tail, relation, weight), ...]}
+
+    Permet d'utiliser graph_algorithms et graph_visualizer sans construire le dictionnaire
+    Python complet (construct_kg): chaque liste est créée à la demande. Comme pour le
+    dictionnaire, seuls les nœuds ayant des arêtes sortantes sont des clés.
+    Les tableaux par arête dérivés du CSR (masques de relations, longueurs) sont calculés une
+    fois par vue avec edge_array et réutilisés par les noyaux de graph_kernels.
+    """
+
+    def __init__(self, csr):
+        self.csr = csr
+        self._heads = np.flatnonzero(np.diff(csr.indptr))
+        self._edge_arrays = {}
+
+    def edge_array(self, key, compute):
+        """Tableau par arête mis en cache sous key, calculé par compute(csr) au premier appel"""
+        if key not in self._edge_arrays:
+            self._edge_arrays[key] = compute(self.csr)
+        return self._edge_arrays[key]
+
+    def __getitem__(self, node):
+        if not 0 <= node < self.csr.n_nodes:
+            raise KeyError(node)
+        start, end = int(self.csr.indptr[node]), int(self.csr.indptr[node + 1])
+        if start == end:
+            raise KeyError(node)
+        return list(zip(self.csr.indices[start:end].tolist(),
+                        self.csr.relations[start:end].tolist(),
+                        self.csr.weights[start:end].tolist()))
+
+    def __iter__(self):
+        return iter(self._heads.tolist())
+
+    def __len__(self):
+        return len(self._heads)
@@ -0,0 +1,275 @@
+"""
+Noyaux des parcours de graphe sur les tableaux du CSR, avec deux backends interchangeables
+
+- 'numpy': référence, toujours disponible. Parcours par frontières vectorisées; Prim garde un tas
+  Python, alimenté par tranches d'arêtes.
+- 'numba': mêmes noyaux compilés par Numba (boucles natives, tas binaire pour Dijkstra et Prim),
+  dans graph_kernels_numba.py. Choisi automatiquement ('auto') quand numba est installé; numba
+  reste optionnel et n'est importé qu'à la première sélection de ce backend.
+
+Les deux backends renvoient exactement les mêmes résultats (mêmes ordres de découverte et mêmes
+départages d'égalité que graph_algorithms). graph_algorithms les utilise quand le graphe est un
+CSRAdjacency; le dictionnaire {head: [(tail, relation, weight)]} garde les boucles Python.
+
+Usage (depuis src/):
+    python graph_kernels.py --benchmark
+    python graph_kernels.py --benchmark --backends numpy numba
+"""
+import argparse
+import collections
+import heapq
+import importlib.util
+import json
+import time
+import numpy as np
+
+KERNEL_BACKENDS = ['auto', 'numpy', 'numba']
+
+# Fonctions d'un backend (signatures communes):
+#   gather_edges(indptr, nodes) -> (heads, edges): arêtes sortantes des nœuds, dans l'ordre des nœuds
+#   bfs_hops(indptr, indices, edge_mask, seeds, max_hops) -> (nodes, hops, edges) dans l'ordre de
+#       découverte, edges = arête par laquelle chaque nœud a été découvert
+#   shortest_paths(indptr, indices, lengths, seeds) -> (distances float64 (inf si non atteint), edges):
+#       edges = arête prédécesseur de chaque nœud (-1 pour les sources et les nœuds non atteints),
+#       parmi celles qui réalisent sa distance la plus petite head, puis la plus petite arête
+#   prim_order(indptr, indices, weights, edge_mask, seeds, limit) -> arêtes de l'arbre dans l'ordre
+#       d'ajout (limit < 0: sans limite)
+#   connected_components(n_nodes, heads, tails) -> plus petit nœud de la composante de chaque nœud
+#   ldg_partition(indptr, indices, order, node_weights, n_parts, capacity, parts) -> partition de chaque
+#       nœud (une passe de LDG en flux, nœuds pris dans l'ordre order, charge d'une partition = somme de
+#       node_weights, jamais au-delà de capacity tant qu'une partition peut recevoir le nœud; parts:
+#       partition de la passe précédente, -1 = pas encore placé)
+KernelBackend = collections.namedtuple('KernelBackend', ['name', 'gather_edges', 'bfs_hops', 'shortest_paths',
+                                                         'prim_order', 'connected_components', 'ldg_partition'])
+
+
+def _gather_edges_numpy(indptr, nodes):
+    starts = indptr[nodes]
+    sizes = indptr[nodes + 1] - starts
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return np.repeat(nodes, sizes), np.repeat(starts, sizes) + offsets
+
+
+def _bfs_hops_numpy(indptr, indices, edge_mask, seeds, max_hops):
+    visited = np.zeros(len(indptr) - 1, dtype=bool)
+    visited[seeds] = True
+    frontier = seeds
+    found_nodes, found_hops = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int16)]
+    found_edges = [np.empty(0, dtype=np.int64)]
+    for hop in range(1, max_hops + 1):
+        _, edges = _gather_edges_numpy(indptr, frontier)
+        edges = edges[edge_mask[edges]]
+        tails = indices[edges].astype(np.int64)
+        unvisited = ~visited[tails]
+        edges, tails = edges[unvisited], tails[unvisited]
+        if not len(tails):
+            break
+        # Première occurrence de chaque nœud, dans l'ordre de parcours de la frontière
+        _, first = np.unique(tails, return_index=True)
+        first = np.sort(first)
+        frontier = tails[first]
+        visited[frontier] = True
+        found_nodes.append(frontier)
+        found_hops.append(np.full(len(frontier), hop, dtype=np.int16))
+        found_edges.append(edges[first])
+    return np.concatenate(found_nodes), np.concatenate(found_hops), np.concatenate(found_edges)
+
+
+def _shortest_paths_numpy(indptr, indices, lengths, seeds):
+    # Relaxation restreinte aux arêtes sortant des nœuds améliorés au tour précédent. Chaque head
+    # relâche ses arêtes avec sa distance finale au moins une fois: les égalités avec la distance
+    # courante ne changent que le prédécesseur (plus petite head, puis plus petite arête). La
+    # frontière reste triée: les arêtes rassemblées sont déjà dans l'ordre (head, arête)
+    distances = np.full(len(indptr) - 1, np.inf)
+    distances[seeds] = 0.0
+    pred_edges = np.full(len(indptr) - 1, -1, dtype=np.int64)
+    pred_heads = np.full(len(indptr) - 1, -1, dtype=np.int64)
+    frontier = np.sort(seeds)
+    while len(frontier):
+        heads, edges = _gather_edges_numpy(indptr, frontier)
+        candidates = distances[heads] + lengths[edges]
+        tails = indices[edges].astype(np.int64)
+        keep = (candidates <= distances[tails]) & np.isfinite(candidates)
+        heads, edges, tails, candidates = heads[keep], edges[keep], tails[keep], candidates[keep]
+        order = np.lexsort((candidates, tails))
+        heads, edges, tails, candidates = heads[order], edges[order], tails[order], candidates[order]
+        first = np.r_[True, tails[1:] != tails[:-1]] if len(tails) else np.empty(0, dtype=bool)
+        heads, edges, tails, candidates = heads[first], edges[first], tails[first], candidates[first]
+        better = candidates < distances[tails]
+        tie = ~better & ((heads < pred_heads[tails]) | ((heads == pred_heads[tails]) & (edges < pred_edges[tails])))
+        update = better | tie
+        pred_edges[tails[update]] = edges[update]
+        pred_heads[tails[update]] = heads[update]
+        frontier = tails[better]
+        distances[frontier] = candidates[better]
+    return distances, pred_edges
+
+
+def _prim_order_numpy(indptr, indices, weights, edge_mask, seeds, limit):
+    in_tree = np.zeros(len(indptr) - 1, dtype=bool)
+    in_tree[seeds] = True
+    heap = []
+
+    def push(node):
+        edges = np.arange(indptr[node], indptr[node + 1])
+        edges = edges[edge_mask[edges]]
+        edges = edges[~in_tree[indices[edges]]]
+        for weight, tail, edge in zip((-weights[edges].astype(np.float64)).tolist(), indices[edges].tolist(),
+                                      edges.tolist()):
+            heapq.heappush(heap, (weight, node, tail, edge))
+
+    for node in seeds.tolist():
+        push(node)
+    chosen = []
+    while heap:
+        _, _, node, edge = heapq.heappop(heap)
+        if in_tree[node]:
+            continue
+        in_tree[node] = True
+        chosen.append(edge)
+        if 0 <= limit <= len(chosen):
+            break
+        push(node)
+    return np.array(chosen, dtype=np.int64)
+
+
+def _connected_components_numpy(n_nodes, heads, tails):
+    # Chaque racine est accrochée à la plus petite racine voisine, puis les pointeurs sont
+    # compressés (saut de pointeurs) jusqu'à ce qu'aucune arête ne relie deux racines distinctes
+    labels = np.arange(n_nodes)
+    heads = np.asarray(heads, dtype=np.int64)
+    tails = np.asarray(tails, dtype=np.int64)
+    while True:
+        head_roots, tail_roots = labels[heads], labels[tails]
+        linking = head_roots != tail_roots
+        if not linking.any():
+            return labels
+        head_roots, tail_roots = head_roots[linking], tail_roots[linking]
+        low = np.minimum(head_roots, tail_roots)
+        np.minimum.at(labels, np.maximum(head_roots, tail_roots), low)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def _ldg_partition_numpy(indptr, indices, order, node_weights, n_parts, capacity, parts):
+    # Linear Deterministic Greedy: partition qui a le plus de voisins placés (dans cette passe ou la
+    # précédente), pondérés par sa place restante (1 - charge / capacité). Une partition que le nœud
+    # ferait dépasser la capacité n'est choisie qu'en dernier recours, si aucune autre ne peut le
+    # recevoir; ex aequo: la moins chargée, puis le plus petit numéro
+    parts = parts.astype(np.int32)
+    loads = np.zeros(n_parts, dtype=np.int64)
+    candidates = np.arange(n_parts)
+    for node in order.tolist():
+        placed = parts[indices[indptr[node]:indptr[node + 1]]]
+        scores = np.bincount(placed[placed >= 0], minlength=n_parts) * (1.0 - loads / capacity)
+        scores[loads + node_weights[node] > capacity] = -1.0
+        part = np.lexsort((candidates, loads, -scores))[0]
+        parts[node] = part
+        loads[part] += node_weights[node]
+    return parts
+
+
+NUMPY_BACKEND = KernelBackend('numpy', _gather_edges_numpy, _bfs_hops_numpy, _shortest_paths_numpy,
+                              _prim_order_numpy, _connected_components_numpy, _ldg_partition_numpy)
+
+
+def _numba_installed():
+    # Sans importer numba: find_spec ne lit que les chemins d'import
+    return importlib.util.find_spec('numba') is not None
+
+
+def available_backends():
+    """Backends utilisables dans cet environnement"""
+    return ['numpy'] + (['numba'] if _numba_installed() else [])
+
+
+def get_backend(name=None):
+    """
+    Backend de noyaux par nom
+
+    Args:
+        name: 'numpy', 'numba' ou 'auto'/None (numba s'il est installé, sinon numpy)
+
+    Returns:
+        KernelBackend
+    """
+    if name in (None, 'auto'):
+        name = 'numba' if _numba_installed() else 'numpy'
+    if name == 'numpy':
+        return NUMPY_BACKEND
+    if name == 'numba':
+        if not _numba_installed():
+            raise ValueError('Backend numba indisponible (pip install numba)')
+        # Import tardif: numba et ses noyaux ne sont chargés qu'à la première sélection
+        from graph_kernels_numba import NUMBA_BACKEND
+        return NUMBA_BACKEND
+    raise ValueError(f'Backend inconnu: {name} (choix: {KERNEL_BACKENDS})')
+
+
+def benchmark(csr, user_history, backends=None, n_users=200, top_k=10, seed=0):
+    """
+    Temps de BFS, Dijkstra et Prim (run_algorithm sur CSRAdjacency) par backend, contre le
+    dictionnaire {head: [(tail, relation, weight)]}, et vérification que les résultats sont identiques
+
+    Le premier appel de chaque backend est exclu des temps (compilation Numba).
+
+    Returns:
+        dict: {algorithme: {'dict': s, backend: s, ...}} et 'identical'
+    """
+    # Import tardif: graph_algorithms importe ce module
+    from graph_algorithms import ALGORITHMS, run_algorithm
+    from graph_csr import CSRAdjacency, csr_heads
+
+    rng = np.random.default_rng(seed)
+    users = sorted(user for user in user_history if len(user_history[user]))
+    users = [users[i] for i in np.sort(rng.choice(len(users), min(n_users, len(users)), replace=False))]
+    heads = csr_heads(csr)
+    kg = collections.defaultdict(list)
+    for head, tail, relation, weight in zip(heads.tolist(), csr.indices.tolist(), csr.relations.tolist(),
+                                            csr.weights.tolist()):
+        kg[head].append((tail, relation, weight))
+    adjacency = CSRAdjacency(csr)
+
+    report = {'users': len(users), 'identical': True}
+    for name in ALGORITHMS:
+        timings = {}
+        reference = None
+        for backend in ['dict'] + list(backends or available_backends()):
+            graph = kg if backend == 'dict' else adjacency
+            options = {} if backend == 'dict' else {'backend': backend}
+            run_algorithm(name, graph, user_history[users[0]], top_k=top_k, **options)
+            start = time.perf_counter()
+            results = [run_algorithm(name, graph, user_history[user], top_k=top_k, **options)['recommendations']
+                       for user in users]
+            timings[backend] = round(time.perf_counter() - start, 4)
+            if reference is None:
+                reference = results
+            elif results != reference:
+                report['identical'] = False
+        report[name] = timings
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Noyaux de parcours de graphe (NumPy / Numba)')
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--benchmark', action='store_true', help='Comparer les backends sur le KG')
+    parser.add_argument('--backends', nargs='+', default=None, choices=KERNEL_BACKENDS[1:])
+    parser.add_argument('--n_users', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f'Backends disponibles: {available_backends()} (auto: {get_backend().name})')
+    if args.benchmark:
+        from graph_snapshot import load_snapshot
+        snapshot = load_snapshot(args.dataset_path, args.dataset)
+        print(json.dumps(benchmark(snapshot.csr, snapshot.user_history, args.backends, args.n_users,
+                                   seed=args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Backend 'numba' de graph_kernels: mêmes noyaux que le backend numpy, compilés par Numba
+
+Importé par graph_kernels.get_backend seulement quand ce backend est choisi: numba (import et
+chargement des noyaux du cache disque, ~1 s) ne ralentit pas les démarrages qui ne s'en servent pas.
+"""
+import heapq
+import numba
+import numpy as np
+
+from graph_kernels import KernelBackend
+
+
+@numba.njit(cache=True)
+def _gather_edges_numba(indptr, nodes):
+    total = 0
+    for i in range(len(nodes)):
+        total += indptr[nodes[i] + 1] - indptr[nodes[i]]
+    heads = np.empty(total, dtype=np.int64)
+    edges = np.empty(total, dtype=np.int64)
+    position = 0
+    for i in range(len(nodes)):
+        for edge in range(indptr[nodes[i]], indptr[nodes[i] + 1]):
+            heads[position] = nodes[i]
+            edges[position] = edge
+            position += 1
+    return heads, edges
+
+
+@numba.njit(cache=True)
+def _bfs_hops_numba(indptr, indices, edge_mask, seeds, max_hops):
+    n_nodes = len(indptr) - 1
+    visited = np.zeros(n_nodes, dtype=np.bool_)
+    queue = np.empty(n_nodes, dtype=np.int64)
+    hops = np.empty(n_nodes, dtype=np.int16)
+    found_by = np.empty(n_nodes, dtype=np.int64)
+    queue_end = 0
+    for seed in seeds:
+        visited[seed] = True
+        queue[queue_end] = seed
+        queue_end += 1
+    n_seeds = queue_end
+    level_start = 0
+    for hop in range(1, max_hops + 1):
+        level_end = queue_end
+        for position in range(level_start, level_end):
+            node = queue[position]
+            for edge in range(indptr[node], indptr[node + 1]):
+                tail = indices[edge]
+                if edge_mask[edge] and not visited[tail]:
+                    visited[tail] = True
+                    queue[queue_end] = tail
+                    hops[queue_end] = hop
+                    found_by[queue_end] = edge
+                    queue_end += 1
+        if queue_end == level_end:
+            break
+        level_start = level_end
+    return (queue[n_seeds:queue_end].copy(), hops[n_seeds:queue_end].copy(),
+            found_by[n_seeds:queue_end].copy())
+
+
+@numba.njit(cache=True)
+def _shortest_paths_numba(indptr, indices, lengths, seeds):
+    n_nodes = len(indptr) - 1
+    distances = np.full(n_nodes, np.inf)
+    pred_edges = np.full(n_nodes, -1, dtype=np.int64)
+    pred_heads = np.full(n_nodes, -1, dtype=np.int64)
+    done = np.zeros(n_nodes, dtype=np.bool_)
+    heap = [(0.0, np.int64(0))]
+    heap.pop()
+    for seed in seeds:
+        distances[seed] = 0.0
+        heapq.heappush(heap, (0.0, np.int64(seed)))
+    while len(heap):
+        distance, node = heapq.heappop(heap)
+        if done[node]:
+            continue
+        done[node] = True
+        for edge in range(indptr[node], indptr[node + 1]):
+            tail = np.int64(indices[edge])
+            candidate = distance + lengths[edge]
+            if candidate < distances[tail]:
+                distances[tail] = candidate
+                pred_edges[tail] = edge
+                pred_heads[tail] = node
+                heapq.heappush(heap, (candidate, tail))
+            elif candidate == distances[tail] and node < pred_heads[tail]:
+                # Égalité: plus petite head (la première arête d'une même head reste)
+                pred_edges[tail] = edge
+                pred_heads[tail] = node
+    return distances, pred_edges
+
+
+@numba.njit(cache=True)
+def _prim_push_numba(heap, indptr, indices, weights, edge_mask, in_tree, node):
+    for edge in range(indptr[node], indptr[node + 1]):
+        tail = np.int64(indices[edge])
+        if edge_mask[edge] and not in_tree[tail]:
+            heapq.heappush(heap, (-np.float64(weights[edge]), np.int64(node), tail, np.int64(edge)))
+
+
+@numba.njit(cache=True)
+def _prim_order_numba(indptr, indices, weights, edge_mask, seeds, limit):
+    n_nodes = len(indptr) - 1
+    in_tree = np.zeros(n_nodes, dtype=np.bool_)
+    for seed in seeds:
+        in_tree[seed] = True
+    heap = [(0.0, np.int64(0), np.int64(0), np.int64(0))]
+    heap.pop()
+    for seed in seeds:
+        _prim_push_numba(heap, indptr, indices, weights, edge_mask, in_tree, seed)
+    chosen = np.empty(n_nodes, dtype=np.int64)
+    n_chosen = 0
+    while len(heap):
+        _, _, node, edge = heapq.heappop(heap)
+        if in_tree[node]:
+            continue
+        in_tree[node] = True
+        chosen[n_chosen] = edge
+        n_chosen += 1
+        if 0 <= limit <= n_chosen:
+            break
+        _prim_push_numba(heap, indptr, indices, weights, edge_mask, in_tree, node)
+    return chosen[:n_chosen].copy()
+
+
+@numba.njit(cache=True)
+def _find_root(parents, node):
+    while parents[node] != node:
+        parents[node] = parents[parents[node]]
+        node = parents[node]
+    return node
+
+
+@numba.njit(cache=True)
+def _connected_components_numba(n_nodes, heads, tails):
+    # Union-find, la plus petite racine devenant la racine commune: racine = plus petit nœud
+    parents = np.arange(n_nodes)
+    for i in range(len(heads)):
+        head_root = _find_root(parents, heads[i])
+        tail_root = _find_root(parents, tails[i])
+        if head_root < tail_root:
+            parents[tail_root] = head_root
+        elif tail_root < head_root:
+            parents[head_root] = tail_root
+    labels = np.empty(n_nodes, dtype=np.int64)
+    for node in range(n_nodes):
+        labels[node] = _find_root(parents, node)
+    return labels
+
+
+@numba.njit(cache=True)
+def _ldg_partition_numba(indptr, indices, order, node_weights, n_parts, capacity, parts):
+    parts = parts.astype(np.int32)
+    loads = np.zeros(n_parts, dtype=np.int64)
+    counts = np.zeros(n_parts, dtype=np.int64)
+    for node in order:
+        counts[:] = 0
+        for edge in range(indptr[node], indptr[node + 1]):
+            if parts[indices[edge]] >= 0:
+                counts[parts[indices[edge]]] += 1
+        best = -1
+        best_score = 0.0
+        for part in range(n_parts):
+            if loads[part] + node_weights[node] <= capacity:
+                score = counts[part] * (1.0 - loads[part] / capacity)
+            else:
+                score = -1.0
+            if best < 0 or score > best_score or (score == best_score and loads[part] < loads[best]):
+                best = part
+                best_score = score
+        parts[node] = best
+        loads[best] += node_weights[node]
+    return parts
+
+
+NUMBA_BACKEND = KernelBackend('numba', _gather_edges_numba, _bfs_hops_numba, _shortest_paths_numba,
+                              _prim_order_numba, _connected_components_numba, _ldg_partition_numba)
@@ -5,6 +5,12 @@ Séparé du code ML/recommendation pour se concentrer sur les algorithmes graph
 import collections
 import os
 import numpy as np
+from profiling import span
+
+# Relation inverse de chaque relation directe (listened_to -> listened_by, similar_to -> similar_from).
+# Avec kg_storage=forward (métadonnées), kg_final ne contient que les relations directes et les
+# inverses sont reconstruites au chargement.
+REVERSE_RELATIONS = {0: 1, 2: 3}
 
 
 def load_dataset_metadata(dataset_path, dataset_name='music'):
@@ -63,30 +69,13 @@ def load_kg(dataset_path, dataset_name='music', use_small=False):
     if metadata and metadata.get('filtered', False):
         print('Dataset filtré détecté depuis les métadonnées')
     
-    suffix = '_small' if use_small else ''
-    kg_file = os.path.join(dataset_path, dataset_name, f'kg_final{suffix}')
-    
-    if os.path.exists(kg_file + '.npy'):
-        kg_np = np.load(kg_file + '.npy')
-    else:
-        # Détecter le nombre de colonnes (3 ou 4)
-        with open(kg_file + '.txt', 'r', encoding='utf-8') as f:
-            first_line = f.readline().strip()
-            num_cols = len(first_line.split('\t'))
-        
-        if num_cols == 4:
-            # Format avec weights
-            kg_np = np.loadtxt(kg_file + '.txt', dtype=np.int32)
-        else:
-            # Format ancien sans weights (backward compatibility)
-            kg_data = np.loadtxt(kg_file + '.txt', dtype=np.int32)
-            # Ajouter une colonne de poids = 1 par défaut
-            kg_np = np.column_stack([kg_data, np.ones(len(kg_data), dtype=np.int32)])
+    with span('graph_loader.load_kg') as counts:
+        kg_np = load_kg_array(dataset_path, dataset_name, use_small)
         
-        np.save(kg_file + '.npy', kg_np)
-    
-    n_entity = len(set(kg_np[:, 0]) | set(kg_np[:, 2]))
-    n_relation = len(set(kg_np[:, 1]))
+        n_entity = len(set(kg_np[:, 0]) | set(kg_np[:, 2]))
+        n_relation = len(set(kg_np[:, 1]))
+        counts['triples'] = len(kg_np)
+        counts['entities'] = n_entity
     
     kg = construct_kg(kg_np)
     
@@ -101,6 +90,103 @@ def load_kg(dataset_path, dataset_name='music', use_small=False):
     return n_entity, n_relation, kg, metadata
 
 
+def _fresh_cache(base):
+    """
+    True si base.npy existe et n'est pas plus ancien que base.txt
+
+    Un cache écrit avant le dernier preprocess (autre seuil, autre graine, autre kg_storage)
+    est ignoré: le .txt est relu et le cache réécrit.
+    """
+    if not os.path.exists(base + '.npy'):
+        return False
+    return not (os.path.exists(base + '.txt')
+                and os.stat(base + '.txt').st_mtime_ns > os.stat(base + '.npy').st_mtime_ns)
+
+
+def load_kg_array(dataset_path, dataset_name='music', use_small=False, use_cache=True):
+    """
+    Charger les triplets du KG sous forme d'array (cache .npy créé au premier chargement,
+    recréé si kg_final.txt est plus récent)
+    Si le dataset est stocké sans relations inverses (kg_storage=forward), elles sont reconstruites
+    
+    Args:
+        dataset_path: Chemin vers le dossier final_data
+        dataset_name: Nom du dataset
+        use_small: Si True, utilise kg_final_small.txt (déprécié)
+        use_cache: Si False, relire kg_final.txt même si le cache .npy est à jour (et le réécrire)
+    
+    Returns:
+        Array numpy int32 de shape (n_triples, 4) avec [head, relation, tail, weight]
+    """
+    suffix = '_small' if use_small else ''
+    kg_file = os.path.join(dataset_path, dataset_name, f'kg_final{suffix}')
+    metadata = load_dataset_metadata(dataset_path, dataset_name) or {}
+    forward_only = metadata.get('kg_storage') == 'forward'
+    
+    if use_cache and _fresh_cache(kg_file):
+        kg_np = np.load(kg_file + '.npy')
+        if kg_np.shape[1] == 3:
+            # Cache sans poids (movie/book, aussi lu par data_loader): poids = 1 comme pour le texte
+            kg_np = np.column_stack([kg_np, np.ones(len(kg_np), dtype=np.int32)])
+        return add_reverse_relations(kg_np) if forward_only else kg_np
+    
+    # Détecter le nombre de colonnes (3 ou 4)
+    with open(kg_file + '.txt', 'r', encoding='utf-8') as f:
+        first_line = f.readline().strip()
+        num_cols = len(first_line.split('\t'))
+    
+    if num_cols == 4:
+        # Format avec weights
+        kg_np = np.loadtxt(kg_file + '.txt', dtype=np.int32)
+    else:
+        # Format ancien sans weights (backward compatibility)
+        kg_data = np.loadtxt(kg_file + '.txt', dtype=np.int32)
+        # Ajouter une colonne de poids = 1 par défaut
+        kg_np = np.column_stack([kg_data, np.ones(len(kg_data), dtype=np.int32)])
+    
+    # Le cache garde le format du fichier texte (relations directes seules si forward)
+    np.save(kg_file + '.npy', kg_np)
+    return add_reverse_relations(kg_np) if forward_only else kg_np
+
+
+def add_reverse_relations(kg_np, reverse_relations=None):
+    """
+    Reconstruire les relations inverses d'un KG stocké sans elles (kg_storage=forward)
+    
+    Les triplets inverses sont les triplets directs avec head et tail échangés et le même poids,
+    placés juste après le bloc de leur relation directe: le résultat est identique, ligne pour
+    ligne, au kg_final.txt complet écrit par preprocess_music.
+    
+    Args:
+        kg_np: Array (n_triples, 4) des relations directes [head, relation, tail, weight]
+        reverse_relations: {relation directe: relation inverse}, défaut REVERSE_RELATIONS
+    
+    Returns:
+        Array int32 (n_triples_total, 4)
+    """
+    reverse_relations = reverse_relations or REVERSE_RELATIONS
+    with span('graph_loader.add_reverse_relations', triples=len(kg_np)) as counts:
+        relations = kg_np[:, 1]
+        blocks = [np.flatnonzero(relations == relation) for relation in sorted(reverse_relations)]
+        others = np.flatnonzero(~np.isin(relations, list(reverse_relations)))
+        kg_full = np.empty((2 * sum(len(rows) for rows in blocks) + len(others), 4), dtype=np.int32)
+        start = 0
+        for (relation, reverse), rows in zip(sorted(reverse_relations.items()), blocks):
+            forward = np.take(kg_np, rows, axis=0)
+            kg_full[start:start + len(rows)] = forward
+            start += len(rows)
+            backward = kg_full[start:start + len(rows)]
+            backward[:, 0] = forward[:, 2]
+            backward[:, 1] = reverse
+            backward[:, 2] = forward[:, 0]
+            backward[:, 3] = forward[:, 3]
+            start += len(rows)
+        # Relations sans inverse déclarée: conservées telles quelles, en fin de tableau
+        kg_full[start:] = np.take(kg_np, others, axis=0)
+        counts['triples_total'] = len(kg_full)
+    return kg_full
+
+
 def construct_kg(kg_np):
     """
     Construire la structure du graphe depuis un array numpy
@@ -114,21 +200,23 @@ def construct_kg(kg_np):
         Si pas de weight, weight = 1 par défaut
     """
     print('Construction du graphe de connaissances ...')
-    kg = collections.defaultdict(list)
-    
-    if kg_np.shape[1] == 4:
-        # Format avec weights
-        for head, relation, tail, weight in kg_np:
-            kg[head].append((tail, relation, weight))
-    else:
-        # Format ancien sans weights (backward compatibility)
-        for head, relation, tail in kg_np:
-            kg[head].append((tail, relation, 1))  # Poids par défaut = 1
+    with span('graph_loader.construct_kg', triples=len(kg_np)) as counts:
+        kg = collections.defaultdict(list)
+        
+        if kg_np.shape[1] == 4:
+            # Format avec weights
+            for head, relation, tail, weight in kg_np:
+                kg[head].append((tail, relation, weight))
+        else:
+            # Format ancien sans weights (backward compatibility)
+            for head, relation, tail in kg_np:
+                kg[head].append((tail, relation, 1))  # Poids par défaut = 1
+        counts['heads'] = len(kg)
     
     return kg
 
 
-def load_ratings(dataset_path, dataset_name='music', use_small=False):
+def load_ratings(dataset_path, dataset_name='music', use_small=False, use_cache=True):
     """
     Charger les ratings utilisateur-item (optionnel, pour analyse)
     
@@ -136,6 +224,7 @@ def load_ratings(dataset_path, dataset_name='music', use_small=False):
         dataset_path: Chemin vers le dossier final_data
         dataset_name: Nom du dataset
         use_small: Si True, utilise ratings_final_small.txt au lieu de ratings_final.txt (déprécié)
+        use_cache: Si False, relire ratings_final.txt même si le cache .npy est à jour (et le réécrire)
     
     Returns:
         Array numpy de shape (n_ratings, 3) avec [user_id, item_id, label]
@@ -148,11 +237,13 @@ def load_ratings(dataset_path, dataset_name='music', use_small=False):
     suffix = '_small' if use_small else ''
     rating_file = os.path.join(dataset_path, dataset_name, f'ratings_final{suffix}')
     
-    if os.path.exists(rating_file + '.npy'):
-        rating_np = np.load(rating_file + '.npy')
-    else:
-        rating_np = np.loadtxt(rating_file + '.txt', dtype=np.int32)
-        np.save(rating_file + '.npy', rating_np)
+    with span('graph_loader.load_ratings') as counts:
+        if use_cache and _fresh_cache(rating_file):
+            rating_np = np.load(rating_file + '.npy')
+        else:
+            rating_np = np.loadtxt(rating_file + '.txt', dtype=np.int32)
+            np.save(rating_file + '.npy', rating_np)
+        counts['ratings'] = len(rating_np)
     
     print(f'Ratings chargés: {rating_np.shape[0]} interactions')
     return rating_np
@@ -0,0 +1,182 @@
+"""
+Snapshot binaire du graphe chargé: CSR, historiques utilisateurs, statistiques et métadonnées
+dans un seul fichier .npz non compressé, pour démarrer main.py / le serveur sans relire les .txt
+
+Le snapshot est reconstruit automatiquement quand kg_final, ratings_final ou
+dataset_metadata ont changé (taille et date de modification enregistrées à la création)
+"""
+import collections
+import collections.abc
+import json
+import os
+import numpy as np
+from graph_loader import load_dataset_metadata, load_kg_array, load_ratings
+from graph_csr import CSRGraph, build_csr
+from graph_stats import get_csr_statistics
+from profiling import span
+
+SNAPSHOT_VERSION = 1
+
+Snapshot = collections.namedtuple('Snapshot', ['csr', 'user_history', 'metadata', 'stats',
+                                               'n_entity', 'n_relation'])
+
+
+class UserHistory(collections.abc.Mapping):
+    """
+    Historiques {user: [artistes écoutés]} stockés en CSR (users triés, indptr, items)
+
+    Même interface que le dictionnaire de graph_loader.get_user_history; chaque liste
+    est créée à la demande, dans l'ordre du fichier de ratings.
+    """
+
+    def __init__(self, users, indptr, items):
+        self.users = users
+        self.indptr = indptr
+        self.items = items
+
+    def __getitem__(self, user):
+        position = int(np.searchsorted(self.users, user))
+        if position >= len(self.users) or self.users[position] != user:
+            raise KeyError(user)
+        return self.items[self.indptr[position]:self.indptr[position + 1]].tolist()
+
+    def __iter__(self):
+        return iter(self.users.tolist())
+
+    def __len__(self):
+        return len(self.users)
+
+
+def history_arrays(ratings_np):
+    """
+    Historiques positifs (label=1) au format CSR, ordre du fichier conservé pour chaque utilisateur
+
+    Returns:
+        tuple: (users triés, indptr, items) en int32/int64/int32
+    """
+    positives = ratings_np[ratings_np[:, 2] == 1]
+    order = np.argsort(positives[:, 0], kind='stable')
+    users, counts = np.unique(positives[order, 0], return_counts=True)
+    indptr = np.zeros(len(users) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return users.astype(np.int32), indptr, positives[order, 1].astype(np.int32)
+
+
+def snapshot_path(dataset_path, dataset_name='music', use_small=False):
+    suffix = '_small' if use_small else ''
+    return os.path.join(dataset_path, dataset_name, f'graph_snapshot{suffix}.npz')
+
+
+def source_signature(dataset_path, dataset_name='music', use_small=False):
+    """(taille, mtime_ns) de chaque fichier source, -1 si absent"""
+    suffix = '_small' if use_small else ''
+    signature = []
+    for name in (f'kg_final{suffix}.txt', f'ratings_final{suffix}.txt', 'dataset_metadata.txt'):
+        path = os.path.join(dataset_path, dataset_name, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.extend([stat.st_size, stat.st_mtime_ns])
+        else:
+            signature.extend([-1, -1])
+    return np.array(signature, dtype=np.int64)
+
+
+def _json_bytes(obj):
+    return np.frombuffer(json.dumps(obj, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+
+
+def _json_load(array):
+    return json.loads(array.tobytes().decode('utf-8'))
+
+
+def build_snapshot(dataset_path, dataset_name='music', use_small=False):
+    """
+    Charger le KG et les ratings depuis les fichiers texte puis écrire le snapshot
+
+    Les .txt sont relus sans passer par les caches .npy: le snapshot contient exactement les
+    fichiers couverts par source_signature (les caches sont réécrits au passage).
+
+    Args:
+        dataset_path: Chemin vers le dossier final_data
+        dataset_name: Nom du dataset
+        use_small: Utiliser kg_final_small.txt / ratings_final_small.txt (déprécié)
+
+    Returns:
+        Snapshot
+    """
+    print('Construction du snapshot du graphe ...')
+    signature = source_signature(dataset_path, dataset_name, use_small)
+    with span('graph_snapshot.build') as counts:
+        kg_np = load_kg_array(dataset_path, dataset_name, use_small, use_cache=False)
+        entities = np.union1d(kg_np[:, 0], kg_np[:, 2])
+        n_entity = len(entities)
+        n_relation = len(np.unique(kg_np[:, 1]))
+
+        # Mêmes compléments que graph_loader.load_kg
+        metadata = load_dataset_metadata(dataset_path, dataset_name) or {}
+        metadata['n_entity'] = n_entity
+        metadata['n_relation'] = n_relation
+        metadata['type'] = 'filtered' if metadata.get('filtered', False) else 'full'
+
+        n_nodes = max(n_entity, int(entities.max(initial=-1)) + 1)
+        csr = build_csr(kg_np, n_nodes=n_nodes)
+        stats = get_csr_statistics(csr)
+
+        try:
+            ratings = load_ratings(dataset_path, dataset_name, use_small=use_small, use_cache=False)
+        except OSError as e:
+            print(f"Impossible de charger les ratings: {e}")
+            ratings = np.zeros((0, 3), dtype=np.int32)
+        users, indptr, items = history_arrays(ratings)
+        counts['edges'] = len(csr.indices)
+        counts['users'] = len(users)
+
+    path = snapshot_path(dataset_path, dataset_name, use_small)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f,
+                 version=np.array(SNAPSHOT_VERSION),
+                 signature=signature,
+                 indptr=csr.indptr, indices=csr.indices, relations=csr.relations, weights=csr.weights,
+                 n_nodes=np.array(csr.n_nodes), n_entity=np.array(n_entity), n_relation=np.array(n_relation),
+                 history_users=users, history_indptr=indptr, history_items=items,
+                 metadata=_json_bytes(metadata), stats=_json_bytes(stats))
+    os.replace(tmp_path, path)
+    print(f'Snapshot écrit: {path}')
+
+    return Snapshot(csr=csr, user_history=UserHistory(users, indptr, items), metadata=metadata,
+                    stats=stats, n_entity=n_entity, n_relation=n_relation)
+
+
+def load_snapshot(dataset_path, dataset_name='music', use_small=False, rebuild=True):
+    """
+    Restaurer le graphe depuis le snapshot (reconstruit s'il est absent ou périmé)
+
+    Args:
+        dataset_path: Chemin vers le dossier final_data
+        dataset_name: Nom du dataset
+        use_small: Utiliser les fichiers _small (déprécié)
+        rebuild: Si False, retourner None au lieu de reconstruire
+
+    Returns:
+        Snapshot ou None
+    """
+    path = snapshot_path(dataset_path, dataset_name, use_small)
+    if os.path.exists(path):
+        with span('graph_snapshot.load') as counts, np.load(path) as data:
+            if (int(data['version']) == SNAPSHOT_VERSION
+                    and np.array_equal(data['signature'], source_signature(dataset_path, dataset_name, use_small))):
+                csr = CSRGraph(indptr=data['indptr'], indices=data['indices'], relations=data['relations'],
+                               weights=data['weights'], n_nodes=int(data['n_nodes']))
+                user_history = UserHistory(data['history_users'], data['history_indptr'], data['history_items'])
+                stats = _json_load(data['stats'])
+                # Les clés JSON sont des chaînes: rétablir les numéros de relation
+                stats['distribution_relations'] = {int(r): c for r, c in stats['distribution_relations'].items()}
+                counts['edges'] = len(csr.indices)
+                counts['users'] = len(user_history)
+                return Snapshot(csr=csr, user_history=user_history, metadata=_json_load(data['metadata']),
+                                stats=stats, n_entity=int(data['n_entity']), n_relation=int(data['n_relation']))
+        print('Snapshot périmé (fichiers sources modifiés)')
+    if not rebuild:
+        return None
+    return build_snapshot(dataset_path, dataset_name, use_small)
@@ -0,0 +1,133 @@
+"""
+Statistiques du graphe de connaissances
+Séparé de graph_visualizer pour ne pas importer matplotlib/networkx quand on ne trace rien
+"""
+from collections import defaultdict
+import numpy as np
+from graph_csr import csr_heads
+from graph_kernels import get_backend
+from profiling import span
+
+
+def get_graph_statistics(kg):
+    """
+    Obtenir des statistiques sur le graphe
+    
+    Args:
+        kg: Dictionnaire {head: [(tail, relation, weight), ...]}
+    
+    Returns:
+        Dictionnaire avec les statistiques
+    """
+    with span('graph_stats.statistics') as counts:
+        all_nodes = set()
+        all_edges = []
+        node_degrees = defaultdict(int)
+        relation_counts = defaultdict(int)
+        
+        for head, tails in kg.items():
+            all_nodes.add(head)
+            for tail_info in tails:
+                if len(tail_info) == 3:
+                    tail, relation, weight = tail_info
+                else:
+                    tail, relation = tail_info
+                    weight = 1
+                
+                all_nodes.add(tail)
+                all_edges.append((head, tail, relation, weight))
+                node_degrees[head] += 1
+                node_degrees[tail] += 1
+                relation_counts[relation] += 1
+        counts['nodes'] = len(all_nodes)
+        counts['edges'] = len(all_edges)
+    
+    degrees = list(node_degrees.values())
+    
+    stats = {
+        'nombre_noeuds': len(all_nodes),
+        'nombre_aretes': len(all_edges),
+        'nombre_relations': len(relation_counts),
+        'degre_moyen': np.mean(degrees) if degrees else 0,
+        'degre_max': max(degrees) if degrees else 0,
+        'degre_min': min(degrees) if degrees else 0,
+        'distribution_relations': dict(relation_counts)
+    }
+    
+    return stats
+
+
+def get_csr_statistics(csr):
+    """
+    Mêmes statistiques que get_graph_statistics, calculées sur le CSR sans boucle Python,
+    plus les composantes connexes (arêtes sans orientation, nœuds isolés exclus)
+    
+    Args:
+        csr: CSRGraph (voir graph_csr.build_csr)
+    
+    Returns:
+        Dictionnaire avec les statistiques
+    """
+    with span('graph_stats.csr_statistics', edges=len(csr.indices)) as counts:
+        out_degree = np.diff(csr.indptr)
+        degrees = out_degree + np.bincount(csr.indices, minlength=csr.n_nodes)
+        labels = get_backend().connected_components(csr.n_nodes, csr_heads(csr), csr.indices)
+        component_sizes = np.bincount(labels[degrees > 0], minlength=csr.n_nodes)
+        degrees = degrees[degrees > 0]
+        relations, relation_counts = np.unique(csr.relations, return_counts=True)
+        counts['nodes'] = len(degrees)
+    
+    return {
+        'nombre_noeuds': int(len(degrees)),
+        'nombre_aretes': int(len(csr.indices)),
+        'nombre_relations': int(len(relations)),
+        'degre_moyen': float(degrees.mean()) if len(degrees) else 0,
+        'degre_max': int(degrees.max()) if len(degrees) else 0,
+        'degre_min': int(degrees.min()) if len(degrees) else 0,
+        'distribution_relations': {int(r): int(c) for r, c in zip(relations, relation_counts)},
+        'composantes_connexes': int(np.count_nonzero(component_sizes)),
+        'plus_grande_composante': int(component_sizes.max(initial=0))
+    }
+
+
+def print_graph_statistics(kg, dataset_info=None, stats=None):
+    """
+    Afficher les statistiques du graphe en français
+    
+    Args:
+        kg: Dictionnaire du graphe (ignoré si stats est fourni)
+        dataset_info: Dictionnaire avec info sur le dataset
+        stats: Statistiques déjà calculées (ex: restaurées depuis le snapshot)
+    """
+    if stats is None:
+        stats = get_graph_statistics(kg)
+    
+    dataset_type = "FILTRÉ" if dataset_info and dataset_info.get('type') == 'filtered' else "COMPLET"
+    
+    print('\n=== Statistiques du Graphe ===')
+    print(f'Type de dataset: {dataset_type}')
+    if dataset_info:
+        if 'n_entity' in dataset_info:
+            print(f'Entités totales: {dataset_info["n_entity"]}')
+        if 'n_relation' in dataset_info:
+            print(f'Types de relations: {dataset_info["n_relation"]}')
+    print(f'Nombre de nœuds: {stats["nombre_noeuds"]}')
+    print(f'Nombre d\'arêtes: {stats["nombre_aretes"]}')
+    print(f'Nombre de types de relations: {stats["nombre_relations"]}')
+    print(f'Degré moyen: {stats["degre_moyen"]:.2f}')
+    print(f'Degré maximum: {stats["degre_max"]}')
+    print(f'Degré minimum: {stats["degre_min"]}')
+    if 'composantes_connexes' in stats:
+        print(f'Composantes connexes: {stats["composantes_connexes"]} '
+              f'(plus grande: {stats["plus_grande_composante"]} nœuds)')
+    print(f'\nDistribution des relations:')
+    relation_names = {
+        0: 'listened_to (user -> artist)',
+        1: 'listened_by (artist -> user)',
+        2: 'similar_to (artist -> artist)',
+        3: 'similar_from (artist -> artist reverse)'
+    }
+    for relation, count in sorted(stats['distribution_relations'].items()):
+        relation_name = relation_names.get(relation, f'Relation {relation}')
+        print(f'  {relation_name}: {count} occurrences')
+    print('=' * 30 + '\n')
@@ -7,9 +7,28 @@ import networkx as nx
 import numpy as np
 from collections import defaultdict
 import os
+from graph_stats import get_graph_statistics, print_graph_statistics  # noqa: F401 (compatibilité)
+from explain import explain_paths
 
 
-def visualize_graph_structure(kg, output_file='graph_structure.png', dataset_info=None, max_nodes=50):
+def node_labels(nodes, entity_mapping=None):
+    """
+    Libellés des nœuds: noms d'artistes si les correspondances sont disponibles, sinon l'index
+    
+    Args:
+        nodes: Itérable d'indices d'entités
+        entity_mapping: EntityMapping (optionnel)
+    
+    Returns:
+        Dictionnaire {node: label}
+    """
+    if entity_mapping is None:
+        return {node: str(node) for node in nodes}
+    return {node: entity_mapping.entity_label(node) for node in nodes}
+
+
+def visualize_graph_structure(kg, output_file='graph_structure.png', dataset_info=None, max_nodes=50,
+                              entity_mapping=None):
     """
     Visualiser la structure générale du graphe de connaissances
     Montre les artistes, utilisateurs et leurs relations de manière claire
@@ -19,6 +38,7 @@ def visualize_graph_structure(kg, output_file='graph_structure.png', dataset_inf
         output_file: Nom du fichier de sortie
         dataset_info: Dictionnaire avec info sur le dataset
         max_nodes: Nombre maximum de nœuds à afficher
+        entity_mapping: EntityMapping pour afficher les noms (optionnel)
     """
     print(f'Création de la visualisation de la structure du graphe...')
     
@@ -114,7 +134,7 @@ def visualize_graph_structure(kg, output_file='graph_structure.png', dataset_inf
     
     # Labels seulement pour les nœuds importants
     if G.number_of_nodes() <= 30:
-        labels = {node: str(node) for node in G.nodes()}
+        labels = node_labels(G.nodes(), entity_mapping)
         nx.draw_networkx_labels(G, pos, labels, font_size=7)
     
     # Titre
@@ -149,7 +169,7 @@ def visualize_graph_structure(kg, output_file='graph_structure.png', dataset_inf
 
 
 def visualize_relation_type(kg, relation_type, output_file='relation_visualization.png', 
-                           dataset_info=None, max_nodes=50):
+                           dataset_info=None, max_nodes=50, entity_mapping=None):
     """
     Visualiser un seul type de relation pour plus de clarté
     
@@ -159,6 +179,7 @@ def visualize_relation_type(kg, relation_type, output_file='relation_visualizati
         output_file: Nom du fichier de sortie
         dataset_info: Informations sur le dataset
         max_nodes: Nombre maximum de nœuds
+        entity_mapping: EntityMapping pour afficher les noms (optionnel)
     """
     relation_names = {
         0: 'listened_to (user → artist)',
@@ -325,7 +346,7 @@ def visualize_relation_type(kg, relation_type, output_file='relation_visualizati
     
     # Labels
     if G.number_of_nodes() <= 30:
-        labels = {node: str(node) for node in G.nodes()}
+        labels = node_labels(G.nodes(), entity_mapping)
         nx.draw_networkx_labels(G, pos, labels, font_size=8)
     
     # Titre avec validation
@@ -352,7 +373,7 @@ def visualize_relation_type(kg, relation_type, output_file='relation_visualizati
     plt.close()
 
 
-def visualize_all_relations(kg, output_dir='.', dataset_info=None, max_nodes=50):
+def visualize_all_relations(kg, output_dir='.', dataset_info=None, max_nodes=50, entity_mapping=None):
     """
     Créer une visualisation pour chaque type de relation
     
@@ -361,6 +382,7 @@ def visualize_all_relations(kg, output_dir='.', dataset_info=None, max_nodes=50)
         output_dir: Répertoire de sortie
         dataset_info: Informations sur le dataset
         max_nodes: Nombre maximum de nœuds par visualisation
+        entity_mapping: EntityMapping pour afficher les noms (optionnel)
     """
     print('\n=== Génération des visualisations par type de relation ===')
     
@@ -375,109 +397,86 @@ def visualize_all_relations(kg, output_dir='.', dataset_info=None, max_nodes=50)
     for relation_type in [0, 1, 2, 3]:
         relation_name = relation_names[relation_type]
         output_file = os.path.join(output_dir, f'graph_relation_{relation_name}.png')
-        visualize_relation_type(kg, relation_type, output_file, dataset_info, max_nodes)
+        visualize_relation_type(kg, relation_type, output_file, dataset_info, max_nodes, entity_mapping)
         output_files.append(output_file)
     
     return output_files
 
 
-def get_graph_statistics(kg):
+def visualize_algorithm_result(kg, algorithm_name, result, start_nodes=None, 
+                               output_file='algorithm_result.png', dataset_info=None,
+                               entity_mapping=None, max_paths=10):
     """
-    Obtenir des statistiques sur le graphe
+    Visualiser les chemins qui expliquent les premières recommandations d'un algorithme
     
     Args:
-        kg: Dictionnaire {head: [(tail, relation, weight), ...]}
+        kg: Dictionnaire du graphe {head: [(tail, relation, weight), ...]} (non parcouru: les
+            chemins viennent de result['predecessors'])
+        algorithm_name: Nom de l'algorithme
+        result: Résultat de run_algorithm lancé avec record_paths=True
+        start_nodes: Nœuds de départ (artistes écoutés), pour la couleur
+        output_file: Fichier de sortie
+        dataset_info: Informations sur le dataset
+        entity_mapping: EntityMapping pour afficher les noms (optionnel)
+        max_paths: Nombre de recommandations expliquées
     
     Returns:
-        Dictionnaire avec les statistiques
+        Liste des explications dessinées (voir explain.explain_paths), None sans prédécesseurs
     """
-    all_nodes = set()
-    all_edges = []
-    node_degrees = defaultdict(int)
-    relation_counts = defaultdict(int)
+    print(f'Visualisation du résultat de {algorithm_name}...')
+    predecessors = result.get('predecessors')
+    if predecessors is None:
+        print('Pas de chemins dans le résultat: relancer l\'algorithme avec record_paths=True')
+        return None
     
-    for head, tails in kg.items():
-        all_nodes.add(head)
-        for tail_info in tails:
-            if len(tail_info) == 3:
-                tail, relation, weight = tail_info
-            else:
-                tail, relation = tail_info
-                weight = 1
-            
-            all_nodes.add(tail)
-            all_edges.append((head, tail, relation, weight))
-            node_degrees[head] += 1
-            node_degrees[tail] += 1
-            relation_counts[relation] += 1
-    
-    degrees = list(node_degrees.values())
-    
-    stats = {
-        'nombre_noeuds': len(all_nodes),
-        'nombre_aretes': len(all_edges),
-        'nombre_relations': len(relation_counts),
-        'degre_moyen': np.mean(degrees) if degrees else 0,
-        'degre_max': max(degrees) if degrees else 0,
-        'degre_min': min(degrees) if degrees else 0,
-        'distribution_relations': dict(relation_counts)
-    }
+    items = [artist for artist, _ in result['recommendations'][:max_paths]]
+    explanations = [explanation for explanation in explain_paths(predecessors, items, entity_mapping)
+                    if explanation is not None]
     
-    return stats
-
-
-def print_graph_statistics(kg, dataset_info=None):
-    """
-    Afficher les statistiques du graphe en français
+    G = nx.DiGraph()
+    for explanation in explanations:
+        G.add_node(explanation['path'][0])
+        for head, tail, relation in zip(explanation['path'], explanation['path'][1:],
+                                        explanation['relations']):
+            G.add_edge(head, tail, relation=relation)
     
-    Args:
-        kg: Dictionnaire du graphe
-        dataset_info: Dictionnaire avec info sur le dataset
-    """
-    stats = get_graph_statistics(kg)
+    print(f'Visualisation: {len(explanations)} chemins, {G.number_of_nodes()} nœuds')
     
-    dataset_type = "FILTRÉ" if dataset_info and dataset_info.get('type') == 'filtered' else "COMPLET"
+    plt.figure(figsize=(14, 10))
+    pos = nx.spring_layout(G, k=1.5, iterations=50, seed=42)
     
-    print('\n=== Statistiques du Graphe ===')
-    print(f'Type de dataset: {dataset_type}')
+    # Artistes écoutés, recommandés et intermédiaires
+    sources = set(start_nodes) if start_nodes is not None else {e['source'] for e in explanations}
+    recommended = {explanation['artist'] for explanation in explanations}
+    node_colors = []
+    for node in G.nodes():
+        if node in sources:
+            node_colors.append('orange')
+        elif node in recommended:
+            node_colors.append('lightgreen')
+        else:
+            node_colors.append('lightgray')
+    nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=500, alpha=0.9)
+    nx.draw_networkx_edges(G, pos, edge_color='gray', arrows=True, arrowsize=12, width=1.2)
+    nx.draw_networkx_labels(G, pos, node_labels(G.nodes(), entity_mapping), font_size=7)
+    nx.draw_networkx_edge_labels(G, pos, {(u, v): G[u][v]['relation'] for u, v in G.edges()}, font_size=6)
+    
+    title = f'{algorithm_name.upper()}: chemins des {len(explanations)} premières recommandations'
     if dataset_info:
-        if 'n_entity' in dataset_info:
-            print(f'Entités totales: {dataset_info["n_entity"]}')
-        if 'n_relation' in dataset_info:
-            print(f'Types de relations: {dataset_info["n_relation"]}')
-    print(f'Nombre de nœuds: {stats["nombre_noeuds"]}')
-    print(f'Nombre d\'arêtes: {stats["nombre_aretes"]}')
-    print(f'Nombre de types de relations: {stats["nombre_relations"]}')
-    print(f'Degré moyen: {stats["degre_moyen"]:.2f}')
-    print(f'Degré maximum: {stats["degre_max"]}')
-    print(f'Degré minimum: {stats["degre_min"]}')
-    print(f'\nDistribution des relations:')
-    relation_names = {
-        0: 'listened_to (user -> artist)',
-        1: 'listened_by (artist -> user)',
-        2: 'similar_to (artist -> artist)',
-        3: 'similar_from (artist -> artist reverse)'
-    }
-    for relation, count in sorted(stats['distribution_relations'].items()):
-        relation_name = relation_names.get(relation, f'Relation {relation}')
-        print(f'  {relation_name}: {count} occurrences')
-    print('=' * 30 + '\n')
-
-
-def visualize_algorithm_result(kg, algorithm_name, result, start_nodes=None, 
-                               output_file='algorithm_result.png', dataset_info=None):
-    """
-    Visualiser le résultat d'un algorithme spécifique
-    (Conservé pour les algorithmes futurs)
+        title += '\nDataset filtré' if dataset_info.get('type') == 'filtered' else '\nDataset complet'
+    plt.title(title, fontsize=11, fontweight='bold')
+    plt.axis('off')
     
-    Args:
-        kg: Dictionnaire du graphe {head: [(tail, relation, weight), ...]}
-        algorithm_name: Nom de l'algorithme
-        result: Résultat de l'algorithme
-        start_nodes: Nœuds de départ
-        output_file: Fichier de sortie
-        dataset_info: Informations sur le dataset
-    """
-    print(f'Visualisation du résultat de {algorithm_name}...')
-    # Cette fonction sera implémentée quand les algorithmes seront prêts
-    pass
+    from matplotlib.patches import Patch
+    legend_elements = [
+        Patch(facecolor='orange', label='Artiste écouté'),
+        Patch(facecolor='lightgreen', label='Artiste recommandé'),
+        Patch(facecolor='lightgray', label='Intermédiaire'),
+    ]
+    plt.legend(handles=legend_elements, loc='upper left', fontsize=9, framealpha=0.9)
+    
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=200, bbox_inches='tight')
+    print(f'Visualisation sauvegardée dans: {output_file}')
+    plt.close()
+    return explanations
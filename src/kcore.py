@@ -0,0 +1,215 @@
+"""
+Décomposition en k-cores du graphe biparti utilisateurs-artistes et sélection de sous-ensembles denses
+
+Le k-core est le plus grand sous-graphe où chaque utilisateur a écouté au moins k artistes du
+sous-graphe et chaque artiste a au moins k auditeurs du sous-graphe. Les cores sont obtenus par
+épluchage vectorisé: à chaque tour, tous les nœuds de degré < k sont retirés ensemble et les degrés
+de leurs voisins diminués par np.bincount sur les arêtes retirées.
+
+kcore_selection remplace le top-N indépendant de preprocess.filter_raw_data (--reduce_method kcore):
+elle garde un k-core de la taille demandée, puis sa plus grande composante connexe.
+
+Usage (depuis src/):
+    python kcore.py --max_users 500 --max_artists 2000     # comparer top-N et k-core, sans rien écrire
+"""
+import argparse
+import os
+import time
+import numpy as np
+
+from graph_kernels import get_backend
+
+# Sélections de preprocess.filter_raw_data (--reduce_method)
+REDUCE_METHODS = ['top', 'kcore']
+
+
+def core_numbers(user_idx, artist_idx, n_users, n_artists):
+    """
+    Nombre de core de chaque nœud: le plus grand k tel que le nœud appartient au k-core
+
+    Args:
+        user_idx, artist_idx: Arêtes (utilisateur, artiste) en index compacts, sans doublons
+        n_users, n_artists: Nombre d'utilisateurs et d'artistes
+
+    Returns:
+        tuple: (cores des utilisateurs, cores des artistes), arrays int64 (0 pour un nœud isolé)
+    """
+    n_nodes = n_users + n_artists
+    heads = np.asarray(user_idx, dtype=np.int64)
+    tails = np.asarray(artist_idx, dtype=np.int64) + n_users
+    degree = np.bincount(heads, minlength=n_nodes) + np.bincount(tails, minlength=n_nodes)
+    core = np.zeros(n_nodes, dtype=np.int64)
+    alive = degree > 0
+    edges = np.arange(len(heads))
+    k = 0
+
+    while alive.any():
+        # Aucun nœud ne tombe avant le niveau degré minimum + 1
+        k = max(k + 1, int(degree[alive].min()) + 1)
+        while True:
+            low = alive & (degree < k)
+            if not low.any():
+                break
+            core[low] = k - 1
+            alive[low] = False
+            removed = ~(alive[heads[edges]] & alive[tails[edges]])
+            gone = edges[removed]
+            edges = edges[~removed]
+            degree -= np.bincount(heads[gone], minlength=n_nodes) + np.bincount(tails[gone], minlength=n_nodes)
+    return core[:n_users], core[n_users:]
+
+
+def _top_by_degree(degree, candidates, limit):
+    """limit candidats de plus fort degré (ex aequo: plus petit index)"""
+    if len(candidates) <= limit:
+        return candidates
+    order = np.lexsort((candidates, -degree[candidates]))
+    return np.sort(candidates[order[:limit]])
+
+
+def _kept_edges(user_idx, artist_idx, users, artists):
+    return users[user_idx] & artists[artist_idx]
+
+
+def kcore_selection(user_ids, artist_ids, max_users, max_artists, min_degree=2):
+    """
+    Sous-ensemble dense et connexe d'au plus max_users utilisateurs et max_artists artistes
+
+    1. k = plus grand niveau dont le k-core contient au moins max_users utilisateurs et
+       max_artists artistes (tout le graphe si la demande dépasse sa taille);
+    2. dans ce core, garder les max_users utilisateurs puis les max_artists artistes de plus fort
+       degré (degré des artistes compté sur les utilisateurs gardés);
+    3. éplucher le résultat au niveau min_degree et garder sa plus grande composante connexe
+       (en nombre d'interactions).
+
+    Args:
+        user_ids, artist_ids: Arêtes (utilisateur, artiste) en ids Last.fm, sans doublons
+        max_users, max_artists: Taille demandée
+        min_degree: Degré minimal de chaque nœud gardé, des deux côtés
+
+    Returns:
+        tuple: (set des ids d'utilisateurs, set des ids d'artistes, dict d'informations)
+    """
+    users, user_idx = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+    artists, artist_idx = np.unique(np.asarray(artist_ids, dtype=np.int64), return_inverse=True)
+    n_users, n_artists = len(users), len(artists)
+    user_core, artist_core = core_numbers(user_idx, artist_idx, n_users, n_artists)
+
+    # Étape 1: le core le plus dense assez grand pour la demande
+    k = 1
+    if n_users and n_artists:
+        user_level = np.sort(user_core)[::-1][min(max_users, n_users) - 1]
+        artist_level = np.sort(artist_core)[::-1][min(max_artists, n_artists) - 1]
+        k = max(1, int(min(user_level, artist_level)))
+    kept_users, kept_artists = user_core >= k, artist_core >= k
+
+    # Étape 2: ramener le core à la taille demandée
+    edges = _kept_edges(user_idx, artist_idx, kept_users, kept_artists)
+    degree = np.bincount(user_idx[edges], minlength=n_users)
+    selected = _top_by_degree(degree, np.flatnonzero(kept_users), max_users)
+    kept_users = np.zeros(n_users, dtype=bool)
+    kept_users[selected] = True
+    edges = _kept_edges(user_idx, artist_idx, kept_users, kept_artists)
+    degree = np.bincount(artist_idx[edges], minlength=n_artists)
+    selected = _top_by_degree(degree, np.flatnonzero(kept_artists & (degree > 0)), max_artists)
+    kept_artists = np.zeros(n_artists, dtype=bool)
+    kept_artists[selected] = True
+
+    # Étape 3: retirer les nœuds devenus trop peu connectés, puis les petites composantes
+    edges = np.flatnonzero(_kept_edges(user_idx, artist_idx, kept_users, kept_artists))
+    sub_user_core, sub_artist_core = core_numbers(user_idx[edges], artist_idx[edges], n_users, n_artists)
+    kept_users &= sub_user_core >= min_degree
+    kept_artists &= sub_artist_core >= min_degree
+    edges = np.flatnonzero(_kept_edges(user_idx, artist_idx, kept_users, kept_artists))
+    if len(edges):
+        labels = get_backend().connected_components(n_users + n_artists, user_idx[edges],
+                                                    artist_idx[edges] + n_users)
+        largest = np.argmax(np.bincount(labels[user_idx[edges]]))
+        kept_users &= labels[:n_users] == largest
+        kept_artists &= labels[n_users:] == largest
+
+    selected_users, selected_artists = users[kept_users], artists[kept_artists]
+    info = dict(selection_stats(user_ids, artist_ids, selected_users, selected_artists), k=k)
+    return set(selected_users.tolist()), set(selected_artists.tolist()), info
+
+
+def selection_stats(user_ids, artist_ids, selected_users, selected_artists):
+    """
+    Statistiques d'une sélection d'utilisateurs et d'artistes sur les arêtes brutes
+
+    Returns:
+        dict: users, artists, interactions, density, min/médiane du nombre d'artistes par
+              utilisateur, users_below_2 (utilisateurs avec moins de 2 artistes gardés),
+              components (composantes connexes du sous-graphe)
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    artist_ids = np.asarray(artist_ids, dtype=np.int64)
+    selected_users = np.unique(np.asarray(list(selected_users), dtype=np.int64))
+    selected_artists = np.unique(np.asarray(list(selected_artists), dtype=np.int64))
+    keep = np.isin(user_ids, selected_users) & np.isin(artist_ids, selected_artists)
+    n_users, n_artists = len(selected_users), len(selected_artists)
+    user_idx = np.searchsorted(selected_users, user_ids[keep])
+    artist_idx = np.searchsorted(selected_artists, artist_ids[keep])
+    per_user = np.bincount(user_idx, minlength=n_users)
+    labels = get_backend().connected_components(n_users + n_artists, user_idx, artist_idx + n_users)
+    return {
+        'users': n_users,
+        'artists': n_artists,
+        'interactions': int(keep.sum()),
+        'density': round(float(keep.sum()) / max(n_users * n_artists, 1), 4),
+        'min_artists_per_user': int(per_user.min()) if n_users else 0,
+        'median_artists_per_user': float(np.median(per_user)) if n_users else 0.0,
+        'users_below_2': int((per_user < 2).sum()),
+        'components': len(np.unique(labels)),
+    }
+
+
+def top_n_selection(user_ids, artist_ids, weights, max_users, max_artists):
+    """Sélection de filter_raw_data --reduce_method top: utilisateurs par nombre d'écoutes, artistes par poids total"""
+    users, user_counts = np.unique(np.asarray(user_ids, dtype=np.int64), return_counts=True)
+    artists, artist_idx = np.unique(np.asarray(artist_ids, dtype=np.int64), return_inverse=True)
+    artist_weights = np.bincount(artist_idx, weights=weights, minlength=len(artists))
+    # Même ordre que le tri stable décroissant de filter_raw_data (ex aequo: première apparition)
+    return (set(users[_stable_top(user_counts, _first_seen(user_ids, users), max_users)].tolist()),
+            set(artists[_stable_top(artist_weights, _first_seen(artist_ids, artists), max_artists)].tolist()))
+
+
+def _first_seen(ids, unique_ids):
+    first = np.full(len(unique_ids), len(ids), dtype=np.int64)
+    np.minimum.at(first, np.searchsorted(unique_ids, ids), np.arange(len(ids)))
+    return first
+
+
+def _stable_top(values, first_seen, limit):
+    return np.lexsort((first_seen, -values))[:limit]
+
+
+def read_user_artists(raw_data_path):
+    """Arêtes de user_artists.dat: (user_ids, artist_ids, weights) en int64"""
+    data = np.loadtxt(os.path.join(raw_data_path, 'user_artists.dat'), dtype=np.int64, skiprows=1, ndmin=2)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparer les sélections top-N et k-core des données brutes')
+    parser.add_argument('--raw_data_path', type=str, default='../rawdata/music')
+    parser.add_argument('--max_users', type=int, default=50)
+    parser.add_argument('--max_artists', type=int, default=100)
+    parser.add_argument('--min_degree', type=int, default=2)
+    args = parser.parse_args()
+
+    user_ids, artist_ids, weights = read_user_artists(args.raw_data_path)
+    print(f'{len(user_ids)} interactions, {len(np.unique(user_ids))} utilisateurs, '
+          f'{len(np.unique(artist_ids))} artistes')
+
+    start = time.perf_counter()
+    users, artists = top_n_selection(user_ids, artist_ids, weights, args.max_users, args.max_artists)
+    print(f'top-N ({time.perf_counter() - start:.2f} s): {selection_stats(user_ids, artist_ids, users, artists)}')
+
+    start = time.perf_counter()
+    _, _, info = kcore_selection(user_ids, artist_ids, args.max_users, args.max_artists, args.min_degree)
+    print(f'k-core ({time.perf_counter() - start:.2f} s): {info}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,18 @@ Point d'entrée principal pour les algorithmes graph classiques
 """
 import argparse
 import os
-from graph_loader import load_kg, load_ratings, get_user_history
-from graph_visualizer import visualize_graph_structure, visualize_all_relations, print_graph_statistics
+from graph_loader import load_kg, load_kg_array, load_ratings, get_user_history
+from graph_snapshot import load_snapshot
+from graph_stats import print_graph_statistics
+from entity_mapping import load_entity_mapping
+from graph_algorithms import run_algorithm
+from graph_csr import build_csr, CSRAdjacency
+from graph_kernels import KERNEL_BACKENDS
+from explain import explain_paths
+from ppr import build_transition, personalized_pagerank, top_k, artist_mask
+from profiling import span, enable_profiling, write_trace
+from batch_query import run_batch, BATCH_QUERIES
+from engine import SIMILAR_METHODS
 
 # Configuration par défaut
 DATA_PATH = '../final_data'  # Chemin vers les données traitées
@@ -12,29 +22,109 @@ RAW_DATA_PATH = '../rawdata'  # Chemin vers les données brutes
 DEFAULT_DATASET = 'music'
 
 
+def run_ppr(csr, start_nodes, metadata, args):
+    """
+    PageRank personnalisé depuis les artistes écoutés (résultat au format de run_algorithm)
+    """
+    transition = build_transition(csr)
+    scores, iterations = personalized_pagerank(transition, start_nodes, alpha=args.alpha, tol=args.ppr_tol)
+    print(f"PPR convergé en {iterations} itérations")
+    candidates = artist_mask(csr.n_nodes, metadata.get('n_artists_actual'), csr)
+    recommendations = top_k(scores, args.top_k, exclude=start_nodes, candidate_mask=candidates)
+    return {'scores': scores, 'recommendations': recommendations, 'n_visited': int((scores > 0).sum())}
+
+
 def main():
     parser = argparse.ArgumentParser(description='Graph Algorithms: BFS, Dijkstra, Prim')
     parser.add_argument('--dataset', type=str, default=DEFAULT_DATASET,
                        help='Dataset name (e.g., music, movie, product)')
     parser.add_argument('--algorithm', type=str, default='bfs',
-                       choices=['bfs', 'dijkstra', 'prim'],
+                       choices=['bfs', 'dijkstra', 'prim', 'ppr'],
                        help='Algorithme à utiliser')
     parser.add_argument('--max_hops', type=int, default=2,
                        help='Nombre maximum de hops pour BFS')
+    parser.add_argument('--kernel_backend', type=str, default='numpy', choices=KERNEL_BACKENDS,
+                       help='Noyaux de BFS/Dijkstra/Prim sur le snapshot CSR (numba: ~1 s de chargement, '
+                            'rentable sur de nombreuses requêtes; auto: numba si installé, sinon numpy)')
     parser.add_argument('--user_id', type=int, default=0,
                        help='ID de l\'utilisateur à analyser')
     parser.add_argument('--visualize', action='store_true',
                        help='Visualiser le graphe')
+    parser.add_argument('--explain', action='store_true',
+                       help='Afficher le chemin depuis un artiste écouté pour chaque recommandation (bfs, dijkstra, prim)')
     parser.add_argument('--max_nodes', type=int, default=100,
                        help='Nombre maximum de nœuds à visualiser')
+    parser.add_argument('--stats', action='store_true',
+                       help='Afficher les statistiques du graphe')
+    parser.add_argument('--no_snapshot', action='store_true',
+                       help='Relire les fichiers texte au lieu du snapshot graph_snapshot.npz')
     parser.add_argument('--use_small', action='store_true',
                        help='Utiliser le dataset réduit (kg_final_small.txt)')
+    parser.add_argument('--alpha', type=float, default=0.15,
+                       help='Probabilité de redémarrage pour PPR')
+    parser.add_argument('--ppr_tol', type=float, default=1e-8,
+                       help='Tolérance de convergence pour PPR (norme L1)')
+    parser.add_argument('--top_k', type=int, default=10,
+                       help='Nombre de recommandations à afficher')
+    parser.add_argument('--profile', type=str, default=None,
+                       help='Écrire une trace JSON des temps/mémoire par étape dans ce fichier')
+    parser.add_argument('--serve', action='store_true',
+                       help='Lancer le serveur de recommandation (graphe chargé une seule fois)')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                       help='Adresse d\'écoute du serveur')
+    parser.add_argument('--port', type=int, default=8080,
+                       help='Port d\'écoute du serveur')
+    parser.add_argument('--unix_socket', type=str, default=None,
+                       help='Écouter sur un socket Unix au lieu de TCP')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Threads de calcul du serveur (défaut: nombre de CPU)')
+    parser.add_argument('--batch_window_ms', type=float, default=2.0,
+                       help='Fenêtre de regroupement des requêtes concurrentes (ms)')
+    parser.add_argument('--max_batch', type=int, default=64,
+                       help='Nombre maximum de requêtes par lot')
+    parser.add_argument('--batch', type=str, default=None,
+                       help='Fichier d\'ids (un par ligne, - = stdin) traités par lots, résultats en JSONL')
+    parser.add_argument('--batch_output', type=str, default=None,
+                       help='Fichier JSONL de sortie du mode --batch (défaut: stdout)')
+    parser.add_argument('--batch_size', type=int, default=64,
+                       help='Nombre d\'ids par appel au moteur en mode --batch')
+    parser.add_argument('--query', type=str, default='recommend', choices=BATCH_QUERIES,
+                       help='Mode --batch: recommandations par utilisateur ou artistes similaires')
+    parser.add_argument('--similar_method', type=str, default='ppr', choices=SIMILAR_METHODS,
+                       help='Méthode des requêtes --query similar')
     
     args = parser.parse_args()
     
+    if args.serve:
+        from server import run_server
+        run_server(DATA_PATH, args.dataset, use_small=args.use_small, host=args.host, port=args.port,
+                   unix_socket=args.unix_socket, workers=args.workers,
+                   window_ms=args.batch_window_ms, max_batch=args.max_batch)
+        return
+    
+    if args.profile:
+        enable_profiling(command='main')
+
+    if args.batch:
+        # Un seul moteur chargé pour toute l'entrée, JSONL sur stdout (messages sur stderr)
+        run_batch(DATA_PATH, args.dataset, args.batch, args.batch_output, use_small=args.use_small,
+                  alpha=args.alpha, ppr_tol=args.ppr_tol, query=args.query, algorithm=args.algorithm,
+                  k=args.top_k, batch_size=args.batch_size, method=args.similar_method, max_hops=args.max_hops)
+        if args.profile:
+            write_trace(args.profile)
+        return
+    
     # Charger le graphe (retourne maintenant metadata aussi)
     print(f"Chargement du graphe pour le dataset: {args.dataset}")
-    n_entity, n_relation, kg, metadata = load_kg(DATA_PATH, args.dataset, use_small=args.use_small)
+    snapshot = None
+    if args.no_snapshot:
+        n_entity, n_relation, kg, metadata = load_kg(DATA_PATH, args.dataset, use_small=args.use_small)
+    else:
+        # CSR, historiques et statistiques restaurés d'un seul fichier (reconstruit si périmé)
+        snapshot = load_snapshot(DATA_PATH, args.dataset, use_small=args.use_small)
+        n_entity, n_relation, metadata = snapshot.n_entity, snapshot.n_relation, snapshot.metadata
+        kg = CSRAdjacency(snapshot.csr)
+        print(f'Graphe de connaissances chargé: {n_entity} entités, {n_relation} relations')
     
     # Utiliser metadata pour déterminer le type de dataset
     if metadata:
@@ -64,20 +154,31 @@ def main():
         **metadata  # Inclure toutes les métadonnées
     }
     
-    # Afficher les statistiques du graphe
-    print_graph_statistics(kg, dataset_info)
+    # Afficher les statistiques du graphe (sur demande)
+    if args.stats:
+        print_graph_statistics(kg, dataset_info, stats=snapshot.stats if snapshot else None)
     
     # Charger les ratings (optionnel)
-    try:
-        ratings = load_ratings(DATA_PATH, args.dataset, use_small=args.use_small)
-        user_history = get_user_history(ratings)
+    if snapshot is not None:
+        user_history = snapshot.user_history
         print(f"Ratings chargés pour {len(user_history)} utilisateurs")
-    except Exception as e:
-        print(f"Impossible de charger les ratings: {e}")
-        user_history = {}
+    else:
+        try:
+            ratings = load_ratings(DATA_PATH, args.dataset, use_small=args.use_small)
+            user_history = get_user_history(ratings)
+            print(f"Ratings chargés pour {len(user_history)} utilisateurs")
+        except Exception as e:
+            print(f"Impossible de charger les ratings: {e}")
+            user_history = {}
+    
+    # Correspondances index -> noms (générées par preprocess.py)
+    entity_mapping = load_entity_mapping(DATA_PATH, args.dataset)
     
     # Visualiser le graphe si demandé
     if args.visualize:
+        # Import tardif: matplotlib et networkx ne sont chargés que pour tracer
+        from graph_visualizer import visualize_graph_structure, visualize_all_relations
+        
         print("\n=== Génération des visualisations ===")
         
         output_dir = f'../final_data/{args.dataset}'
@@ -88,17 +189,60 @@ def main():
         visualize_graph_structure(kg, 
                                  output_file=os.path.join(output_dir, 'graph_structure.png'),
                                  dataset_info=dataset_info,
-                                 max_nodes=args.max_nodes)
+                                 max_nodes=args.max_nodes,
+                                 entity_mapping=entity_mapping)
         
         # 2. Visualisations par type de relation
         print("\n2. Visualisations par type de relation...")
         visualize_all_relations(kg, 
                                output_dir=output_dir,
                                dataset_info=dataset_info,
-                               max_nodes=args.max_nodes)
+                               max_nodes=args.max_nodes,
+                               entity_mapping=entity_mapping)
+    
+    # Exécuter l'algorithme depuis les artistes écoutés par l'utilisateur
+    start_nodes = list(user_history.get(args.user_id, []))
+    if not start_nodes:
+        print(f"Aucun historique pour l'utilisateur {args.user_id}, algorithme ignoré")
+    else:
+        print(f"\n=== Algorithme: {args.algorithm.upper()} (utilisateur {args.user_id}, {len(start_nodes)} artistes écoutés) ===")
+        with span(f'algorithm.{args.algorithm}', start_nodes=len(start_nodes)) as counts:
+            if args.algorithm == 'ppr':
+                if snapshot is not None:
+                    csr = snapshot.csr
+                else:
+                    kg_np = load_kg_array(DATA_PATH, args.dataset, use_small=args.use_small)
+                    csr = build_csr(kg_np, n_nodes=max(n_entity, int(kg_np[:, [0, 2]].max()) + 1))
+                result = run_ppr(csr, start_nodes, metadata, args)
+            else:
+                # Prédécesseurs enregistrés seulement s'ils servent (explications ou tracé)
+                result = run_algorithm(args.algorithm, kg, start_nodes, max_hops=args.max_hops,
+                                       top_k=args.top_k, backend=args.kernel_backend,
+                                       record_paths=args.explain or args.visualize)
+            counts['visited'] = result['n_visited']
+            counts['recommendations'] = len(result['recommendations'])
+        print(f"Nœuds visités: {result['n_visited']}")
+        print(f"Top {args.top_k} recommandations:")
+        explanations = [None] * len(result['recommendations'])
+        if args.explain and 'predecessors' in result:
+            explanations = explain_paths(result['predecessors'], [artist for artist, _ in result['recommendations']],
+                                         entity_mapping)
+        elif args.explain:
+            print("  (pas d'explication de chemin pour PPR)")
+        for rank, ((artist, score), explanation) in enumerate(zip(result['recommendations'], explanations), 1):
+            name = f" - {entity_mapping.entity_label(artist)}" if entity_mapping else ""
+            print(f"  {rank}. Artiste {artist}{name} (score: {score:.4g})")
+            if explanation is not None:
+                print(f"       {explanation['text']}")
+
+        if args.visualize and 'predecessors' in result:
+            from graph_visualizer import visualize_algorithm_result
+            visualize_algorithm_result(kg, args.algorithm, result, start_nodes,
+                                       output_file=os.path.join(output_dir, f'algorithm_{args.algorithm}.png'),
+                                       dataset_info=dataset_info, entity_mapping=entity_mapping)
     
-    #TODO: Implement the algorithm
-    # Les algorithmes qu'on a fait : BFS, Dijkstra, Prim, etc...
+    if args.profile:
+        write_trace(args.profile)
 
 
 if __name__ == '__main__':
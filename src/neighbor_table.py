@@ -0,0 +1,244 @@
+"""
+Table dense des k plus proches voisins de chaque artiste par co-écoute
+
+preprocess_music écrit final_data/{dataset}/neighbors/:
+    ids.npy     int32 (n_artists, k): voisins triés par score décroissant, -1 en fin de ligne
+    scores.npy  float32 (n_artists, k): score de chaque voisin (0 pour -1)
+    table.json  k, score, signature des fichiers sources (écrit en dernier)
+Les voisins sont ceux des relations similar_to / similar_from (paires au-dessus du seuil
+min_co_listens), classés par nombre de co-écoutes ('count') ou par similarité normalisée par le
+nombre d'auditeurs des deux artistes ('cosine', 'jaccard').
+
+Une requête "artistes similaires" devient une lecture des lignes demandées (NeighborTable.similar_artists),
+sans parcourir les listes d'adjacence.
+"""
+import json
+import os
+import numpy as np
+
+from profiling import span
+
+TABLE_VERSION = 1
+NEIGHBOR_SCORES = ['count', 'cosine', 'jaccard']
+# Taille maximale (lignes x colonnes) d'un bloc de lignes complété pour np.partition
+PARTITION_BLOCK = 1 << 22
+
+
+def pair_scores(artist1, artist2, counts, listeners, score='count'):
+    """
+    Score de chaque paire d'artistes
+
+    Args:
+        artist1, artist2, counts: Paires et nombres de co-écoutes (co_listen.co_listen_counts)
+        listeners: Nombre d'auditeurs de chaque artiste
+        score: 'count' (co-écoutes), 'cosine' (c / sqrt(n1 * n2)) ou 'jaccard' (c / (n1 + n2 - c))
+
+    Returns:
+        Array float64 aligné sur les paires
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    if score == 'count':
+        return counts
+    n1 = np.asarray(listeners, dtype=np.float64)[artist1]
+    n2 = np.asarray(listeners, dtype=np.float64)[artist2]
+    if score == 'cosine':
+        return counts / np.sqrt(np.maximum(n1 * n2, 1.0))
+    if score == 'jaccard':
+        return counts / np.maximum(n1 + n2 - counts, 1.0)
+    raise ValueError(f'Score inconnu: {score} (choix: {NEIGHBOR_SCORES})')
+
+
+def top_k_table(heads, tails, scores, n_rows, k):
+    """
+    k meilleurs tails de chaque head (score décroissant, puis tail croissant en cas d'égalité)
+
+    Les arêtes des lignes de degré <= k sont triées ensemble. Les autres lignes sont regroupées par
+    degré voisin en blocs denses (lignes x degré maximal du bloc <= PARTITION_BLOCK) sur lesquels
+    np.partition donne le k-ième score de chaque ligne en une fois; seuls les k gardés sont triés.
+
+    Args:
+        heads, tails, scores: Arêtes (une entrée par sens)
+        n_rows: Nombre de lignes de la table
+        k: Nombre de voisins gardés
+
+    Returns:
+        tuple: (ids int32 (n_rows, k), -1 en fin de ligne; scores float32 (n_rows, k))
+    """
+    ids = np.full((n_rows, k), -1, dtype=np.int32)
+    table_scores = np.zeros((n_rows, k), dtype=np.float32)
+    if not len(heads) or k <= 0:
+        return ids, table_scores
+
+    # Arêtes groupées par head (tail croissant dans chaque ligne)
+    order = np.lexsort((tails, heads))
+    heads, tails, scores = heads[order], tails[order], scores[order]
+    degrees = np.bincount(heads, minlength=n_rows)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+
+    # Lignes courtes: toutes leurs arêtes sont gardées, triées par score en une fois
+    short = np.flatnonzero(degrees[heads] <= k)
+    short = short[np.lexsort((tails[short], -scores[short], heads[short]))]
+    short_degrees = np.where(degrees <= k, degrees, 0)
+    ranks = np.arange(len(short)) - (np.cumsum(short_degrees) - short_degrees)[heads[short]]
+    ids[heads[short], ranks] = tails[short]
+    table_scores[heads[short], ranks] = scores[short]
+
+    long_rows = np.flatnonzero(degrees > k)
+    long_rows = long_rows[np.argsort(degrees[long_rows], kind='stable')]
+    start = 0
+    while start < len(long_rows):
+        stop = start + 1
+        while stop < len(long_rows) and (stop - start + 1) * degrees[long_rows[stop]] <= PARTITION_BLOCK:
+            stop += 1
+        rows = long_rows[start:stop]
+        width = degrees[rows[-1]]
+        columns = np.arange(width)
+        positions = indptr[rows][:, None] + columns
+        valid = columns < degrees[rows][:, None]
+        positions = np.where(valid, positions, 0)
+        block_scores = np.where(valid, scores[positions], -np.inf)
+        # k-ième score de chaque ligne: tout ce qui le dépasse est gardé, les ex aequo à ce score
+        # complètent la ligne dans l'ordre des tails (np.argpartition les départagerait au hasard)
+        kth = -np.partition(-block_scores, k - 1, axis=1)[:, k - 1:k]
+        above = block_scores > kth
+        ties = block_scores == kth
+        keep = above | (ties & (np.cumsum(ties, axis=1) <= k - above.sum(axis=1, keepdims=True)))
+        best = np.nonzero(keep)[1].reshape(len(rows), k)
+        # Ordre final parmi les k: score décroissant puis position (= tail croissant à score égal)
+        best = np.take_along_axis(best, np.argsort(-np.take_along_axis(block_scores, best, axis=1),
+                                                   axis=1, kind='stable'), axis=1)
+        chosen = np.take_along_axis(positions, best, axis=1)
+        ids[rows] = tails[chosen]
+        table_scores[rows] = scores[chosen]
+        start = stop
+    return ids, table_scores
+
+
+def build_neighbor_table(artist1, artist2, counts, listeners, n_artists, k=50, score='count'):
+    """
+    Table des k voisins de chaque artiste depuis les paires de co-écoute (artist1 < artist2)
+
+    Returns:
+        tuple: (ids int32 (n_artists, k), scores float32 (n_artists, k))
+    """
+    with span('neighbor_table.build', pairs=len(artist1)):
+        values = pair_scores(artist1, artist2, counts, listeners, score)
+        heads = np.concatenate([artist1, artist2]).astype(np.int64)
+        tails = np.concatenate([artist2, artist1]).astype(np.int64)
+        return top_k_table(heads, tails, np.concatenate([values, values]), n_artists, k)
+
+
+def neighbor_table_path(dataset_path, dataset_name='music'):
+    return os.path.join(dataset_path, dataset_name, 'neighbors')
+
+
+def write_neighbor_table(table_dir, ids, scores, info=None, signature=None):
+    """
+    Écrire ids.npy, scores.npy puis table.json (en dernier: une table incomplète n'est pas chargée)
+
+    Args:
+        table_dir: Dossier de la table (voir neighbor_table_path)
+        ids, scores: Sortie de build_neighbor_table
+        info: Informations ajoutées à table.json (score, min_co_listens, ...)
+        signature: graph_snapshot.source_signature des fichiers dont la table est dérivée
+    """
+    os.makedirs(table_dir, exist_ok=True)
+    meta_path = os.path.join(table_dir, 'table.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    np.save(os.path.join(table_dir, 'ids.npy'), ids)
+    np.save(os.path.join(table_dir, 'scores.npy'), scores)
+    meta = dict(info or {})
+    meta.update({'version': TABLE_VERSION, 'n_artists': int(ids.shape[0]), 'k': int(ids.shape[1]),
+                 'signature': None if signature is None else [int(x) for x in signature]})
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def load_neighbor_table(table_dir, mmap=True, signature=None):
+    """
+    Ouvrir la table (fichiers .npy en mmap par défaut)
+
+    Args:
+        table_dir: Dossier de la table
+        mmap: Ouvrir les tableaux en mmap_mode='r'
+        signature: Si donnée, retourner None quand la table a été construite depuis d'autres fichiers sources
+
+    Returns:
+        NeighborTable ou None si absente, d'une autre version ou périmée
+    """
+    meta_path = os.path.join(table_dir, 'table.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != TABLE_VERSION:
+        return None
+    if signature is not None and meta.get('signature') != [int(x) for x in signature]:
+        print('Table des voisins périmée (fichiers sources modifiés)')
+        return None
+    mode = 'r' if mmap else None
+    return NeighborTable(np.load(os.path.join(table_dir, 'ids.npy'), mmap_mode=mode),
+                         np.load(os.path.join(table_dir, 'scores.npy'), mmap_mode=mode), meta)
+
+
+class NeighborTable:
+    """
+    Voisins précalculés de chaque artiste (voir build_neighbor_table)
+
+    Args:
+        ids: Array (n_artists, k) des voisins, -1 en fin de ligne
+        scores: Array (n_artists, k) des scores
+        meta: Contenu de table.json
+    """
+
+    def __init__(self, ids, scores, meta=None):
+        self.ids = ids
+        self.scores = scores
+        self.meta = meta or {}
+
+    @property
+    def n_artists(self):
+        return self.ids.shape[0]
+
+    @property
+    def k(self):
+        return self.ids.shape[1]
+
+    def similar_artists(self, artist_ids, k=None):
+        """
+        Voisins d'un lot d'artistes en une seule lecture indexée
+
+        Args:
+            artist_ids: Index d'artistes (les index hors de la table donnent des lignes de -1)
+            k: Nombre de voisins (au plus self.k)
+
+        Returns:
+            tuple: (ids int32 (n, k), scores float32 (n, k))
+        """
+        k = self.k if k is None else min(k, self.k)
+        artist_ids = np.asarray(artist_ids, dtype=np.int64)
+        valid = (artist_ids >= 0) & (artist_ids < self.n_artists)
+        rows = np.where(valid, artist_ids, 0)
+        ids = np.where(valid[:, None], self.ids[rows, :k], -1)
+        scores = np.where(valid[:, None], self.scores[rows, :k], 0.0).astype(np.float32)
+        return ids, scores
+
+    def similar_artists_batch(self, artist_ids, k=10):
+        """
+        Même format que EmbeddingIndex.similar_artists_batch
+
+        Returns:
+            Liste alignée sur artist_ids: [(artiste, score)] ou None si l'artiste est hors de la table
+        """
+        ids, scores = self.similar_artists(artist_ids, k)
+        results = []
+        for artist, row_ids, row_scores in zip(artist_ids, ids.tolist(), scores.tolist()):
+            if not 0 <= artist < self.n_artists:
+                results.append(None)
+                continue
+            results.append([(tail, score) for tail, score in zip(row_ids, row_scores) if tail >= 0])
+        return results
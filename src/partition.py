@@ -0,0 +1,276 @@
+"""
+Composantes connexes et partitionnement du KG en shards avec nœuds de halo
+
+Chaque nœud (artiste ou utilisateur) est affecté à une partition par LDG (Linear Deterministic
+Greedy) en flux: les nœuds sont pris dans l'ordre d'un parcours en largeur de chaque composante et
+placés dans la partition qui contient le plus de leurs voisins, pondérée par sa place restante.
+Les passes suivantes (restreaming) recommencent le flux en comptant aussi les voisins à leur place
+de la passe précédente: la coupe baisse nettement sur les premières passes puis se stabilise.
+La charge d'un nœud est 1 + son nombre d'arêtes sortantes: les partitions sont équilibrées à la
+fois en nœuds et en arêtes à parcourir (au plus (1 + imbalance) fois la charge moyenne).
+
+partition_path(...) contient:
+    assignment.npy         int32 (n_nodes,): partition de chaque nœud
+    part_XXX/owned.npy     int64: nœuds de la partition
+    part_XXX/halo.npy      int64: nœuds à moins de halo_hops arêtes des nœuds possédés, hors partition
+    part_XXX/halo_hops.npy int16: distance de chaque nœud de halo
+    part_XXX/kg.npy        int32 (n, 4) [head, relation, tail, weight]: arêtes sortantes des nœuds
+                           possédés et des nœuds de halo à moins de halo_hops (ids globaux)
+    partition.json         n_parts, halo_hops, coupe, signature des fichiers sources (écrit en dernier)
+
+Un parcours de profondeur <= halo_hops depuis les nœuds possédés ne lit que le KG local: BFS à
+max_hops depuis les artistes d'un utilisateur possédé demande halo_hops >= max_hops + 1, un ripple
+set à n_hop sauts halo_hops >= n_hop + 1 (les historiques sont à une arête de l'utilisateur).
+
+Usage (depuis src/):
+    python partition.py --n_parts 4 --halo_hops 1
+"""
+import argparse
+import collections
+import json
+import os
+import numpy as np
+
+from graph_csr import build_csr, csr_heads
+from graph_kernels import get_backend, KERNEL_BACKENDS
+from profiling import span
+
+PARTITION_VERSION = 1
+
+# Partition chargée: CSR local aux ids globaux (n_nodes identique au graphe complet)
+Shard = collections.namedtuple('Shard', ['part', 'owned', 'halo', 'halo_hops', 'csr'])
+
+
+def connected_components(csr, backend=None):
+    """
+    Composante connexe de chaque nœud, arêtes prises sans orientation
+
+    Args:
+        csr: CSRGraph
+        backend: Backend de graph_kernels (défaut: 'auto')
+
+    Returns:
+        Array int64 (n_nodes,): plus petit nœud de la composante (un nœud isolé est sa propre composante)
+    """
+    with span('partition.components', edges=len(csr.indices)):
+        return get_backend(backend).connected_components(csr.n_nodes, csr_heads(csr), csr.indices)
+
+
+def component_sizes(labels, nodes=None):
+    """
+    Taille des composantes, de la plus grande à la plus petite
+
+    Args:
+        labels: Sortie de connected_components
+        nodes: Nœuds comptés (défaut: tous)
+
+    Returns:
+        tuple: (étiquettes, tailles) triées par taille décroissante
+    """
+    components, sizes = np.unique(labels if nodes is None else labels[nodes], return_counts=True)
+    order = np.argsort(-sizes, kind='stable')
+    return components[order], sizes[order]
+
+
+def stream_order(csr, labels, backend=None):
+    """Ordre de flux de LDG: parcours en largeur depuis la racine de chaque composante"""
+    roots = np.flatnonzero(labels == np.arange(csr.n_nodes))
+    nodes, _, _ = get_backend(backend).bfs_hops(csr.indptr, csr.indices, np.ones(len(csr.indices), dtype=bool),
+                                             roots, csr.n_nodes)
+    return np.concatenate([roots, nodes])
+
+
+def partition_graph(csr, n_parts, imbalance=0.05, passes=6, backend=None):
+    """
+    Partition équilibrée à coupe faible (LDG en flux)
+
+    Args:
+        csr: CSRGraph (toutes relations; le KG contient chaque arête dans les deux sens)
+        n_parts: Nombre de partitions
+        imbalance: Dépassement toléré de la charge moyenne d'une partition (nœuds + arêtes sortantes)
+        passes: Nombre de passes de LDG (1 = flux simple)
+        backend: Backend de graph_kernels (défaut: 'auto')
+
+    Returns:
+        Array int32 (n_nodes,): partition de chaque nœud
+    """
+    if n_parts < 1:
+        raise ValueError(f'n_parts doit être >= 1: {n_parts}')
+    kernels = get_backend(backend)
+    node_weights = np.diff(csr.indptr) + 1
+    # Arrondi inférieur: une charge <= capacity reste dans la tolérance imbalance
+    capacity = int(np.floor(node_weights.sum() * (1.0 + imbalance) / n_parts))
+    with span('partition.ldg', nodes=csr.n_nodes, parts=n_parts, passes=passes):
+        order = stream_order(csr, connected_components(csr, backend), backend)
+        assignment = np.full(csr.n_nodes, -1, dtype=np.int32)
+        for _ in range(max(passes, 1)):
+            assignment = kernels.ldg_partition(csr.indptr, csr.indices, order, node_weights, n_parts,
+                                               max(capacity, 1), assignment)
+        return assignment
+
+
+def partition_quality(csr, assignment, n_parts):
+    """
+    Coupe et équilibre d'une partition
+
+    Returns:
+        dict: cut_edges (arêtes entre deux partitions), cut_fraction, nodes et edges par partition
+              (arêtes sortantes des nœuds possédés), max_imbalance (charge maximale / charge moyenne)
+    """
+    heads = csr_heads(csr)
+    cut = int((assignment[heads] != assignment[csr.indices]).sum())
+    nodes = np.bincount(assignment, minlength=n_parts)
+    edges = np.bincount(assignment[heads], minlength=n_parts)
+    return {
+        'cut_edges': cut,
+        'cut_fraction': round(cut / max(len(csr.indices), 1), 4),
+        'nodes': nodes.tolist(),
+        'edges': edges.tolist(),
+        'max_imbalance': round(float((nodes + edges).max() * n_parts / max(csr.n_nodes + len(csr.indices), 1)), 4),
+    }
+
+
+def shard_arrays(csr, assignment, part, halo_hops=1, backend=None):
+    """
+    Nœuds possédés, halo et arêtes locales d'une partition
+
+    Returns:
+        tuple: (owned, halo, halo_hops (distance de chaque nœud de halo), kg int32 (n, 4))
+    """
+    kernels = get_backend(backend)
+    owned = np.flatnonzero(assignment == part)
+    nodes, hops, _ = kernels.bfs_hops(csr.indptr, csr.indices, np.ones(len(csr.indices), dtype=bool), owned, halo_hops)
+    order = np.argsort(nodes, kind='stable')
+    halo, hops = nodes[order], hops[order]
+    # Arêtes sortantes de tous les nœuds d'où un parcours de profondeur halo_hops peut repartir
+    heads, edges = kernels.gather_edges(csr.indptr, np.union1d(owned, halo[hops < halo_hops]))
+    kg = np.column_stack([heads, csr.relations[edges], csr.indices[edges], csr.weights[edges]]).astype(np.int32)
+    return owned, halo, hops, kg
+
+
+def partition_path(dataset_path, dataset_name='music', n_parts=4):
+    return os.path.join(dataset_path, dataset_name, 'partitions', f'{n_parts}')
+
+
+def write_partitions(out_dir, csr, assignment, n_parts, halo_hops=1, signature=None, backend=None):
+    """
+    Écrire assignment.npy, un dossier par partition puis partition.json (en dernier)
+
+    Args:
+        out_dir: Dossier de sortie (voir partition_path)
+        csr: CSRGraph complet
+        assignment: Sortie de partition_graph
+        n_parts: Nombre de partitions
+        halo_hops: Profondeur du halo
+        signature: graph_snapshot.source_signature des fichiers dont le KG est dérivé
+
+    Returns:
+        dict: Contenu de partition.json
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, 'partition.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    np.save(os.path.join(out_dir, 'assignment.npy'), assignment.astype(np.int32))
+    shards = []
+    with span('partition.write', parts=n_parts) as counts:
+        for part in range(n_parts):
+            owned, halo, hops, kg = shard_arrays(csr, assignment, part, halo_hops, backend)
+            part_dir = os.path.join(out_dir, f'part_{part:03d}')
+            os.makedirs(part_dir, exist_ok=True)
+            np.save(os.path.join(part_dir, 'owned.npy'), owned)
+            np.save(os.path.join(part_dir, 'halo.npy'), halo)
+            np.save(os.path.join(part_dir, 'halo_hops.npy'), hops)
+            np.save(os.path.join(part_dir, 'kg.npy'), kg)
+            shards.append({'owned': len(owned), 'halo': len(halo), 'edges': len(kg)})
+        counts['edges'] = sum(shard['edges'] for shard in shards)
+    meta = {'version': PARTITION_VERSION, 'n_parts': n_parts, 'halo_hops': halo_hops, 'n_nodes': csr.n_nodes,
+            'quality': partition_quality(csr, assignment, n_parts), 'shards': shards,
+            'signature': None if signature is None else [int(x) for x in signature]}
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+    return meta
+
+
+def load_partition_meta(out_dir, signature=None):
+    """
+    Lire partition.json
+
+    Returns:
+        dict ou None si absent, d'une autre version ou périmé (signature différente)
+    """
+    meta_path = os.path.join(out_dir, 'partition.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != PARTITION_VERSION:
+        return None
+    if signature is not None and meta.get('signature') != [int(x) for x in signature]:
+        print('Partitions périmées (fichiers sources modifiés)')
+        return None
+    return meta
+
+
+def load_shard(out_dir, part, mmap=True, signature=None):
+    """
+    Charger une partition: seuls ses fichiers sont lus
+
+    Args:
+        out_dir: Dossier écrit par write_partitions
+        part: Numéro de partition
+        mmap: Ouvrir owned/halo en mmap_mode='r'
+        signature: Voir load_partition_meta
+
+    Returns:
+        Shard (csr aux ids globaux, construit depuis kg.npy) ou None si les partitions sont absentes ou périmées
+    """
+    meta = load_partition_meta(out_dir, signature)
+    if meta is None:
+        return None
+    if not 0 <= part < meta['n_parts']:
+        raise ValueError(f"Partition hors limites: {part} (n_parts={meta['n_parts']})")
+    part_dir = os.path.join(out_dir, f'part_{part:03d}')
+    mode = 'r' if mmap else None
+    kg = np.load(os.path.join(part_dir, 'kg.npy'))
+    return Shard(part=part,
+                 owned=np.load(os.path.join(part_dir, 'owned.npy'), mmap_mode=mode),
+                 halo=np.load(os.path.join(part_dir, 'halo.npy'), mmap_mode=mode),
+                 halo_hops=meta['halo_hops'],
+                 csr=build_csr(kg, n_nodes=meta['n_nodes']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Partitionner le KG en shards avec halo')
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--n_parts', type=int, default=4)
+    parser.add_argument('--halo_hops', type=int, default=1,
+                        help='Profondeur du halo (parcours locaux jusqu\'à cette profondeur)')
+    parser.add_argument('--imbalance', type=float, default=0.05)
+    parser.add_argument('--passes', type=int, default=6, help='Passes de LDG (restreaming)')
+    parser.add_argument('--kernel_backend', type=str, default='auto', choices=KERNEL_BACKENDS)
+    parser.add_argument('--output', type=str, default=None, help='Dossier de sortie (défaut: partitions/<n_parts>)')
+    args = parser.parse_args()
+
+    from graph_snapshot import load_snapshot, source_signature
+    snapshot = load_snapshot(args.dataset_path, args.dataset)
+    csr = snapshot.csr
+    labels = connected_components(csr, args.kernel_backend)
+    degree = np.diff(csr.indptr) + np.bincount(csr.indices, minlength=csr.n_nodes)
+    _, sizes = component_sizes(labels, np.flatnonzero(degree))
+    print(f'{csr.n_nodes} nœuds, {len(csr.indices)} arêtes: {len(sizes)} composantes connexes '
+          f'(plus grande: {sizes[0] if len(sizes) else 0} nœuds)')
+
+    assignment = partition_graph(csr, args.n_parts, args.imbalance, args.passes, args.kernel_backend)
+    out_dir = args.output or partition_path(args.dataset_path, args.dataset, args.n_parts)
+    meta = write_partitions(out_dir, csr, assignment, args.n_parts, args.halo_hops,
+                            source_signature(args.dataset_path, args.dataset), args.kernel_backend)
+    print(json.dumps({key: meta[key] for key in ('quality', 'shards')}))
+    print(f'Partitions écrites dans {out_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+PageRank personnalisé (random walk with restart) sur le graphe de connaissances
+Itération de puissance vectorisée sur la matrice de transition transposée (format CSR)
+"""
+import collections
+import numpy as np
+from graph_csr import csr_heads
+
+# Part de la masse envoyée par chaque type de relation (renormalisée par nœud sur les
+# relations présentes). Les poids sont d'abord normalisés par (nœud, relation): sinon les
+# nombres d'écoutes (milliers) écraseraient les co-écoutes (unités) sur chaque artiste
+DEFAULT_RELATION_MIX = {0: 1.0, 1: 1.0, 2: 1.0, 3: 1.0}
+
+# P^T en CSR: indptr par nœud cible, sources et probabilités de transition
+Transition = collections.namedtuple('Transition', ['indptr', 'sources', 'probs', 'dangling', 'n_nodes'])
+
+
+def build_transition(csr, relation_mix=None, weight_transform=None):
+    """
+    Construire la matrice de transition normalisée par ligne, stockée transposée
+
+    P[i, j] = mix[r] * w_ij / (somme des w_i* de relation r), renormalisé pour que chaque ligne somme à 1
+
+    Args:
+        csr: CSRGraph (voir graph_csr.build_csr)
+        relation_mix: {relation: part de masse}, défaut DEFAULT_RELATION_MIX
+        weight_transform: None (poids bruts) ou 'log1p' (atténue les très gros nombres d'écoutes)
+
+    Returns:
+        Transition
+    """
+    relation_mix = relation_mix or DEFAULT_RELATION_MIX
+    n_nodes = csr.n_nodes
+    heads = csr_heads(csr).astype(np.int64)
+    relations = csr.relations.astype(np.int64)
+    weights = csr.weights.astype(np.float64)
+    if weight_transform == 'log1p':
+        weights = np.log1p(weights)
+    elif weight_transform is not None:
+        raise ValueError(f'weight_transform inconnu: {weight_transform}')
+
+    n_rel = int(relations.max(initial=0)) + 1
+    mix = np.zeros(n_rel)
+    for relation, share in relation_mix.items():
+        if relation < n_rel:
+            mix[relation] = share
+
+    # Normaliser par (nœud, relation), pondérer par relation, puis renormaliser par nœud
+    group = heads * n_rel + relations
+    group_strength = np.bincount(group, weights=weights, minlength=n_nodes * n_rel)
+    probs = np.divide(weights, group_strength[group], out=np.zeros_like(weights),
+                      where=group_strength[group] > 0) * mix[relations]
+    node_total = np.bincount(heads, weights=probs, minlength=n_nodes)
+    probs = np.divide(probs, node_total[heads], out=np.zeros_like(probs), where=node_total[heads] > 0)
+
+    # Transposer: regrouper les arêtes par nœud cible
+    keep = probs > 0
+    targets = csr.indices[keep].astype(np.int64)
+    order = np.argsort(targets, kind='stable')
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(targets, minlength=n_nodes), out=indptr[1:])
+
+    return Transition(indptr=indptr,
+                      sources=heads[keep][order].astype(np.int32),
+                      probs=probs[keep][order],
+                      dangling=node_total == 0,
+                      n_nodes=n_nodes)
+
+
+def _propagate(transition, scores, probs=None):
+    """Calculer P^T @ scores pour un vecteur (n,) ou un bloc dense (n, batch)"""
+    out = np.zeros_like(scores)
+    if len(transition.sources) == 0:
+        return out
+    if probs is None:
+        probs = transition.probs.astype(scores.dtype)
+    # np.take est nettement plus rapide que l'indexation avancée sur les lignes d'un bloc
+    contributions = np.take(scores, transition.sources, axis=0)
+    if scores.ndim == 1:
+        contributions *= probs
+    else:
+        contributions *= probs[:, None]
+    # Somme par segment (nœud cible); les segments vides sont ignorés par reduceat
+    non_empty = np.flatnonzero(np.diff(transition.indptr))
+    out[non_empty] = np.add.reduceat(contributions, transition.indptr[non_empty], axis=0)
+    return out
+
+
+def seed_matrix(n_nodes, seed_lists, dtype=np.float64):
+    """
+    Vecteurs de redémarrage: distribution uniforme sur les nœuds de départ de chaque colonne
+
+    Args:
+        n_nodes: Nombre de nœuds
+        seed_lists: Liste de listes de nœuds (une par utilisateur)
+
+    Returns:
+        Array (n_nodes, len(seed_lists))
+    """
+    restart = np.zeros((n_nodes, len(seed_lists)), dtype=dtype)
+    for column, seeds in enumerate(seed_lists):
+        seeds = np.unique(np.asarray(seeds, dtype=np.int64))
+        if len(seeds):
+            restart[seeds, column] = 1.0 / len(seeds)
+    return restart
+
+
+def personalized_pagerank_batch(transition, seed_lists, alpha=0.15, tol=1e-6, max_iter=100,
+                                dtype=np.float32):
+    """
+    PageRank personnalisé pour plusieurs utilisateurs à la fois (bloc dense (n_nodes, batch))
+
+    r = alpha * s + (1 - alpha) * (P^T r + masse des nœuds sans arête sortante * s)
+
+    Args:
+        transition: Transition (voir build_transition)
+        seed_lists: Liste de listes de nœuds de départ (une par utilisateur)
+        alpha: Probabilité de redémarrage
+        tol: Tolérance de convergence (norme L1 de la variation, par colonne)
+        max_iter: Nombre maximum d'itérations
+        dtype: Type des scores (float32 divise la mémoire par deux)
+
+    Returns:
+        tuple: (scores (n_nodes, batch), nombre d'itérations)
+    """
+    restart = seed_matrix(transition.n_nodes, seed_lists, dtype=dtype)
+    scores = restart.copy()
+    dangling = transition.dangling
+    probs = transition.probs.astype(dtype)
+
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        spread = _propagate(transition, scores, probs)
+        if dangling.any():
+            spread += scores[dangling].sum(axis=0) * restart
+        new_scores = alpha * restart + (1.0 - alpha) * spread
+        delta = np.abs(new_scores - scores).sum(axis=0).max()
+        scores = new_scores
+        if delta < tol:
+            break
+    return scores, iteration
+
+
+def personalized_pagerank(transition, seeds, alpha=0.15, tol=1e-8, max_iter=100):
+    """
+    PageRank personnalisé pour un seul ensemble de nœuds de départ
+
+    Returns:
+        tuple: (scores (n_nodes,), nombre d'itérations)
+    """
+    scores, iterations = personalized_pagerank_batch(transition, [seeds], alpha=alpha, tol=tol,
+                                                     max_iter=max_iter, dtype=np.float64)
+    return scores[:, 0], iterations
+
+
+def top_k(scores, k, exclude=None, candidate_mask=None):
+    """
+    Top-k des scores d'une colonne (argpartition puis tri des k meilleurs)
+
+    Args:
+        scores: Array (n_nodes,)
+        k: Nombre de résultats
+        exclude: Nœuds à exclure (ex: artistes déjà écoutés)
+        candidate_mask: Masque booléen des nœuds recommandables (ex: artistes seulement)
+
+    Returns:
+        Liste [(nœud, score)] par score décroissant, sans les nœuds de score nul (non atteints)
+    """
+    scores = np.array(scores, dtype=np.float64)
+    scores[scores <= 0] = -np.inf
+    if candidate_mask is not None:
+        scores[~candidate_mask] = -np.inf
+    if exclude is not None and len(exclude):
+        scores[np.asarray(exclude, dtype=np.int64)] = -np.inf
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return []
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind='stable')]
+    return [(int(node), float(scores[node])) for node in best]
+
+
+def ppr_recommend(transition, user_history, users=None, k=10, alpha=0.15, tol=1e-6, max_iter=100,
+                  batch_size=64, candidate_mask=None):
+    """
+    Recommandations PPR pour plusieurs utilisateurs, traités par blocs
+
+    Args:
+        transition: Transition
+        user_history: {user: [artistes écoutés]} (voir graph_loader.get_user_history)
+        users: Utilisateurs à traiter (défaut: tous ceux de user_history)
+        k: Nombre de recommandations par utilisateur
+        alpha, tol, max_iter: Paramètres de l'itération
+        batch_size: Nombre d'utilisateurs par bloc (mémoire ~ n_edges * batch_size * 4 octets)
+        candidate_mask: Masque booléen des nœuds recommandables
+
+    Returns:
+        dict: {user: [(artiste, score), ...]}
+    """
+    users = list(user_history) if users is None else list(users)
+    recommendations = {}
+    for start in range(0, len(users), batch_size):
+        batch = users[start:start + batch_size]
+        seed_lists = [user_history.get(user, []) for user in batch]
+        scores, _ = personalized_pagerank_batch(transition, seed_lists, alpha=alpha, tol=tol, max_iter=max_iter)
+        for column, user in enumerate(batch):
+            recommendations[user] = top_k(scores[:, column], k, exclude=seed_lists[column],
+                                          candidate_mask=candidate_mask)
+    return recommendations
+
+
+def artist_mask(n_nodes, n_artists=None, csr=None):
+    """
+    Masque des artistes: indices < n_artists si connu, sinon les nœuds ayant une relation artiste
+
+    Args:
+        n_nodes: Nombre de nœuds
+        n_artists: Nombre d'artistes (métadonnées n_artists_actual)
+        csr: CSRGraph utilisé si n_artists est inconnu (tails de listened_to, extrémités de similar_*)
+    """
+    mask = np.zeros(n_nodes, dtype=bool)
+    if n_artists is not None:
+        mask[:n_artists] = True
+    elif csr is not None:
+        mask[csr.indices[np.isin(csr.relations, (0, 2, 3))]] = True
+    else:
+        mask[:] = True
+    return mask
@@ -1,14 +1,24 @@
 import argparse
 import numpy as np
 import collections
+import concurrent.futures
+import contextlib
 import os
+from profiling import span, enable_profiling, write_trace
+from entity_mapping import write_entity_mapping
+from rng_utils import make_rng, spawn_rng, stage_rng, rng_fingerprint, STAGE_NEGATIVE_SAMPLING, STAGE_MINHASH
+from co_listen import co_listen_counts, minhash_co_listen_counts, external_co_listen_counts
+from artifact_cache import ArtifactCache, artifact_key, file_digest, json_array, json_value
+from neighbor_table import build_neighbor_table, write_neighbor_table, NEIGHBOR_SCORES
+from graph_snapshot import source_signature
+from kcore import kcore_selection, top_n_selection, REDUCE_METHODS
 
 RATING_FILE_NAME = dict({'movie': 'ratings.dat', 'book': 'BX-Book-Ratings.csv', 'news': 'ratings.txt'})
 SEP = dict({'movie': '::', 'book': ';', 'news': '\t'})
 THRESHOLD = dict({'movie': 4, 'book': 0, 'news': 0})
 
 
-def filter_raw_data(raw_data_path, max_users=50, max_artists=100):
+def filter_raw_data(raw_data_path, max_users=50, max_artists=100, method='top', min_degree=2):
     """
     Filtrer les données brutes pour créer un sous-ensemble plus petit
     Modifie directement les fichiers dans raw_data_path
@@ -17,8 +27,13 @@ def filter_raw_data(raw_data_path, max_users=50, max_artists=100):
         raw_data_path: Chemin vers rawdata/music
         max_users: Nombre maximum d'utilisateurs à garder
         max_artists: Nombre maximum d'artistes à garder
+        method: 'top' (utilisateurs les plus actifs et artistes les plus écoutés, choisis indépendamment)
+                ou 'kcore' (sous-graphe dense et connexe, voir kcore.py)
+        min_degree: Degré minimal des utilisateurs et artistes gardés (method='kcore')
     """
-    print(f'Filtrage des données brutes: max {max_users} utilisateurs, {max_artists} artistes...')
+    if method not in REDUCE_METHODS:
+        raise ValueError(f'Méthode de réduction inconnue: {method} (choix: {REDUCE_METHODS})')
+    print(f'Filtrage des données brutes ({method}): max {max_users} utilisateurs, {max_artists} artistes...')
     
     user_artists_file = os.path.join(raw_data_path, 'user_artists.dat')
     if not os.path.exists(user_artists_file):
@@ -39,19 +54,16 @@ def filter_raw_data(raw_data_path, max_users=50, max_artists=100):
     
     print(f'Données originales: {len(user_artist_data)} interactions')
     
-    # Sélectionner les utilisateurs et artistes les plus actifs
-    user_counts = collections.defaultdict(int)
-    artist_counts = collections.defaultdict(int)
-    
-    for user_id, artist_id, weight in user_artist_data:
-        user_counts[user_id] += 1
-        artist_counts[artist_id] += weight
-    
-    sorted_users = sorted(user_counts.items(), key=lambda x: x[1], reverse=True)
-    sorted_artists = sorted(artist_counts.items(), key=lambda x: x[1], reverse=True)
-    
-    selected_users = set([user for user, _ in sorted_users[:max_users]])
-    selected_artists = set([artist for artist, _ in sorted_artists[:max_artists]])
+    # Sélectionner les utilisateurs et artistes
+    edges = np.array(user_artist_data, dtype=np.int64).reshape(-1, 3)
+    if method == 'kcore':
+        selected_users, selected_artists, info = kcore_selection(edges[:, 0], edges[:, 1], max_users, max_artists,
+                                                                 min_degree)
+        print(f"k-core de niveau {info['k']}: densité {info['density']}, "
+              f"médiane de {info['median_artists_per_user']:g} artistes par utilisateur")
+    else:
+        selected_users, selected_artists = top_n_selection(edges[:, 0], edges[:, 1], edges[:, 2],
+                                                           max_users, max_artists)
     
     print(f'Sélection: {len(selected_users)} utilisateurs, {len(selected_artists)} artistes')
     
@@ -79,32 +91,26 @@ def filter_raw_data(raw_data_path, max_users=50, max_artists=100):
     return selected_users, selected_artists
 
 
-def preprocess_music(raw_data_path, output_path, reduce_data=False, max_users=50, max_artists=100, min_co_listens=None):
+def _read_catalog(raw_data_path, selected_users=None, selected_artists=None):
     """
-    Preprocess music dataset (Last.fm)
-    
+    Étape catalog: artistes (index, noms) et écoutes utilisateur-artiste retenues
+
     Args:
-        raw_data_path: Chemin vers rawdata/music (dossier avec fichiers .dat)
-        output_path: Chemin vers final_data/music (dossier de sortie)
-        reduce_data: Si True, filtre les données brutes avant le preprocessing
-        max_users: Nombre maximum d'utilisateurs (si reduce_data=True)
-        max_artists: Nombre maximum d'artistes (si reduce_data=True)
+        raw_data_path: Chemin vers rawdata/music
+        selected_users, selected_artists: Sélection de filter_raw_data (None = pas de filtrage)
+
+    Returns:
+        dict: artist_ids et user_ids (ids Last.fm dans l'ordre des index), artist_names (JSON),
+              listens (n, 3) [user_idx, artist_idx, weight] dans l'ordre du fichier
     """
-    # Filtrer les données brutes si demandé
-    selected_users = None
-    selected_artists = None
-    if reduce_data:
-        selected_users, selected_artists = filter_raw_data(raw_data_path, max_users, max_artists)
-        if selected_users is None:
-            reduce_data = False  # Pas de filtrage possible
-    
-    print('Prétraitement du dataset music...')
-    
+    reduce_data = selected_users is not None
+
     # Step 1: Read artists to create item mapping
     print('Lecture des artistes...')
     artist_id2index = {}
+    artist_names = []
     artist_file = os.path.join(raw_data_path, 'artists.dat')
-    with open(artist_file, 'r', encoding='utf-8') as f:
+    with span('preprocess.parse_artists') as counts, open(artist_file, 'r', encoding='utf-8') as f:
         next(f)  # skip header
         for idx, line in enumerate(f):
             parts = line.strip().split('\t')
@@ -114,20 +120,20 @@ def preprocess_music(raw_data_path, output_path, reduce_data=False, max_users=50
                     # Si on a filtré, ne garder que les artistes sélectionnés
                     if not reduce_data or artist_id in selected_artists:
                         artist_id2index[artist_id] = len(artist_id2index)
+                        artist_names.append(parts[1] if len(parts) >= 2 else '')
                 except ValueError:
                     continue
-    
+        counts['artists'] = len(artist_id2index)
+
     print(f'{len(artist_id2index)} artistes trouvés')
-    
-    # Step 2: Convert user_artists.dat to ratings_final.txt
-    print('Conversion des interactions utilisateur-artiste en ratings...')
+
+    # Step 2: Read user_artists.dat (users indexed in order of first appearance)
+    print('Lecture des interactions utilisateur-artiste...')
     user_artists_file = os.path.join(raw_data_path, 'user_artists.dat')
-    
-    # Read all user-artist interactions
-    user_pos_ratings = collections.defaultdict(set)
-    user_weights = collections.defaultdict(dict)  # user -> {artist: weight}
-    
-    with open(user_artists_file, 'r', encoding='utf-8') as f:
+    user_id2index = {}
+    listens = []  # (user_idx, artist_idx, weight)
+
+    with span('preprocess.parse_interactions') as counts, open(user_artists_file, 'r', encoding='utf-8') as f:
         next(f)  # skip header
         for line in f:
             parts = line.strip().split('\t')
@@ -135,138 +141,195 @@ def preprocess_music(raw_data_path, output_path, reduce_data=False, max_users=50
                 try:
                     user_id = int(parts[0])
                     artist_id = int(parts[1])
-                    weight = int(parts[2])
-                    
+                    weight = int(parts[2])  # nombre d'écoutes
+
                     # Si on a filtré, ne garder que les utilisateurs et artistes sélectionnés
                     if reduce_data:
                         if user_id not in selected_users or artist_id not in selected_artists:
                             continue
-                    
+
                     if artist_id in artist_id2index:
-                        artist_idx = artist_id2index[artist_id]
-                        user_weights[user_id][artist_idx] = weight
-                        # Consider positive if weight > median (or use a threshold)
-                        user_pos_ratings[user_id].add(artist_idx)
+                        user_idx = user_id2index.setdefault(user_id, len(user_id2index))
+                        listens.append((user_idx, artist_id2index[artist_id], weight))
                 except ValueError:
                     continue
-    
+        counts['interactions'] = len(listens)
+
+    return {
+        'artist_ids': np.fromiter(artist_id2index, dtype=np.int64, count=len(artist_id2index)),
+        'user_ids': np.fromiter(user_id2index, dtype=np.int64, count=len(user_id2index)),
+        'artist_names': json_array(artist_names),
+        'listens': np.array(listens, dtype=np.int64).reshape(-1, 3),
+    }
+
+
+def _sample_ratings(listens, n_artists, rng):
+    """
+    Étape ratings: label 1 si le poids atteint la médiane des poids, plus autant de négatifs
+    tirés parmi les artistes non écoutés (un flux aléatoire par utilisateur)
+
+    Returns:
+        dict: ratings (n, 3) [user_idx, artist_idx, label] dans l'ordre d'écriture, threshold
+    """
+    user_pos_ratings = collections.defaultdict(set)
+    user_weights = collections.defaultdict(dict)  # user -> {artist: weight}
+    for user_idx, artist_idx, weight in listens.tolist():
+        user_weights[user_idx][artist_idx] = weight
+        user_pos_ratings[user_idx].add(artist_idx)
+
     # Calculate threshold (median weight) for positive ratings
     all_weights = [w for weights in user_weights.values() for w in weights.values()]
     threshold = np.median(all_weights) if all_weights else 1
-    print(f'Seuil de poids utilisé: {threshold:.2f} pour les ratings positifs')
-    
-    # Remap user IDs to consecutive indices
-    user_id2index = {}
-    user_idx = 0
-    for user_id in user_pos_ratings.keys():
-        user_id2index[user_id] = user_idx
-        user_idx += 1
-    
-    # Write ratings_final.txt
-    os.makedirs(output_path, exist_ok=True)
-    ratings_file = os.path.join(output_path, 'ratings_final.txt')
-    with open(ratings_file, 'w', encoding='utf-8') as writer:
-        all_artists = set(artist_id2index.values())
-        
-        for user_id, pos_artists in user_pos_ratings.items():
-            user_idx = user_id2index[user_id]
-            
-            # Write positive ratings
+
+    with span('preprocess.sample_ratings') as counts:
+        all_artists = np.arange(n_artists, dtype=np.int64)
+        ratings = []
+        for user_idx, pos_artists in user_pos_ratings.items():
+            # Positive ratings
             for artist_idx in pos_artists:
-                weight = user_weights[user_id].get(artist_idx, 0)
-                label = 1 if weight >= threshold else 0
-                writer.write(f'{user_idx}\t{artist_idx}\t{label}\n')
-            
+                label = 1 if user_weights[user_idx][artist_idx] >= threshold else 0
+                ratings.append((user_idx, artist_idx, label))
+
             # Sample negative ratings (artists not listened to)
-            neg_artists = all_artists - pos_artists
+            # Flux aléatoire propre à l'utilisateur: résultat indépendant de l'ordre de traitement
+            neg_artists = np.setdiff1d(all_artists, np.fromiter(pos_artists, dtype=np.int64), assume_unique=True)
             n_neg = min(len(pos_artists), len(neg_artists))
             if n_neg > 0:
-                sampled_neg = np.random.choice(list(neg_artists), size=n_neg, replace=False)
-                for artist_idx in sampled_neg:
-                    writer.write(f'{user_idx}\t{artist_idx}\t0\n')
-    
-    print(f'Nombre d\'utilisateurs: {len(user_id2index)}')
-    print(f'Nombre d\'items (artistes): {len(artist_id2index)}')
+                sampled_neg = spawn_rng(rng, user_idx).choice(neg_artists, size=n_neg, replace=False)
+                ratings.extend((user_idx, artist_idx, 0) for artist_idx in sampled_neg.tolist())
+        counts['ratings'] = len(ratings)
+
+    return {'ratings': np.array(ratings, dtype=np.int64).reshape(-1, 3), 'threshold': np.array(threshold)}
+
+
+def _co_listen_pairs(listens, n_artists):
+    """
+    Étape co_listen (exact): nombre de co-écoutes de toutes les paires d'artistes, sans seuil
+    (le seuil min_co_listens est appliqué ensuite: le changer ne relance pas cette étape)
+
+    Returns:
+        dict: pairs (n, 3) [artist1, artist2, count], artist1 < artist2, triées par (artist1, artist2)
+    """
+    with span('preprocess.co_listen') as counts:
+        artist1, artist2, co_counts = co_listen_counts(listens[:, 0], listens[:, 1], n_artists)
+        counts['pairs'] = len(artist1)
+    return {'pairs': np.column_stack([artist1, artist2, co_counts]).astype(np.int64)}
+
+
+def _remove_array_cache(path):
+    """Supprimer le cache .npy d'un fichier texte réécrit (graph_loader le recrée au prochain chargement)"""
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(os.path.splitext(path)[0] + '.npy')
+
+
+def preprocess_music(raw_data_path, output_path, reduce_data=False, max_users=50, max_artists=100, min_co_listens=None,
+                     rng=None, co_listen_mode='exact', num_hashes=128, lsh_bands=32, minhash_rng=None,
+                     kg_storage='full', cache_dir=None, use_cache=True, neighbor_k=50, neighbor_score='count',
+                     memory_budget=256 << 20, spill_dir=None, reduce_method='top', kcore_min_degree=2):
+    """
+    Preprocess music dataset (Last.fm)
+
+    Les étapes (catalog, ratings, co_listen) sont mises en cache par artifact_cache.py, avec pour
+    clé l'empreinte des fichiers bruts et des paramètres dont elles dépendent: une nouvelle
+    exécution ne relance que les étapes invalidées (ex: --min_co_listens ne relance que le seuillage
+    des co-écoutes et l'écriture de kg_final.txt).
     
-    # Step 3: Build knowledge graph from listening patterns (nombre d'écoutes)
-    print('Construction du graphe de connaissances à partir des patterns d\'écoute...')
+    Args:
+        raw_data_path: Chemin vers rawdata/music (dossier avec fichiers .dat)
+        output_path: Chemin vers final_data/music (dossier de sortie)
+        reduce_data: Si True, filtre les données brutes avant le preprocessing
+        max_users: Nombre maximum d'utilisateurs (si reduce_data=True)
+        max_artists: Nombre maximum d'artistes (si reduce_data=True)
+        rng: numpy.random.Generator de l'échantillonnage négatif (un flux dérivé par utilisateur)
+        co_listen_mode: 'exact' (toutes les paires), 'external' (mêmes comptes, mémoire bornée par
+                        memory_budget avec déversement sur disque) ou 'minhash' (candidats MinHash/LSH),
+                        voir co_listen.py
+        num_hashes, lsh_bands: Taille des signatures MinHash et nombre de bandes LSH
+        minhash_rng: Generator des fonctions de hachage MinHash
+        kg_storage: 'full' (relations 0 à 3) ou 'forward' (listened_to et similar_to seulement,
+                    listened_by et similar_from reconstruites par graph_loader.load_kg_array)
+        cache_dir: Dossier du cache d'artefacts (défaut: {output_path}/artifacts)
+        use_cache: False = tout recalculer sans lire ni écrire le cache
+        neighbor_k: Nombre de voisins par artiste de la table neighbors/ (0 = pas de table, voir neighbor_table.py)
+        neighbor_score: Classement des voisins: 'count', 'cosine' ou 'jaccard'
+        memory_budget: Mémoire de travail du mode 'external' en octets
+        spill_dir: Dossier des runs temporaires du mode 'external' (défaut: dossier temporaire du système)
+        reduce_method: Sélection de filter_raw_data: 'top' ou 'kcore' (si reduce_data=True)
+        kcore_min_degree: Degré minimal des nœuds gardés (si reduce_method='kcore')
+    """
+    if kg_storage not in ('full', 'forward'):
+        raise ValueError(f'kg_storage inconnu: {kg_storage}')
+    rng = make_rng(rng)
+    minhash_rng = make_rng(minhash_rng)
+    cache = ArtifactCache(cache_dir or os.path.join(output_path, 'artifacts'), enabled=use_cache)
+    # Filtrer les données brutes si demandé
+    selected_users = None
+    selected_artists = None
+    if reduce_data:
+        with span('preprocess.filter_raw_data'):
+            selected_users, selected_artists = filter_raw_data(raw_data_path, max_users, max_artists,
+                                                               reduce_method, kcore_min_degree)
+        if selected_users is None:
+            reduce_data = False  # Pas de filtrage possible
     
+    print('Prétraitement du dataset music...')
+
+    # Étape catalog: artistes et écoutes (clé: contenu des fichiers bruts et sélection)
+    with span('preprocess.hash_inputs'):
+        catalog_key = artifact_key(
+            'catalog',
+            artists=file_digest(os.path.join(raw_data_path, 'artists.dat')),
+            user_artists=file_digest(os.path.join(raw_data_path, 'user_artists.dat')),
+            selected_users=sorted(selected_users) if reduce_data else None,
+            selected_artists=sorted(selected_artists) if reduce_data else None)
+    catalog = cache.stage('catalog', catalog_key, lambda: _read_catalog(
+        raw_data_path, selected_users if reduce_data else None, selected_artists if reduce_data else None))
+    listens = catalog['listens']
+    artist_ids = catalog['artist_ids'].tolist()
+    user_ids = catalog['user_ids'].tolist()
+    artist_id2index = {artist_id: idx for idx, artist_id in enumerate(artist_ids)}
+    user_id2index = {user_id: idx for idx, user_id in enumerate(user_ids)}
+    artist_names = dict(zip(artist_ids, json_value(catalog['artist_names'])))
     n_artists = len(artist_id2index)
     n_users = len(user_id2index)
+
+    # Étape ratings: positifs et négatifs échantillonnés
+    print('Conversion des interactions utilisateur-artiste en ratings...')
+    ratings_key = artifact_key('ratings', catalog=catalog_key, rng=rng_fingerprint(rng))
+    ratings = cache.stage('ratings', ratings_key, lambda: _sample_ratings(listens, n_artists, rng))
+    print(f'Seuil de poids utilisé: {float(ratings["threshold"]):.2f} pour les ratings positifs')
+
+    def write_ratings(path):
+        _remove_array_cache(path)
+        with span('preprocess.write_ratings') as counts, open(path, 'w', encoding='utf-8') as writer:
+            writer.writelines(f'{user_idx}\t{artist_idx}\t{label}\n'
+                              for user_idx, artist_idx, label in ratings['ratings'].tolist())
+            counts['ratings'] = len(ratings['ratings'])
+
+    os.makedirs(output_path, exist_ok=True)
+    cache.materialize(os.path.join(output_path, 'ratings_final.txt'), ratings_key, write_ratings)
+    
+    print(f'Nombre d\'utilisateurs: {n_users}')
+    print(f'Nombre d\'items (artistes): {n_artists}')
+    
+    # Step 3: Build knowledge graph from listening patterns (nombre d'écoutes)
+    print('Construction du graphe de connaissances à partir des patterns d\'écoute...')
     
     # Entity mapping:
     # - Artists: 0 to n_artists-1
     # - Users: n_artists to n_artists+n_users-1
-    entity_id2index = {}
-    
-    # Map artists
-    for aid, idx in artist_id2index.items():
-        entity_id2index[f'artist_{aid}'] = idx
-    
-    # Map users (starting from n_artists)
-    for uid, idx in user_id2index.items():
-        entity_id2index[f'user_{uid}'] = n_artists + idx
     
     # APPROACH 2: User-Artist relations (basé sur nombre d'écoutes)
     # Relation: user -> artist avec poids = nombre d'écoutes
     print('  - Construction des relations User-Artist...')
-    user_artist_relations = []  # (user_idx, artist_idx, weight)
-    
-    # Re-read user_artists.dat to get weights
-    with open(user_artists_file, 'r', encoding='utf-8') as f:
-        next(f)  # skip header
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 3:
-                try:
-                    raw_user_id = int(parts[0])
-                    raw_artist_id = int(parts[1])
-                    weight = int(parts[2])  # nombre d'écoutes
-                    
-                    if reduce_data:
-                        if raw_user_id not in selected_users or raw_artist_id not in selected_artists:
-                            continue
-                    
-                    if raw_user_id in user_id2index and raw_artist_id in artist_id2index:
-                        user_idx = user_id2index[raw_user_id]
-                        artist_idx = artist_id2index[raw_artist_id]
-                        user_entity_idx = n_artists + user_idx
-                        user_artist_relations.append((user_entity_idx, artist_idx, weight))
-                except ValueError:
-                    continue
-    
+    user_artist_relations = [(n_artists + user_idx, artist_idx, weight)
+                             for user_idx, artist_idx, weight in listens.tolist()]
     print(f'    {len(user_artist_relations)} relations User-Artist créées')
     
     # APPROACH 3: Artist-Artist similarity (basé sur co-listening pondéré)
     # Relation: artist1 -> artist2 avec poids = nombre d'users qui ont écouté les deux
     print('  - Construction des relations Artist-Artist (similarité pondérée)...')
     
-    # Construire artist-user mapping pour calculer co-listening
-    artist_users = collections.defaultdict(dict)  # artist_idx -> {user_idx: weight}
-    
-    for user_entity_idx, artist_idx, weight in user_artist_relations:
-        user_idx = user_entity_idx - n_artists  # Convert back to user index
-        artist_users[artist_idx][user_idx] = weight
-    
-    # Calculer similarité entre artistes (co-listening pondéré)
-    artist_similarity = collections.defaultdict(int)  # (artist1, artist2) -> co-listening count
-    
-    # Pour chaque utilisateur, créer des connexions entre artistes qu'il a écoutés
-    for user_idx in range(n_users):
-        user_artists = []
-        for artist_idx, user_dict in artist_users.items():
-            if user_idx in user_dict:
-                user_artists.append(artist_idx)
-        
-        # Créer des connexions entre toutes les paires d'artistes pour cet utilisateur
-        for i in range(len(user_artists)):
-            for j in range(i + 1, len(user_artists)):
-                artist1, artist2 = user_artists[i], user_artists[j]
-                # Ordre canonique pour éviter les doublons
-                if artist1 > artist2:
-                    artist1, artist2 = artist2, artist1
-                artist_similarity[(artist1, artist2)] += 1
-    
     # Filtrer: seulement garder les connexions avec au moins min_co_listens utilisateurs
     # Pour les petits datasets, réduire le seuil pour avoir plus de relations
     if min_co_listens is None:
@@ -275,58 +338,109 @@ def preprocess_music(raw_data_path, output_path, reduce_data=False, max_users=50
         else:
             min_co_listens = 2  # Seuil normal
     
-    artist_artist_relations = []
-    for (artist1, artist2), count in artist_similarity.items():
-        if count >= min_co_listens:
-            artist_artist_relations.append((artist1, artist2, count))
+    if co_listen_mode == 'minhash':
+        # Mode approché: candidats MinHash/LSH, co-écoutes comptées sur les seuls candidats
+        # (le seuil écarte des artistes avant le LSH: il fait partie de la clé)
+        def compute_minhash():
+            with span('preprocess.co_listen_minhash') as counts:
+                artist1, artist2, co_counts = minhash_co_listen_counts(
+                    listens[:, 0], listens[:, 1], n_artists, min_co_listens=min_co_listens,
+                    n_hashes=num_hashes, bands=lsh_bands, rng=minhash_rng)
+                counts['pairs'] = len(artist1)
+            return {'pairs': np.column_stack([artist1, artist2, co_counts]).astype(np.int64)}
+
+        co_listen_key = artifact_key('co_listen', catalog=catalog_key, mode='minhash', min_co_listens=min_co_listens,
+                                     num_hashes=num_hashes, lsh_bands=lsh_bands, rng=rng_fingerprint(minhash_rng))
+        pairs = cache.stage('co_listen', co_listen_key, compute_minhash)['pairs']
+    elif co_listen_mode == 'external':
+        # Agrégation externe: runs triés sur disque fusionnés en appliquant le seuil (seuil dans la clé,
+        # le budget mémoire ne change pas le résultat)
+        def compute_external():
+            with span('preprocess.co_listen_external') as counts:
+                artist1, artist2, co_counts = external_co_listen_counts(
+                    listens[:, 0], listens[:, 1], n_artists, min_co_listens=min_co_listens,
+                    memory_budget=memory_budget, spill_dir=spill_dir, stats=counts)
+            return {'pairs': np.column_stack([artist1, artist2, co_counts]).astype(np.int64)}
+
+        co_listen_key = artifact_key('co_listen', catalog=catalog_key, mode='external', min_co_listens=min_co_listens)
+        pairs = cache.stage('co_listen', co_listen_key, compute_external)['pairs']
+    else:
+        co_listen_key = artifact_key('co_listen', catalog=catalog_key, mode='exact')
+        pairs = cache.stage('co_listen', co_listen_key, lambda: _co_listen_pairs(listens, n_artists))['pairs']
+    
+    artist_artist_relations = [tuple(pair) for pair in pairs[pairs[:, 2] >= min_co_listens].tolist()]
     
     print(f'    {len(artist_artist_relations)} relations Artist-Artist créées (seuil: {min_co_listens} co-écoutes)')
     if len(artist_artist_relations) == 0:
         print(f'    ⚠️ ATTENTION: Aucune relation Artist-Artist trouvée!')
         print(f'       Le seuil min_co_listens={min_co_listens} est peut-être trop élevé pour ce dataset.')
+
+    # Étape neighbors: top-k des voisins de chaque artiste parmi les mêmes paires que similar_to
+    if neighbor_k > 0:
+        def compute_neighbors():
+            kept = pairs[pairs[:, 2] >= min_co_listens]
+            listeners = np.bincount(listens[:, 1], minlength=n_artists)
+            ids, scores = build_neighbor_table(kept[:, 0], kept[:, 1], kept[:, 2], listeners, n_artists,
+                                               k=neighbor_k, score=neighbor_score)
+            return {'ids': ids, 'scores': scores}
+
+        neighbors_key = artifact_key('neighbors', co_listen=co_listen_key, min_co_listens=min_co_listens,
+                                     k=neighbor_k, score=neighbor_score)
+        neighbors = cache.stage('neighbors', neighbors_key, compute_neighbors)
     
     # Write kg_final.txt
-    kg_file = os.path.join(output_path, 'kg_final.txt')
     relation_id2index = {
         'listened_to': 0,      # user -> artist (Approach 2)
         'listened_by': 1,      # artist -> user (reverse, Approach 2)
         'similar_to': 2,       # artist1 -> artist2 (Approach 3)
         'similar_from': 3      # artist2 -> artist1 (reverse, Approach 3)
     }
-    
-    n_kg_triples = 0
-    with open(kg_file, 'w', encoding='utf-8') as writer:
-        # APPROACH 2: User -> Artist relations (listened_to)
-        for user_entity_idx, artist_idx, weight in user_artist_relations:
-            writer.write(f'{user_entity_idx}\t{relation_id2index["listened_to"]}\t{artist_idx}\t{weight}\n')
-            n_kg_triples += 1
-        
-        # APPROACH 2: Artist -> User relations (listened_by) - reverse
-        # Utiliser le même poids que listened_to
-        for user_entity_idx, artist_idx, weight in user_artist_relations:
-            writer.write(f'{artist_idx}\t{relation_id2index["listened_by"]}\t{user_entity_idx}\t{weight}\n')
-            n_kg_triples += 1
-        
-        # APPROACH 3: Artist -> Artist relations (similar_to)
-        for artist1, artist2, weight in artist_artist_relations:
-            writer.write(f'{artist1}\t{relation_id2index["similar_to"]}\t{artist2}\t{weight}\n')
-            n_kg_triples += 1
-        
-        # APPROACH 3: Reverse Artist -> Artist relations (similar_from)
-        # Utiliser le même poids que similar_to
-        for artist1, artist2, weight in artist_artist_relations:
-            writer.write(f'{artist2}\t{relation_id2index["similar_from"]}\t{artist1}\t{weight}\n')
-            n_kg_triples += 1
-    
-    n_entities = len(entity_id2index)
+    n_copies = 2 if kg_storage == 'full' else 1
+    n_kg_triples = n_copies * (len(user_artist_relations) + len(artist_artist_relations))
+    
+    def write_kg(path):
+        _remove_array_cache(path)
+        with span('preprocess.write_kg') as counts, open(path, 'w', encoding='utf-8') as writer:
+            # APPROACH 2: User -> Artist relations (listened_to)
+            for user_entity_idx, artist_idx, weight in user_artist_relations:
+                writer.write(f'{user_entity_idx}\t{relation_id2index["listened_to"]}\t{artist_idx}\t{weight}\n')
+            
+            # APPROACH 2: Artist -> User relations (listened_by) - reverse
+            # Utiliser le même poids que listened_to
+            if kg_storage == 'full':
+                for user_entity_idx, artist_idx, weight in user_artist_relations:
+                    writer.write(f'{artist_idx}\t{relation_id2index["listened_by"]}\t{user_entity_idx}\t{weight}\n')
+            
+            # APPROACH 3: Artist -> Artist relations (similar_to)
+            for artist1, artist2, weight in artist_artist_relations:
+                writer.write(f'{artist1}\t{relation_id2index["similar_to"]}\t{artist2}\t{weight}\n')
+            
+            # APPROACH 3: Reverse Artist -> Artist relations (similar_from)
+            # Utiliser le même poids que similar_to
+            if kg_storage == 'full':
+                for artist1, artist2, weight in artist_artist_relations:
+                    writer.write(f'{artist2}\t{relation_id2index["similar_from"]}\t{artist1}\t{weight}\n')
+            counts['triples'] = n_kg_triples
+    
+    kg_key = artifact_key('kg', catalog=catalog_key, co_listen=co_listen_key, min_co_listens=min_co_listens,
+                          kg_storage=kg_storage)
+    cache.materialize(os.path.join(output_path, 'kg_final.txt'), kg_key, write_kg)
+    
+    n_entities = n_artists + n_users
     n_relations = len(relation_id2index)
     
+    # Sauvegarder les correspondances index <-> IDs Last.fm et les noms d'artistes
+    with span('preprocess.write_mappings', entities=n_entities):
+        write_entity_mapping(output_path, artist_id2index, user_id2index, artist_names)
+    
     print(f'Graphe de connaissances créé:')
     print(f'  - Nombre d\'entités: {n_entities} ({n_artists} artistes + {n_users} utilisateurs)')
     print(f'  - Nombre de relations: {n_relations}')
-    print(f'    * listened_to/listened_by: {len(user_artist_relations) * 2} triplets')
-    print(f'    * similar_to/similar_from: {len(artist_artist_relations) * 2} triplets')
+    print(f'    * listened_to/listened_by: {len(user_artist_relations) * n_copies} triplets')
+    print(f'    * similar_to/similar_from: {len(artist_artist_relations) * n_copies} triplets')
     print(f'  - Nombre total de triplets KG: {n_kg_triples}')
+    if kg_storage == 'forward':
+        print(f'    (relations inverses non stockées, reconstruites au chargement)')
     
     # Sauvegarder les métadonnées du dataset
     metadata_file = os.path.join(output_path, 'dataset_metadata.txt')
@@ -335,129 +449,261 @@ def preprocess_music(raw_data_path, output_path, reduce_data=False, max_users=50
         if reduce_data:
             f.write(f'max_users_requested={max_users}\n')
             f.write(f'max_artists_requested={max_artists}\n')
+            if reduce_method != 'top':
+                f.write(f'reduce_method={reduce_method}\n')
+                f.write(f'kcore_min_degree={kcore_min_degree}\n')
         # Sauvegarder les valeurs RÉELLES, pas les max demandés
         f.write(f'n_users_actual={len(user_id2index)}\n')
         f.write(f'n_artists_actual={n_artists}\n')
         f.write(f'n_entities={n_entities}\n')
         f.write(f'n_relations={n_relations}\n')
         f.write(f'n_kg_triples={n_kg_triples}\n')
+        if kg_storage != 'full':
+            f.write(f'kg_storage={kg_storage}\n')
+        if co_listen_mode != 'exact':
+            f.write(f'co_listen_mode={co_listen_mode}\n')
+        if co_listen_mode == 'minhash':
+            f.write(f'minhash_hashes={num_hashes}\n')
+            f.write(f'lsh_bands={lsh_bands}\n')
     
     print('Métadonnées sauvegardées dans dataset_metadata.txt')
+
+    # Après dataset_metadata.txt: la signature de la table couvre les fichiers sources définitifs
+    if neighbor_k > 0:
+        write_neighbor_table(os.path.join(output_path, 'neighbors'), neighbors['ids'], neighbors['scores'],
+                             info={'score': neighbor_score, 'min_co_listens': min_co_listens},
+                             signature=source_signature(os.path.dirname(output_path), os.path.basename(output_path)))
+        print(f'Table des {neighbor_k} voisins par artiste sauvegardée dans neighbors/ (score: {neighbor_score})')
+    print('Correspondances index <-> IDs sauvegardées dans mappings/')
+    if use_cache:
+        print(f'Cache d\'artefacts: {cache.cache_dir}')
     print('Terminé!')
 
 
-def read_item_index_to_entity_id_file():
-    file = '../data/' + DATASET + '/item_index2entity_id_rehashed.txt'
+# Fichiers KG de chaque dataset (dans l'ordre d'attribution des ids)
+KG_FILE_NAMES = dict({'movie': ['kg_part1_rehashed.txt', 'kg_part2_rehashed.txt'],
+                      'book': ['kg_rehashed.txt'], 'news': ['kg_rehashed.txt']})
+# Taille cible des blocs de lignes KG traités par un worker
+KG_CHUNK_BYTES = 32 << 20
+
+
+def read_item_index(data_path):
+    """
+    Lire item_index2entity_id_rehashed.txt: les items deviennent les entités 0..n_items-1
+
+    Returns:
+        tuple: (item_index_old2new {item d'origine: index}, entity_id2index {entité Satori: index})
+    """
+    file = os.path.join(data_path, 'item_index2entity_id_rehashed.txt')
     print('Lecture du fichier de mapping item index vers entity id: ' + file + ' ...')
-    i = 0
-    for line in open(file, encoding='utf-8').readlines():
-        item_index = line.strip().split('\t')[0]
-        satori_id = line.strip().split('\t')[1]
-        item_index_old2new[item_index] = i
-        entity_id2index[satori_id] = i
-        i += 1
+    item_index_old2new = dict()
+    entity_id2index = dict()
+    with open(file, encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            item_index, satori_id = line.strip().split('\t')[:2]
+            item_index_old2new[item_index] = i
+            entity_id2index[satori_id] = i
+    return item_index_old2new, entity_id2index
 
 
-def convert_rating():
-    file = '../data/' + DATASET + '/' + RATING_FILE_NAME[DATASET]
+def convert_ratings(data_path, dataset, item_index_old2new, rng=None):
+    """
+    Ratings explicites -> ratings_final: positifs (note >= THRESHOLD) et autant de négatifs tirés
+    parmi les items non notés (un flux aléatoire par utilisateur)
 
+    Returns:
+        Array int32 (n_ratings, 3) [user, item, label] dans l'ordre d'écriture
+    """
+    file = os.path.join(data_path, RATING_FILE_NAME[dataset])
     print('Lecture du fichier de ratings ...')
+    sep, threshold = SEP[dataset], THRESHOLD[dataset]
+    quoted = dataset == 'book'  # champs entre guillemets dans BX-Book-Ratings.csv
     item_set = set(item_index_old2new.values())
     user_pos_ratings = dict()
     user_neg_ratings = dict()
 
-    for line in open(file, encoding='utf-8').readlines()[1:]:
-        array = line.strip().split(SEP[DATASET])
-
-        # remove prefix and suffix quotation marks for BX dataset
-        if DATASET == 'book':
-            array = list(map(lambda x: x[1:-1], array))
-
-        item_index_old = array[1]
-        if item_index_old not in item_index_old2new:  # the item is not in the final item set
-            continue
-        item_index = item_index_old2new[item_index_old]
-
-        user_index_old = int(array[0])
-
-        rating = float(array[2])
-        if rating >= THRESHOLD[DATASET]:
-            if user_index_old not in user_pos_ratings:
-                user_pos_ratings[user_index_old] = set()
-            user_pos_ratings[user_index_old].add(item_index)
-        else:
-            if user_index_old not in user_neg_ratings:
-                user_neg_ratings[user_index_old] = set()
-            user_neg_ratings[user_index_old].add(item_index)
+    with span('preprocess.read_ratings') as counts, open(file, encoding='utf-8') as f:
+        next(f)  # skip header
+        n_lines = 0
+        for line in f:
+            array = line.strip().split(sep)
+            user_field, item_index_old, rating_field = array[0], array[1], array[2]
+            if quoted:
+                user_field, item_index_old, rating_field = user_field[1:-1], item_index_old[1:-1], rating_field[1:-1]
+            n_lines += 1
+
+            item_index = item_index_old2new.get(item_index_old)
+            if item_index is None:  # the item is not in the final item set
+                continue
+            user_index_old = int(user_field)
+            ratings = user_pos_ratings if float(rating_field) >= threshold else user_neg_ratings
+            if user_index_old not in ratings:
+                ratings[user_index_old] = set()
+            ratings[user_index_old].add(item_index)
+        counts['lines'] = n_lines
 
     print('Conversion du fichier de ratings ...')
-    writer = open('../data/' + DATASET + '/ratings_final.txt', 'w', encoding='utf-8')
-    user_cnt = 0
-    user_index_old2new = dict()
-    for user_index_old, pos_item_set in user_pos_ratings.items():
-        if user_index_old not in user_index_old2new:
-            user_index_old2new[user_index_old] = user_cnt
-            user_cnt += 1
-        user_index = user_index_old2new[user_index_old]
-
-        for item in pos_item_set:
-            writer.write('%d\t%d\t1\n' % (user_index, item))
-        unwatched_set = item_set - pos_item_set
-        if user_index_old in user_neg_ratings:
-            unwatched_set -= user_neg_ratings[user_index_old]
-        for item in np.random.choice(list(unwatched_set), size=len(pos_item_set), replace=False):
-            writer.write('%d\t%d\t0\n' % (user_index, item))
-    writer.close()
-    print('Nombre d\'utilisateurs: %d' % user_cnt)
+    rng = make_rng(rng)
+    rows = []
+    with span('preprocess.sample_ratings', users=len(user_pos_ratings)) as counts:
+        for user_index, (user_index_old, pos_item_set) in enumerate(user_pos_ratings.items()):
+            rows.extend((user_index, item, 1) for item in pos_item_set)
+            unwatched_set = item_set - pos_item_set
+            if user_index_old in user_neg_ratings:
+                unwatched_set -= user_neg_ratings[user_index_old]
+            user_rng = spawn_rng(rng, user_index)
+            sampled = user_rng.choice(sorted(unwatched_set), size=len(pos_item_set), replace=False)
+            rows.extend((user_index, item, 0) for item in sampled.tolist())
+        counts['ratings'] = len(rows)
+    print('Nombre d\'utilisateurs: %d' % len(user_pos_ratings))
     print('Nombre d\'items: %d' % len(item_set))
+    return np.array(rows, dtype=np.int32).reshape(-1, 3)
+
+
+def _line_chunks(path, chunk_bytes):
+    """Découper un fichier en intervalles d'octets [start, end) alignés sur des débuts de ligne"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        while bounds[-1] < size:
+            target = bounds[-1] + chunk_bytes
+            if target >= size:
+                bounds.append(size)
+                break
+            f.seek(target)
+            f.readline()  # finir la ligne en cours
+            bounds.append(min(f.tell(), size))
+    return [(path, start, end) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _parse_kg_chunk(task):
+    """
+    Lire un bloc de lignes KG (worker): ids locaux dans l'ordre de première apparition
 
+    Returns:
+        tuple: (entités locales, relations locales, triplets int32 (n, 3) en ids locaux)
+    """
+    path, start, end = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        lines = list(map(str.strip, f.read(end - start).decode('utf-8').splitlines()))
+    fields = '\t'.join(lines).split('\t')
+    if len(fields) == 3 * len(lines):
+        # Cas courant (3 champs par ligne): colonnes par tranches, sans boucle par ligne
+        heads, relations, tails = fields[0::3], fields[1::3], fields[2::3]
+        entities = [None] * (2 * len(lines))
+        entities[0::2], entities[1::2] = heads, tails  # head avant tail, comme la lecture séquentielle
+    else:
+        rows = [array for array in (line.split('\t') for line in lines) if len(array) >= 3]
+        heads, relations, tails = [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+        entities = [token for row in rows for token in (row[0], row[2])]
+
+    entity_vocab = list(dict.fromkeys(entities))
+    relation_vocab = list(dict.fromkeys(relations))
+    entity_ids = {entity: i for i, entity in enumerate(entity_vocab)}
+    relation_ids = {relation: i for i, relation in enumerate(relation_vocab)}
+    triples = np.empty((len(heads), 3), dtype=np.int32)
+    triples[:, 0] = np.fromiter(map(entity_ids.__getitem__, heads), dtype=np.int32, count=len(heads))
+    triples[:, 1] = np.fromiter(map(relation_ids.__getitem__, relations), dtype=np.int32, count=len(heads))
+    triples[:, 2] = np.fromiter(map(entity_ids.__getitem__, tails), dtype=np.int32, count=len(heads))
+    return entity_vocab, relation_vocab, triples
+
+
+def convert_kg(kg_files, entity_id2index, workers=1, chunk_bytes=KG_CHUNK_BYTES):
+    """
+    Triplets KG avec ids d'entités et de relations consécutifs
 
-def convert_kg():
-    print('Conversion du fichier KG ...')
-    entity_cnt = len(entity_id2index)
-    relation_cnt = 0
+    Les fichiers sont découpés en blocs de lignes lus en parallèle; les ids locaux de chaque bloc
+    sont fusionnés dans l'ordre des blocs, ce qui donne exactement les ids d'une lecture séquentielle
+    (ordre de première apparition, head avant tail), quel que soit le nombre de workers.
 
-    writer = open('../data/' + DATASET + '/kg_final.txt', 'w', encoding='utf-8')
+    Args:
+        kg_files: Fichiers KG (head \\t relation \\t tail), dans l'ordre
+        entity_id2index: {entité: index} des items, complété en place
+        workers: Processus de lecture
+        chunk_bytes: Taille cible d'un bloc
 
-    files = []
-    if DATASET == 'movie':
-        files.append(open('../data/' + DATASET + '/kg_part1_rehashed.txt', encoding='utf-8'))
-        files.append(open('../data/' + DATASET + '/kg_part2_rehashed.txt', encoding='utf-8'))
-    else:
-        files.append(open('../data/' + DATASET + '/kg_rehashed.txt', encoding='utf-8'))
+    Returns:
+        tuple: (array int32 (n_triples, 3) [head, relation, tail], {relation: index})
+    """
+    print('Conversion du fichier KG ...')
+    relation_id2index = dict()
+    tasks = [task for file in kg_files for task in _line_chunks(file, chunk_bytes)]
+    blocks = []
+
+    with span('preprocess.convert_kg', chunks=len(tasks)) as counts, contextlib.ExitStack() as stack:
+        if workers > 1 and len(tasks) > 1:
+            executor = stack.enter_context(concurrent.futures.ProcessPoolExecutor(max_workers=workers))
+            results = executor.map(_parse_kg_chunk, tasks)
+        else:
+            results = map(_parse_kg_chunk, tasks)
+        for entities, relations, triples in results:
+            # Ids globaux des entités/relations du bloc, nouveaux ids dans l'ordre local
+            entity_ids = np.array([entity_id2index.setdefault(entity, len(entity_id2index)) for entity in entities],
+                                  dtype=np.int32)
+            relation_ids = np.array([relation_id2index.setdefault(relation, len(relation_id2index))
+                                     for relation in relations], dtype=np.int32)
+            block = np.empty_like(triples)
+            block[:, 0] = entity_ids[triples[:, 0]]
+            block[:, 1] = relation_ids[triples[:, 1]]
+            block[:, 2] = entity_ids[triples[:, 2]]
+            blocks.append(block)
+        kg_np = np.concatenate(blocks) if blocks else np.empty((0, 3), dtype=np.int32)
+        counts['triples'] = len(kg_np)
+
+    print('Nombre d\'entités (contenant les items): %d' % len(entity_id2index))
+    print('Nombre de relations: %d' % len(relation_id2index))
+    return kg_np, relation_id2index
+
+
+def write_int_table(path, array, block_rows=1 << 16):
+    """
+    Écrire un array d'entiers en texte (colonnes séparées par des tabulations) et son cache .npy,
+    lu directement par graph_loader / data_loader sans np.loadtxt
+    """
+    with open(path + '.txt', 'w', encoding='utf-8') as writer:
+        line_format = '\t'.join(['%d'] * array.shape[1]) + '\n'
+        for start in range(0, len(array), block_rows):
+            writer.write(''.join(line_format % tuple(row) for row in array[start:start + block_rows].tolist()))
+    np.save(path + '.npy', array)
 
-    for file in files:
-        for line in file:
-            array = line.strip().split('\t')
-            head_old = array[0]
-            relation_old = array[1]
-            tail_old = array[2]
 
-            if head_old not in entity_id2index:
-                entity_id2index[head_old] = entity_cnt
-                entity_cnt += 1
-            head = entity_id2index[head_old]
+def preprocess_kg_dataset(data_path, dataset, rng=None, workers=1, chunk_bytes=KG_CHUNK_BYTES):
+    """
+    Preprocess movie / book / news (fichiers *_rehashed de RippleNet dans data_path)
 
-            if tail_old not in entity_id2index:
-                entity_id2index[tail_old] = entity_cnt
-                entity_cnt += 1
-            tail = entity_id2index[tail_old]
+    Écrit dans data_path ratings_final.txt / kg_final.txt (format inchangé: 3 colonnes) et leurs
+    caches .npy, ainsi que dataset_metadata.txt.
 
-            if relation_old not in relation_id2index:
-                relation_id2index[relation_old] = relation_cnt
-                relation_cnt += 1
-            relation = relation_id2index[relation_old]
+    Args:
+        data_path: Dossier du dataset (ex: ../data/movie)
+        dataset: 'movie', 'book' ou 'news'
+        rng: Generator de l'échantillonnage négatif
+        workers: Processus de lecture du KG
+        chunk_bytes: Taille cible des blocs de lignes KG
+    """
+    with span('preprocess.read_item_index'):
+        item_index_old2new, entity_id2index = read_item_index(data_path)
 
-            writer.write('%d\t%d\t%d\n' % (head, relation, tail))
+    rating_np = convert_ratings(data_path, dataset, item_index_old2new, rng)
+    with span('preprocess.write_ratings', ratings=len(rating_np)):
+        write_int_table(os.path.join(data_path, 'ratings_final'), rating_np)
 
-    writer.close()
-    print('Nombre d\'entités (contenant les items): %d' % entity_cnt)
-    print('Nombre de relations: %d' % relation_cnt)
+    kg_files = [os.path.join(data_path, name) for name in KG_FILE_NAMES[dataset]]
+    kg_np, relation_id2index = convert_kg(kg_files, entity_id2index, workers, chunk_bytes)
+    with span('preprocess.write_kg', triples=len(kg_np)):
+        write_int_table(os.path.join(data_path, 'kg_final'), kg_np)
 
+    with open(os.path.join(data_path, 'dataset_metadata.txt'), 'w', encoding='utf-8') as f:
+        f.write('filtered=False\n')
+        f.write(f'n_users_actual={int(rating_np[:, 0].max(initial=-1)) + 1}\n')
+        f.write(f'n_items_actual={len(item_index_old2new)}\n')
+        f.write(f'n_entities={len(entity_id2index)}\n')
+        f.write(f'n_relations={len(relation_id2index)}\n')
+        f.write(f'n_kg_triples={len(kg_np)}\n')
 
-if __name__ == '__main__':
-    np.random.seed(555)
 
+if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Prétraitement des données avec option de réduction')
     parser.add_argument('-d', '--dataset', type=str, default='music', 
                        help='Nom du dataset à prétraiter')
@@ -467,30 +713,77 @@ if __name__ == '__main__':
                        help='Nombre maximum d\'utilisateurs (si --reduce)')
     parser.add_argument('--max_artists', type=int, default=100,
                        help='Nombre maximum d\'artistes (si --reduce)')
+    parser.add_argument('--reduce_method', type=str, default='top', choices=REDUCE_METHODS,
+                       help='Sélection de --reduce: top-N indépendants ou sous-graphe k-core dense et connexe')
+    parser.add_argument('--kcore_min_degree', type=int, default=2,
+                       help='Degré minimal des utilisateurs et artistes gardés (si --reduce_method kcore)')
     parser.add_argument('--min_co_listens', type=int, default=None,
                        help='Seuil minimum de co-écoutes pour relations Artist-Artist (défaut: 2, ou 1 pour petits datasets)')
+    parser.add_argument('--co_listen', type=str, default='exact', choices=['exact', 'external', 'minhash'],
+                       help='Calcul des co-écoutes: exact, exact à mémoire bornée (external) ou approché par MinHash/LSH')
+    parser.add_argument('--num_hashes', type=int, default=128,
+                       help='Nombre de fonctions de hachage MinHash (si --co_listen minhash)')
+    parser.add_argument('--lsh_bands', type=int, default=32,
+                       help='Nombre de bandes LSH, doit diviser --num_hashes (si --co_listen minhash)')
+    parser.add_argument('--memory_budget_mb', type=int, default=256,
+                       help='Mémoire de travail du comptage des co-écoutes (si --co_listen external)')
+    parser.add_argument('--spill_dir', type=str, default=None,
+                       help='Dossier des runs temporaires (si --co_listen external, défaut: dossier temporaire)')
+    parser.add_argument('--kg_storage', type=str, default='full', choices=['full', 'forward'],
+                       help='forward: ne pas écrire listened_by/similar_from (reconstruites au chargement)')
+    parser.add_argument('--cache_dir', type=str, default=None,
+                       help='Dossier du cache d\'artefacts par étape (défaut: ../final_data/<dataset>/artifacts)')
+    parser.add_argument('--no_cache', action='store_true',
+                       help='Tout recalculer sans lire ni écrire le cache d\'artefacts')
+    parser.add_argument('--neighbor_k', type=int, default=50,
+                       help='Voisins par artiste dans la table neighbors/ (0 = pas de table)')
+    parser.add_argument('--neighbor_score', type=str, default='count', choices=NEIGHBOR_SCORES,
+                       help='Classement des voisins: co-écoutes brutes ou normalisées par les auditeurs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                       help='Processus de lecture des fichiers KG (movie/book/news)')
+    parser.add_argument('--seed', type=int, default=555,
+                       help='Graine racine de l\'échantillonnage négatif')
+    parser.add_argument('--profile', type=str, default=None,
+                       help='Écrire une trace JSON des temps/mémoire par étape dans ce fichier')
     
     args = parser.parse_args()
     DATASET = args.dataset
+    if args.profile:
+        enable_profiling(command='preprocess')
 
     raw_data_path = f'../rawdata/{DATASET}'
     output_path = f'../final_data/{DATASET}'
     
     if DATASET == 'music':
         # Use new music preprocessing
-        preprocess_music(raw_data_path, output_path, 
-                        reduce_data=args.reduce,
-                        max_users=args.max_users,
-                        max_artists=args.max_artists,
-                        min_co_listens=args.min_co_listens)
+        with span('preprocess.total'):
+            preprocess_music(raw_data_path, output_path, 
+                            reduce_data=args.reduce,
+                            max_users=args.max_users,
+                            max_artists=args.max_artists,
+                            min_co_listens=args.min_co_listens,
+                            rng=stage_rng(args.seed, STAGE_NEGATIVE_SAMPLING),
+                            co_listen_mode=args.co_listen,
+                            num_hashes=args.num_hashes,
+                            lsh_bands=args.lsh_bands,
+                            minhash_rng=stage_rng(args.seed, STAGE_MINHASH),
+                            kg_storage=args.kg_storage,
+                            cache_dir=args.cache_dir,
+                            use_cache=not args.no_cache,
+                            neighbor_k=args.neighbor_k,
+                            neighbor_score=args.neighbor_score,
+                            memory_budget=args.memory_budget_mb << 20,
+                            spill_dir=args.spill_dir,
+                            reduce_method=args.reduce_method,
+                            kcore_min_degree=args.kcore_min_degree)
     else:
-        # Use old preprocessing for movie/book
-        entity_id2index = dict()
-        relation_id2index = dict()
-        item_index_old2new = dict()
-
-        read_item_index_to_entity_id_file()
-        convert_rating()
-        convert_kg()
+        # movie/book/news: fichiers *_rehashed de RippleNet dans ../data/<dataset>
+        with span('preprocess.total'):
+            preprocess_kg_dataset(f'../data/{DATASET}', DATASET,
+                                  rng=stage_rng(args.seed, STAGE_NEGATIVE_SAMPLING),
+                                  workers=args.workers)
 
         print('Terminé')
+    
+    if args.profile:
+        write_trace(args.profile)
@@ -0,0 +1,180 @@
+"""
+Module d'instrumentation légère (temps et mémoire) pour les étapes critiques
+Désactivé par défaut: les spans ne coûtent presque rien tant que enable_profiling() n'est pas appelé
+"""
+import contextlib
+import functools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+_enabled = False
+_spans = []   # Spans terminés, dans l'ordre de fin
+_stack = []   # Spans en cours (pour l'imbrication)
+_trace_info = {}
+
+
+def enable_profiling(command=None, trace_memory=True):
+    """
+    Activer la collecte des spans
+
+    Args:
+        command: Nom de la commande (ex: 'preprocess', 'main') enregistré dans la trace
+        trace_memory: Si True, démarre tracemalloc pour mesurer le pic d'allocation Python
+    """
+    global _enabled
+    _enabled = True
+    _spans.clear()
+    _stack.clear()
+    _trace_info.clear()
+    _trace_info['command'] = command
+    _trace_info['argv'] = list(sys.argv)
+    _trace_info['started_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    _trace_info['python'] = platform.python_version()
+    _trace_info['platform'] = platform.platform()
+    _trace_info['tracemalloc'] = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable_profiling():
+    """Désactiver la collecte (les spans déjà collectés sont conservés)"""
+    global _enabled
+    _enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _enabled
+
+
+def _peak_rss_kb():
+    """Pic de mémoire résidente du processus en Ko (None si indisponible)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS renvoie des octets, Linux des Ko
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+@contextlib.contextmanager
+def span(name, **counts):
+    """
+    Mesurer une étape: temps mur, temps CPU, pic RSS et pic tracemalloc
+
+    Le dictionnaire retourné par le context manager permet d'enregistrer
+    des compteurs d'items une fois connus:
+
+        with span('preprocess.co_listen') as counts:
+            ...
+            counts['pairs'] = len(artist_similarity)
+
+    Args:
+        name: Nom de l'étape
+        **counts: Compteurs d'items déjà connus à l'entrée
+    """
+    if not _enabled:
+        yield dict(counts)
+        return
+
+    record = {
+        'name': name,
+        'parent': _stack[-1]['name'] if _stack else None,
+        'depth': len(_stack),
+        'items': dict(counts),
+        '_child_peak': 0,
+    }
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # Le pic du parent est conservé via _child_peak avant la remise à zéro
+        if _stack:
+            _stack[-1]['_child_peak'] = max(_stack[-1]['_child_peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        record['_mem_start'] = tracemalloc.get_traced_memory()[0]
+    _stack.append(record)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield record['items']
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        _stack.pop()
+
+        record['wall_s'] = round(wall, 6)
+        record['cpu_s'] = round(cpu, 6)
+        record['peak_rss_kb'] = _peak_rss_kb()
+        if tracing and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], record['_child_peak'])
+            record['tracemalloc_peak_bytes'] = peak - record['_mem_start']
+            if _stack:
+                _stack[-1]['_child_peak'] = max(_stack[-1]['_child_peak'], peak)
+        else:
+            record['tracemalloc_peak_bytes'] = None
+        record.pop('_child_peak', None)
+        record.pop('_mem_start', None)
+        if wall > 0:
+            record['items_per_s'] = {key: round(value / wall, 1) for key, value in record['items'].items()
+                                     if isinstance(value, (int, float))}
+        _spans.append(record)
+
+
+def profiled(name=None):
+    """
+    Décorateur équivalent à span() autour d'une fonction
+
+    Args:
+        name: Nom de l'étape (défaut: nom de la fonction)
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_trace():
+    """
+    Retourner la trace courante
+
+    Returns:
+        dict: {'command', 'argv', 'started_at', ..., 'spans': [...]}
+    """
+    trace = dict(_trace_info)
+    trace['peak_rss_kb'] = _peak_rss_kb()
+    trace['spans'] = list(_spans)
+    return trace
+
+
+def write_trace(output_file):
+    """
+    Écrire la trace au format JSON
+
+    Args:
+        output_file: Chemin du fichier JSON de sortie
+    """
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(get_trace(), f, indent=2)
+    print(f'Trace de performance sauvegardée dans: {output_file}')
@@ -0,0 +1,89 @@
+"""
+Générateurs aléatoires explicites et reproductibles pour les étapes d'échantillonnage
+Chaque étape reçoit un numpy.random.Generator; les flux par utilisateur/shard sont dérivés
+par clé (comme SeedSequence.spawn) et ne dépendent donc ni de l'ordre ni du nombre de workers
+"""
+import numpy as np
+
+# Clés de flux par étape (dérivées d'une même graine racine)
+STAGE_NEGATIVE_SAMPLING = 0
+STAGE_SPLIT = 1
+STAGE_RIPPLE_SET = 2
+STAGE_MINHASH = 3
+STAGE_EMBEDDING = 4
+STAGE_WALKS = 5
+
+
+def make_rng(seed=None):
+    """
+    Construire un Generator depuis une graine
+
+    Args:
+        seed: None (entropie du système), int, SeedSequence ou Generator (retourné tel quel)
+
+    Returns:
+        numpy.random.Generator
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return np.random.Generator(np.random.PCG64(seed))
+
+
+def _seed_sequence(rng):
+    bit_generator = rng.bit_generator
+    seed_seq = getattr(bit_generator, 'seed_seq', None)  # numpy >= 1.25
+    if seed_seq is None:
+        seed_seq = bit_generator._seed_seq
+    return seed_seq
+
+
+def spawn_seed_sequence(rng, *key):
+    """
+    SeedSequence enfant identifiée par une clé (ex: index utilisateur)
+
+    Équivalent au i-ème enfant de SeedSequence.spawn, mais sans compteur interne:
+    la même clé donne toujours le même flux, quel que soit l'ordre des appels.
+    """
+    parent = _seed_sequence(rng)
+    return np.random.SeedSequence(parent.entropy,
+                                  spawn_key=tuple(parent.spawn_key) + tuple(int(k) for k in key),
+                                  pool_size=parent.pool_size)
+
+
+def spawn_rng(rng, *key):
+    """
+    Generator enfant identifié par une clé (ex: index utilisateur ou de shard)
+
+    Args:
+        rng: Generator parent (créé par make_rng)
+        *key: Entiers identifiant le flux
+
+    Returns:
+        numpy.random.Generator
+    """
+    return np.random.Generator(np.random.PCG64(spawn_seed_sequence(rng, *key)))
+
+
+def rng_fingerprint(rng):
+    """
+    Identité du flux d'un Generator (entropie et clé de dérivation de sa SeedSequence)
+
+    Deux Generators neufs de même empreinte produisent la même suite: utilisé dans les clés du cache
+    d'artefacts (artifact_cache.py). Un Generator sans graine a une entropie aléatoire, donc une
+    empreinte nouvelle à chaque exécution.
+    """
+    seed_seq = _seed_sequence(rng)
+    return [str(seed_seq.entropy), [int(k) for k in seed_seq.spawn_key]]
+
+
+def stage_rng(seed, stage):
+    """
+    Generator d'une étape du pipeline dérivé d'une graine racine
+
+    Args:
+        seed: Graine racine (None, int, SeedSequence ou Generator)
+        stage: Constante STAGE_* de ce module
+    """
+    return spawn_rng(make_rng(seed), stage)
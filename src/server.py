@@ -0,0 +1,323 @@
+"""
+Serveur de recommandation asyncio: le graphe est chargé une fois et reste en mémoire
+Les requêtes arrivant à quelques millisecondes d'intervalle sont regroupées (micro-batching)
+en un seul appel vectorisé exécuté dans un pool de threads
+
+Usage (depuis src/):
+    python main.py --serve --port 8080
+    curl 'http://127.0.0.1:8080/recommend?user_id=0&algorithm=ppr&k=10'
+"""
+import asyncio
+import collections
+import concurrent.futures
+import json
+from http import HTTPStatus
+import os
+import time
+import urllib.parse
+import numpy as np
+
+from engine import RecommendationEngine, ENGINE_ALGORITHMS, SIMILAR_METHODS
+
+# Bornes des paramètres de requête: un lot par (algorithme, max_hops) ou par méthode, quel que soit k
+MAX_K = 100
+MAX_HOPS = 5
+
+
+class MicroBatcher:
+    """
+    Regrouper les requêtes concurrentes en lots
+
+    Le premier élément ouvre une fenêtre de window_ms; tout ce qui arrive avant sa fin
+    (jusqu'à max_batch éléments) est traité par un seul appel batch_fn(items) dans l'executor.
+
+    Args:
+        batch_fn: Fonction (liste d'items) -> liste de résultats alignés
+        executor: Executor pour le calcul CPU
+        window_ms: Durée de la fenêtre de regroupement
+        max_batch: Taille maximale d'un lot
+    """
+
+    def __init__(self, batch_fn, executor, window_ms=2.0, max_batch=64):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.n_batches = 0
+        self.n_items = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+            except Exception as e:  # propager l'erreur à chaque requête du lot
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.n_batches += 1
+            self.n_items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class LatencyStats:
+    """Latences des dernières requêtes (fenêtre glissante) pour p50/p99 et QPS"""
+
+    def __init__(self, window=10000):
+        self.latencies = collections.deque(maxlen=window)
+        self.timestamps = collections.deque(maxlen=window)
+        self.n_requests = 0
+
+    def record(self, seconds):
+        self.latencies.append(seconds)
+        self.timestamps.append(time.monotonic())
+        self.n_requests += 1
+
+    def summary(self):
+        if not self.latencies:
+            return {'n_requests': self.n_requests}
+        latencies_ms = np.array(self.latencies) * 1000.0
+        span_s = self.timestamps[-1] - self.timestamps[0]
+        return {
+            'n_requests': self.n_requests,
+            'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+            'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+            'max_ms': round(float(latencies_ms.max()), 3),
+            'qps': round(len(self.timestamps) / span_s, 1) if span_s > 0 else None,
+        }
+
+
+def _int_param(params, name, default=None, minimum=None, maximum=None):
+    """
+    Paramètre entier d'une requête
+
+    Raises:
+        ValueError: paramètre absent (sans défaut), non entier ou hors de [minimum, maximum]
+    """
+    if name not in params:
+        if default is None:
+            raise ValueError(f'paramètre manquant: {name}')
+        return default
+    try:
+        value = int(params[name])
+    except ValueError:
+        raise ValueError(f'paramètre {name} non entier: {params[name]!r}') from None
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ValueError(f'paramètre {name} hors de [{minimum}, {maximum}]: {value}')
+    return value
+
+
+class RecommendationServer:
+    """
+    Serveur HTTP/1.1 minimal (keep-alive) au-dessus d'asyncio, TCP ou socket Unix
+
+    Routes:
+        GET /health
+        GET /stats
+        GET /recommend?user_id=0&algorithm=ppr&k=10&max_hops=2   (1 <= k <= max_k, 1 <= max_hops <= MAX_HOPS)
+        GET /similar?artist_id=3&k=10&method=ppr
+
+    Statuts: 400 pour un paramètre invalide, 404 pour un id inconnu, 503 si l'index demandé
+    (embeddings, table des voisins) n'est pas chargé, 500 pour une erreur du moteur.
+    """
+
+    def __init__(self, engine, workers=None, window_ms=2.0, max_batch=64, max_k=MAX_K):
+        self.engine = engine
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.max_k = max_k
+        self.batchers = {}
+        self.stats = LatencyStats()
+
+    def _batcher(self, key, batch_fn):
+        if key not in self.batchers:
+            batcher = MicroBatcher(batch_fn, self.executor, self.window_ms, self.max_batch)
+            batcher.start()
+            self.batchers[key] = batcher
+        return self.batchers[key]
+
+    @staticmethod
+    def _sliced(batch_fn):
+        """Lot d'items (id, k) calculé une fois au plus grand k du lot, puis tronqué pour chaque requête"""
+        def run(items):
+            results = batch_fn([item for item, _ in items], max(k for _, k in items))
+            return [result[:k] if result is not None else None for result, (_, k) in zip(results, items)]
+        return run
+
+    async def recommend(self, user_id, algorithm, k, max_hops):
+        # Un lot par algorithme (et max_hops pour BFS, seul à l'utiliser): au plus
+        # len(ENGINE_ALGORITHMS) + MAX_HOPS lots, quels que soient les paramètres des clients
+        max_hops = max_hops if algorithm == 'bfs' else None
+        batcher = self._batcher(('recommend', algorithm, max_hops), self._sliced(
+            lambda users, k: self.engine.recommend_batch(users, algorithm, k, max_hops or 2)))
+        return await batcher.submit((user_id, k))
+
+    async def similar(self, artist_id, k, method='ppr'):
+        batcher = self._batcher(('similar', method), self._sliced(
+            lambda artists, k: self.engine.similar_artists_batch(artists, k, method)))
+        return await batcher.submit((artist_id, k))
+
+    async def dispatch(self, method, target):
+        """Retourner (status, payload) pour une requête"""
+        url = urllib.parse.urlsplit(target)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        if method != 'GET':
+            return 405, {'error': 'méthode non supportée'}
+        if url.path == '/health':
+            return 200, {'status': 'ok', **self.engine.info()}
+        if url.path == '/stats':
+            batches = {'/'.join(map(str, key)): {'batches': b.n_batches, 'items': b.n_items}
+                       for key, b in self.batchers.items()}
+            return 200, {'latency': self.stats.summary(), 'batchers': batches}
+        if url.path not in ('/recommend', '/similar'):
+            return 404, {'error': f'route inconnue: {url.path}'}
+
+        # Seuls les paramètres de la requête donnent un 400; les erreurs du moteur sont des 500
+        try:
+            k = _int_param(params, 'k', 10, 1, self.max_k)
+            if url.path == '/recommend':
+                item_id = _int_param(params, 'user_id')
+                name = params.get('algorithm', 'ppr')
+                if name not in ENGINE_ALGORITHMS:
+                    raise ValueError(f'algorithme inconnu: {name}')
+                max_hops = _int_param(params, 'max_hops', 2, 1, MAX_HOPS)
+            else:
+                item_id = _int_param(params, 'artist_id')
+                name = params.get('method', 'ppr')
+                if name not in SIMILAR_METHODS:
+                    raise ValueError(f'méthode inconnue: {name}')
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        missing = self.engine.missing_index(name)
+        if missing is not None:
+            return 503, {'error': missing}
+
+        try:
+            if url.path == '/recommend':
+                result = await self.recommend(item_id, name, k, max_hops)
+            else:
+                result = await self.similar(item_id, k, name)
+        except Exception as e:  # erreur interne du moteur, propagée par le lot
+            return 500, {'error': f'erreur du moteur: {e}'}
+        if url.path == '/recommend':
+            if result is None:
+                return 404, {'error': f'utilisateur inconnu: {item_id}'}
+            return 200, {'user_id': item_id, 'algorithm': name, 'recommendations': result}
+        if result is None:
+            return 404, {'error': f'artiste inconnu: {item_id}'}
+        return 200, {'artist_id': item_id, 'similar': result}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) < 3:
+                    break
+                method, target, version = parts[0], parts[1], parts[2]
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length:
+                    await reader.readexactly(length)
+
+                status, payload = await self.dispatch(method, target)
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                writer.write(f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'
+                             f'Content-Type: application/json; charset=utf-8\r\n'
+                             f'Content-Length: {len(body)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + body)
+                await writer.drain()
+                self.stats.record(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080, unix_socket=None):
+        if unix_socket:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            print(f'Serveur en écoute sur unix:{unix_socket}')
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f'Serveur en écoute sur http://{host}:{port}')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for batcher in self.batchers.values():
+                await batcher.stop()
+            self.executor.shutdown(wait=False)
+
+
+def run_server(dataset_path, dataset_name='music', use_small=False, host='127.0.0.1', port=8080,
+               unix_socket=None, workers=None, window_ms=2.0, max_batch=64, engine=None, max_k=MAX_K):
+    """
+    Charger le moteur une fois puis servir les requêtes jusqu'à interruption
+
+    Args:
+        dataset_path: Chemin vers final_data
+        dataset_name: Nom du dataset
+        use_small: Utiliser le dataset réduit (déprécié)
+        host, port: Adresse TCP (ignorée si unix_socket est donné)
+        unix_socket: Chemin d'un socket Unix
+        workers: Threads de l'executor (défaut: nombre de CPU)
+        window_ms: Fenêtre de micro-batching
+        max_batch: Taille maximale d'un lot
+        engine: RecommendationEngine déjà chargé (optionnel)
+        max_k: Valeur maximale du paramètre k des requêtes
+    """
+    if engine is None:
+        print('Chargement du moteur de recommandation...')
+        engine = RecommendationEngine.from_dataset(dataset_path, dataset_name, use_small=use_small)
+    server = RecommendationServer(engine, workers=workers, window_ms=window_ms, max_batch=max_batch, max_k=max_k)
+    try:
+        asyncio.run(server.serve(host, port, unix_socket))
+    except KeyboardInterrupt:
+        print('\nServeur arrêté')
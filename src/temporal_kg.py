@@ -0,0 +1,526 @@
+"""
+Instantanés temporels du KG music par fenêtres de périodes (mois, trimestre, année)
+
+user_taggedartists.dat date chaque étiquetage (jour, mois, année): un utilisateur qui étiquette un
+artiste est actif sur cet artiste à cette date. Pour chaque fenêtre des window_periods dernières
+périodes, le KG a la même structure que celui de preprocess_music:
+    - listened_to / listened_by: poids = nombre d'étiquetages de l'utilisateur sur l'artiste
+    - similar_to / similar_from: poids = nombre d'utilisateurs actifs sur les deux artistes
+avec, pour listened_to / listened_by, un poids décroissant avec l'ancienneté (demi-vie en périodes).
+
+Les événements sont triés par période (index period_ptr, comme un indptr): la fenêtre suivante est
+obtenue en ajoutant les événements de la période qui entre et en retirant ceux de la période qui
+sort. Seules les paires qui contiennent un artiste ajouté à (ou retiré d') un utilisateur changent de
+co-activité; quand un pas remplace une grande partie de la fenêtre, elle est reconstruite.
+
+Les fenêtres sont écrites dans final_data/{dataset}/temporal/{period}_w{window_periods}/
+(window_XXXX.npy, window_XXXX_decayed.npy, index.json écrit en dernier) et ouvertes en mmap.
+
+Usage (depuis src/):
+    python temporal_kg.py --build --period quarter
+    python temporal_kg.py --trending 2010Q3 --k 20
+    python temporal_kg.py --recommend 0 --window 2010Q3
+    python temporal_kg.py --benchmark
+"""
+import argparse
+import collections
+import json
+import os
+import time
+import numpy as np
+
+from artifact_cache import file_digest
+from co_listen import LISTENED_TO, LISTENED_BY, co_listen_counts, artist_triples
+from engine import RecommendationEngine
+from entity_mapping import load_entity_mapping
+from graph_csr import build_csr, CSRAdjacency
+from graph_snapshot import load_snapshot
+from profiling import span
+
+TEMPORAL_VERSION = 1
+# Nombre de mois par période
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+# Au-delà de cette part d'événements modifiés par pas, reconstruire la fenêtre coûte moins cher
+# que le delta (mesuré sur Last.fm: égalité vers 1/6, fenêtres de 12 mois glissant d'un mois)
+MAX_DELTA_FRACTION = 0.15
+# Dates antérieures à Last.fm (1956, 1957, 1979 dans le dataset): erreurs de saisie, ignorées
+MIN_YEAR = 2005
+
+# Événements triés par période; period_ptr[p - first_period] = début des événements de la période p
+TagEvents = collections.namedtuple('TagEvents', ['users', 'artists', 'periods', 'period_ptr', 'first_period',
+                                                 'n_artists', 'n_users', 'period'])
+
+
+def period_label(period_index, period='quarter'):
+    """Libellé d'une période: '2010-07' (mois), '2010Q3' (trimestre), '2010' (année)"""
+    months = period_index * PERIOD_MONTHS[period]
+    year, month = divmod(months, 12)
+    if period == 'month':
+        return f'{year}-{month + 1:02d}'
+    if period == 'quarter':
+        return f'{year}Q{month // 3 + 1}'
+    return str(year)
+
+
+def load_tag_events(raw_data_path, entity_mapping, period='quarter', min_year=MIN_YEAR):
+    """
+    Lire user_taggedartists.dat et trier les étiquetages par période
+
+    Args:
+        raw_data_path: Chemin vers rawdata/music
+        entity_mapping: EntityMapping du dataset (IDs Last.fm -> index du KG); les utilisateurs et
+                        artistes absents du KG sont ignorés
+        period: 'month', 'quarter' ou 'year'
+        min_year: Ignorer les dates antérieures
+
+    Returns:
+        TagEvents
+    """
+    path = os.path.join(raw_data_path, 'user_taggedartists.dat')
+    with span('temporal_kg.load_events') as counts:
+        data = np.loadtxt(path, dtype=np.int64, skiprows=1, ndmin=2).reshape(-1, 6)
+        users = entity_mapping.user_index(data[:, 0])
+        artists = entity_mapping.artist_index(data[:, 1])
+        months = data[:, 5] * 12 + data[:, 4] - 1
+        keep = (users >= 0) & (artists >= 0) & (data[:, 5] >= min_year)
+        users, artists, months = users[keep], artists[keep], months[keep]
+
+        periods = months // PERIOD_MONTHS[period]
+        order = np.argsort(periods, kind='stable')
+        users, artists, periods = users[order], artists[order], periods[order]
+        first = int(periods[0]) if len(periods) else 0
+        last = int(periods[-1]) if len(periods) else -1
+        period_ptr = np.searchsorted(periods, np.arange(first, last + 2)).astype(np.int64)
+        counts['events'] = len(periods)
+        counts['periods'] = last - first + 1
+    return TagEvents(users=users.astype(np.int64), artists=artists.astype(np.int64), periods=periods,
+                     period_ptr=period_ptr, first_period=first, n_artists=entity_mapping.n_artists,
+                     n_users=entity_mapping.n_users, period=period)
+
+
+def _period_slice(events, period_index):
+    """Positions des événements d'une période (vide hors de l'intervalle couvert)"""
+    offset = period_index - events.first_period
+    if offset < 0 or offset + 1 >= len(events.period_ptr):
+        return slice(0, 0)
+    return slice(int(events.period_ptr[offset]), int(events.period_ptr[offset + 1]))
+
+
+def _ranges(starts, stops):
+    sizes = stops - starts
+    return np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+
+
+def _apply_delta(keys, columns, delta_keys, delta_columns):
+    """
+    Ajouter des deltas à un état trié {clé: valeurs} et retirer les clés dont le compte tombe à 0
+
+    Args:
+        keys: Clés triées uniques de l'état
+        columns: Liste d'arrays alignés sur keys (le premier est le compte)
+        delta_keys: Clés triées uniques du delta
+        delta_columns: Arrays alignés sur delta_keys
+
+    Returns:
+        tuple: (keys, columns); les arrays de columns peuvent être modifiés sur place
+    """
+    pos = np.searchsorted(keys, delta_keys)
+    found = pos < len(keys)
+    found[found] = keys[pos[found]] == delta_keys[found]
+    # Clés existantes: mise à jour sur place (les colonnes appartiennent à l'état)
+    for column, delta in zip(columns, delta_columns):
+        column[pos[found]] += delta[found]
+    dead = pos[found][columns[0][pos[found]] == 0]
+    new = np.flatnonzero(~found)
+    if not len(new) and not len(dead):
+        return keys, columns
+
+    # Fusion en une seule copie: position de chaque nouvelle clé dans le résultat, puis les
+    # anciennes lignes encore vivantes dans les emplacements restants
+    n_out = len(keys) + len(new) - len(dead)
+    new_dest = pos[new] - np.searchsorted(dead, pos[new]) + np.arange(len(new))
+    is_new = np.zeros(n_out, dtype=bool)
+    is_new[new_dest] = True
+    alive = np.ones(len(keys), dtype=bool)
+    alive[dead] = False
+    merged = []
+    for column, delta in zip([keys] + columns, [delta_keys] + delta_columns):
+        out = np.empty(n_out, dtype=column.dtype)
+        out[new_dest] = delta[new]
+        out[~is_new] = column[alive]
+        merged.append(out)
+    return merged[0], merged[1:]
+
+
+def _flip_pairs(keys, flip_keys, n_artists):
+    """
+    Paires d'artistes qui gagnent (ou perdent) une co-activité quand les écoutes flip_keys
+    entrent dans l'état keys (ou en sortent): chaque écoute (user, a) est associée aux autres
+    artistes b de l'utilisateur, une seule fois quand b fait aussi partie de flip_keys
+
+    Args:
+        keys: Clés triées user * n_artists + artist de l'état contenant flip_keys
+        flip_keys: Clés triées des écoutes qui entrent ou sortent
+
+    Returns:
+        Array des clés artist1 * n_artists + artist2 (artist1 < artist2), une par co-activité
+    """
+    users, artists = flip_keys // n_artists, flip_keys % n_artists
+    starts = np.searchsorted(keys, users * n_artists)
+    sizes = np.searchsorted(keys, (users + 1) * n_artists) - starts
+    others = keys[_ranges(starts, starts + sizes)]
+    artists = np.repeat(artists, sizes)
+    other_artists = others % n_artists
+    pos = np.minimum(np.searchsorted(flip_keys, others), max(len(flip_keys) - 1, 0))
+    other_flips = flip_keys[pos] == others if len(flip_keys) else np.zeros(len(others), dtype=bool)
+    keep = (other_artists != artists) & (~other_flips | (artists < other_artists))
+    artist1 = np.minimum(artists[keep], other_artists[keep])
+    artist2 = np.maximum(artists[keep], other_artists[keep])
+    return artist1 * n_artists + artist2
+
+
+def _window_kg(n_artists, ua_keys, ua_counts, ua_decayed, pair_keys, pair_counts, min_co_listens):
+    """Triplets (relations 0 à 3, même ordre que kg_final.txt) et poids décroissants alignés"""
+    n_listens = len(ua_keys)
+    keep = pair_counts >= min_co_listens
+    pair_keys, pair_counts = pair_keys[keep], pair_counts[keep]
+    n_pairs = len(pair_keys)
+
+    users = ua_keys // n_artists
+    artists = ua_keys - users * n_artists
+    kg_np = np.empty((2 * n_listens + 2 * n_pairs, 4), dtype=np.int32)
+    listened_to, listened_by = kg_np[:n_listens], kg_np[n_listens:2 * n_listens]
+    listened_to[:, 0], listened_to[:, 1], listened_to[:, 2], listened_to[:, 3] = users + n_artists, LISTENED_TO, \
+        artists, ua_counts
+    listened_by[:, 0], listened_by[:, 1], listened_by[:, 2], listened_by[:, 3] = artists, LISTENED_BY, \
+        users + n_artists, ua_counts
+    artist1 = pair_keys // n_artists
+    kg_np[2 * n_listens:] = artist_triples(artist1, pair_keys - artist1 * n_artists, pair_counts)
+
+    decayed = np.empty(len(kg_np), dtype=np.float32)
+    decayed[:n_listens] = decayed[n_listens:2 * n_listens] = ua_decayed
+    decayed[2 * n_listens:2 * n_listens + n_pairs] = decayed[2 * n_listens + n_pairs:] = pair_counts
+    return kg_np, decayed
+
+
+def _window_state(events, end, window_periods, half_life):
+    """État (écoutes et co-activités) de la fenêtre se terminant à end, calculé depuis les événements"""
+    n_artists = events.n_artists
+    start = _period_slice(events, max(end - window_periods + 1, events.first_period)).start
+    stop = _period_slice(events, end).stop
+    users, artists = events.users[start:stop], events.artists[start:stop]
+    ages = end - events.periods[start:stop]
+    ua_keys, inverse = np.unique(users * n_artists + artists, return_inverse=True)
+    ua_counts = np.bincount(inverse, minlength=len(ua_keys)).astype(np.int64)
+    ua_decayed = np.bincount(inverse, weights=2.0 ** (-ages / half_life), minlength=len(ua_keys))
+    artist1, artist2, pair_counts = co_listen_counts(ua_keys // n_artists, ua_keys % n_artists, n_artists)
+    return ua_keys, ua_counts, ua_decayed, artist1 * n_artists + artist2, pair_counts
+
+
+def _delta_state(events, state, entering, leaving, step, leaving_weight):
+    """
+    État de la fenêtre suivante: ajouter les événements entering, retirer les événements leaving
+
+    Args:
+        events: TagEvents
+        state: (ua_keys, ua_counts, ua_decayed, pair_keys, pair_counts) de la fenêtre précédente
+        entering, leaving: Tranches d'événements (voir _period_slice)
+        step: Facteur de décroissance d'une période
+        leaving_weight: Poids décroissant d'un événement qui sort de la fenêtre
+
+    Returns:
+        tuple: État de la nouvelle fenêtre
+    """
+    n_artists = events.n_artists
+    ua_keys, ua_counts, ua_decayed, pair_keys, pair_counts = state
+    keys = np.concatenate([events.users[entering] * n_artists + events.artists[entering],
+                           events.users[leaving] * n_artists + events.artists[leaving]])
+    signs = np.r_[np.ones(entering.stop - entering.start, dtype=np.int64),
+                  -np.ones(leaving.stop - leaving.start, dtype=np.int64)]
+    delta_keys, inverse = np.unique(keys, return_inverse=True)
+    delta_counts = np.bincount(inverse, weights=signs, minlength=len(delta_keys)).astype(np.int64)
+    delta_decayed = np.bincount(inverse, weights=np.where(signs > 0, 1.0, -leaving_weight),
+                                minlength=len(delta_keys))
+
+    # Écoutes dont la présence change (compte qui passe de 0 à > 0 ou l'inverse): seules les
+    # paires qui contiennent un artiste ajouté ou retiré changent de co-activité
+    pos = np.searchsorted(ua_keys, delta_keys)
+    was_active = pos < len(ua_keys)
+    was_active[was_active] = ua_keys[pos[was_active]] == delta_keys[was_active]
+    old_counts = np.zeros(len(delta_keys), dtype=np.int64)
+    old_counts[was_active] = ua_counts[pos[was_active]]
+    new_counts = old_counts + delta_counts
+    removed_pairs = _flip_pairs(ua_keys, delta_keys[(old_counts > 0) & (new_counts == 0)], n_artists)
+
+    ua_decayed = ua_decayed * step
+    ua_keys, (ua_counts, ua_decayed) = _apply_delta(ua_keys, [ua_counts, ua_decayed], delta_keys,
+                                                    [delta_counts, delta_decayed])
+    np.maximum(ua_decayed, 0.0, out=ua_decayed)  # erreurs d'arrondi des soustractions
+    added_pairs = _flip_pairs(ua_keys, delta_keys[(old_counts == 0) & (new_counts > 0)], n_artists)
+
+    change_keys, inverse = np.unique(np.concatenate([added_pairs, removed_pairs]), return_inverse=True)
+    signs = np.r_[np.ones(len(added_pairs)), -np.ones(len(removed_pairs))]
+    change_counts = np.bincount(inverse, weights=signs, minlength=len(change_keys)).astype(np.int64)
+    nonzero = change_counts != 0
+    pair_keys, (pair_counts,) = _apply_delta(pair_keys, [pair_counts], change_keys[nonzero],
+                                             [change_counts[nonzero]])
+    return ua_keys, ua_counts, ua_decayed, pair_keys, pair_counts
+
+
+def iter_windows(events, window_periods=1, half_life=1.0, min_co_listens=2, max_delta_fraction=MAX_DELTA_FRACTION):
+    """
+    Fenêtres successives, chacune calculée comme un delta de la précédente
+
+    La fenêtre se terminant à la période p couvre [p - window_periods + 1, p]. Le poids décroissant
+    d'un étiquetage d'âge a (en périodes) est 2^(-a / half_life): tout l'état est multiplié par
+    2^(-1 / half_life) à chaque pas, les événements qui entrent valent 1 et ceux qui sortent
+    2^(-window_periods / half_life). Quand les événements qui entrent et sortent dépassent
+    max_delta_fraction des événements de la fenêtre (un pas remplace une grande partie du contenu,
+    ex: fenêtres d'une seule période), l'état est reconstruit à la place.
+
+    Yields:
+        tuple: (période de fin, kg_np int32 (n, 4), poids décroissants float32 (n,))
+    """
+    step = 2.0 ** (-1.0 / half_life)
+    leaving_weight = 2.0 ** (-window_periods / half_life)
+    state = None
+    last_period = events.first_period + len(events.period_ptr) - 2
+    for end in range(events.first_period, last_period + 1):
+        entering, leaving = _period_slice(events, end), _period_slice(events, end - window_periods)
+        window_start = _period_slice(events, max(end - window_periods + 1, events.first_period)).start
+        n_changes = (entering.stop - entering.start) + (leaving.stop - leaving.start)
+        if state is None or n_changes > max_delta_fraction * (entering.stop - window_start):
+            state = _window_state(events, end, window_periods, half_life)
+        else:
+            state = _delta_state(events, state, entering, leaving, step, leaving_weight)
+        yield (end, *_window_kg(events.n_artists, *state, min_co_listens))
+
+
+def build_window(events, end, window_periods=1, half_life=1.0, min_co_listens=2):
+    """
+    Fenêtre se terminant à la période end, reconstruite depuis les événements (sans delta)
+
+    Returns:
+        tuple: (kg_np int32 (n, 4), poids décroissants float32 (n,))
+    """
+    return _window_kg(events.n_artists, *_window_state(events, end, window_periods, half_life), min_co_listens)
+
+
+def temporal_path(dataset_path, dataset_name='music', period='quarter', window_periods=1):
+    return os.path.join(dataset_path, dataset_name, 'temporal', f'{period}_w{window_periods}')
+
+
+def build_temporal(events, output_dir, window_periods=1, half_life=1.0, min_co_listens=2,
+                   max_delta_fraction=MAX_DELTA_FRACTION, info=None):
+    """
+    Calculer toutes les fenêtres par deltas et les écrire (index.json en dernier)
+
+    Returns:
+        TemporalKG
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    windows = []
+    with span('temporal_kg.build', events=len(events.periods)) as counts:
+        for number, (end, kg_np, decayed) in enumerate(iter_windows(events, window_periods, half_life,
+                                                                    min_co_listens, max_delta_fraction)):
+            name = f'window_{number:04d}'
+            np.save(os.path.join(output_dir, f'{name}.npy'), kg_np)
+            np.save(os.path.join(output_dir, f'{name}_decayed.npy'), decayed)
+            windows.append({'label': period_label(end, events.period), 'file': name,
+                            'first_period': period_label(end - window_periods + 1, events.period),
+                            'n_triples': int(len(kg_np)),
+                            'n_listens': int((kg_np[:, 1] == LISTENED_TO).sum())})
+        counts['windows'] = len(windows)
+
+    meta = dict(info or {})
+    meta.update({'version': TEMPORAL_VERSION, 'period': events.period, 'window_periods': window_periods,
+                 'half_life': half_life, 'min_co_listens': min_co_listens, 'n_artists': int(events.n_artists),
+                 'n_users': int(events.n_users), 'windows': windows})
+    tmp_path = os.path.join(output_dir, 'index.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, 'index.json'))
+    print(f'{len(windows)} fenêtres écrites dans {output_dir}')
+    return load_temporal(output_dir)
+
+
+def load_temporal(output_dir, signature=None):
+    """
+    Ouvrir les fenêtres écrites par build_temporal
+
+    Args:
+        output_dir: Dossier des fenêtres
+        signature: Si donnée, retourner None quand les fenêtres viennent d'autres fichiers
+
+    Returns:
+        TemporalKG ou None si absent, d'une autre version ou périmé
+    """
+    meta_path = os.path.join(output_dir, 'index.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != TEMPORAL_VERSION:
+        return None
+    if signature is not None and meta.get('signature') != signature:
+        print('Fenêtres temporelles périmées (fichiers sources modifiés)')
+        return None
+    return TemporalKG(output_dir, meta)
+
+
+class TemporalKG:
+    """
+    Fenêtres écrites sur disque, chargées en mmap à la demande
+
+    Args:
+        output_dir: Dossier des fenêtres
+        meta: Contenu de index.json
+    """
+
+    def __init__(self, output_dir, meta):
+        self.output_dir = output_dir
+        self.meta = meta
+        self.labels = [window['label'] for window in meta['windows']]
+        self._index = {label: i for i, label in enumerate(self.labels)}
+
+    @property
+    def n_nodes(self):
+        return self.meta['n_artists'] + self.meta['n_users']
+
+    def _window(self, label):
+        if label not in self._index:
+            available = f'{self.labels[0]} .. {self.labels[-1]}' if self.labels else 'aucune'
+            raise KeyError(f'Fenêtre inconnue: {label} (disponibles: {available})')
+        return self.meta['windows'][self._index[label]]
+
+    def window(self, label, mmap_mode='r'):
+        """
+        Triplets de la fenêtre et poids décroissants alignés
+
+        Returns:
+            tuple: (kg_np int32 (n, 4), decayed float32 (n,))
+        """
+        name = self._window(label)['file']
+        kg_np = np.load(os.path.join(self.output_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+        decayed = np.load(os.path.join(self.output_dir, f'{name}_decayed.npy'), mmap_mode=mmap_mode)
+        return kg_np, decayed
+
+    def csr(self, label, decayed_weights=False):
+        """
+        CSRGraph de la fenêtre (entités numérotées comme le KG complet)
+
+        Args:
+            decayed_weights: Poids décroissants (arrondis, au moins 1) à la place des comptes
+        """
+        kg_np, decayed = self.window(label)
+        if decayed_weights:
+            kg_np = np.array(kg_np)
+            kg_np[:, 3] = np.maximum(np.rint(decayed * 100), 1).astype(np.int32)
+        return build_csr(kg_np, n_nodes=self.n_nodes)
+
+    def trending_artists(self, label, k=10):
+        """
+        Artistes les plus actifs de la fenêtre (somme des poids décroissants de listened_to)
+
+        Returns:
+            list: [(artiste, score), ...]
+        """
+        kg_np, decayed = self.window(label)
+        listens = np.flatnonzero(kg_np[:, 1] == LISTENED_TO)
+        scores = np.bincount(kg_np[listens, 2], weights=decayed[listens], minlength=self.meta['n_artists'])
+        top = np.argsort(-scores, kind='stable')[:k]
+        return [(int(artist), float(scores[artist])) for artist in top if scores[artist] > 0]
+
+    def engine(self, label, user_history, entity_mapping=None, decayed_weights=True, **kwargs):
+        """RecommendationEngine sur le graphe de la fenêtre (historiques complets comme graines)"""
+        csr = self.csr(label, decayed_weights)
+        metadata = {'n_artists_actual': self.meta['n_artists'], 'type': f'temporal {label}'}
+        return RecommendationEngine(CSRAdjacency(csr), None, user_history, metadata, entity_mapping, csr=csr,
+                                    **kwargs)
+
+
+def benchmark(events, window_periods=1, half_life=1.0, min_co_listens=2, max_delta_fraction=MAX_DELTA_FRACTION):
+    """
+    Temps des fenêtres par deltas contre une reconstruction complète de chaque fenêtre,
+    et vérification que les deux donnent les mêmes triplets (max_delta_fraction=inf: deltas seuls)
+
+    Returns:
+        dict
+    """
+    start = time.perf_counter()
+    delta_windows = list(iter_windows(events, window_periods, half_life, min_co_listens, max_delta_fraction))
+    delta_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    full_windows = [build_window(events, end, window_periods, half_life, min_co_listens)
+                    for end, _, _ in delta_windows]
+    full_seconds = time.perf_counter() - start
+
+    identical = all(np.array_equal(delta_kg, full_kg) for (_, delta_kg, _), (full_kg, _) in
+                    zip(delta_windows, full_windows))
+    max_decay_error = max((float(np.abs(delta_decayed - full_decayed).max(initial=0.0))
+                           for (_, _, delta_decayed), (_, full_decayed) in zip(delta_windows, full_windows)),
+                          default=0.0)
+    return {'windows': len(delta_windows), 'events': int(len(events.periods)),
+            'delta_seconds': round(delta_seconds, 3), 'full_rebuild_seconds': round(full_seconds, 3),
+            'identical_triples': identical, 'max_decayed_weight_error': max_decay_error}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Instantanés du KG par fenêtre temporelle')
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--raw_data_path', type=str, default='../rawdata/music')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--build', action='store_true', help='(Re)construire les fenêtres')
+    parser.add_argument('--period', type=str, default='quarter', choices=sorted(PERIOD_MONTHS))
+    parser.add_argument('--window_periods', type=int, default=1, help='Périodes couvertes par une fenêtre')
+    parser.add_argument('--half_life', type=float, default=1.0, help='Demi-vie des poids décroissants (périodes)')
+    parser.add_argument('--min_co_listens', type=int, default=2, help='Seuil des relations similar_to')
+    parser.add_argument('--max_delta_fraction', type=float, default=MAX_DELTA_FRACTION,
+                        help="Part d'événements modifiés au-delà de laquelle une fenêtre est reconstruite")
+    parser.add_argument('--trending', type=str, default=None, metavar='FENÊTRE',
+                        help='Artistes les plus actifs de la fenêtre (ex: 2010Q3)')
+    parser.add_argument('--recommend', type=int, default=None, metavar='USER',
+                        help="Recommandations PPR pour l'utilisateur sur le graphe de --window")
+    parser.add_argument('--window', type=str, default=None, help='Fenêtre de --recommend (défaut: la dernière)')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--benchmark', action='store_true', help='Deltas contre reconstruction complète')
+    args = parser.parse_args()
+
+    entity_mapping = load_entity_mapping(args.dataset_path, args.dataset)
+    if entity_mapping is None:
+        raise SystemExit('Correspondances absentes: lancer preprocess.py')
+    output_dir = temporal_path(args.dataset_path, args.dataset, args.period, args.window_periods)
+    signature = {'tags': file_digest(os.path.join(args.raw_data_path, 'user_taggedartists.dat')),
+                 'artists': entity_mapping.n_artists, 'users': entity_mapping.n_users,
+                 'half_life': args.half_life, 'min_co_listens': args.min_co_listens}
+
+    temporal = None if args.build else load_temporal(output_dir, signature)
+    events = None
+    if temporal is None or args.benchmark:
+        events = load_tag_events(args.raw_data_path, entity_mapping, args.period)
+    if temporal is None:
+        temporal = build_temporal(events, output_dir, args.window_periods, args.half_life, args.min_co_listens,
+                                  args.max_delta_fraction, info={'signature': signature})
+
+    if args.trending:
+        print(f'\nArtistes les plus actifs ({args.trending}):')
+        for artist, score in temporal.trending_artists(args.trending, args.k):
+            print(f'  {entity_mapping.entity_label(artist)}: {score:.2f}')
+    if args.recommend is not None:
+        if not temporal.labels:
+            raise SystemExit("Aucune fenêtre: pas d'étiquetage daté pour les artistes et utilisateurs du KG")
+        label = args.window or temporal.labels[-1]
+        snapshot = load_snapshot(args.dataset_path, args.dataset)
+        engine = temporal.engine(label, snapshot.user_history, entity_mapping)
+        recommendations = engine.recommend(args.recommend, k=args.k)
+        print(f'\nRecommandations pour {args.recommend} ({label}):')
+        for item in recommendations or []:
+            print(f"  {item['name']}: {item['score']:.4f}")
+    if args.benchmark:
+        print(json.dumps(benchmark(events, args.window_periods, args.half_life, args.min_co_listens,
+                                   args.max_delta_fraction), indent=2))
+
+
+if __name__ == '__main__':
+    main()
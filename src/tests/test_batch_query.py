@@ -0,0 +1,51 @@
+"""
+Mode --batch: un index absent arrête le traitement avant la lecture de l'entrée
+"""
+import io
+import json
+import os
+import sys
+import pytest
+
+from batch_query import run_batch
+from preprocess import preprocess_music
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'rawdata', 'music')
+
+
+class UnreadableInput:
+    """Entrée standard qui échoue si elle est lue"""
+
+    def __iter__(self):
+        raise AssertionError("l'entrée ne doit pas être lue")
+
+    read = readline = __iter__
+
+
+@pytest.fixture(scope='module')
+def dataset_path(tmp_path_factory):
+    dataset_path = str(tmp_path_factory.mktemp('final_data'))
+    # Sans table des voisins ni index d'embeddings
+    preprocess_music(RAW_DATA_PATH, os.path.join(dataset_path, 'music'), reduce_data=True, max_users=50,
+                     max_artists=100, rng=0, use_cache=False, neighbor_k=0)
+    return dataset_path
+
+
+@pytest.mark.parametrize('query, options, message', [
+    ('similar', {'method': 'table'}, 'Table des voisins absente'),
+    ('similar', {'method': 'embedding'}, "Index d'embeddings absent"),
+    ('recommend', {'algorithm': 'embedding'}, "Index d'embeddings absent"),
+])
+def test_missing_index_exits_before_reading(dataset_path, monkeypatch, query, options, message):
+    monkeypatch.setattr(sys, 'stdin', UnreadableInput())
+    with pytest.raises(SystemExit, match=message):
+        run_batch(dataset_path, 'music', '-', query=query, **options)
+
+
+def test_batch_writes_one_line_per_id(dataset_path, monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('0\n# commentaire\nabc\n14\n'))
+    summary = run_batch(dataset_path, 'music', '-', query='similar', k=3)
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record['artist_id'] for record in records] == [0, None, 14]
+    assert summary == {**summary, 'queries': 3, 'errors': 1}
+    assert len(records[0]['similar']) == 3
@@ -0,0 +1,128 @@
+"""
+Les backends de graph_kernels donnent les mêmes résultats que les boucles Python du dictionnaire
+"""
+import collections
+import numpy as np
+import pytest
+
+from explain import explain_paths
+from graph_algorithms import ALGORITHMS, run_algorithm
+from graph_csr import CSRAdjacency, build_csr, csr_heads
+from graph_kernels import available_backends, get_backend
+from graph_loader import construct_kg
+
+N_ARTISTS = 60
+N_USERS = 20
+
+BACKENDS = ['numpy', pytest.param('numba', marks=pytest.mark.skipif('numba' not in available_backends(),
+                                                                     reason='numba non installé'))]
+
+
+@pytest.fixture(scope='module')
+def kg_np():
+    """
+    KG synthétique au format de preprocess_music: poids entiers faibles (beaucoup d'ex aequo),
+    quelques artistes isolés. Triplets triés par head puis tail, l'ordre des arêtes du CSR: le BFS
+    du dictionnaire découvre les nœuds dans l'ordre de ses listes d'adjacence
+    """
+    rng = np.random.default_rng(0)
+    users = rng.integers(0, N_USERS, 300) + N_ARTISTS
+    listened = rng.integers(0, N_ARTISTS - 5, 300)
+    pairs = rng.integers(0, N_ARTISTS - 5, (150, 2))
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    listens = np.unique(np.column_stack([users, listened]), axis=0)
+    pairs = np.unique(pairs, axis=0)
+    listen_weights = rng.integers(1, 4, len(listens))
+    pair_weights = rng.integers(1, 4, len(pairs))
+    rows = [np.column_stack([listens[:, 0], np.zeros(len(listens), int), listens[:, 1], listen_weights]),
+            np.column_stack([listens[:, 1], np.ones(len(listens), int), listens[:, 0], listen_weights]),
+            np.column_stack([pairs[:, 0], np.full(len(pairs), 2), pairs[:, 1], pair_weights]),
+            np.column_stack([pairs[:, 1], np.full(len(pairs), 3), pairs[:, 0], pair_weights])]
+    kg_np = np.concatenate(rows).astype(np.int32)
+    return kg_np[np.lexsort((kg_np[:, 2], kg_np[:, 0]))]
+
+
+@pytest.fixture(scope='module')
+def csr(kg_np):
+    return build_csr(kg_np, n_nodes=N_ARTISTS + N_USERS)
+
+
+def _start_sets(kg_np):
+    rng = np.random.default_rng(1)
+    history = collections.defaultdict(list)
+    for user, artist in kg_np[kg_np[:, 1] == 0][:, [0, 2]].tolist():
+        history[user].append(artist)
+    return [history[user] for user in sorted(history)] + [[N_ARTISTS - 1], rng.choice(N_ARTISTS, 8).tolist()]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('algorithm', list(ALGORITHMS))
+def test_algorithms_match_dict(kg_np, csr, algorithm, backend):
+    kg = construct_kg(kg_np)
+    adjacency = CSRAdjacency(csr)
+    for start_nodes in _start_sets(kg_np):
+        expected = run_algorithm(algorithm, kg, start_nodes, top_k=10, record_paths=True)
+        result = run_algorithm(algorithm, adjacency, start_nodes, top_k=10, backend=backend, record_paths=True)
+        assert result['recommendations'] == expected['recommendations']
+        assert result['n_visited'] == expected['n_visited']
+        items = [artist for artist, _ in expected['recommendations']]
+        assert (explain_paths(result['predecessors'], items)
+                == explain_paths(expected['predecessors'], items))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_dijkstra_predecessors_match_dict(kg_np, csr, backend):
+    # Prédécesseurs de tous les nœuds atteints, pas seulement ceux des recommandations
+    kg = construct_kg(kg_np)
+    adjacency = CSRAdjacency(csr)
+    for start_nodes in _start_sets(kg_np):
+        expected = run_algorithm('dijkstra', kg, start_nodes, record_paths=True)['predecessors']
+        result = run_algorithm('dijkstra', adjacency, start_nodes, backend=backend, record_paths=True)['predecessors']
+        n_nodes = len(expected.parent)
+        assert (result.parent[n_nodes:] == -1).all()
+        for name in ('parent', 'relation', 'weight'):
+            assert np.array_equal(getattr(result, name)[:n_nodes], getattr(expected, name)), name
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_gather_edges(csr, backend):
+    nodes = np.array([3, 0, N_ARTISTS + 2, 3, N_ARTISTS - 1], dtype=np.int64)
+    heads, edges = get_backend(backend).gather_edges(csr.indptr, nodes)
+    expected = [(node, edge) for node in nodes.tolist() for edge in range(csr.indptr[node], csr.indptr[node + 1])]
+    assert list(zip(heads.tolist(), edges.tolist())) == expected
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_connected_components(csr, backend):
+    heads = csr_heads(csr)
+    labels = get_backend(backend).connected_components(csr.n_nodes, heads, csr.indices.astype(np.int64))
+
+    # Référence: parcours en largeur non orienté, étiquette = plus petit nœud de la composante
+    neighbors = collections.defaultdict(set)
+    for head, tail in zip(heads.tolist(), csr.indices.tolist()):
+        neighbors[head].add(tail)
+        neighbors[tail].add(head)
+    expected = [-1] * csr.n_nodes
+    for root in range(csr.n_nodes):
+        if expected[root] >= 0:
+            continue
+        expected[root] = root
+        queue = [root]
+        for node in queue:
+            for neighbor in neighbors[node]:
+                if expected[neighbor] < 0:
+                    expected[neighbor] = root
+                    queue.append(neighbor)
+    assert labels.tolist() == expected
+    assert len(np.unique(labels)) > 1
+
+
+@pytest.mark.skipif('numba' not in available_backends(), reason='numba non installé')
+def test_ldg_partition_backends_agree(csr):
+    order = np.arange(csr.n_nodes, dtype=np.int64)
+    node_weights = np.diff(csr.indptr) + 1
+    parts = np.full(csr.n_nodes, -1, dtype=np.int32)
+    capacity = 1.05 * node_weights.sum() / 3
+    results = [get_backend(name).ldg_partition(csr.indptr, csr.indices, order, node_weights, 3, capacity, parts)
+               for name in ('numpy', 'numba')]
+    assert np.array_equal(results[0], results[1])
@@ -0,0 +1,55 @@
+"""
+Le snapshot et les caches .npy suivent un nouveau preprocess (cd src && python -m pytest tests)
+"""
+import os
+import numpy as np
+
+from graph_loader import load_kg_array, load_ratings
+from graph_snapshot import load_snapshot
+from preprocess import preprocess_music
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'rawdata', 'music')
+
+
+def _preprocess(dataset_path, **kwargs):
+    preprocess_music(RAW_DATA_PATH, os.path.join(dataset_path, 'music'), reduce_data=True, max_users=50,
+                     max_artists=100, rng=0, use_cache=False, neighbor_k=0, **kwargs)
+
+
+def _edges(csr):
+    heads = np.repeat(np.arange(csr.n_nodes), np.diff(csr.indptr))
+    rows = np.column_stack([heads, csr.relations, csr.indices, csr.weights]).astype(np.int64)
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def _sorted_rows(kg_np):
+    kg_np = kg_np.astype(np.int64)
+    return kg_np[np.lexsort(kg_np.T[::-1])]
+
+
+def test_repreprocess_updates_snapshot(tmp_path):
+    dataset_path = str(tmp_path)
+    _preprocess(dataset_path, min_co_listens=1)
+    before = load_snapshot(dataset_path)
+    # Caches .npy créés par un chargement ordinaire
+    load_kg_array(dataset_path)
+    load_ratings(dataset_path)
+
+    _preprocess(dataset_path, min_co_listens=3)
+    text = np.loadtxt(os.path.join(dataset_path, 'music', 'kg_final.txt'), dtype=np.int64)
+    after = load_snapshot(dataset_path)
+    assert len(after.csr.indices) == len(text) < len(before.csr.indices)
+    assert np.array_equal(_edges(after.csr), _sorted_rows(text))
+    assert np.array_equal(_sorted_rows(load_kg_array(dataset_path)), _sorted_rows(text))
+
+
+def test_forward_storage_after_full_cache(tmp_path):
+    dataset_path = str(tmp_path)
+    _preprocess(dataset_path, min_co_listens=1)
+    full = load_snapshot(dataset_path)
+    full_kg = load_kg_array(dataset_path)
+
+    _preprocess(dataset_path, min_co_listens=1, kg_storage='forward')
+    forward_kg = load_kg_array(dataset_path)
+    assert np.array_equal(forward_kg, full_kg)
+    assert np.array_equal(_edges(load_snapshot(dataset_path).csr), _edges(full.csr))
@@ -0,0 +1,34 @@
+"""
+Partitionnement LDG: équilibre garanti à imbalance près, mêmes partitions pour les deux backends
+"""
+import os
+import numpy as np
+import pytest
+
+from graph_csr import build_csr
+from graph_kernels import available_backends
+from partition import partition_graph, partition_quality
+
+BACKENDS = ['numpy', pytest.param('numba', marks=pytest.mark.skipif('numba' not in available_backends(),
+                                                                     reason='numba non installé'))]
+
+
+@pytest.fixture(scope='module')
+def csr():
+    """KG réduit livré avec le dépôt: 80 nœuds dont des artistes de degré élevé par rapport à la marge"""
+    kg_np = np.loadtxt(os.path.join(os.path.dirname(__file__), '..', '..', 'final_data', 'music', 'kg_final.txt'),
+                       dtype=np.int64)
+    return build_csr(kg_np)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('n_parts', [2, 3, 4, 8])
+@pytest.mark.parametrize('imbalance', [0.05, 0.1])
+def test_partition_respects_imbalance(csr, backend, n_parts, imbalance):
+    assignment = partition_graph(csr, n_parts, imbalance=imbalance, backend=backend)
+    quality = partition_quality(csr, assignment, n_parts)
+    assert assignment.min() >= 0
+    assert quality['max_imbalance'] <= 1 + imbalance
+    # La coupe reste bien meilleure qu'une affectation modulo
+    heads = np.repeat(np.arange(csr.n_nodes), np.diff(csr.indptr))
+    assert quality['cut_edges'] < ((heads % n_parts) != (csr.indices % n_parts)).sum()
@@ -0,0 +1,65 @@
+"""
+Validation des paramètres et statuts d'erreur du serveur (dispatch appelé sans passer par le réseau)
+"""
+import asyncio
+import os
+import pytest
+
+from engine import RecommendationEngine
+from preprocess import preprocess_music
+from server import RecommendationServer, MAX_HOPS
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'rawdata', 'music')
+
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory):
+    dataset_path = str(tmp_path_factory.mktemp('final_data'))
+    # Sans table des voisins ni index d'embeddings: méthodes 'table' et 'embedding' indisponibles
+    preprocess_music(RAW_DATA_PATH, os.path.join(dataset_path, 'music'), reduce_data=True, max_users=50,
+                     max_artists=100, rng=0, use_cache=False, neighbor_k=0)
+    return RecommendationEngine.from_dataset(dataset_path, 'music')
+
+
+def _dispatch(server, *targets):
+    async def run():
+        try:
+            return [await server.dispatch('GET', target) for target in targets]
+        finally:
+            for batcher in server.batchers.values():
+                await batcher.stop()
+    return asyncio.run(run())
+
+
+def test_invalid_parameters_are_rejected(engine):
+    server = RecommendationServer(engine, workers=1)
+    targets = ['/similar?artist_id=3&k=-5', '/similar?artist_id=3&k=0', f'/similar?artist_id=3&k={server.max_k + 1}',
+               '/recommend?user_id=0&max_hops=-1', f'/recommend?user_id=0&algorithm=bfs&max_hops={MAX_HOPS + 1}',
+               '/recommend?user_id=abc', '/recommend', '/recommend?user_id=0&algorithm=foo',
+               '/similar?artist_id=3&method=foo']
+    for target, (status, payload) in zip(targets, _dispatch(server, *targets)):
+        assert status == 400, target
+        assert 'error' in payload
+    assert not server.batchers
+
+
+def test_batchers_do_not_depend_on_k(engine):
+    server = RecommendationServer(engine, workers=1)
+    targets = [f'/recommend?user_id=0&k={k}' for k in range(1, 30)] + [f'/similar?artist_id=3&k={k}' for k in (1, 5, 50)]
+    responses = _dispatch(server, *targets)
+    assert all(status == 200 for status, _ in responses)
+    assert set(server.batchers) == {('recommend', 'ppr', None), ('similar', 'ppr')}
+    top = engine.recommend(0, 'ppr', k=29)
+    for k, (_, payload) in zip(range(1, 30), responses):
+        assert payload['recommendations'] == top[:k]
+    assert len(responses[-1][1]['similar']) <= 50
+
+
+def test_missing_index_is_unavailable(engine):
+    server = RecommendationServer(engine, workers=1)
+    (status, payload), (table_status, _), (unknown_status, _) = _dispatch(
+        server, '/recommend?user_id=0&algorithm=embedding', '/similar?artist_id=3&method=table',
+        '/recommend?user_id=999999')
+    assert status == table_status == 503
+    assert 'embeddings' in payload['error']
+    assert unknown_status == 404
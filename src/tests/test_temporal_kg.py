@@ -0,0 +1,41 @@
+"""
+Fenêtres temporelles: recommandations sur une fenêtre où l'utilisateur n'atteint aucun artiste
+"""
+import numpy as np
+import pytest
+
+from temporal_kg import TagEvents, build_temporal, load_temporal
+
+N_ARTISTS = 4
+N_USERS = 3
+
+
+def _events(users, artists, periods):
+    """TagEvents synthétiques (trimestres), triés par période comme load_tag_events"""
+    users, artists, periods = (np.asarray(values, dtype=np.int64) for values in (users, artists, periods))
+    first = int(periods[0]) if len(periods) else 0
+    last = int(periods[-1]) if len(periods) else -1
+    period_ptr = np.searchsorted(periods, np.arange(first, last + 2)).astype(np.int64)
+    return TagEvents(users=users, artists=artists, periods=periods, period_ptr=period_ptr, first_period=first,
+                     n_artists=N_ARTISTS, n_users=N_USERS, period='quarter')
+
+
+def test_user_without_reachable_artists(tmp_path):
+    # 2010Q1: l'utilisateur 0 sur l'artiste 0; 2010Q2: les utilisateurs 1 et 2 sur les artistes 1 à 3
+    first = 2010 * 4
+    events = _events([0, 1, 1, 2, 2], [0, 1, 2, 1, 3], [first, first + 1, first + 1, first + 1, first + 1])
+    temporal = build_temporal(events, str(tmp_path), min_co_listens=1)
+    assert temporal.labels == ['2010Q1', '2010Q2']
+
+    user_history = {N_ARTISTS + 0: [0], N_ARTISTS + 1: [1, 2], N_ARTISTS + 2: [1, 3]}
+    engine = temporal.engine('2010Q2', user_history)
+    assert engine.recommend(N_ARTISTS + 0, k=5) == []
+    assert [item['artist'] for item in engine.recommend(N_ARTISTS + 1, k=5)] == [3]
+
+
+def test_empty_temporal_kg(tmp_path):
+    temporal = build_temporal(_events([], [], []), str(tmp_path))
+    assert temporal.labels == []
+    assert load_temporal(str(tmp_path)).labels == []
+    with pytest.raises(KeyError, match='aucune'):
+        temporal.window('2010Q1')
@@ -0,0 +1,301 @@
+"""
+Corpus de marches aléatoires pondérées sur le KG (DeepWalk / node2vec), écrit par blocs sur disque
+
+Chaque marche part d'un nœud et avance de walk_length pas; le voisin suivant est tiré
+proportionnellement au poids des arêtes (tables d'alias, alias_sampling) puis, si p ou q diffère
+de 1, accepté par rejet avec le biais de node2vec relatif au nœud précédent t:
+    1/p si le voisin est t, 1 si c'est un voisin de t, 1/q sinon
+Un métachemin restreint les relations de chaque pas (ex: listened_to puis similar_to/similar_from:
+utilisateur -> artiste -> artiste), répété jusqu'à la fin de la marche (0 2,3 1: retour à un utilisateur).
+
+Les marches sont découpées en blocs de chunk_walks marches, chacun tiré avec son propre flux
+(rng_utils.spawn_rng(graine, bloc)) et écrit par le worker qui l'a calculé dans walks_XXXXX.npy
+(int32, (n_marches, walk_length + 1), -1 après un nœud sans arête autorisée): le corpus ne dépend
+pas du nombre de workers et la mémoire reste bornée par un bloc par worker. corpus.json est écrit
+en dernier.
+
+Usage (depuis src/):
+    python walk_corpus.py --walks_per_node 10 --walk_length 40 --workers 4
+    python walk_corpus.py --p 1 --q 0.5 --metapath 0 2,3 1 --output ../final_data/music/walks_metapath
+"""
+import argparse
+import collections
+import concurrent.futures
+import glob
+import json
+import os
+import time
+import numpy as np
+
+from alias_sampling import build_alias, draw
+from graph_csr import csr_heads
+from graph_snapshot import load_snapshot
+from profiling import span
+from rng_utils import make_rng, spawn_rng, stage_rng, STAGE_WALKS
+
+CORPUS_VERSION = 1
+
+# Graphe partagé par les workers: tables d'alias d'une classe de relations par pas du métachemin
+# (tails: voisin de chaque élément des tables), edge_keys = head * n_nodes + tail triés (biais node2vec)
+WalkGraph = collections.namedtuple('WalkGraph', ['tables', 'tails', 'step_tables', 'edge_keys', 'n_nodes'])
+
+# Contexte partagé par les workers (hérité au fork ou transmis une fois par l'initializer)
+_CONTEXT = {}
+
+
+def build_walk_graph(csr, metapath=None):
+    """
+    Tables d'alias par classe de relations du métachemin
+
+    Args:
+        csr: CSRGraph
+        metapath: Liste d'ensembles de relations, un par pas (répétée); None = toutes les relations
+
+    Returns:
+        WalkGraph
+    """
+    heads = csr_heads(csr).astype(np.int64)
+    classes = [None] if not metapath else []
+    for relations in metapath or []:
+        relations = tuple(sorted(set(int(r) for r in relations)))
+        if relations not in classes:
+            classes.append(relations)
+
+    tables, tails = [], []
+    for relations in classes:
+        if relations is None:
+            tables.append(build_alias(csr.indptr, csr.weights))
+            tails.append(csr.indices)
+            continue
+        # Arêtes gardées dans l'ordre du CSR: les groupes restent délimités par head
+        edges = np.flatnonzero(np.isin(csr.relations, relations))
+        indptr = np.zeros(csr.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads[edges], minlength=csr.n_nodes), out=indptr[1:])
+        tables.append(build_alias(indptr, csr.weights[edges]))
+        tails.append(csr.indices[edges])
+
+    if metapath:
+        step_tables = [classes.index(tuple(sorted(set(int(r) for r in relations)))) for relations in metapath]
+    else:
+        step_tables = [0]
+    edge_keys = heads * csr.n_nodes + csr.indices
+    return WalkGraph(tables=tables, tails=tails, step_tables=step_tables, edge_keys=edge_keys,
+                     n_nodes=csr.n_nodes)
+
+
+def start_nodes(graph):
+    """Nœuds ayant au moins une arête autorisée au premier pas"""
+    return np.flatnonzero(np.diff(graph.tables[graph.step_tables[0]].indptr))
+
+
+def _is_edge(graph, heads, tails):
+    keys = heads * graph.n_nodes + tails
+    pos = np.minimum(np.searchsorted(graph.edge_keys, keys), max(len(graph.edge_keys) - 1, 0))
+    return graph.edge_keys[pos] == keys
+
+
+def node2vec_walks(graph, starts, walk_length, rng=None, p=1.0, q=1.0):
+    """
+    Marches pondérées depuis starts, toutes avancées d'un pas à la fois
+
+    Args:
+        graph: WalkGraph (voir build_walk_graph)
+        starts: Nœuds de départ (une marche par entrée)
+        walk_length: Nombre de pas
+        rng: numpy.random.Generator
+        p: Paramètre de retour (1/p = poids relatif d'un retour au nœud précédent)
+        q: Paramètre entrée-sortie (1/q = poids relatif d'un voisin non adjacent au nœud précédent)
+
+    Returns:
+        Array int64 (n_marches, walk_length + 1), complété par -1 après un nœud sans arête autorisée
+    """
+    rng = make_rng(rng)
+    starts = np.asarray(starts, dtype=np.int64)
+    walks = np.full((len(starts), walk_length + 1), -1, dtype=np.int64)
+    walks[:, 0] = starts
+    biased = p != 1.0 or q != 1.0
+    max_bias = max(1.0 / p, 1.0, 1.0 / q)
+
+    active = np.arange(len(starts))
+    for step in range(walk_length):
+        table_index = graph.step_tables[step % len(graph.step_tables)]
+        table, tails = graph.tables[table_index], graph.tails[table_index]
+        current = walks[active, step]
+        proposals = draw(table, current, rng)
+        alive = proposals >= 0
+        active, current, proposals = active[alive], current[alive], proposals[alive]
+        nexts = tails[proposals].astype(np.int64)
+
+        if biased and step > 0:
+            # Rejet: seules les propositions refusées sont tirées à nouveau
+            previous = walks[active, step - 1]
+            pending = np.arange(len(active))
+            while len(pending):
+                candidates = nexts[pending]
+                bias = np.where(candidates == previous[pending], 1.0 / p,
+                                np.where(_is_edge(graph, previous[pending], candidates), 1.0, 1.0 / q))
+                pending = pending[rng.random(len(pending)) * max_bias >= bias]
+                if len(pending):
+                    nexts[pending] = tails[draw(table, current[pending], rng)]
+
+        walks[active, step + 1] = nexts
+        if not len(active):
+            break
+    return walks
+
+
+def _init_worker(context):
+    _CONTEXT.update(context)
+
+
+def _walk_chunk(task):
+    """Calculer et écrire un bloc de marches; retourne (fichier, nombre de marches, pas effectués)"""
+    chunk, first_walk, n_walks = task
+    ctx = _CONTEXT
+    params = ctx['params']
+    starts = ctx['starts'][(first_walk + np.arange(n_walks)) % len(ctx['starts'])]
+    rng = spawn_rng(ctx['rng'], chunk)
+    walks = node2vec_walks(ctx['graph'], starts, params['walk_length'], rng, params['p'], params['q'])
+    name = f'walks_{chunk:05d}.npy'
+    np.save(os.path.join(ctx['output_dir'], name), walks.astype(np.int32))
+    return name, n_walks, int((walks[:, 1:] >= 0).sum())
+
+
+def generate_corpus(csr, output_dir, walks_per_node=10, walk_length=40, p=1.0, q=1.0, metapath=None,
+                    workers=1, chunk_walks=1 << 16, seed=0, info=None):
+    """
+    Générer le corpus: walks_per_node marches depuis chaque nœud de départ, par blocs
+
+    Args:
+        csr: CSRGraph (ex: load_snapshot(...).csr)
+        output_dir: Dossier du corpus (les blocs d'un corpus précédent sont supprimés)
+        walks_per_node: Passes sur les nœuds de départ
+        walk_length: Nombre de pas par marche
+        p, q: Paramètres node2vec (1, 1 = DeepWalk pondéré)
+        metapath: Liste d'ensembles de relations par pas (None = toutes)
+        workers: Processus calculant les blocs
+        chunk_walks: Marches par bloc (mémoire d'un worker ~ chunk_walks * (walk_length + 1) * 8 octets)
+        seed: Graine racine
+        info: Informations ajoutées à corpus.json
+
+    Returns:
+        WalkCorpus
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    meta_path = os.path.join(output_dir, 'corpus.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for path in glob.glob(os.path.join(output_dir, 'walks_*.npy')):
+        os.remove(path)
+
+    graph = build_walk_graph(csr, metapath)
+    starts = start_nodes(graph)
+    n_walks = len(starts) * walks_per_node
+    tasks = [(chunk, first, min(chunk_walks, n_walks - first))
+             for chunk, first in enumerate(range(0, n_walks, chunk_walks))]
+    context = {
+        'graph': graph,
+        'starts': starts,
+        'rng': stage_rng(seed, STAGE_WALKS),
+        'output_dir': output_dir,
+        'params': {'walk_length': walk_length, 'p': p, 'q': q},
+    }
+
+    start = time.perf_counter()
+    with span('walk_corpus.generate', walks=n_walks) as counts:
+        if workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                        initargs=(context,)) as executor:
+                results = list(executor.map(_walk_chunk, tasks))
+        else:
+            _init_worker(context)
+            results = [_walk_chunk(task) for task in tasks]
+        counts['steps'] = sum(result[2] for result in results)
+    seconds = time.perf_counter() - start
+
+    meta = dict(info or {})
+    meta.update({'version': CORPUS_VERSION, 'walk_length': walk_length, 'walks_per_node': walks_per_node,
+                 'p': p, 'q': q, 'metapath': [sorted(set(int(r) for r in rel)) for rel in metapath or []],
+                 'seed': seed, 'n_start_nodes': int(len(starts)), 'n_walks': int(n_walks),
+                 'n_steps': int(counts['steps']), 'seconds': round(seconds, 3),
+                 'chunks': [{'file': name, 'n_walks': count} for name, count, _ in results]})
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+    print(f'{n_walks} marches ({counts["steps"]} pas) en {seconds:.2f}s '
+          f'({counts["steps"] / max(seconds, 1e-9) / 1e6:.2f} M pas/s) dans {output_dir}')
+    return load_corpus(output_dir)
+
+
+def load_corpus(output_dir):
+    """WalkCorpus d'un dossier écrit par generate_corpus, ou None s'il est absent ou incomplet"""
+    meta_path = os.path.join(output_dir, 'corpus.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != CORPUS_VERSION:
+        return None
+    return WalkCorpus(output_dir, meta)
+
+
+class WalkCorpus:
+    """
+    Corpus écrit sur disque, lu bloc par bloc en mmap
+
+    Args:
+        output_dir: Dossier du corpus
+        meta: Contenu de corpus.json
+    """
+
+    def __init__(self, output_dir, meta):
+        self.output_dir = output_dir
+        self.meta = meta
+
+    def __len__(self):
+        return self.meta['n_walks']
+
+    def chunks(self, mmap_mode='r'):
+        """Itérer sur les blocs: arrays int32 (n_marches, walk_length + 1)"""
+        for chunk in self.meta['chunks']:
+            yield np.load(os.path.join(self.output_dir, chunk['file']), mmap_mode=mmap_mode)
+
+    def sentences(self):
+        """Marches sous forme de listes de nœuds (sans le remplissage -1), ex: pour gensim Word2Vec"""
+        for walks in self.chunks():
+            for walk in walks:
+                yield walk[walk >= 0].tolist()
+
+
+def parse_metapath(values):
+    """['0', '2,3'] -> [[0], [2, 3]]"""
+    return [[int(r) for r in value.split(',')] for value in values] if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Corpus de marches aléatoires pondérées (DeepWalk / node2vec)')
+    parser.add_argument('--dataset_path', type=str, default='../final_data')
+    parser.add_argument('--dataset', type=str, default='music')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Dossier du corpus (défaut: final_data/{dataset}/walks)')
+    parser.add_argument('--walks_per_node', type=int, default=10)
+    parser.add_argument('--walk_length', type=int, default=40)
+    parser.add_argument('--p', type=float, default=1.0, help='Paramètre de retour de node2vec')
+    parser.add_argument('--q', type=float, default=1.0, help='Paramètre entrée-sortie de node2vec')
+    parser.add_argument('--metapath', type=str, nargs='+', default=None,
+                        help='Relations autorisées à chaque pas, répétées (ex: 0 2,3)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processus calculant les blocs')
+    parser.add_argument('--chunk_walks', type=int, default=1 << 16, help='Marches par bloc écrit')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    output_dir = args.output or os.path.join(args.dataset_path, args.dataset, 'walks')
+    csr = load_snapshot(args.dataset_path, args.dataset).csr
+    generate_corpus(csr, output_dir, args.walks_per_node, args.walk_length, args.p, args.q,
+                    parse_metapath(args.metapath), args.workers, args.chunk_walks, args.seed,
+                    info={'dataset': args.dataset})
+
+
+if __name__ == '__main__':
+    main()